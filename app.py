@@ -3,10 +3,11 @@ import pandas as pd
 from PIL import Image
 import io
 import os
-import tempfile
+import time
 import logging
 from datetime import datetime
-from modules import ocr, parser, exporter, constants, qr_reader
+from modules import exporter, constants, metrics
+from modules.job_queue import CardJobQueue, STATUS_LABELS, STATUS_DONE, STATUS_FAILED
 from dotenv import load_dotenv
 import shutil
 import subprocess
@@ -21,9 +22,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# 環境変数の設定
-SAVE_IMAGES = os.getenv('SAVE_IMAGES', 'false').lower() == 'true'
-
 # Streamlit UI設定
 st.set_page_config(
     page_title="名刺OCRアプリ",
@@ -48,77 +46,47 @@ hide_streamlit_style = """
     """
 st.markdown(hide_streamlit_style, unsafe_allow_html=True)
 
-def process_image(image_path):
+# 処理状況の画面を更新する間隔（秒）
+JOB_POLL_INTERVAL = 1.0
+
+@st.cache_resource
+def get_job_queue():
     """
-    画像を処理してデータを抽出する共通関数
-    
-    Args:
-        image_path: 処理する画像のパス
-        
-    Returns:
-        tuple: (成功したかどうか, エラーメッセージ, 抽出テキスト, QRコードテキスト, 構造化データ)
+    名刺の処理ジョブキューを取得する（再実行や複数セッションの間で共有）
     """
-    try:
-        # 画像を読み込み
-        pil_image = Image.open(image_path)
-        
-        # OCR処理
-        ocr_text, processed_images = ocr.extract_text_from_image(image_path, save_processed_images=SAVE_IMAGES)
-        
-        # OCRエラーチェック
-        if "エラー" in ocr_text or "失敗" in ocr_text:
-            return False, ocr_text, None, None, None
-        
-        # QRコード読み取り
-        qr_text = qr_reader.read_qr_from_image(pil_image)
-        if qr_text:
-            logger.info(f"QRコード検出: {qr_text[:50]}...")
-            
-            # sasaeai URLの特別処理
-            if qr_reader.is_sasaeai_url(qr_text):
-                logger.info("sasaeai URLを検出しました")
-        
-        # Gemini APIでテキスト構造化
-        try:
-            # QRコード情報も含めて構造化
-            structured_data = parser.parse_text(ocr_text, qr_text)
-            
-            # 予備メールアドレスと予備電話番号を「その他」に移動
-            if structured_data:
-                other_info = []
-                if structured_data.get('メールアドレス（予備）'):
-                    other_info.append(f"予備メールアドレス: {structured_data['メールアドレス（予備）']}")
-                    del structured_data['メールアドレス（予備）']
-                if structured_data.get('電話番号（予備）'):
-                    other_info.append(f"予備電話番号: {structured_data['電話番号（予備）']}")
-                    del structured_data['電話番号（予備）']
-                
-                if other_info:
-                    if structured_data.get('その他'):
-                        structured_data['その他'] += "\n" + "\n".join(other_info)
-                    else:
-                        structured_data['その他'] = "\n".join(other_info)
-            
-            return True, None, ocr_text, qr_text, structured_data
-        except Exception as api_err:
-            error_msg = str(api_err)
-            # APIクォータエラーの特別処理
-            if "429" in error_msg:
-                return False, "Gemini APIのクォータ制限に達しました。しばらく待ってから再試行してください。", ocr_text, qr_text, None
-            else:
-                return False, f"Gemini APIエラー: {error_msg}", ocr_text, qr_text, None
-    except Exception as e:
-        return False, f"処理中にエラーが発生しました: {str(e)}", None, None, None
+    return CardJobQueue()
+
+@st.cache_resource
+def start_metrics_server():
+    """
+    計測結果を公開するHTTPサーバを起動する（METRICS_ENABLEDとMETRICS_PORTを指定した場合のみ、プロセス内で1回）
+    """
+    if constants.METRICS_ENABLED and constants.METRICS_PORT:
+        return metrics.start_http_server(constants.METRICS_PORT)
+    return None
+
+def _upload_id(uploaded_file):
+    """
+    アップロードされたファイルの識別子を返す（同じファイルを二重に登録しないために使用）
+    """
+    return getattr(uploaded_file, "file_id", None) or f"{uploaded_file.name}:{uploaded_file.size}"
+
+def _profile_requested():
+    """
+    URLに ?profile=1 が付いている場合は、処理をプロファイルする（再デプロイせずに遅い名刺を調査するため）
+    """
+    return st.query_params.get("profile") == "1"
 
 def main():
+    start_metrics_server()
     st.title("名刺OCRアプリ")
     st.subheader("名刺画像から情報を抽出・整理・保存")
     
     # 使用方法の説明を追加
     st.markdown("""
     ### 使い方
-    1. 「Browse files」ボタンをクリックして、読み込みたい名刺の画像を選んでください
-    2. 「🔍 データ抽出」ボタンをクリックすると、名刺の情報が自動的に抽出されます
+    1. 「Browse files」ボタンをクリックして、読み込みたい名刺の画像を選んでください（複数選択できます）
+    2. 「🔍 データ抽出」ボタンをクリックすると、名刺の情報がバックグラウンドで順に抽出されます
     3. 抽出された情報は画面に表示され、必要に応じてCSVファイルとして保存できます。
       エクセルやスプレッドシートで開いてご利用ください。
     """)
@@ -126,54 +94,74 @@ def main():
     # セッション状態の初期化
     if 'df' not in st.session_state:
         st.session_state.df = pd.DataFrame(columns=constants.COLUMNS)
+    if 'job_ids' not in st.session_state:
+        st.session_state.job_ids = []
+        st.session_state.submitted_uploads = set()
+        st.session_state.appended_jobs = set()
     
     # 左カラム：画像アップロード
     col1, col2 = st.columns([1, 2])
     
     with col1:
         st.write("### 名刺画像をアップロード")
-        uploaded_file = st.file_uploader("名刺画像を選択", type=["png", "jpg", "jpeg"])
+        uploaded_files = st.file_uploader(
+            "名刺画像を選択（複数選択できます）", type=["png", "jpg", "jpeg"], accept_multiple_files=True
+        )
         
-        if uploaded_file:
-            # 画像表示
-            image = Image.open(uploaded_file)
-            st.image(image, caption="アップロードされた名刺", use_container_width=True)
+        if uploaded_files:
+            # 画像表示（1枚の場合のみ大きく表示）
+            if len(uploaded_files) == 1:
+                image = Image.open(uploaded_files[0])
+                st.image(image, caption="アップロードされた名刺", use_container_width=True)
+            else:
+                st.write(f"{len(uploaded_files)}枚の名刺が選択されています")
             
-            # OCR処理ボタン
+            # OCR処理ボタン（未登録の画像だけをジョブとして登録する）
             if st.button("🔍 データ抽出", key="extract_uploaded"):
-                with st.spinner("画像を処理中..."):
-                    # 一時ファイルとして保存
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp_file:
-                        tmp_file.write(uploaded_file.getvalue())
-                        temp_path = tmp_file.name
-                    
-                    try:
-                        # 画像処理
-                        success, error_msg, ocr_text, qr_text, structured_data = process_image(temp_path)
-                        
-                        if success:
-                            # テキスト情報の表示
-                            st.text_area("OCRで抽出したテキスト", ocr_text, height=120)
-                            
-                            # QRコード情報があれば表示
-                            if qr_text:
-                                st.text_area("QRコードから抽出したリンク", qr_text or "", height=80)
-                            
-                            # DataFrameに追加
-                            new_df = pd.DataFrame([structured_data])
-                            st.session_state.df = pd.concat([st.session_state.df, new_df], ignore_index=True)
-                            
-                            st.success("データ抽出に成功しました！")
-                        else:
-                            st.error(error_msg)
-                            if ocr_text:
-                                st.text_area("OCRで抽出したテキスト", ocr_text, height=120)
-                                if qr_text:
-                                    st.text_area("QRコードから抽出したリンク", qr_text or "", height=80)
-                                st.info("テキストは抽出できましたが、Gemini APIでの解析に失敗しました。APIキーや接続を確認してください。")
-                    finally:
-                        # 一時ファイルの削除
-                        os.unlink(temp_path)
+                new_files = [f for f in uploaded_files if _upload_id(f) not in st.session_state.submitted_uploads]
+                if new_files:
+                    job_ids = get_job_queue().submit(
+                        [(f.name, f.getvalue()) for f in new_files], profile=_profile_requested()
+                    )
+                    st.session_state.job_ids += job_ids
+                    st.session_state.submitted_uploads.update(_upload_id(f) for f in new_files)
+                else:
+                    st.info("選択された名刺はすべて処理済みです")
+        
+        # 名刺ごとの処理状況
+        jobs = get_job_queue().snapshot(st.session_state.job_ids)
+        if jobs:
+            st.write("### 処理状況")
+            st.dataframe(pd.DataFrame([
+                {
+                    "ファイル名": job["filename"],
+                    "状態": STATUS_LABELS[job["status"]],
+                    "名前": job["fields"].get("名前", ""),
+                    "会社名": job["fields"].get("会社名", ""),
+                    "エラー": job["error"] or "",
+                }
+                for job in jobs
+            ]), use_container_width=True, hide_index=True)
+            
+            # 完了した名刺のデータを一覧に追加（1回だけ）
+            for job in jobs:
+                if job["status"] == STATUS_DONE and job["id"] not in st.session_state.appended_jobs:
+                    new_df = pd.DataFrame([job["result"]["data"]])
+                    st.session_state.df = pd.concat([st.session_state.df, new_df], ignore_index=True)
+                    st.session_state.appended_jobs.add(job["id"])
+            
+            # 抽出テキストの確認
+            finished = [job for job in jobs if job["result"] and job["result"]["ocr_text"]]
+            if finished:
+                selected = st.selectbox(
+                    "抽出テキストを確認する名刺", finished, format_func=lambda job: job["filename"]
+                )
+                st.text_area("OCRで抽出したテキスト", selected["result"]["ocr_text"], height=120)
+                if selected["result"]["qr_text"]:
+                    qr_types = "、".join(qr_code["type"] for qr_code in selected["result"].get("qr_codes") or [])
+                    st.text_area(f"QRコードから抽出した内容（{qr_types}）", selected["result"]["qr_text"], height=80)
+                if selected["status"] == STATUS_FAILED:
+                    st.info("テキストは抽出できましたが、Gemini APIでの解析に失敗しました。APIキーや接続を確認してください。")
     
     # 右カラム：データ表示と保存機能
     with col2:
@@ -194,13 +182,21 @@ def main():
             # データクリアボタン
             if st.button("🗑 データクリア"):
                 st.session_state.df = pd.DataFrame(columns=constants.COLUMNS)
-                st.experimental_rerun()
+                # 完了したジョブは破棄し、処理中のジョブだけ表示を続ける
+                get_job_queue().forget(st.session_state.job_ids)
+                st.session_state.job_ids = [job["id"] for job in get_job_queue().snapshot(st.session_state.job_ids)]
+                st.rerun()
         else:
             st.info("名刺データがまだありません。左側から名刺画像をアップロードしてデータ抽出を行ってください。")
 
     # フッター
     st.markdown("---")
     st.markdown("© 2025 名刺OCRアプリ")
+    
+    # 処理中の名刺がある間は定期的に画面を更新する
+    if any(job["status"] not in (STATUS_DONE, STATUS_FAILED) for job in jobs):
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
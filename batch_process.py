@@ -0,0 +1,320 @@
+"""
+名刺画像を一括処理するコマンドラインツール
+
+ディレクトリまたはglobパターンで指定した名刺画像を並行処理し、結果をCSV/Excelに出力する。
+処理済みの名刺はマニフェスト（JSON Lines）に1件ずつ記録するため、
+中断した場合も同じコマンドを再実行すると続きから処理できる。
+
+使用例:
+    python batch_process.py samples/ -o meishi.csv
+    python batch_process.py "scans/**/*.jpg" -o meishi.xlsx --workers 8 --llm-concurrency 4 --llm-batch-size 10
+    python batch_process.py samples/ -o meishi.csv --metrics-json metrics.json
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import asyncio
+import logging
+import argparse
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from modules import exporter, constants, metrics
+from modules.pipeline import process_cards_async
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+# 処理対象とする画像の拡張子
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# 所要時間を集計する処理段階
+STAGES = ["ocr", "qr", "llm", "total"]
+
+def collect_images(inputs: Iterable[str], recursive: bool = False) -> List[str]:
+    """
+    ディレクトリ・globパターン・ファイルのパスから名刺画像のパスを集める
+
+    Args:
+        inputs (Iterable[str]): ディレクトリ、globパターン、またはファイルのパス
+        recursive (bool): ディレクトリのサブディレクトリも探すかどうか
+
+    Returns:
+        list: 重複を除いて並べ替えた画像のパス
+    """
+    paths = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            if recursive:
+                for root, _, files in os.walk(pattern):
+                    paths += [os.path.join(root, name) for name in files]
+            else:
+                paths += [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            paths += glob.glob(pattern, recursive=True)
+    images = {
+        os.path.normpath(path) for path in paths
+        if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS)
+    }
+    return sorted(images)
+
+def load_manifest(manifest_path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    マニフェストから処理済みの名刺の記録を読み込む
+
+    中断時に書きかけになった最終行などの壊れた行は読み飛ばす。
+    同じ画像の記録が複数ある場合は後の記録を使う。
+
+    Args:
+        manifest_path (str): マニフェストのパス
+
+    Returns:
+        dict: 画像のパス -> 記録
+    """
+    records = {}
+    if not os.path.exists(manifest_path):
+        return records
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                records[record["image_path"]] = record
+            except (json.JSONDecodeError, KeyError, TypeError):
+                logger.warning(f"マニフェストの{line_number}行目を読み込めないため読み飛ばします")
+    return records
+
+def select_pending(image_paths: List[str], done: Dict[str, Dict[str, Any]],
+                   retry_failed: bool = False) -> List[str]:
+    """
+    マニフェストに記録のない名刺（retry_failedの場合は前回失敗した名刺も）を入力順に選ぶ
+
+    Args:
+        image_paths (list): 入力した画像のパス
+        done (dict): 画像のパス -> マニフェストの記録
+        retry_failed (bool): 前回失敗した名刺も処理し直すかどうか
+
+    Returns:
+        list: 処理する画像のパス
+    """
+    return [
+        path for path in image_paths
+        if path not in done or (retry_failed and not done[path]["success"])
+    ]
+
+def append_manifest(manifest_file, result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    処理結果をマニフェストに1行追記し、ディスクに書き出す
+
+    Args:
+        manifest_file: 追記モードで開いたマニフェストのファイル
+        result (dict): process_cardと同じ形式の処理結果
+
+    Returns:
+        dict: 追記した記録
+    """
+    record = {
+        "image_path": os.path.normpath(result["image_path"]),
+        "success": result["success"],
+        "error": result["error"],
+        "data": result["data"],
+        "cached": result["cached"],
+        "pixels_saved": (result.get("normalization") or {}).get("pixels_saved", 0),
+        "pixels_upscaled": (result.get("normalization") or {}).get("pixels_upscaled", 0),
+        "timings": result["timings"],
+        "finished_at": datetime.now().isoformat(timespec="seconds")
+    }
+    manifest_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+    manifest_file.flush()
+    os.fsync(manifest_file.fileno())
+    return record
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """
+    値の百分位数を返す（最近傍順位法）
+
+    Args:
+        values (list): 値のリスト
+        q (float): 百分位（0〜100）
+
+    Returns:
+        float: 百分位数（値がない場合はNone）
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+def summarize(records: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    """
+    今回の実行で処理した名刺の集計（スループット、段階ごとのp50/p95、失敗数、画像の正規化で削減・拡大した画素数）を作成する
+
+    Args:
+        records (list): 今回の実行で追記した記録
+        elapsed (float): 実行時間（秒）
+
+    Returns:
+        dict: 集計結果
+    """
+    stages = {}
+    for stage in STAGES:
+        values = [record["timings"][stage] for record in records if stage in record["timings"]]
+        stages[stage] = {"count": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95)}
+    failures = Counter(record["error"] for record in records if not record["success"])
+    return {
+        "processed": len(records),
+        "succeeded": sum(1 for record in records if record["success"]),
+        "failed": sum(failures.values()),
+        "cached": sum(1 for record in records if record["cached"]),
+        "pixels_saved": sum(record.get("pixels_saved", 0) for record in records),
+        "pixels_upscaled": sum(record.get("pixels_upscaled", 0) for record in records),
+        "elapsed": elapsed,
+        "throughput": len(records) / elapsed if elapsed > 0 else 0.0,
+        "stages": stages,
+        "failures": dict(failures.most_common())
+    }
+
+def print_summary(summary: Dict[str, Any], skipped: int) -> None:
+    """
+    集計結果を表示する
+    """
+    print("\n===== 処理結果 =====")
+    print(f"処理件数: {summary['processed']}件（成功 {summary['succeeded']}件 / 失敗 {summary['failed']}件 / "
+          f"キャッシュ {summary['cached']}件）、前回までに処理済み: {skipped}件")
+    print(f"実行時間: {summary['elapsed']:.1f}秒、スループット: {summary['throughput']:.2f}件/秒")
+    print(f"画像の正規化で削減した画素数: {summary['pixels_saved'] / 1_000_000:.1f}M画素"
+          f"（小さな画像の拡大で増えた画素数: {summary['pixels_upscaled'] / 1_000_000:.1f}M画素）")
+    print("段階ごとの所要時間:")
+    for stage, stats in summary["stages"].items():
+        if stats["count"]:
+            print(f"  {stage:<6} p50 {stats['p50']:.2f}秒 / p95 {stats['p95']:.2f}秒（{stats['count']}件）")
+    if summary["failures"]:
+        print("失敗の内訳:")
+        for error, count in summary["failures"].items():
+            print(f"  {count}件: {error}")
+
+def write_output(records: Dict[str, Dict[str, Any]], image_paths: List[str], output_path: str) -> int:
+    """
+    成功した名刺のデータを入力順にCSVまたはExcelに出力する
+
+    Args:
+        records (dict): 画像のパス -> 記録
+        image_paths (list): 入力した画像のパス（出力順）
+        output_path (str): 出力先（拡張子 .xlsx の場合はExcel、それ以外はCSV）
+
+    Returns:
+        int: 出力した件数
+    """
+    rows = [
+        records[path]["data"] for path in image_paths
+        if path in records and records[path]["success"] and records[path]["data"]
+    ]
+    df = pd.DataFrame(rows, columns=constants.COLUMNS).fillna("")
+    if output_path.lower().endswith(".xlsx"):
+        with open(output_path, 'wb') as f:
+            f.write(exporter.to_excel(df))
+    else:
+        # Excelで開いても文字化けしないようBOM付きUTF-8で保存する
+        with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+            f.write(exporter.to_csv(df))
+    return len(rows)
+
+async def run_batch(pending: List[str], manifest_path: str, workers: Optional[int],
+                    llm_concurrency: Optional[int], use_cache: bool,
+                    llm_batch_size: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    未処理の名刺を並行処理し、終わった順にマニフェストへ追記する
+
+    Gemini APIでの解析は、llm_batch_size件（デフォルトはGEMINI_BATCH_SIZE）までの名刺をまとめて1リクエストで送る。
+
+    Returns:
+        list: 今回の実行で追記した記録
+    """
+    records = []
+    # 中断で最終行が書きかけの場合は、次の記録がその行に続かないよう改行しておく
+    if os.path.exists(manifest_path) and os.path.getsize(manifest_path) > 0:
+        with open(manifest_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+        if needs_newline:
+            with open(manifest_path, 'a', encoding='utf-8') as f:
+                f.write("\n")
+    with open(manifest_path, 'a', encoding='utf-8') as manifest_file:
+        async for result in process_cards_async(
+            pending, max_workers=workers, max_llm_concurrency=llm_concurrency, use_cache=use_cache,
+            llm_batch_size=llm_batch_size or constants.GEMINI_BATCH_SIZE
+        ):
+            records.append(append_manifest(manifest_file, result))
+            status = "成功" if result["success"] else f"失敗: {result['error']}"
+            print(f"[{len(records)}/{len(pending)}] {result['image_path']} {status}", flush=True)
+    return records
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='名刺画像を一括処理してCSV/Excelに出力する')
+    parser.add_argument('inputs', nargs='+', help='名刺画像のディレクトリ、globパターン、またはファイル')
+    parser.add_argument('-o', '--output', required=True, help='出力先（.csv または .xlsx）')
+    parser.add_argument('--manifest', help='進捗を記録するマニフェストのパス（デフォルト: 出力先 + .manifest.jsonl）')
+    parser.add_argument('--workers', type=int, default=None,
+                        help=f'OCR・QRコード読み取りの並列数（デフォルト: {constants.PIPELINE_MAX_WORKERS}）')
+    parser.add_argument('--llm-concurrency', type=int, default=None,
+                        help=f'Gemini APIの同時呼び出し数（デフォルト: {constants.GEMINI_MAX_CONCURRENCY}）')
+    parser.add_argument('--llm-batch-size', type=int, default=None,
+                        help=f'Gemini APIの1リクエストにまとめる名刺の最大数（1の場合は名刺ごとに解析、デフォルト: {constants.GEMINI_BATCH_SIZE}）')
+    parser.add_argument('--recursive', action='store_true', help='ディレクトリのサブディレクトリも処理する')
+    parser.add_argument('--retry-failed', action='store_true', help='前回失敗した名刺も処理し直す')
+    parser.add_argument('--no-cache', action='store_true', help='処理結果キャッシュを使用しない')
+    parser.add_argument('--metrics-json', help='処理時間・件数の計測結果を保存するJSONファイルのパス（指定すると計測を有効にする）')
+    args = parser.parse_args(argv)
+
+    for name in ("workers", "llm_concurrency", "llm_batch_size"):
+        value = getattr(args, name)
+        if value is not None and value < 1:
+            parser.error(f"--{name.replace('_', '-')}は1以上を指定してください: {value}")
+
+    image_paths = collect_images(args.inputs, recursive=args.recursive)
+    if not image_paths:
+        print("処理対象の画像が見つかりません", file=sys.stderr)
+        return 1
+
+    manifest_path = args.manifest or f"{args.output}.manifest.jsonl"
+    done = load_manifest(manifest_path)
+    pending = select_pending(image_paths, done, retry_failed=args.retry_failed)
+    skipped = len(image_paths) - len(pending)
+    print(f"対象: {len(image_paths)}件（処理済み {skipped}件、未処理 {len(pending)}件）")
+
+    if args.metrics_json:
+        metrics.set_enabled(True)
+    if metrics.is_enabled() and constants.METRICS_PORT:
+        metrics.start_http_server(constants.METRICS_PORT)
+
+    start = time.perf_counter()
+    try:
+        new_records = asyncio.run(run_batch(
+            pending, manifest_path, args.workers, args.llm_concurrency, use_cache=not args.no_cache,
+            llm_batch_size=args.llm_batch_size
+        ))
+    except KeyboardInterrupt:
+        print("\n中断しました。同じコマンドを再実行すると続きから処理します。", file=sys.stderr)
+        return 130
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(new_records, elapsed)
+    print_summary(summary, skipped)
+    if args.metrics_json:
+        metrics.dump_json(args.metrics_json)
+        print(f"計測結果を保存しました: {args.metrics_json}")
+
+    exported = write_output(load_manifest(manifest_path), image_paths, args.output)
+    print(f"\n{exported}件のデータを出力しました: {args.output}")
+    return 0 if summary["failed"] == 0 else 2
+
+if __name__ == "__main__":
+    sys.exit(main())
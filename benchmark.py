@@ -0,0 +1,347 @@
+"""
+名刺処理のベンチマークを実行するツール
+
+benchmark_corpus.py で作成した合成名刺のコーパスを使い、次の処理を計測する。
+- ocr: OCR（Tesseract）のみ。正解の項目の値がOCRテキストに含まれる割合を集計する
+- qr: QRコード読み取りのみ。正解のQRコードの内容を読み取れた割合と誤検出を集計する
+- pipeline: 処理全体（Gemini APIの代わりにオフラインのスタブを使用、処理結果キャッシュは使用しない）。
+  抽出した項目が正解と一致する割合を集計する
+
+スループット、p50/p95の処理時間、メモリ使用量のピーク（RSS）、項目ごとの正解率をJSONに保存するため、
+コミットごとの結果を --baseline で比較できる。
+メモリ使用量のピークはプロセス全体の値のため、ベンチマークごとに比べる場合は --benchmarks で1つずつ実行する。
+
+使用例:
+    python benchmark_corpus.py -o bench_corpus --count 300
+    python benchmark.py bench_corpus -o bench_results/$(git rev-parse --short HEAD).json
+    python benchmark.py bench_corpus --benchmarks qr --limit 50 --baseline bench_results/main.json
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import argparse
+import subprocess
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:
+    # Windowsではメモリ使用量のピークを記録しない
+    resource = None
+
+from modules import ocr, qr_reader, parser as llm_parser
+from modules.constants import PIPELINE_VERSION, OCR_MODE
+from modules.image_source import load_card_image
+from modules.llm_backend import LLMBackend
+from modules.llm_stub_server import generate_stub_response
+from modules.pipeline import process_card
+from batch_process import percentile
+from benchmark_corpus import load_corpus, score_fields, score_text
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+# 結果のJSONの形式のバージョン
+RESULT_VERSION = "1"
+# 計測できるベンチマーク
+BENCHMARKS = ["ocr", "qr", "pipeline"]
+# 比較で悪化として表示する変化の割合
+REGRESSION_THRESHOLD = 0.1
+
+class OfflineLLMBackend(LLMBackend):
+    """
+    スタブサーバと同じ応答（OCRテキストから正規表現で取り出した項目）をプロセス内で返すバックエンド
+
+    ネットワークとAPIクォータを使わずに処理全体を計測するために使用する。
+    """
+
+    name = "offline"
+    rate_limited = False
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        return generate_stub_response(prompt)
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    プロセスのメモリ使用量（RSS）のピークをMBで返す（計測できない環境ではNone）
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linuxはキロバイト、macOSはバイト単位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _git_commit() -> Optional[str]:
+    """
+    計測したコミットのハッシュを返す（gitがない場合はNone）
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_ocr(path: str, card: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    OCRを実行し、正解の項目の値がOCRテキストに含まれるかを判定する
+    """
+    text, _, stats = ocr.extract_text_with_stats(path)
+    return {"fields": score_text(card["fields"], text), "passes": stats.get("pass_count", 0)}
+
+def run_qr(path: str, card: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    QRコードを読み取り、正解のQRコードの内容と比較する
+    """
+    values = {payload["value"] for payload in qr_reader.read_qr_codes(load_card_image(path))}
+    expected = set(card["qr_codes"])
+    return {"expected": len(expected), "found": len(expected & values), "false_positives": len(values - expected)}
+
+def run_pipeline(path: str, card: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    処理全体を実行し、抽出した項目を正解と比較する
+    """
+    result = process_card(path, use_cache=False)
+    return {
+        "success": result["success"],
+        "fields": score_fields(card["fields"], result["data"]),
+        "timings": result["timings"],
+    }
+
+RUNNERS: Dict[str, Callable[[str, Dict[str, Any]], Dict[str, Any]]] = {
+    "ocr": run_ocr,
+    "qr": run_qr,
+    "pipeline": run_pipeline,
+}
+
+def _latency_stats(values: List[float]) -> Dict[str, Any]:
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "mean": sum(values) / len(values) if values else None,
+    }
+
+def _field_accuracy(outcomes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    項目ごとと全体の正解率を集計する
+    """
+    correct, total = defaultdict(int), defaultdict(int)
+    for outcome in outcomes:
+        for key, matched in outcome.get("fields", {}).items():
+            total[key] += 1
+            correct[key] += int(matched)
+    fields = {key: correct[key] / total[key] for key in total}
+    overall = sum(correct.values()) / sum(total.values()) if total else None
+    return {"overall": overall, "fields": fields}
+
+def summarize_benchmark(name: str, outcomes: List[Dict[str, Any]], latencies: List[float],
+                        errors: List[str], elapsed: float) -> Dict[str, Any]:
+    """
+    1つのベンチマークの結果を集計する
+
+    Args:
+        name (str): ベンチマーク名
+        outcomes (list): 名刺ごとの判定結果
+        latencies (list): 名刺ごとの処理時間（秒）
+        errors (list): 例外で終わった名刺のエラーメッセージ
+        elapsed (float): 実行時間（秒）
+
+    Returns:
+        dict: 集計結果（件数、スループット、処理時間、メモリ使用量のピーク、正解率など）
+    """
+    summary = {
+        "cards": len(latencies),
+        "errors": len(errors),
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "latency": _latency_stats(latencies),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if name in ("ocr", "pipeline"):
+        summary["accuracy"] = _field_accuracy(outcomes)
+    if name == "qr":
+        expected = sum(outcome["expected"] for outcome in outcomes)
+        summary["qr"] = {
+            "expected": expected,
+            "found": sum(outcome["found"] for outcome in outcomes),
+            "recall": sum(outcome["found"] for outcome in outcomes) / expected if expected else None,
+            "false_positives": sum(outcome["false_positives"] for outcome in outcomes),
+        }
+    if name == "pipeline":
+        summary["success_rate"] = (
+            sum(1 for outcome in outcomes if outcome["success"]) / len(outcomes) if outcomes else None
+        )
+        stages = defaultdict(list)
+        for outcome in outcomes:
+            for stage, value in outcome["timings"].items():
+                stages[stage].append(value)
+        summary["stages"] = {stage: _latency_stats(values) for stage, values in stages.items()}
+    return summary
+
+def run_benchmark(name: str, corpus_dir: str, cards: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    コーパスの名刺を1枚ずつ順に処理して計測する
+
+    Args:
+        name (str): ベンチマーク名（"ocr" / "qr" / "pipeline"）
+        corpus_dir (str): コーパスのディレクトリ
+        cards (list): 計測する名刺の正解データ
+
+    Returns:
+        dict: 集計結果
+    """
+    runner = RUNNERS[name]
+    outcomes, latencies, errors = [], [], []
+    start = time.perf_counter()
+    for index, card in enumerate(cards, 1):
+        card_start = time.perf_counter()
+        try:
+            outcomes.append(runner(os.path.join(corpus_dir, card["file"]), card))
+        except Exception as e:
+            logger.exception(f"ベンチマーク {name} の処理中にエラーが発生しました: {card['file']}")
+            errors.append(f"{card['file']}: {str(e)}")
+        latencies.append(time.perf_counter() - card_start)
+        print(f"\r[{name}] {index}/{len(cards)}", end="", flush=True)
+    print()
+    return summarize_benchmark(name, outcomes, latencies, errors, time.perf_counter() - start)
+
+def _comparable_values(name: str, summary: Dict[str, Any]) -> Iterator[tuple]:
+    """
+    比較する指標を (指標名, 値, 大きいほど良いかどうか) で返す
+    """
+    yield f"{name}.throughput", summary["throughput"], True
+    yield f"{name}.p50", summary["latency"]["p50"], False
+    yield f"{name}.p95", summary["latency"]["p95"], False
+    yield f"{name}.peak_rss_mb", summary["peak_rss_mb"], False
+    if "accuracy" in summary:
+        yield f"{name}.accuracy", summary["accuracy"]["overall"], True
+        for key, value in summary["accuracy"]["fields"].items():
+            yield f"{name}.accuracy.{key}", value, True
+    if "qr" in summary:
+        yield f"{name}.recall", summary["qr"]["recall"], True
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    2つの結果の指標を比較する
+
+    Args:
+        baseline (dict): 比較元の結果
+        current (dict): 今回の結果
+
+    Returns:
+        list: 指標ごとの比較（metric, baseline, current, change, regression）
+    """
+    rows = []
+    for name, summary in current["benchmarks"].items():
+        if name not in baseline.get("benchmarks", {}):
+            continue
+        base_values = {metric: value for metric, value, _ in _comparable_values(name, baseline["benchmarks"][name])}
+        for metric, value, higher_is_better in _comparable_values(name, summary):
+            base = base_values.get(metric)
+            if base is None or value is None:
+                continue
+            change = (value - base) / base if base else 0.0
+            worse = -change if higher_is_better else change
+            rows.append({
+                "metric": metric,
+                "baseline": base,
+                "current": value,
+                "change": change,
+                "regression": worse > REGRESSION_THRESHOLD,
+            })
+    return rows
+
+def print_results(results: Dict[str, Any]) -> None:
+    """
+    計測結果を表示する
+    """
+    print("\n===== ベンチマーク結果 =====")
+    for name, summary in results["benchmarks"].items():
+        latency = summary["latency"]
+        print(f"[{name}] {summary['cards']}枚（エラー {summary['errors']}件）、"
+              f"スループット {summary['throughput']:.2f}枚/秒、"
+              f"p50 {latency['p50']:.3f}秒 / p95 {latency['p95']:.3f}秒")
+        if summary["peak_rss_mb"] is not None:
+            print(f"  メモリ使用量のピーク: {summary['peak_rss_mb']:.0f}MB")
+        if summary.get("accuracy", {}).get("overall") is not None:
+            fields = ", ".join(f"{key} {value:.0%}" for key, value in summary["accuracy"]["fields"].items())
+            print(f"  正解率: {summary['accuracy']['overall']:.1%}（{fields}）")
+        if summary.get("qr", {}).get("recall") is not None:
+            qr = summary["qr"]
+            print(f"  QRコード: {qr['found']}/{qr['expected']}件を読み取り（{qr['recall']:.1%}）、誤検出 {qr['false_positives']}件")
+    if "comparison" in results:
+        regressions = [row for row in results["comparison"] if row["regression"]]
+        print(f"\n比較元: {results['baseline']}（悪化 {len(regressions)}件）")
+        for row in results["comparison"]:
+            mark = " ← 悪化" if row["regression"] else ""
+            print(f"  {row['metric']:<32} {row['baseline']:.3f} -> {row['current']:.3f}（{row['change']:+.1%}）{mark}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='合成名刺のコーパスで名刺処理のベンチマークを実行する')
+    parser.add_argument('corpus', help='benchmark_corpus.pyで作成したコーパスのディレクトリ')
+    parser.add_argument('-o', '--output', help='結果を保存するJSONファイルのパス（デフォルト: bench_results/<コミット>.json）')
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=BENCHMARKS,
+                        help='実行するベンチマーク（デフォルト: すべて）')
+    parser.add_argument('--limit', type=int, default=None, help='計測する名刺の枚数の上限')
+    parser.add_argument('--baseline', help='比較元の結果のJSONファイル（悪化した指標を表示する）')
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    cards = corpus["cards"][:args.limit] if args.limit else corpus["cards"]
+    commit = _git_commit()
+
+    # Gemini APIの代わりにオフラインのスタブを使う
+    llm_parser.set_llm_backend(OfflineLLMBackend())
+
+    results = {
+        "version": RESULT_VERSION,
+        "commit": commit,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pipeline_version": PIPELINE_VERSION,
+            "ocr_mode": OCR_MODE,
+        },
+        "corpus": {
+            "path": args.corpus,
+            "version": corpus["version"],
+            "seed": corpus["seed"],
+            "cards": len(cards),
+            "fonts": corpus["fonts"],
+        },
+        "benchmarks": {},
+    }
+    for name in args.benchmarks:
+        results["benchmarks"][name] = run_benchmark(name, args.corpus, cards)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        results["baseline"] = args.baseline
+        results["comparison"] = compare_results(baseline, results)
+        corpus_keys = ("version", "seed", "cards", "fonts")
+        if any(baseline.get("corpus", {}).get(key) != results["corpus"][key] for key in corpus_keys):
+            print("注意: 比較元とコーパス（バージョン・シード・枚数・フォント）が異なるため、正しく比較できません", file=sys.stderr)
+
+    output_path = args.output or os.path.join("bench_results", f"{commit or 'result'}.json")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    print_results(results)
+    print(f"\n結果を保存しました: {output_path}")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    sys.exit(main())
@@ -0,0 +1,354 @@
+"""
+ベンチマーク用の合成名刺コーパス（正解データ付き）を作成するツール
+
+generate_sample_card.render_card で名刺を描画し、フォント・文字の大きさ・解像度・回転・ぼかし・
+JPEGのノイズ・縦書き・QRコード（URL / sasaeai URL / vCard / MECARD）を変えた画像を作成する。
+同じシードと枚数からは同じコーパスが作成される（ただし描画に使うフォントはインストール済みのものに依存する）。
+
+作成したコーパスは benchmark.py で計測する。
+
+使用例:
+    python benchmark_corpus.py -o bench_corpus --count 300 --seed 0
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import random
+import argparse
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+from PIL import Image, ImageFilter, ImageFont
+
+from generate_sample_card import render_card
+
+# コーパスの形式のバージョン（正解データや画像の作り方を変えた場合に上げる）
+CORPUS_VERSION = "2"
+# 正解データのファイル名
+MANIFEST_NAME = "corpus.json"
+
+# 描画に使うフォントの候補（インストールされているものだけを使用）
+JP_FONT_CANDIDATES = [
+    "msgothic.ttc", "msmincho.ttc", "YuGothR.ttc", "meiryo.ttc",
+    "NotoSansCJK-Regular.ttc", "NotoSerifCJK-Regular.ttc", "NotoSansJP-Regular.otf",
+    "ipaexg.ttf", "ipaexm.ttf", "ipag.ttf", "ipam.ttf",
+]
+EN_FONT_CANDIDATES = [
+    "arial.ttf", "times.ttf", "verdana.ttf",
+    "DejaVuSans.ttf", "DejaVuSerif.ttf", "DejaVuSansMono.ttf",
+    "LiberationSans-Regular.ttf", "LiberationSerif-Regular.ttf",
+]
+
+# 名刺の内容の候補（ローマ字はメールアドレスとURLに使用）
+JP_SURNAMES = [("山田", "yamada"), ("佐藤", "sato"), ("鈴木", "suzuki"), ("高橋", "takahashi"),
+               ("田中", "tanaka"), ("伊藤", "ito"), ("渡辺", "watanabe"), ("中村", "nakamura"),
+               ("小林", "kobayashi"), ("加藤", "kato")]
+JP_GIVEN_NAMES = [("太郎", "taro"), ("花子", "hanako"), ("健一", "kenichi"), ("美咲", "misaki"),
+                  ("大輔", "daisuke"), ("由美", "yumi"), ("翔太", "shota"), ("直樹", "naoki")]
+JP_COMPANIES = [("サンプルテクノロジー", "sample-tech"), ("未来ソリューションズ", "mirai-sol"),
+                ("東和システム", "towa-sys"), ("青葉商事", "aoba-shoji"),
+                ("日本データ工業", "nihon-data"), ("さくらデザイン", "sakura-design")]
+JP_COMPANY_FORMS = ["株式会社{}", "{}株式会社", "合同会社{}"]
+JP_POSITIONS = ["代表取締役", "取締役 技術部長", "営業部 課長", "開発部 主任",
+                "総務部", "マーケティング部 マネージャー"]
+JP_LOCALITIES = ["東京都千代田区丸の内", "東京都港区芝公園", "大阪府大阪市北区梅田",
+                 "神奈川県横浜市西区みなとみらい", "愛知県名古屋市中区栄", "福岡県福岡市博多区博多駅前"]
+JP_BUILDINGS = ["", " サンプルビル{}F", " 第二ビル{}階"]
+# 市外局番（携帯電話の番号）と市内局番の桁数
+JP_PHONE_FORMATS = [("03", 4), ("06", 4), ("045", 3), ("052", 3), ("092", 3), ("090", 4), ("080", 4)]
+
+EN_FIRST_NAMES = ["John", "Emily", "Michael", "Sarah", "David", "Laura", "James", "Olivia"]
+EN_LAST_NAMES = ["Smith", "Johnson", "Brown", "Taylor", "Miller", "Wilson", "Clark", "Lewis"]
+EN_COMPANIES = [("ACME Corporation", "acme"), ("Globex Inc.", "globex"), ("Initech Co.", "initech"),
+                ("Umbrella Ltd.", "umbrella"), ("Stark Industries", "stark")]
+EN_POSITIONS = ["Senior Sales Manager", "Software Engineer", "Chief Executive Officer",
+                "Marketing Director", "Account Executive"]
+EN_STREETS = ["Main Street", "Oak Avenue", "Market Street", "Broadway", "Pine Road"]
+EN_CITIES = [("New York, NY", "10001"), ("San Francisco, CA", "94105"), ("Chicago, IL", "60601"),
+             ("Seattle, WA", "98101")]
+
+# QRコードの内容の種類
+QR_KINDS = ["url", "sasaeai", "vcard", "mecard"]
+
+# 画像の劣化の発生率と範囲
+QR_RATE = 0.4
+VERTICAL_RATE = 0.2
+RIGHT_ANGLE_RATE = 0.1
+SKEW_RATE = 0.4
+MAX_SKEW_DEGREES = 5.0
+BLUR_RATE = 0.4
+JPEG_RATE = 0.6
+RESOLUTION_SCALES = [0.6, 1.0, 1.0, 1.5, 2.5]
+# 傾けた名刺の背景（机の上で撮影した写真を想定）
+BACKGROUND_COLOR = (110, 110, 110)
+
+def available_fonts(candidates: List[str]) -> List[str]:
+    """
+    候補のうち読み込めるフォントを返す
+    """
+    fonts = []
+    for font in candidates:
+        try:
+            ImageFont.truetype(font, 12)
+        except IOError:
+            continue
+        fonts.append(font)
+    return fonts
+
+def _phone_number(rng: random.Random, is_jp: bool) -> str:
+    if not is_jp:
+        return f"+1 ({rng.randint(200, 999)}) 555-{rng.randint(0, 9999):04d}"
+    prefix, middle_digits = rng.choice(JP_PHONE_FORMATS)
+    middle = rng.randint(10 ** (middle_digits - 1), 10 ** middle_digits - 1)
+    return f"{prefix}-{middle}-{rng.randint(0, 9999):04d}"
+
+def _contact(rng: random.Random, is_jp: bool) -> Dict[str, str]:
+    """
+    名刺の内容（正解データ）を作成する
+    """
+    if is_jp:
+        (surname, surname_romaji), (given, given_romaji) = rng.choice(JP_SURNAMES), rng.choice(JP_GIVEN_NAMES)
+        company_stem, slug = rng.choice(JP_COMPANIES)
+        building = rng.choice(JP_BUILDINGS).format(rng.randint(2, 20))
+        address = (f"{rng.choice(JP_LOCALITIES)}{rng.randint(1, 5)}-{rng.randint(1, 20)}-"
+                   f"{rng.randint(1, 30)}{building}")
+        return {
+            "名前": f"{surname} {given}",
+            "会社名": rng.choice(JP_COMPANY_FORMS).format(company_stem),
+            "職業": rng.choice(JP_POSITIONS),
+            "メールアドレス": f"{surname_romaji}.{given_romaji}@{slug}.co.jp",
+            "電話番号": _phone_number(rng, True),
+            "郵便番号": f"{rng.randint(100, 999)}-{rng.randint(0, 9999):04d}",
+            "住所": address,
+            "HP URL": f"https://www.{slug}.co.jp",
+        }
+    first, last = rng.choice(EN_FIRST_NAMES), rng.choice(EN_LAST_NAMES)
+    company, slug = rng.choice(EN_COMPANIES)
+    city, zip_code = rng.choice(EN_CITIES)
+    return {
+        "名前": f"{first} {last}",
+        "会社名": company,
+        "職業": rng.choice(EN_POSITIONS),
+        "メールアドレス": f"{first.lower()}.{last.lower()}@{slug}.com",
+        "電話番号": _phone_number(rng, False),
+        "住所": f"{rng.randint(1, 999)} {rng.choice(EN_STREETS)}, {city} {zip_code}",
+        "HP URL": f"https://www.{slug}.com",
+    }
+
+def _qr_payload(rng: random.Random, kind: str, fields: Dict[str, str]) -> str:
+    """
+    QRコードの内容を作成する
+    """
+    if kind == "url":
+        return fields["HP URL"]
+    if kind == "sasaeai":
+        return f"https://sasaeai.com/u/{rng.randint(10000, 99999)}"
+    name_parts = fields["名前"].split(" ", 1)
+    if kind == "vcard":
+        return "\n".join([
+            "BEGIN:VCARD", "VERSION:3.0",
+            f"N:{';'.join(name_parts)}", f"FN:{fields['名前']}",
+            f"ORG:{fields['会社名']}", f"TITLE:{fields['職業']}",
+            f"TEL;TYPE=WORK:{fields['電話番号']}", f"EMAIL:{fields['メールアドレス']}",
+            f"URL:{fields['HP URL']}", "END:VCARD",
+        ])
+    return (f"MECARD:N:{','.join(name_parts)};TEL:{fields['電話番号']};"
+            f"EMAIL:{fields['メールアドレス']};URL:{fields['HP URL']};;")
+
+def make_card_spec(index: int, seed: int, jp_fonts: List[str], en_fonts: List[str]) -> Dict[str, Any]:
+    """
+    1枚の名刺の内容・描画方法・劣化のさせ方を決める（同じシードと番号からは同じ結果になる）
+
+    Args:
+        index (int): 名刺の番号
+        seed (int): コーパスのシード
+        jp_fonts (list): 日本語の名刺に使うフォント
+        en_fonts (list): 英語の名刺に使うフォント
+
+    Returns:
+        dict: file, language, fields（正解の項目）, qr_codes（正解のQRコードの内容）, render, degrade
+    """
+    rng = random.Random(f"{seed}-{index}")
+    is_jp = rng.random() < 0.7
+    fields = _contact(rng, is_jp)
+    qr_codes = []
+    if rng.random() < QR_RATE:
+        kind = rng.choice(QR_KINDS)
+        qr_codes.append(_qr_payload(rng, kind, fields))
+        if kind == "sasaeai":
+            fields["sasaeai URL"] = qr_codes[0]
+
+    render = {
+        "font_path": None,
+        "font_scale": round(rng.uniform(0.8, 1.25), 2),
+        "vertical": is_jp and rng.random() < VERTICAL_RATE,
+        "qr_text": qr_codes[0] if qr_codes else None,
+    }
+    rotation = rng.choice([90, 180, 270]) if rng.random() < RIGHT_ANGLE_RATE else 0
+    degrade = {
+        "scale": rng.choice(RESOLUTION_SCALES),
+        "rotation": rotation,
+        "skew": round(rng.uniform(-MAX_SKEW_DEGREES, MAX_SKEW_DEGREES), 2) if rng.random() < SKEW_RATE else 0.0,
+        "blur": round(rng.uniform(0.5, 1.5), 2) if rng.random() < BLUR_RATE else 0.0,
+        "jpeg_quality": rng.randint(35, 95) if rng.random() < JPEG_RATE else None,
+    }
+    # フォントは最後に選ぶ（インストール済みのフォントが違っても、内容と劣化のさせ方は変わらない）
+    fonts = (jp_fonts if is_jp else en_fonts) or en_fonts or jp_fonts
+    if fonts:
+        render["font_path"] = rng.choice(fonts)
+    extension = "jpg" if degrade["jpeg_quality"] else "png"
+    return {
+        "file": f"card_{index:04d}.{extension}",
+        "language": "ja" if is_jp else "en",
+        "fields": fields,
+        "qr_codes": qr_codes,
+        "render": render,
+        "degrade": degrade,
+    }
+
+def render_spec(spec: Dict[str, Any]) -> Image.Image:
+    """
+    劣化させる前の名刺の画像を描画する
+    """
+    fields = spec["fields"]
+    address = fields["住所"]
+    if fields.get("郵便番号"):
+        address = f"〒{fields['郵便番号']} {address}"
+    return render_card(
+        fields["名前"], fields["会社名"], fields["職業"], address, fields["電話番号"],
+        fields["メールアドレス"], fields["HP URL"], is_jp=spec["language"] == "ja", **spec["render"]
+    )
+
+def degrade_image(image: Image.Image, degrade: Dict[str, Any]) -> Image.Image:
+    """
+    解像度の変更・回転・傾き・ぼかしを加える（JPEGのノイズは保存時に加える）
+    """
+    if degrade["scale"] != 1.0:
+        size = (round(image.width * degrade["scale"]), round(image.height * degrade["scale"]))
+        image = image.resize(size, Image.LANCZOS)
+    if degrade["rotation"]:
+        # 反時計回りに回転する（読み取り時は時計回りに戻す必要がある）
+        image = image.rotate(degrade["rotation"], expand=True)
+    if degrade["skew"]:
+        image = image.rotate(degrade["skew"], resample=Image.BICUBIC, expand=True, fillcolor=BACKGROUND_COLOR)
+    if degrade["blur"]:
+        image = image.filter(ImageFilter.GaussianBlur(degrade["blur"] * degrade["scale"]))
+    return image
+
+def encode_image(image: Image.Image, jpeg_quality: Optional[int]) -> bytes:
+    """
+    画像をPNG、またはJPEG（画質を指定した場合）のバイト列にする
+    """
+    buffer = io.BytesIO()
+    if jpeg_quality:
+        image.convert("RGB").save(buffer, format="JPEG", quality=jpeg_quality)
+    else:
+        image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def generate_corpus(output_dir: str, count: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    合成名刺のコーパスを作成し、画像と正解データ（corpus.json）を保存する
+
+    Args:
+        output_dir (str): 保存先ディレクトリ
+        count (int): 名刺の枚数
+        seed (int): 乱数のシード
+
+    Returns:
+        dict: 正解データ（version, seed, count, fonts, cards）
+    """
+    jp_fonts = available_fonts(JP_FONT_CANDIDATES)
+    en_fonts = available_fonts(EN_FONT_CANDIDATES)
+    if not jp_fonts:
+        print("日本語のフォントが見つかりません。日本語の名刺は正しく描画されません。", file=sys.stderr)
+
+    os.makedirs(output_dir, exist_ok=True)
+    cards = []
+    for index in range(count):
+        spec = make_card_spec(index, seed, jp_fonts, en_fonts)
+        image = degrade_image(render_spec(spec), spec["degrade"])
+        with open(os.path.join(output_dir, spec["file"]), "wb") as f:
+            f.write(encode_image(image, spec["degrade"]["jpeg_quality"]))
+        cards.append(spec)
+
+    manifest = {
+        "version": CORPUS_VERSION,
+        "seed": seed,
+        "count": count,
+        "fonts": {"ja": jp_fonts, "en": en_fonts},
+        "cards": cards,
+    }
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+def load_corpus(corpus_dir: str) -> Dict[str, Any]:
+    """
+    コーパスの正解データを読み込む
+    """
+    with open(os.path.join(corpus_dir, MANIFEST_NAME), encoding="utf-8") as f:
+        return json.load(f)
+
+_DASHES = re.compile(r'[‐‑‒–—―−－]')
+
+def normalize_value(text: Optional[str]) -> str:
+    """
+    正解との比較用に値を正規化する（全角・半角、空白、ハイフンの種類、大文字・小文字の違いを無視する）
+    """
+    text = unicodedata.normalize("NFKC", text or "")
+    text = _DASHES.sub("-", text)
+    return re.sub(r'\s+', '', text).lower()
+
+def score_fields(expected: Dict[str, str], actual: Optional[Dict[str, str]]) -> Dict[str, bool]:
+    """
+    抽出した項目が正解と一致するかを項目ごとに判定する
+
+    Args:
+        expected (dict): 正解の項目
+        actual (dict): 抽出した項目（抽出に失敗した場合はNone）
+
+    Returns:
+        dict: 項目名 -> 一致したかどうか（正解に値のある項目のみ）
+    """
+    actual = actual or {}
+    return {
+        key: normalize_value(actual.get(key)) == normalize_value(value)
+        for key, value in expected.items() if value
+    }
+
+def score_text(expected: Dict[str, str], text: Optional[str]) -> Dict[str, bool]:
+    """
+    OCRテキストに正解の値が含まれるかを項目ごとに判定する
+
+    Args:
+        expected (dict): 正解の項目
+        text (str): OCRテキスト
+
+    Returns:
+        dict: 項目名 -> 含まれていたかどうか（正解に値のある項目のみ）
+    """
+    normalized = normalize_value(text)
+    return {key: normalize_value(value) in normalized for key, value in expected.items() if value}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='ベンチマーク用の合成名刺コーパス（正解データ付き）を作成する')
+    parser.add_argument('-o', '--output', default='bench_corpus', help='保存先ディレクトリ（デフォルト: bench_corpus）')
+    parser.add_argument('--count', type=int, default=300, help='名刺の枚数（デフォルト: 300）')
+    parser.add_argument('--seed', type=int, default=0, help='乱数のシード（デフォルト: 0）')
+    args = parser.parse_args(argv)
+    if args.count < 1:
+        parser.error(f"--countは1以上を指定してください: {args.count}")
+
+    manifest = generate_corpus(args.output, args.count, args.seed)
+    with_qr = sum(1 for card in manifest["cards"] if card["qr_codes"])
+    vertical = sum(1 for card in manifest["cards"] if card["render"]["vertical"])
+    print(f"{args.count}枚の名刺を作成しました: {args.output}（QRコード付き {with_qr}枚、縦書き {vertical}枚）")
+    print(f"使用したフォント: 日本語 {manifest['fonts']['ja'] or 'なし'} / 英語 {manifest['fonts']['en'] or 'なし'}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,16 +3,99 @@ import cv2
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 
-# サンプルディレクトリの作成
+# サンプルディレクトリ
 SAMPLES_DIR = 'samples'
-os.makedirs(SAMPLES_DIR, exist_ok=True)
 
-def create_sample_card(filename, name, company, position, address, phone, email, website, is_jp=True):
+# 名刺サイズ (91mm x 55mm at 300dpi)
+CARD_WIDTH, CARD_HEIGHT = 1075, 650
+
+# 既定のフォント（システムにインストールされたものを使用）
+DEFAULT_JP_FONT = 'msgothic.ttc'
+DEFAULT_EN_FONT = 'arial.ttf'
+
+# 会社ロゴ（単純な長方形）の位置 (左, 上, 右, 下)
+LOGO_BOX = (40, 40, 200, 90)
+# 縦書きの名刺が収まらない場合に文字を縮小する倍率と、文字の大きさの下限（ピクセル）
+VERTICAL_SHRINK = 0.9
+VERTICAL_MIN_SIZE = 10
+
+def load_font(font_path, size):
     """
-    サンプル名刺を生成して保存する
-    
+    フォントを読み込む（見つからない場合はデフォルトフォントを使用）
+
+    Args:
+        font_path (str): フォントファイルのパスまたはファイル名
+        size (int): 文字の大きさ（ピクセル）
+
+    Returns:
+        PIL.ImageFont: フォント
+    """
+    try:
+        return ImageFont.truetype(font_path, size)
+    except IOError:
+        return ImageFont.load_default()
+
+def render_qr_code(text, size):
+    """
+    QRコードの画像を作成する
+
+    Args:
+        text (str): QRコードの内容
+        size (int): 一辺の大きさの目安（ピクセル、モジュールの大きさの整数倍に丸める）
+
+    Returns:
+        PIL.Image: QRコードの画像（グレースケール）
+    """
+    matrix = cv2.QRCodeEncoder.create().encode(text)
+    scale = max(1, round(size / matrix.shape[0]))
+    matrix = cv2.resize(matrix, None, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST)
+    return Image.fromarray(matrix)
+
+def layout_vertical_text(texts, sizes, width=CARD_WIDTH, height=CARD_HEIGHT, reserved=()):
+    """
+    縦書きの文字の位置を決める（右の列から左へ、各列は上から下へ並べ、下端に達したら左の列に折り返す）
+
+    Args:
+        texts (list): 項目ごとのテキスト（右の列から順）
+        sizes (list): 項目ごとの文字の大きさ（ピクセル）
+        width (int): 名刺の幅
+        height (int): 名刺の高さ
+        reserved (list): 文字を置かない領域 (左, 上, 右, 下) のリスト（ロゴ・QRコード）
+
+    Returns:
+        list: 項目ごとの文字の位置 (x, y) のリスト（名刺に収まらない場合はNone）
+    """
+    positions = []
+    x = width - 60
+    for text, size in zip(texts, sizes):
+        y = 40
+        points = []
+        for _ in text:
+            while True:
+                if x < 20:
+                    return None
+                if y + size > height - 20:
+                    # 列の下端に達したら左の列に折り返す
+                    x -= int(size * 1.2)
+                    y = 40
+                    continue
+                overlap = [box for box in reserved if x < box[2] and box[0] < x + size and y < box[3] and box[1] < y + size]
+                if overlap:
+                    y = max(box[3] for box in overlap) + 10
+                    continue
+                break
+            points.append((x, y))
+            y += int(size * 1.1)
+        positions.append(points)
+        x -= int(size * 1.8)
+    return positions
+
+def render_card(name, company, position, address, phone, email, website, is_jp=True,
+                font_path=None, font_scale=1.0, vertical=False, qr_text=None):
+    """
+    名刺の画像を作成する
+
     Args:
-        filename (str): 保存するファイル名
         name (str): 名前
         company (str): 会社名
         position (str): 役職
@@ -21,78 +104,131 @@ def create_sample_card(filename, name, company, position, address, phone, email,
         email (str): メールアドレス
         website (str): ウェブサイト
         is_jp (bool): 日本語かどうか
+        font_path (str): 使用するフォント（省略時は日本語・英語の既定のフォント）
+        font_scale (float): 文字の大きさの倍率
+        vertical (bool): 縦書きにするかどうか（右の列から1文字ずつ下に並べ、収まらない場合は折り返す・縮小する）
+        qr_text (str): 右下（縦書きの場合は左下）に配置するQRコードの内容
+
+    Returns:
+        PIL.Image: 名刺の画像
     """
-    # 名刺サイズ (91mm x 55mm at 300dpi)
-    width, height = 1075, 650
+    width, height = CARD_WIDTH, CARD_HEIGHT
     # 背景色（白）
     background = (255, 255, 255)
     # テキスト色（黒）
     text_color = (0, 0, 0)
-    
+
     # 名刺イメージを作成
     img = Image.new('RGB', (width, height), color=background)
     draw = ImageDraw.Draw(img)
-    
+
     # フォント選択
     # 注意: フォントファイルはシステムにインストールされたものを使用
-    try:
-        if is_jp:
-            name_font = ImageFont.truetype('msgothic.ttc', 40)
-            company_font = ImageFont.truetype('msgothic.ttc', 36)
-            detail_font = ImageFont.truetype('msgothic.ttc', 24)
-        else:
-            name_font = ImageFont.truetype('arial.ttf', 40)
-            company_font = ImageFont.truetype('arial.ttf', 36)
-            detail_font = ImageFont.truetype('arial.ttf', 24)
-    except IOError:
-        # フォントが見つからない場合はデフォルトフォントを使用
-        name_font = ImageFont.load_default()
-        company_font = ImageFont.load_default()
-        detail_font = ImageFont.load_default()
-    
+    font_path = font_path or (DEFAULT_JP_FONT if is_jp else DEFAULT_EN_FONT)
+
     # 会社ロゴ（単純な長方形として描画）
-    draw.rectangle([(40, 40), (200, 90)], fill=(200, 200, 200))
-    
-    # 情報を描画
-    draw.text((40, 120), company, font=company_font, fill=text_color)
-    draw.text((40, 180), name, font=name_font, fill=text_color)
-    draw.text((40, 240), position, font=detail_font, fill=text_color)
-    draw.text((40, 300), address, font=detail_font, fill=text_color)
-    draw.text((40, 360), f"TEL: {phone}", font=detail_font, fill=text_color)
-    draw.text((40, 400), f"Email: {email}", font=detail_font, fill=text_color)
-    draw.text((40, 440), website, font=detail_font, fill=text_color)
-    
+    draw.rectangle([LOGO_BOX[:2], LOGO_BOX[2:]], fill=(200, 200, 200))
+
+    # QRコードの位置（右下、縦書きの場合は左下）
+    qr_image = render_qr_code(qr_text, 180) if qr_text else None
+    if qr_image is not None:
+        left = 40 if vertical else width - qr_image.width - 40
+        qr_box = (left, height - qr_image.height - 40, left + qr_image.width, height - 40)
+
+    # 情報を描画（横書きの場合の上端の位置, テキスト, 倍率1の文字の大きさ）
+    lines = [
+        (120, company, 36),
+        (180, name, 40),
+        (240, position, 24),
+        (300, address, 24),
+        (360, f"TEL: {phone}", 24),
+        (400, f"Email: {email}", 24),
+        (440, website, 24),
+    ]
+    if vertical:
+        # 折り返しても収まらない場合は、すべての文字が収まるまで文字を小さくする（正解データと描画する文字を一致させる）
+        reserved = [LOGO_BOX] + ([qr_box] if qr_image is not None else [])
+        scale = font_scale
+        while True:
+            sizes = [max(VERTICAL_MIN_SIZE, int(size * scale)) for _, _, size in lines]
+            positions = layout_vertical_text([text for _, text, _ in lines], sizes, width, height, reserved)
+            if positions is not None:
+                break
+            if min(sizes) <= VERTICAL_MIN_SIZE:
+                raise ValueError("縦書きの名刺にすべての文字が収まりません")
+            scale *= VERTICAL_SHRINK
+        for (_, text, _), size, points in zip(lines, sizes, positions):
+            font = load_font(font_path, size)
+            for char, point in zip(text, points):
+                draw.text(point, char, font=font, fill=text_color)
+    else:
+        for top, text, size in lines:
+            font = load_font(font_path, int(size * font_scale))
+            draw.text((40, 120 + (top - 120) * font_scale), text, font=font, fill=text_color)
+
+    # QRコードを配置
+    if qr_image is not None:
+        img.paste(qr_image.convert('RGB'), qr_box[:2])
+
     # 名刺の枠線を描画
     draw.rectangle([(0, 0), (width-1, height-1)], outline=(200, 200, 200))
-    
+    return img
+
+def create_sample_card(filename, name, company, position, address, phone, email, website, is_jp=True,
+                       output_dir=SAMPLES_DIR, **options):
+    """
+    サンプル名刺を生成して保存する
+
+    Args:
+        filename (str): 保存するファイル名
+        name (str): 名前
+        company (str): 会社名
+        position (str): 役職
+        address (str): 住所
+        phone (str): 電話番号
+        email (str): メールアドレス
+        website (str): ウェブサイト
+        is_jp (bool): 日本語かどうか
+        output_dir (str): 保存先ディレクトリ
+        **options: render_cardのフォント・縦書き・QRコードの指定
+
+    Returns:
+        str: 保存したファイルのパス
+    """
+    img = render_card(name, company, position, address, phone, email, website, is_jp=is_jp, **options)
+
     # 画像を保存
-    img.save(os.path.join(SAMPLES_DIR, filename))
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, filename)
+    img.save(path)
     print(f"サンプル名刺を保存しました: {filename}")
+    return path
+
+if __name__ == "__main__":
+    # 日本語サンプル名刺
+    create_sample_card(
+        'japanese_card.png',
+        '山田 太郎',
+        '株式会社サンプルテクノロジー',
+        '取締役 技術部長',
+        '東京都千代田区丸の内1-1-1 サンプルビル8F',
+        '03-1234-5678',
+        'yamada@example.com',
+        'https://www.example.com',
+        is_jp=True
+    )
+
+    # 英語サンプル名刺
+    create_sample_card(
+        'english_card.png',
+        'John Smith',
+        'ACME Corporation',
+        'Senior Sales Manager',
+        '123 Main Street, New York, NY 10001',
+        '+1 (212) 555-1234',
+        'john.smith@acme.com',
+        'https://www.acme.com',
+        is_jp=False
+    )
 
-# 日本語サンプル名刺
-create_sample_card(
-    'japanese_card.png',
-    '山田 太郎',
-    '株式会社サンプルテクノロジー',
-    '取締役 技術部長',
-    '東京都千代田区丸の内1-1-1 サンプルビル8F',
-    '03-1234-5678',
-    'yamada@example.com',
-    'https://www.example.com',
-    is_jp=True
-)
-
-# 英語サンプル名刺
-create_sample_card(
-    'english_card.png',
-    'John Smith',
-    'ACME Corporation',
-    'Senior Sales Manager',
-    '123 Main Street, New York, NY 10001',
-    '+1 (212) 555-1234',
-    'john.smith@acme.com',
-    'https://www.acme.com',
-    is_jp=False
-)
-
-print("サンプル名刺の生成が完了しました。") 
\ No newline at end of file
+    print("サンプル名刺の生成が完了しました。")
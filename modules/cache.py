@@ -0,0 +1,231 @@
+"""
+処理結果をディスクにキャッシュするモジュール：
+- SQLiteを使ったキー・値ストア（値はJSONで保存）
+- 有効期限（TTL）と件数・サイズ上限によるLRU方式の削除
+- ヒット・ミス数の集計
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from . import metrics
+from .constants import (
+    CACHE_DIR, RESULT_CACHE_TTL, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_MB,
+    LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_MB
+)
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+def make_cache_key(*parts: Any) -> str:
+    """
+    キャッシュキーを作成する（各要素を連結したSHA-256）
+
+    Args:
+        *parts: キーを構成する値（bytesはそのまま、それ以外は文字列化して使用）
+
+    Returns:
+        str: 16進数のハッシュ値
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode('utf-8')
+        digest.update(hashlib.sha256(data).digest())
+    return digest.hexdigest()
+
+class DiskCache:
+    """
+    SQLiteを使ったスレッドセーフなディスクキャッシュ
+
+    アクセス日時を記録し、件数またはサイズの上限を超えた場合は
+    最も長く使われていないエントリから削除する。
+    """
+
+    def __init__(self, path: str, table: str = "cache", ttl: Optional[float] = None,
+                 max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        """
+        Args:
+            path (str): SQLiteファイルのパス
+            table (str): 使用するテーブル名（用途ごとに分ける）
+            ttl (float): 有効期限（秒）。Noneまたは0以下の場合は無期限
+            max_entries (int): 最大件数。Noneの場合は無制限
+            max_bytes (int): 値の合計サイズの上限（バイト）。Noneの場合は無制限
+        """
+        if not table.isidentifier():
+            raise ValueError(f"キャッシュのテーブル名が不正です: {table}")
+        self.path = path
+        self.table = table
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed)")
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        キャッシュから値を取得する
+
+        Args:
+            key (str): キャッシュキー
+
+        Returns:
+            Any: 保存された値（存在しない・期限切れの場合はNone）
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                metrics.inc("cache_lookups_total", table=self.table, result="miss")
+                return None
+            value, created = row
+            if self.ttl and now - created > self.ttl:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self.evictions += 1
+                self.misses += 1
+                metrics.inc("cache_lookups_total", table=self.table, result="expired")
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        metrics.inc("cache_lookups_total", table=self.table, result="hit")
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        キャッシュに値を保存し、上限を超えた分を削除する
+
+        Args:
+            key (str): キャッシュキー
+            value (Any): JSONに変換できる値
+        """
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data.encode('utf-8')), now, now)
+            )
+            self._evict(now)
+
+    def delete(self, key: str) -> None:
+        """
+        指定したキーのエントリを削除する
+        """
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        """
+        すべてのエントリを削除する
+        """
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def _evict(self, now: float) -> None:
+        """
+        期限切れのエントリと、件数・サイズ上限を超えた古いエントリを削除する（ロック取得済みで呼ぶこと）
+        """
+        if self.ttl:
+            cursor = self._conn.execute(f"DELETE FROM {self.table} WHERE created < ?", (now - self.ttl,))
+            self.evictions += max(cursor.rowcount, 0)
+
+        count, total_size = self._conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+        ).fetchone()
+        over_count = count - self.max_entries if self.max_entries else 0
+        over_size = total_size - self.max_bytes if self.max_bytes else 0
+        if over_count <= 0 and over_size <= 0:
+            return
+
+        # アクセス日時の古い順に、件数とサイズの両方が上限内に収まるまで削除する
+        removed_size = 0
+        victims = []
+        for key, size in self._conn.execute(f"SELECT key, size FROM {self.table} ORDER BY accessed"):
+            if len(victims) >= over_count and removed_size >= over_size:
+                break
+            victims.append((key,))
+            removed_size += size
+        self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", victims)
+        self.evictions += len(victims)
+        logger.debug(f"キャッシュ（{self.table}）から{len(victims)}件を削除しました")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        キャッシュの統計情報を返す
+
+        Returns:
+            dict: 件数、合計サイズ、ヒット数、ミス数、削除数、ヒット率
+        """
+        with self._lock:
+            count, total_size = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": count,
+            "bytes": total_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+_shared_caches = {}
+_shared_caches_lock = threading.Lock()
+
+def _get_shared_cache(table: str, ttl: float, max_entries: int, max_mb: float) -> DiskCache:
+    """
+    用途（テーブル）ごとに1つのキャッシュインスタンスをプロセス内で共有する
+    （Streamlitの複数セッション間でも共有）
+    """
+    with _shared_caches_lock:
+        if table not in _shared_caches:
+            _shared_caches[table] = DiskCache(
+                os.path.join(CACHE_DIR, "cache.sqlite3"),
+                table=table,
+                ttl=ttl,
+                max_entries=max_entries,
+                max_bytes=int(max_mb * 1024 * 1024)
+            )
+        return _shared_caches[table]
+
+def get_result_cache() -> DiskCache:
+    """
+    処理結果（OCRテキスト・QRテキスト・構造化データ）用のキャッシュを取得する
+
+    Returns:
+        DiskCache: 処理結果キャッシュ
+    """
+    return _get_shared_cache("results", RESULT_CACHE_TTL, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_MB)
+
+def get_llm_cache() -> DiskCache:
+    """
+    Gemini APIのレスポンス用のキャッシュを取得する
+
+    Returns:
+        DiskCache: レスポンスキャッシュ
+    """
+    return _get_shared_cache("llm_responses", LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_MB)
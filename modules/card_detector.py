@@ -0,0 +1,170 @@
+"""
+写真から名刺の領域を検出して切り出すモジュール：
+- 縮小したグレースケール画像の輪郭から名刺の四角形（4つの角）を探す
+- 見つかった四角形を射影変換し、名刺の縦横比の画像に補正する
+- 名刺が見つからない場合（スキャン画像など）は呼び出し側で元の画像をそのまま使う
+
+机の上で撮影した写真の背景をOCR・QRコード読み取りの対象から外し、処理する画素数を減らす。
+"""
+
+import logging
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+# 輪郭を探すときに縮小する画像の長辺（ピクセル）
+DETECT_LONG_SIDE = 500
+# 名刺とみなす四角形の面積の範囲（画像の面積に対する割合）
+MIN_AREA_RATIO = 0.15
+MAX_AREA_RATIO = 0.97
+# 名刺とみなす縦横比の許容範囲（想定する比率に対する倍率、撮影時の傾きを考慮して広めにとる）
+ASPECT_TOLERANCE = 0.3
+# 近似した多角形が4点にならなかった輪郭を、外接矩形で代用する場合に必要な充填率
+MIN_RECTANGULARITY = 0.9
+# 面積の大きい順に調べる輪郭の数
+MAX_CANDIDATES = 5
+# 名刺とみなすために必要な、四角形の内側と外側の平均輝度の差（名刺は背景より明るいものとする）
+MIN_BRIGHTNESS_GAP = 10
+
+def order_corners(points: np.ndarray) -> np.ndarray:
+    """
+    四角形の4つの角を左上・右上・右下・左下の順に並べる
+
+    Args:
+        points (numpy.ndarray): 4つの角の座標（4x2）
+
+    Returns:
+        numpy.ndarray: 並べ替えた座標（4x2、float32）
+    """
+    points = points.reshape(4, 2).astype(np.float32)
+    # 重心からの角度で時計回り（画像座標ではy軸が下向き）に並べ、左上に最も近い角から始める
+    center = points.mean(axis=0)
+    angles = np.arctan2(points[:, 1] - center[1], points[:, 0] - center[0])
+    points = points[np.argsort(angles)]
+    start = int(np.argmin(points.sum(axis=1)))
+    return np.roll(points, -start, axis=0)
+
+def _edge_lengths(corners: np.ndarray) -> Tuple[float, float]:
+    """
+    並べ替えた四角形の幅と高さ（向かい合う辺の長い方）を返す
+    """
+    top = np.linalg.norm(corners[1] - corners[0])
+    bottom = np.linalg.norm(corners[2] - corners[3])
+    left = np.linalg.norm(corners[3] - corners[0])
+    right = np.linalg.norm(corners[2] - corners[1])
+    return max(top, bottom), max(left, right)
+
+def _is_card_shape(corners: np.ndarray, aspect: float) -> bool:
+    """
+    四角形の縦横比が名刺（横長・縦長のどちらでもよい）に近いかどうかを判定する
+    """
+    width, height = _edge_lengths(corners)
+    if min(width, height) <= 0:
+        return False
+    ratio = max(width, height) / min(width, height)
+    return abs(ratio - aspect) <= aspect * ASPECT_TOLERANCE
+
+def _is_brighter_than_background(small: np.ndarray, corners: np.ndarray) -> bool:
+    """
+    四角形の内側が外側より明るいかどうかを判定する
+
+    名刺の中の濃い色のロゴや写真の枠を名刺と誤認しないための確認
+    （暗い色の名刺は検出されず、画像全体を使う）。
+    """
+    mask = np.zeros(small.shape[:2], np.uint8)
+    cv2.fillConvexPoly(mask, corners.astype(np.int32), 255)
+    inside = cv2.mean(small, mask=mask)[0]
+    outside = cv2.mean(small, mask=cv2.bitwise_not(mask))[0]
+    return inside - outside >= MIN_BRIGHTNESS_GAP
+
+def find_card_quad(gray: np.ndarray, aspect: float) -> Optional[np.ndarray]:
+    """
+    グレースケール画像から名刺の四角形を探す
+
+    Args:
+        gray (numpy.ndarray): グレースケール画像
+        aspect (float): 名刺の縦横比（長辺 / 短辺）
+
+    Returns:
+        numpy.ndarray: 名刺の4つの角（左上・右上・右下・左下、元の画像の座標、4x2）。見つからない場合はNone
+    """
+    height, width = gray.shape[:2]
+    scale = min(1.0, DETECT_LONG_SIDE / max(height, width))
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+    image_area = small.shape[0] * small.shape[1]
+
+    # エッジを検出し、途切れた輪郭をつなげる
+    blurred = cv2.GaussianBlur(small, (5, 5), 0)
+    edges = cv2.Canny(blurred, 50, 150)
+    edges = cv2.dilate(edges, np.ones((3, 3), np.uint8))
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:MAX_CANDIDATES]:
+        area = cv2.contourArea(contour)
+        if area < image_area * MIN_AREA_RATIO:
+            break
+        if area > image_area * MAX_AREA_RATIO:
+            continue
+        approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+        if len(approx) == 4 and cv2.isContourConvex(approx):
+            corners = order_corners(approx)
+        else:
+            # 角が欠けて4点にならない輪郭は、十分に四角ければ最小外接矩形で代用する
+            rect = cv2.minAreaRect(contour)
+            rect_area = rect[1][0] * rect[1][1]
+            if not rect_area or area / rect_area < MIN_RECTANGULARITY:
+                continue
+            corners = order_corners(cv2.boxPoints(rect))
+        if _is_card_shape(corners, aspect) and _is_brighter_than_background(small, corners):
+            return corners / scale
+    return None
+
+def warp_card(image: np.ndarray, corners: np.ndarray, long_side: int, aspect: float) -> np.ndarray:
+    """
+    名刺の四角形を射影変換し、名刺の縦横比の画像に補正する（横長・縦長の向きは保つ）
+
+    Args:
+        image (numpy.ndarray): 元の画像
+        corners (numpy.ndarray): 名刺の4つの角（左上・右上・右下・左下、4x2）
+        long_side (int): 補正後の画像の長辺（ピクセル）
+        aspect (float): 名刺の縦横比（長辺 / 短辺）
+
+    Returns:
+        numpy.ndarray: 補正した名刺の画像
+    """
+    width, height = _edge_lengths(corners)
+    short_side = round(long_side / aspect)
+    out_width, out_height = (long_side, short_side) if width >= height else (short_side, long_side)
+    target = np.array(
+        [[0, 0], [out_width - 1, 0], [out_width - 1, out_height - 1], [0, out_height - 1]],
+        dtype=np.float32
+    )
+    matrix = cv2.getPerspectiveTransform(corners.astype(np.float32), target)
+    interpolation = cv2.INTER_AREA if max(width, height) > long_side else cv2.INTER_CUBIC
+    return cv2.warpPerspective(image, matrix, (out_width, out_height), flags=interpolation,
+                               borderMode=cv2.BORDER_REPLICATE)
+
+def crop_card(image: np.ndarray, gray: np.ndarray, long_side: int,
+              aspect: float) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    画像から名刺を探して切り出す（見つからない場合は元の画像を返す）
+
+    Args:
+        image (numpy.ndarray): 元の画像（BGR）
+        gray (numpy.ndarray): 元の画像のグレースケール
+        long_side (int): 切り出した画像の長辺（ピクセル）
+        aspect (float): 名刺の縦横比（長辺 / 短辺）
+
+    Returns:
+        tuple: (切り出した名刺の画像または元の画像, 名刺の4つの角またはNone)
+    """
+    corners = find_card_quad(gray, aspect)
+    if corners is None:
+        logger.info("名刺の領域が見つからないため、画像全体を使用します")
+        return image, None
+    logger.info(f"名刺の領域を検出しました: {corners.astype(int).tolist()}")
+    return warp_card(image, corners, long_side, aspect), corners
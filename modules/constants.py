@@ -5,10 +5,14 @@
 import os
 import logging
 import re
+from dotenv import load_dotenv
 
 # ロギング設定
 logger = logging.getLogger(__name__)
 
+# 環境変数の読み込み（以下の設定値を.envファイルからも読み込めるようにする）
+load_dotenv()
+
 # 環境変数の設定
 SAVE_IMAGES = os.getenv('SAVE_IMAGES', 'false').lower() == 'true'
 
@@ -132,6 +136,109 @@ logger.info(f"使用するGeminiモデル: {GEMINI_MODEL}")
 # APIリクエストタイムアウト（秒）
 API_TIMEOUT = 30
 
+# Gemini APIのレート制限（クォータに合わせて設定）
+GEMINI_RPM = float(os.getenv('GEMINI_RPM') or 15)  # 1分あたりの最大リクエスト数
+GEMINI_TPM = float(os.getenv('GEMINI_TPM') or 1000000)  # 1分あたりの最大トークン数
+
+# Gemini APIの再試行設定（429・5xxエラー時に指数バックオフで再試行）
+GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES') or 5)  # 最大再試行回数
+GEMINI_RETRY_BASE_DELAY = float(os.getenv('GEMINI_RETRY_BASE_DELAY') or 2)  # 初回の待機秒数
+GEMINI_RETRY_MAX_DELAY = float(os.getenv('GEMINI_RETRY_MAX_DELAY') or 60)  # 待機秒数の上限
+# レート制限の待機と再試行を含めた1回の解析の期限（秒）
+GEMINI_DEADLINE = float(os.getenv('GEMINI_DEADLINE') or 300)
+
+# 名刺テキストの解析に使うLLMバックエンド
+# gemini: Gemini API / stub: ローカルのスタブサーバ / record: Gemini APIの応答を記録 / replay: 記録した応答を再生
+LLM_BACKENDS = ("gemini", "stub", "record", "replay")
+LLM_BACKEND = (os.getenv('LLM_BACKEND') or 'gemini').lower()
+if LLM_BACKEND not in LLM_BACKENDS:
+    raise ValueError(f"LLM_BACKENDの値が不正です: {LLM_BACKEND}（{', '.join(LLM_BACKENDS)}のいずれかを指定してください）")
+# スタブサーバのURL（LLM_BACKEND=stubの場合）
+LLM_STUB_URL = os.getenv('LLM_STUB_URL') or 'http://127.0.0.1:8765'
+# 応答の記録・再生に使うフィクスチャの保存先（LLM_BACKEND=record/replayの場合）
+LLM_FIXTURES_DIR = os.getenv('LLM_FIXTURES_DIR') or os.path.join('fixtures', 'llm')
+# 再生時に記録時の所要時間だけ待機するかどうか
+LLM_REPLAY_LATENCY = (os.getenv('LLM_REPLAY_LATENCY') or 'false').lower() == 'true'
+
+# ルールベース抽出の設定（全項目の確信度が閾値に達した名刺はGemini APIを呼び出さない）
+RULE_FAST_PATH_ENABLED = (os.getenv('RULE_FAST_PATH_ENABLED') or 'true').lower() == 'true'
+RULE_CONFIDENCE_THRESHOLD = float(os.getenv('RULE_CONFIDENCE_THRESHOLD') or 0.85)  # 確信度の閾値（0〜1）
+if not 0 <= RULE_CONFIDENCE_THRESHOLD <= 1:
+    raise ValueError(f"RULE_CONFIDENCE_THRESHOLDは0〜1の範囲で指定してください: {RULE_CONFIDENCE_THRESHOLD}")
+
+# 複数の名刺を並行処理する際の設定
+# OCR・QRコード読み取りを同時に実行する最大数
+PIPELINE_MAX_WORKERS = int(os.getenv('PIPELINE_MAX_WORKERS') or 4)
+# Gemini APIの同時呼び出し数の上限
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY') or 4)
+if PIPELINE_MAX_WORKERS < 1 or GEMINI_MAX_CONCURRENCY < 1:
+    raise ValueError("PIPELINE_MAX_WORKERSとGEMINI_MAX_CONCURRENCYは1以上を指定してください")
+
+# 一括解析で1リクエストにまとめる名刺の最大数
+GEMINI_BATCH_SIZE = int(os.getenv('GEMINI_BATCH_SIZE') or 10)
+if GEMINI_BATCH_SIZE < 1:
+    raise ValueError(f"GEMINI_BATCH_SIZEは1以上を指定してください: {GEMINI_BATCH_SIZE}")
+
+# OCRの実行モード（sequential: 逐次実行, parallel: 並列実行, cascade: 低コスト順に実行して早期終了,
+#                  layout: テキスト行ごとに並列実行）
+OCR_MODE = (os.getenv('OCR_MODE') or 'parallel').lower()
+
+# OCR並列実行時のワーカー数（Tesseractはサブプロセスで動作するためスレッドで十分並列化できる。
+#   複数の名刺を並行処理する場合もプロセス全体で共有し、同時に実行するTesseractの数の上限になる）
+OCR_MAX_WORKERS = int(os.getenv('OCR_MAX_WORKERS') or min(8, os.cpu_count() or 1))
+if OCR_MAX_WORKERS < 1:
+    raise ValueError(f"OCR_MAX_WORKERSは1以上を指定してください: {OCR_MAX_WORKERS}")
+
+# 複数のTesseractを同時に実行する場合は、Tesseract内部のOpenMPスレッドを1に制限してコアの奪い合いを防ぐ
+# （Tesseractのプロセスは起動時の環境変数を引き継ぐため、最初のOCRより前に1度だけ設定する。
+#   環境変数で指定済みの場合はその値を使う）
+if OCR_MAX_WORKERS > 1 or PIPELINE_MAX_WORKERS > 1:
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+# カスケードOCRの打ち切り条件（単語の平均信頼度 0〜100）
+OCR_CASCADE_MIN_CONFIDENCE = float(os.getenv('OCR_CASCADE_MIN_CONFIDENCE') or 80)
+
+# カスケードOCRの打ち切り条件（メール・電話・郵便番号・URLのうち検出できた割合 0〜1）
+OCR_CASCADE_MIN_COVERAGE = float(os.getenv('OCR_CASCADE_MIN_COVERAGE') or 0.5)
+
+# OCRの前に向き・書字方向・文字の種類を判定し、試す言語・ページ分割モードを絞り込むかどうか
+OCR_SCRIPT_DETECT_ENABLED = (os.getenv('OCR_SCRIPT_DETECT_ENABLED') or 'true').lower() == 'true'
+
+# 入力画像の正規化（EXIFの向きの補正、JPEGの縮小デコード、解像度の調整）
+IMAGE_NORMALIZE_ENABLED = (os.getenv('IMAGE_NORMALIZE_ENABLED') or 'true').lower() == 'true'
+# 名刺を読み取る目標の解像度（dpi、名刺の長辺91mmが300dpiで約1075ピクセル）
+IMAGE_TARGET_DPI = int(os.getenv('IMAGE_TARGET_DPI') or 300)
+# 写真で名刺が画像の長辺に占める割合の想定（0〜1、この割合で写っていても目標の解像度を保てる大きさまで縮小する）
+IMAGE_CARD_FILL = float(os.getenv('IMAGE_CARD_FILL') or 0.7)
+# デコードする画像の最大画素数（メモリ使用量の上限、JPEGはこれ以下になるよう縮小デコードする）
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS') or 60_000_000)
+if IMAGE_TARGET_DPI < 1 or IMAGE_MAX_PIXELS < 1:
+    raise ValueError("IMAGE_TARGET_DPIとIMAGE_MAX_PIXELSは1以上を指定してください")
+if not 0 < IMAGE_CARD_FILL <= 1:
+    raise ValueError(f"IMAGE_CARD_FILLは0より大きく1以下で指定してください: {IMAGE_CARD_FILL}")
+# 写真から名刺の領域を検出し、名刺の縦横比に補正して切り出すかどうか（見つからない場合は画像全体を使用）
+CARD_DETECT_ENABLED = (os.getenv('CARD_DETECT_ENABLED') or 'true').lower() == 'true'
+
+# 処理パイプラインのバージョン（OCR・QR・解析の処理内容を変更したら上げ、既存のキャッシュを無効化する）
+PIPELINE_VERSION = "9"
+
+# キャッシュの保存先ディレクトリ
+CACHE_DIR = os.getenv('CACHE_DIR') or '.cache'
+
+# 処理結果キャッシュの設定（同じ画像の再アップロード時にOCR・QR・Gemini APIの処理を省略）
+RESULT_CACHE_ENABLED = (os.getenv('RESULT_CACHE_ENABLED') or 'true').lower() == 'true'
+RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL') or 7 * 24 * 60 * 60)  # 有効期限（秒）
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES') or 1000)  # 最大件数
+RESULT_CACHE_MAX_MB = float(os.getenv('RESULT_CACHE_MAX_MB') or 100)  # 最大サイズ（MB）
+
+# Gemini APIレスポンスキャッシュの設定（正規化後のプロンプトが同じ場合にAPI呼び出しを省略）
+LLM_CACHE_ENABLED = (os.getenv('LLM_CACHE_ENABLED') or 'true').lower() == 'true'
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL') or 30 * 24 * 60 * 60)  # 有効期限（秒）
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES') or 5000)  # 最大件数
+LLM_CACHE_MAX_MB = float(os.getenv('LLM_CACHE_MAX_MB') or 50)  # 最大サイズ（MB）
+# キャッシュの世代（値を変えると既存のレスポンスキャッシュはすべて使われなくなる）
+LLM_CACHE_VERSION = os.getenv('LLM_CACHE_VERSION') or '1'
+
 # プロンプトテンプレートファイルのパス
 PROMPT_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "prompt_template.txt")
 
@@ -143,4 +250,29 @@ if SAVE_IMAGES:
 # 処理済み画像を保存するためのディレクトリ（デバッグ用）
 PROCESSED_IMAGES_DIR = "processed_images"
 if SAVE_IMAGES:
-    os.makedirs(PROCESSED_IMAGES_DIR, exist_ok=True) 
\ No newline at end of file
+    os.makedirs(PROCESSED_IMAGES_DIR, exist_ok=True)
+
+# 診断情報（QRコード読み取りの前処理画像・失敗の記録など）の記録（デバッグ用、デフォルトは記録しない）
+DIAGNOSTICS_ENABLED = (os.getenv('DIAGNOSTICS_ENABLED') or 'false').lower() == 'true'
+# 診断情報の保存先ディレクトリ（処理ごとのIDを付けたファイル名でバックグラウンドで書き込む）
+DIAGNOSTICS_DIR = os.getenv('DIAGNOSTICS_DIR') or 'diagnostics'
+# メモリ上に保持する診断情報の最大件数
+DIAGNOSTICS_MAX_ENTRIES = int(os.getenv('DIAGNOSTICS_MAX_ENTRIES') or 200)
+if DIAGNOSTICS_MAX_ENTRIES < 1:
+    raise ValueError(f"DIAGNOSTICS_MAX_ENTRIESは1以上を指定してください: {DIAGNOSTICS_MAX_ENTRIES}")
+
+# 処理時間・件数の計測（メトリクス）を行うかどうか（無効の場合は計測の処理をほぼ行わない）
+METRICS_ENABLED = (os.getenv('METRICS_ENABLED') or 'false').lower() == 'true'
+# メトリクスを公開するHTTPサーバのポート（/metrics, /metrics.json、0の場合は起動しない）
+METRICS_PORT = int(os.getenv('METRICS_PORT') or 0)
+if not 0 <= METRICS_PORT <= 65535:
+    raise ValueError(f"METRICS_PORTは0〜65535の範囲で指定してください: {METRICS_PORT}")
+
+# すべての名刺の処理をプロファイルするかどうか（falseの場合も、要求された名刺だけはプロファイルする）
+PROFILE_ENABLED = (os.getenv('PROFILE_ENABLED') or 'false').lower() == 'true'
+# プロファイル（.pstats / .collapsed / .json）の保存先ディレクトリ
+PROFILE_DIR = os.getenv('PROFILE_DIR') or 'profiles'
+# 保存しておくプロファイルの数（処理時間の長い順）
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP') or 10)
+if PROFILE_KEEP < 1:
+    raise ValueError(f"PROFILE_KEEPは1以上を指定してください: {PROFILE_KEEP}")
@@ -0,0 +1,171 @@
+"""
+診断情報（QRコード読み取りの前処理画像や失敗の記録など）を記録するモジュール：
+- DIAGNOSTICS_ENABLEDがtrueの場合だけ記録する（デフォルトでは何もせず、ディスクにも書き込まない）
+- 記録はメモリ上のリングバッファ（最大DIAGNOSTICS_MAX_ENTRIES件）に保持する
+- 画像とログのファイルへの書き込みはバックグラウンドのスレッドで行い、処理中の名刺を待たせない
+- ファイル名には処理ごとのIDを付け、複数のセッションが同じファイルに書き込まないようにする
+"""
+
+import os
+import time
+import uuid
+import queue
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from .constants import DIAGNOSTICS_ENABLED, DIAGNOSTICS_DIR, DIAGNOSTICS_MAX_ENTRIES
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+# 書き込み待ちの最大件数（超えた分は書き込まずに破棄する）
+MAX_PENDING_WRITES = 64
+
+def new_request_id(name: str = "") -> str:
+    """
+    診断情報のファイル名に使う処理ごとのIDを作成する
+
+    Args:
+        name (str): 画像のファイル名など（IDの先頭に付ける）
+
+    Returns:
+        str: 「日時-画像名-乱数」形式のID
+    """
+    stem = os.path.splitext(os.path.basename(name))[0]
+    stem = "".join(char if char.isalnum() or char in "-_" else "_" for char in stem)[:40]
+    parts = [time.strftime("%Y%m%d-%H%M%S"), stem, uuid.uuid4().hex[:8]]
+    return "-".join(part for part in parts if part)
+
+class DiagnosticsSink:
+    """
+    診断情報をリングバッファに保持し、バックグラウンドのスレッドでファイルに書き込む
+    """
+
+    def __init__(self, enabled: bool = DIAGNOSTICS_ENABLED, directory: Optional[str] = DIAGNOSTICS_DIR,
+                 max_entries: int = DIAGNOSTICS_MAX_ENTRIES, max_pending: int = MAX_PENDING_WRITES):
+        """
+        Args:
+            enabled (bool): 記録するかどうか
+            directory (str): ファイルの保存先ディレクトリ（Noneの場合はファイルに書き込まない）
+            max_entries (int): リングバッファに保持する最大件数
+            max_pending (int): 書き込み待ちの最大件数
+        """
+        self.enabled = enabled
+        self.directory = directory
+        self.dropped = 0
+        self._entries = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._writer = None
+
+    def record(self, event: str, message: str, request_id: str = "",
+               image: Optional[np.ndarray] = None) -> None:
+        """
+        診断情報を記録する（無効の場合は何もしない）
+
+        Args:
+            event (str): 出来事の種類（ファイル名にも使用、例: "qr_failed"）
+            message (str): 内容
+            request_id (str): 処理ごとのID（new_request_idで作成）
+            image (numpy.ndarray): 一緒に保存する画像
+        """
+        if not self.enabled:
+            return
+        entry = {"time": time.time(), "request_id": request_id, "event": event, "message": message}
+        with self._lock:
+            self._entries.append(entry)
+        if self.directory is None:
+            return
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((entry, image))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def entries(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        リングバッファに保持している診断情報を古い順に返す
+
+        Args:
+            limit (int): 返す最大件数（新しいものから数える）
+
+        Returns:
+            list: 診断情報の辞書（time, request_id, event, message）のリスト
+        """
+        with self._lock:
+            entries = list(self._entries)
+        return entries[-limit:] if limit else entries
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        書き込み待ちの診断情報がすべて書き込まれるまで待つ
+
+        Returns:
+            bool: timeoutまでに書き込みが終わったかどうか
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _ensure_writer(self) -> None:
+        """
+        書き込み用のスレッドを必要になった時点で起動する
+        """
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="diagnostics-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            entry, image = self._queue.get()
+            try:
+                self._write(entry, image)
+            except Exception as e:
+                logger.warning(f"診断情報の書き込みに失敗しました: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, entry: Dict[str, Any], image: Optional[np.ndarray]) -> None:
+        """
+        処理ごとのログファイルに1行追記し、画像があれば処理ごとのファイル名で保存する
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        request_id = entry["request_id"] or "unknown"
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["time"]))
+        with open(os.path.join(self.directory, f"{request_id}.log"), "a", encoding="utf-8") as f:
+            f.write(f"{timestamp}\t{entry['event']}\t{entry['message']}\n")
+        if image is not None:
+            cv2.imwrite(os.path.join(self.directory, f"{request_id}_{entry['event']}.png"), image)
+
+_shared_sink = None
+_shared_sink_lock = threading.Lock()
+
+def get_diagnostics_sink() -> DiagnosticsSink:
+    """
+    プロセス内で共有する診断情報の記録先を取得する
+
+    Returns:
+        DiagnosticsSink: 記録先
+    """
+    global _shared_sink
+    with _shared_sink_lock:
+        if _shared_sink is None:
+            _shared_sink = DiagnosticsSink()
+        return _shared_sink
+
+def record(event: str, message: str, request_id: str = "", image: Optional[np.ndarray] = None) -> None:
+    """
+    共有の記録先に診断情報を記録する（DIAGNOSTICS_ENABLEDがfalseの場合は何もしない）
+    """
+    if DIAGNOSTICS_ENABLED:
+        get_diagnostics_sink().record(event, message, request_id, image)
@@ -3,8 +3,10 @@
 """
 import pandas as pd
 import io
+from . import metrics
 from .constants import KEY_MAPPING, OUTPUT_KEYS
 
+@metrics.timed("export", format="csv")
 def to_csv(df, encoding='utf-8'):
     """
     DataFrameをCSV形式に変換してダウンロード用のバイトストリームとして返す
@@ -20,6 +22,7 @@ def to_csv(df, encoding='utf-8'):
     df.to_csv(csv_buffer, index=False, encoding=encoding)
     return csv_buffer.getvalue()
 
+@metrics.timed("export", format="excel")
 def to_excel(df):
     """
     DataFrameをExcel形式に変換してダウンロード用のバイトストリームとして返す
@@ -0,0 +1,202 @@
+"""
+Gemini APIのクライアント・モデルを共有するモジュール：
+- APIの設定（genai.configure）はプロセス内で1回だけ行う
+- GenerativeModelはモデル名・生成設定ごとに1つ作成して使い回す
+- 呼び出しごとの所要時間をセットアップ時間とリクエスト時間に分けて集計する
+
+genai.configureを呼ぶたびにクライアントが作り直され接続も張り直されるため、
+Streamlitの複数セッションや並列処理の間でも同じクライアントを共有する。
+"""
+
+import json
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import google.generativeai as genai
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+class GeminiClientPool:
+    """
+    設定済みのGeminiクライアントと、モデル名・生成設定ごとのGenerativeModelを保持するスレッドセーフなプール
+    """
+
+    def __init__(self, api_key: str,
+                 configure: Callable[..., Any] = None,
+                 model_factory: Callable[..., Any] = None):
+        """
+        Args:
+            api_key (str): Gemini APIキー
+            configure (Callable): APIを設定する関数（デフォルトはgenai.configure）
+            model_factory (Callable): モデルを作成する関数（デフォルトはgenai.GenerativeModel）
+        """
+        if not api_key:
+            raise ValueError("GEMINI_API_KEYが設定されていません")
+        self._api_key = api_key
+        self._configure = configure or genai.configure
+        self._model_factory = model_factory or genai.GenerativeModel
+        self._configured = False
+        self._models = {}
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._calls = 0
+        self._setup_seconds = 0.0
+        self._request_seconds = 0.0
+
+    def _ensure_configured(self) -> None:
+        """
+        APIの設定を1回だけ行う（ロック取得済みで呼ぶこと）
+        """
+        if self._configured:
+            return
+        try:
+            self._configure(api_key=self._api_key)
+        except Exception as e:
+            error_msg = f"Gemini APIの設定に失敗しました: {e}"
+            logger.error(error_msg)
+            raise RuntimeError(error_msg)
+        self._configured = True
+        logger.info("Gemini APIクライアントを設定しました")
+
+    def get_model(self, model_name: str, generation_config: Optional[Dict[str, Any]] = None,
+                  safety_settings: Optional[List[Dict[str, str]]] = None) -> Any:
+        """
+        モデル名・生成設定に対応するGenerativeModelを取得する（初回のみ作成）
+
+        Args:
+            model_name (str): モデル名
+            generation_config (dict): 生成設定
+            safety_settings (list): セーフティ設定
+
+        Returns:
+            GenerativeModel: 共有のモデル
+        """
+        key = (
+            model_name,
+            json.dumps(generation_config, sort_keys=True),
+            json.dumps(safety_settings, sort_keys=True)
+        )
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                self._ensure_configured()
+                model = self._model_factory(
+                    model_name,
+                    generation_config=generation_config,
+                    safety_settings=safety_settings
+                )
+                self._models[key] = model
+                logger.info(f"Geminiモデルを作成しました: {model_name}")
+            return model
+
+    def generate(self, model_name: str, prompt: str, timeout: Optional[float] = None,
+                 generation_config: Optional[Dict[str, Any]] = None,
+                 safety_settings: Optional[List[Dict[str, str]]] = None) -> Tuple[str, Dict[str, float]]:
+        """
+        共有のモデルでプロンプトのレスポンスを生成する
+
+        Args:
+            model_name (str): モデル名
+            prompt (str): プロンプト
+            timeout (float): リクエストのタイムアウト秒数
+            generation_config (dict): 生成設定
+            safety_settings (list): セーフティ設定
+
+        Returns:
+            tuple: (レスポンステキスト, 所要時間 {"setup": 秒, "request": 秒})
+        """
+        setup_start = time.perf_counter()
+        model = self.get_model(model_name, generation_config, safety_settings)
+        request_start = time.perf_counter()
+        request_options = {"timeout": timeout} if timeout else None
+        try:
+            response = model.generate_content(prompt, request_options=request_options)
+            text = response.text.strip()
+        finally:
+            end = time.perf_counter()
+            timing = {"setup": request_start - setup_start, "request": end - request_start}
+            with self._stats_lock:
+                self._calls += 1
+                self._setup_seconds += timing["setup"]
+                self._request_seconds += timing["request"]
+        logger.info(f"Gemini API呼び出し時間: セットアップ {timing['setup'] * 1000:.1f}ms / "
+                    f"リクエスト {timing['request'] * 1000:.1f}ms")
+        return text, timing
+
+    def generate_stream(self, model_name: str, prompt: str, timeout: Optional[float] = None,
+                        generation_config: Optional[Dict[str, Any]] = None,
+                        safety_settings: Optional[List[Dict[str, str]]] = None) -> Iterator[str]:
+        """
+        共有のモデルでレスポンスをストリーミングで生成し、受信したテキストの断片を順に返す
+
+        Args:
+            model_name (str): モデル名
+            prompt (str): プロンプト
+            timeout (float): リクエストのタイムアウト秒数
+            generation_config (dict): 生成設定
+            safety_settings (list): セーフティ設定
+
+        Yields:
+            str: レスポンステキストの断片
+        """
+        setup_start = time.perf_counter()
+        model = self.get_model(model_name, generation_config, safety_settings)
+        request_start = time.perf_counter()
+        request_options = {"timeout": timeout} if timeout else None
+        first_chunk = None
+        try:
+            for chunk in model.generate_content(prompt, stream=True, request_options=request_options):
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - request_start
+                yield chunk.text
+        finally:
+            end = time.perf_counter()
+            with self._stats_lock:
+                self._calls += 1
+                self._setup_seconds += request_start - setup_start
+                self._request_seconds += end - request_start
+            if first_chunk is not None:
+                logger.info(f"Gemini APIストリーミング時間: セットアップ {(request_start - setup_start) * 1000:.1f}ms / "
+                            f"最初の受信 {first_chunk * 1000:.1f}ms / 全体 {(end - request_start) * 1000:.1f}ms")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        呼び出し回数と所要時間の集計を返す
+
+        Returns:
+            dict: 呼び出し回数、モデル数、セットアップ・リクエストの合計/平均秒数
+        """
+        with self._stats_lock:
+            calls = self._calls
+            setup = self._setup_seconds
+            request = self._request_seconds
+        return {
+            "calls": calls,
+            "models": len(self._models),
+            "setup_seconds": setup,
+            "request_seconds": request,
+            "avg_setup_seconds": setup / calls if calls else 0.0,
+            "avg_request_seconds": request / calls if calls else 0.0
+        }
+
+_client_pool = None
+_client_pool_lock = threading.Lock()
+
+def get_gemini_client_pool(api_key: str) -> GeminiClientPool:
+    """
+    プロセス内で共有するGeminiクライアントプールを取得する
+
+    Args:
+        api_key (str): Gemini APIキー
+
+    Returns:
+        GeminiClientPool: 共有のクライアントプール
+    """
+    global _client_pool
+    with _client_pool_lock:
+        if _client_pool is None:
+            _client_pool = GeminiClientPool(api_key)
+        return _client_pool
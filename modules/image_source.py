@@ -0,0 +1,376 @@
+"""
+名刺画像をメモリ上で扱うモジュール：
+- アップロードされたバイト列・バッファ・ファイルから画像を読み込む（一時ファイルを作らない）
+- 画像のデコード（cv2.imdecode）は1回だけ行い、その際に入力を正規化する
+  （EXIFの向きの補正、大きなJPEGの縮小デコード、名刺の目標解像度への拡大・縮小、画素数の上限）
+- 写真の場合は名刺の領域を検出し、名刺の縦横比に補正して切り出す（modules.card_detector）
+- OCRとQRコード読み取りで共通に使う派生画像（BGR・グレースケール・ノイズ除去・二値化）を
+  初めて必要になった時点で作成し、使い回す
+"""
+
+import io
+import os
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from .card_detector import crop_card
+from .constants import (
+    IMAGE_NORMALIZE_ENABLED, IMAGE_TARGET_DPI, IMAGE_CARD_FILL, IMAGE_MAX_PIXELS, CARD_DETECT_ENABLED
+)
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+# 名刺の大きさ（mm、日本の標準サイズ）
+CARD_WIDTH_MM = 91
+CARD_HEIGHT_MM = 55
+
+# JPEGの縮小デコードで使える縮小率と、対応するcv2.imdecodeのフラグ
+_REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# EXIFのOrientationタグ
+_EXIF_ORIENTATION = 0x0112
+
+def card_long_side(dpi: int = IMAGE_TARGET_DPI) -> int:
+    """
+    名刺の長辺を指定した解像度で表したピクセル数を返す（300dpiで1075ピクセル）
+    """
+    return round(CARD_WIDTH_MM / 25.4 * dpi)
+
+def plan_normalization(width: int, height: int, jpeg: bool, target_dpi: int = IMAGE_TARGET_DPI,
+                       card_fill: float = IMAGE_CARD_FILL,
+                       max_pixels: int = IMAGE_MAX_PIXELS) -> Tuple[int, int]:
+    """
+    画像の大きさから、縮小デコードの縮小率と正規化後の長辺のピクセル数を決める
+
+    長辺が「名刺が card_fill の割合で写っていても目標の解像度になる大きさ」を超える画像は
+    その大きさまで縮小し、名刺が画像いっぱいに写っていても目標の解像度に満たない画像は拡大する。
+    JPEGは縮小後の大きさを下回らない範囲で縮小デコード（1/2・1/4・1/8）し、
+    デコード後の画素数がmax_pixelsを超える場合はさらに縮小率を上げる。
+
+    Args:
+        width (int): 元の画像の幅
+        height (int): 元の画像の高さ
+        jpeg (bool): JPEG画像かどうか（縮小デコードできるかどうか）
+        target_dpi (int): 名刺を読み取る目標の解像度（dpi）
+        card_fill (float): 写真で名刺が画像の長辺に占める割合の想定（0〜1）
+        max_pixels (int): デコードする画像の最大画素数
+
+    Returns:
+        tuple: (縮小デコードの縮小率, 正規化後の長辺のピクセル数（拡大・縮小しない場合は0）)
+
+    Raises:
+        ValueError: 縮小デコードしても画素数の上限を超える場合
+    """
+    long_side = max(width, height)
+    min_long_side = card_long_side(target_dpi)
+    max_long_side = round(min_long_side / card_fill)
+
+    reduction = 1
+    if jpeg:
+        for factor in (8, 4, 2):
+            if long_side / factor >= max_long_side:
+                reduction = factor
+                break
+        while reduction < 8 and (width // reduction) * (height // reduction) > max_pixels:
+            reduction *= 2
+    if (width // reduction) * (height // reduction) > max_pixels:
+        raise ValueError(f"画像が大きすぎます（{width}x{height}、上限 {max_pixels}画素）")
+
+    decoded_long_side = long_side // reduction
+    if decoded_long_side > max_long_side:
+        return reduction, max_long_side
+    if decoded_long_side < min_long_side:
+        return reduction, min_long_side
+    return reduction, 0
+
+def apply_exif_orientation(image: np.ndarray, orientation: int) -> np.ndarray:
+    """
+    EXIFのOrientationタグに従って画像の向きを補正する
+
+    Args:
+        image (numpy.ndarray): 画像
+        orientation (int): Orientationタグの値（1〜8）
+
+    Returns:
+        numpy.ndarray: 向きを補正した画像
+    """
+    if orientation == 2:
+        return cv2.flip(image, 1)
+    if orientation == 3:
+        return cv2.rotate(image, cv2.ROTATE_180)
+    if orientation == 4:
+        return cv2.flip(image, 0)
+    if orientation == 5:
+        return cv2.transpose(image)
+    if orientation == 6:
+        return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
+    if orientation == 7:
+        return cv2.flip(cv2.transpose(image), -1)
+    if orientation == 8:
+        return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return image
+
+def _resize_long_side(image: np.ndarray, long_side: int) -> np.ndarray:
+    """
+    画像の長辺がlong_sideピクセルになるよう拡大・縮小する（long_sideが0の場合はそのまま返す）
+    """
+    if not long_side:
+        return image
+    scale = long_side / max(image.shape[:2])
+    return cv2.resize(
+        image,
+        (max(1, round(image.shape[1] * scale)), max(1, round(image.shape[0] * scale))),
+        interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    )
+
+def _pixel_changes(source_size: Tuple[int, int], image: np.ndarray) -> Dict[str, int]:
+    """
+    元の画像と比べて削減した画素数・拡大で増えた画素数を返す（どちらも0以上）
+    """
+    delta = source_size[0] * source_size[1] - image.shape[0] * image.shape[1]
+    return {"pixels_saved": max(0, delta), "pixels_upscaled": max(0, -delta)}
+
+def _normalization_stats(source_size: Tuple[int, int], decoded_size: Tuple[int, int], image: np.ndarray,
+                         reduction: int, orientation: int) -> Dict[str, Any]:
+    """
+    正規化の内容をまとめ、ログに出力する
+    """
+    width, height = source_size
+    stats = {
+        "source_size": source_size,
+        "decoded_size": decoded_size,
+        "output_size": (image.shape[1], image.shape[0]),
+        "reduction": reduction,
+        "orientation": orientation,
+        **_pixel_changes(source_size, image)
+    }
+    logger.info(
+        f"画像を正規化しました: {width}x{height} -> {image.shape[1]}x{image.shape[0]}"
+        f"（縮小デコード 1/{reduction}、向き {orientation}、削減画素数 {stats['pixels_saved']}、"
+        f"拡大で増えた画素数 {stats['pixels_upscaled']}）"
+    )
+    return stats
+
+def _probe(data: bytes) -> Optional[Tuple[int, int, str, int]]:
+    """
+    画像のヘッダだけを読み、大きさ・形式・EXIFの向きを返す（画素はデコードしない）
+
+    Returns:
+        tuple: (幅, 高さ, 形式, Orientationタグの値)（読み取れない場合はNone）
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            try:
+                orientation = int(image.getexif().get(_EXIF_ORIENTATION, 1))
+            except Exception:
+                orientation = 1
+            return image.width, image.height, image.format or "", orientation
+    except Image.DecompressionBombError as e:
+        raise ValueError(f"画像が大きすぎます: {e}")
+    except Exception:
+        return None
+
+class CardImage:
+    """
+    1枚の名刺画像（元のバイト列と、遅延作成して共有する派生画像）
+
+    派生画像はOCRとQRコード読み取りのスレッドから同時に参照されるため、作成はロックで保護する。
+    返す配列は共有されるので、利用側で書き換えないこと。
+    """
+
+    def __init__(self, data: bytes, name: str = "", bgr: Optional[np.ndarray] = None):
+        """
+        Args:
+            data (bytes): 画像ファイルのバイト列（処理結果キャッシュのキーにも使用）
+            name (str): 画像の名前（ファイル名やパス、ログと処理結果に使用）
+            bgr (numpy.ndarray): デコード済みのBGR画像（指定した場合はデコードを省略）
+        """
+        self.data = data
+        self.name = name
+        # 正規化の内容（デコード後に設定: 元の大きさ、デコードした大きさ、正規化後の大きさ、削減した画素数など）
+        self.normalization: Optional[Dict[str, Any]] = None
+        self._derived = {}
+        if bgr is not None:
+            self._derived["bgr"] = bgr
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, name: str = "") -> "CardImage":
+        """
+        バイト列から名刺画像を作成する
+        """
+        return cls(bytes(data), name)
+
+    @classmethod
+    def from_buffer(cls, buffer: Any, name: Optional[str] = None) -> "CardImage":
+        """
+        読み込み可能なバッファ（アップロードされたファイル、BytesIOなど）から名刺画像を作成する
+        """
+        if hasattr(buffer, "getvalue"):
+            data = buffer.getvalue()
+        else:
+            data = buffer.read()
+        return cls(data, name if name is not None else getattr(buffer, "name", ""))
+
+    @classmethod
+    def from_path(cls, path: str) -> "CardImage":
+        """
+        画像ファイルのパスから名刺画像を作成する
+        """
+        with open(path, 'rb') as f:
+            return cls(f.read(), path)
+
+    @classmethod
+    def from_pil(cls, image: Image.Image, name: str = "") -> "CardImage":
+        """
+        PIL画像から名刺画像を作成する（元のバイト列は持たないため、処理結果キャッシュは使えない）
+
+        デコード済みの画像のため、正規化は目標の解像度への拡大・縮小だけを行う。
+        """
+        bgr = cv2.cvtColor(np.array(image.convert("RGB")), cv2.COLOR_RGB2BGR)
+        card = cls(b"", name)
+        if IMAGE_NORMALIZE_ENABLED:
+            source_size = (bgr.shape[1], bgr.shape[0])
+            _, target_long_side = plan_normalization(*source_size, jpeg=False)
+            bgr = _resize_long_side(bgr, target_long_side)
+            card.normalization = _normalization_stats(source_size, source_size, bgr, 1, 1)
+        card._derived["bgr"] = card._crop_card(bgr)
+        return card
+
+    def __repr__(self) -> str:
+        return f"CardImage(name={self.name!r}, bytes={len(self.data)})"
+
+    def _get(self, key: str, build) -> np.ndarray:
+        """
+        派生画像を取得する（初回のみbuildで作成）
+        """
+        image = self._derived.get(key)
+        if image is not None:
+            return image
+        with self._lock:
+            image = self._derived.get(key)
+            if image is None:
+                image = build()
+                self._derived[key] = image
+            return image
+
+    def _decode(self) -> np.ndarray:
+        """
+        画像をデコードし、正規化（向きの補正・縮小デコード・拡大縮小）したBGR画像を返す
+        """
+        buffer = np.frombuffer(self.data, np.uint8)
+        if not IMAGE_NORMALIZE_ENABLED:
+            image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError(f"画像の読み込みに失敗しました: {self.name}")
+            return self._crop_card(image)
+
+        probe = _probe(self.data)
+        if probe is None:
+            raise ValueError(f"画像の読み込みに失敗しました: {self.name}")
+        width, height, image_format, orientation = probe
+        reduction, target_long_side = plan_normalization(width, height, jpeg=image_format == "JPEG")
+
+        # 向きは自前で補正するため、デコード時のEXIFによる回転は無効にする
+        image = cv2.imdecode(buffer, _REDUCED_DECODE_FLAGS[reduction] | cv2.IMREAD_IGNORE_ORIENTATION)
+        if image is None:
+            raise ValueError(f"画像の読み込みに失敗しました: {self.name}")
+        decoded_size = (image.shape[1], image.shape[0])
+        image = _resize_long_side(apply_exif_orientation(image, orientation), target_long_side)
+        self.normalization = _normalization_stats((width, height), decoded_size, image, reduction, orientation)
+        return self._crop_card(image)
+
+    def _crop_card(self, image: np.ndarray) -> np.ndarray:
+        """
+        画像から名刺の領域を切り出す（見つからない場合は画像全体を返す）
+        """
+        if not CARD_DETECT_ENABLED:
+            return image
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        cropped, corners = crop_card(image, gray, card_long_side(), CARD_WIDTH_MM / CARD_HEIGHT_MM)
+        if corners is None:
+            # 画像全体を使う場合は、検出に使ったグレースケール画像をそのまま派生画像として使い回す
+            self._derived["gray"] = gray
+        if self.normalization is not None:
+            self.normalization.update({
+                "card_detected": corners is not None,
+                "output_size": (cropped.shape[1], cropped.shape[0]),
+                **_pixel_changes(self.normalization["source_size"], cropped)
+            })
+        return cropped
+
+    @property
+    def bgr(self) -> np.ndarray:
+        """
+        デコードしたBGR画像（デコードできない場合はValueError）
+        """
+        return self._get("bgr", self._decode)
+
+    @property
+    def gray(self) -> np.ndarray:
+        """
+        グレースケール画像
+        """
+        return self._get("gray", lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY))
+
+    @property
+    def denoise(self) -> np.ndarray:
+        """
+        ノイズ除去（バイラテラルフィルタ）したグレースケール画像
+        """
+        return self._get("denoise", lambda: cv2.bilateralFilter(self.gray, 9, 75, 75))
+
+    @property
+    def binary(self) -> np.ndarray:
+        """
+        ノイズ除去した画像を大津の方法で二値化した画像
+        """
+        return self._get(
+            "binary",
+            lambda: cv2.threshold(self.denoise, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+        )
+
+    def derived_names(self) -> List[str]:
+        """
+        作成済みの派生画像の名前を返す（動作確認用）
+        """
+        with self._lock:
+            return sorted(self._derived)
+
+def load_card_image(source: Any, name: Optional[str] = None) -> CardImage:
+    """
+    パス・バイト列・バッファ・PIL画像のいずれかから名刺画像を取得する
+
+    Args:
+        source: CardImage、画像ファイルのパス、バイト列、読み込み可能なバッファ、またはPIL画像
+        name (str): 画像の名前（省略時はパスやバッファの名前）
+
+    Returns:
+        CardImage: 名刺画像（sourceがCardImageの場合はそのまま返す）
+    """
+    if isinstance(source, CardImage):
+        return source
+    if isinstance(source, (str, os.PathLike)):
+        card = CardImage.from_path(os.fspath(source))
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        card = CardImage.from_bytes(source)
+    elif isinstance(source, Image.Image):
+        card = CardImage.from_pil(source)
+    elif hasattr(source, "read"):
+        card = CardImage.from_buffer(source)
+    else:
+        raise TypeError(f"名刺画像として扱えない型です: {type(source).__name__}")
+    if name is not None:
+        card.name = name
+    return card
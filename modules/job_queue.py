@@ -0,0 +1,188 @@
+"""
+名刺画像をバックグラウンドで処理するジョブキューを提供するモジュール：
+- アップロードされた画像をジョブとして登録し、ワーカースレッドで順に処理する
+- ジョブごとの状態（待機中・OCR・QR・LLM・完了・失敗）と抽出途中の項目を保持する
+- Streamlitの再実行（rerun）をまたいで使えるよう、プロセス内で1つのキューを共有する
+"""
+
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from .pipeline import process_card
+from .image_source import CardImage
+from .rate_limiter import PRIORITY_INTERACTIVE, PRIORITY_BATCH
+from .constants import PIPELINE_MAX_WORKERS
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+# ジョブの状態
+STATUS_QUEUED = "queued"
+STATUS_OCR = "ocr"
+STATUS_QR = "qr"
+STATUS_LLM = "llm"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# 画面に表示する状態名
+STATUS_LABELS = {
+    STATUS_QUEUED: "待機中",
+    STATUS_OCR: "OCR処理中",
+    STATUS_QR: "QRコード読み取り中",
+    STATUS_LLM: "解析中",
+    STATUS_DONE: "完了",
+    STATUS_FAILED: "失敗",
+}
+
+# 完了したジョブを保持する時間（秒）
+JOB_RETENTION_SECONDS = 60 * 60
+
+class CardJob:
+    """
+    1枚の名刺画像の処理ジョブ
+    """
+
+    def __init__(self, filename: str, image: CardImage, priority: int, profile: bool = False):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.image: Optional[CardImage] = image
+        self.priority = priority
+        self.profile = profile
+        self.status = STATUS_QUEUED
+        self.fields: Dict[str, str] = {}
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+
+    @property
+    def pending(self) -> bool:
+        return self.status not in (STATUS_DONE, STATUS_FAILED)
+
+class CardJobQueue:
+    """
+    名刺画像の処理ジョブを受け付け、ワーカースレッドで並行処理するキュー
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        Args:
+            max_workers (int): 同時に処理するジョブの数（デフォルトはPIPELINE_MAX_WORKERS）
+        """
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or PIPELINE_MAX_WORKERS, thread_name_prefix="card-job"
+        )
+        self._jobs: Dict[str, CardJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, files: List[Any], profile: bool = False) -> List[str]:
+        """
+        画像をジョブとして登録する
+
+        画像はメモリ上に保持したまま処理する（一時ファイルは作らない）。
+        1枚だけの場合は画面からの処理として優先し、複数枚の場合は一括処理の優先度で処理する。
+
+        Args:
+            files (list): (ファイル名, 画像のバイト列) のタプルのリスト
+            profile (bool): 処理をプロファイルするかどうか（処理が遅い名刺の調査用）
+
+        Returns:
+            list: 登録したジョブのID
+        """
+        self.prune()
+        priority = PRIORITY_INTERACTIVE if len(files) == 1 else PRIORITY_BATCH
+        job_ids = []
+        for filename, data in files:
+            job = CardJob(filename, CardImage.from_bytes(data, filename), priority, profile)
+            with self._lock:
+                self._jobs[job.id] = job
+            self._executor.submit(self._run, job)
+            job_ids.append(job.id)
+        logger.info(f"{len(job_ids)}件の名刺をジョブとして登録しました")
+        return job_ids
+
+    def _update(self, job: CardJob, **changes: Any) -> None:
+        with self._lock:
+            for name, value in changes.items():
+                setattr(job, name, value)
+
+    def _set_field(self, job: CardJob, key: str, value: str) -> None:
+        with self._lock:
+            job.fields[key] = value
+
+    def _run(self, job: CardJob) -> None:
+        """
+        ワーカースレッドでジョブを処理する
+        """
+        try:
+            result = process_card(
+                job.image,
+                priority=job.priority,
+                on_field=lambda key, value: self._set_field(job, key, value),
+                on_stage=lambda stage: self._update(job, status=stage),
+                profile=job.profile
+            )
+            self._update(
+                job,
+                result=result,
+                error=result["error"],
+                status=STATUS_DONE if result["success"] else STATUS_FAILED,
+                finished=time.time()
+            )
+        except Exception as e:
+            logger.exception(f"ジョブの処理中にエラーが発生しました: {job.filename}")
+            self._update(job, error=f"処理中にエラーが発生しました: {e}", status=STATUS_FAILED, finished=time.time())
+        finally:
+            # 処理が終わった画像（デコード結果と派生画像を含む）は保持しない
+            job.image = None
+
+    def snapshot(self, job_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        ジョブの現在の状態を取得する（登録順）
+
+        Args:
+            job_ids (list): ジョブのID
+
+        Returns:
+            list: ジョブごとの辞書（id, filename, status, fields, result, error）
+        """
+        with self._lock:
+            return [
+                {
+                    "id": job.id,
+                    "filename": job.filename,
+                    "status": job.status,
+                    "fields": dict(job.fields),
+                    "result": job.result,
+                    "error": job.error,
+                }
+                for job in (self._jobs.get(job_id) for job_id in job_ids)
+                if job is not None
+            ]
+
+    def forget(self, job_ids: List[str]) -> None:
+        """
+        完了・失敗したジョブを削除する（処理中のジョブは残す）
+        """
+        with self._lock:
+            for job_id in job_ids:
+                job = self._jobs.get(job_id)
+                if job is not None and not job.pending:
+                    del self._jobs[job_id]
+
+    def prune(self, max_age: float = JOB_RETENTION_SECONDS) -> None:
+        """
+        完了してからmax_age秒を超えたジョブを削除する
+        """
+        now = time.time()
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished is not None and now - job.finished > max_age
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
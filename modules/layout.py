@@ -0,0 +1,129 @@
+"""
+名刺画像のレイアウト（テキスト行の位置）を解析するモジュール：
+- モルフォロジー演算で文字を横方向につなげ、テキスト行の矩形を検出する
+- 検出した行を読み順（上から下、同じ高さの行は左から右）に並べる
+- 行ごとのOCR（--psm 7）に渡す画像を切り出す
+
+行ごとの位置情報は、レイアウトを考慮したプロンプトなどにも利用できる。
+"""
+
+import logging
+from typing import Any, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+# 文字をつなげるカーネルの幅（画像の幅に対する割合）と最小値（ピクセル）
+LINE_KERNEL_WIDTH_RATIO = 1 / 40
+LINE_KERNEL_MIN_WIDTH = 15
+# テキスト行とみなす矩形の高さの範囲（最小はピクセル、最大は画像の高さに対する割合）
+LINE_MIN_HEIGHT = 8
+LINE_MAX_HEIGHT_RATIO = 0.2
+# テキスト行とみなす矩形の最小の幅（ピクセル）
+LINE_MIN_WIDTH = 8
+# 矩形の中の黒画素の割合の範囲（罫線や塗りつぶしの図形を除外する）
+LINE_MIN_INK_RATIO = 0.05
+LINE_MAX_INK_RATIO = 0.9
+# 同じ行とみなす縦方向の中心の差（行の高さに対する割合）
+ROW_TOLERANCE = 0.5
+# 同じ行の隣り合う矩形を1つの行にまとめる間隔（文字の高さに対する割合、大きな文字の単語間の空白を吸収する）
+WORD_GAP_RATIO = 1.0
+# 行の画像を切り出すときの余白（ピクセル）
+LINE_PADDING = 4
+# Tesseractに渡す行の画像の周囲に付ける白い余白（ピクセル）
+LINE_BORDER = 10
+
+def detect_text_lines(gray: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    グレースケール画像からテキスト行の矩形を検出し、読み順に並べる
+
+    Args:
+        gray (numpy.ndarray): グレースケール画像
+
+    Returns:
+        list: テキスト行の辞書（box: [x, y, 幅, 高さ]）のリスト（読み順）
+    """
+    height, width = gray.shape[:2]
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+    # 文字同士を横方向につなげて、1行を1つの塊にする
+    kernel_width = max(LINE_KERNEL_MIN_WIDTH, int(width * LINE_KERNEL_WIDTH_RATIO))
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_width, 3))
+    joined = cv2.morphologyEx(ink, cv2.MORPH_CLOSE, kernel)
+    contours, _ = cv2.findContours(joined, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if h < LINE_MIN_HEIGHT or h > height * LINE_MAX_HEIGHT_RATIO or w < LINE_MIN_WIDTH:
+            continue
+        ink_ratio = cv2.countNonZero(ink[y:y + h, x:x + w]) / (w * h)
+        if not LINE_MIN_INK_RATIO <= ink_ratio <= LINE_MAX_INK_RATIO:
+            continue
+        boxes.append((x, y, w, h))
+
+    lines = [{"box": list(box)} for box in _merge_words(sort_reading_order(boxes))]
+    logger.info(f"テキスト行を{len(lines)}行検出しました")
+    return lines
+
+def sort_reading_order(boxes: List[Tuple[int, int, int, int]]) -> List[Tuple[int, int, int, int]]:
+    """
+    矩形を読み順（上から下、縦方向の中心が近い矩形は同じ行として左から右）に並べる
+
+    Args:
+        boxes (list): (x, y, 幅, 高さ) のリスト
+
+    Returns:
+        list: 並べ替えた矩形のリスト
+    """
+    rows = []
+    for box in sorted(boxes, key=lambda box: box[1] + box[3] / 2):
+        center = box[1] + box[3] / 2
+        if rows:
+            row = rows[-1]
+            row_center = sum(b[1] + b[3] / 2 for b in row) / len(row)
+            row_height = max(b[3] for b in row)
+            if abs(center - row_center) <= min(row_height, box[3]) * ROW_TOLERANCE:
+                row.append(box)
+                continue
+        rows.append([box])
+    return [box for row in rows for box in sorted(row, key=lambda box: box[0])]
+
+def _merge_words(boxes: List[Tuple[int, int, int, int]]) -> List[Tuple[int, int, int, int]]:
+    """
+    読み順に並んだ矩形のうち、同じ行で間隔が文字の高さ程度までのものを1つにまとめる
+    """
+    merged = []
+    for box in boxes:
+        if merged:
+            x, y, w, h = merged[-1]
+            same_row = abs((box[1] + box[3] / 2) - (y + h / 2)) <= min(h, box[3]) * ROW_TOLERANCE
+            gap = box[0] - (x + w)
+            if same_row and 0 <= gap <= max(h, box[3]) * WORD_GAP_RATIO:
+                left, top = min(x, box[0]), min(y, box[1])
+                right, bottom = max(x + w, box[0] + box[2]), max(y + h, box[1] + box[3])
+                merged[-1] = (left, top, right - left, bottom - top)
+                continue
+        merged.append(box)
+    return merged
+
+def crop_line(image: np.ndarray, box: List[int]) -> np.ndarray:
+    """
+    テキスト行の画像を余白付きで切り出す（Tesseractが行の端の文字を読み落とさないよう白い縁も付ける）
+
+    Args:
+        image (numpy.ndarray): 切り出し元の画像（グレースケールまたは二値画像）
+        box (list): [x, y, 幅, 高さ]
+
+    Returns:
+        numpy.ndarray: 行の画像
+    """
+    x, y, w, h = box
+    top = max(0, y - LINE_PADDING)
+    left = max(0, x - LINE_PADDING)
+    crop = image[top:y + h + LINE_PADDING, left:x + w + LINE_PADDING]
+    return cv2.copyMakeBorder(crop, LINE_BORDER, LINE_BORDER, LINE_BORDER, LINE_BORDER,
+                              cv2.BORDER_CONSTANT, value=255)
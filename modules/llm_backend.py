@@ -0,0 +1,221 @@
+"""
+名刺テキストの解析に使うLLMバックエンドを切り替えるモジュール：
+- GeminiBackend: Gemini APIを呼び出す（本番用）
+- HTTPStubBackend: ローカルのスタブサーバ（modules.llm_stub_server）を呼び出す（負荷試験用）
+- RecordReplayBackend: 応答をフィクスチャファイルに記録・再生する（再現性のある試験用）
+
+使用するバックエンドは環境変数LLM_BACKENDで選択する。
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+
+from .cache import make_cache_key
+from .gemini_client import get_gemini_client_pool
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+class LLMBackend:
+    """
+    LLMバックエンドの基底クラス
+    """
+
+    # キャッシュキーやログに使う名前
+    name = "base"
+    # 共有のレートリミッタ（GEMINI_RPM・GEMINI_TPM）を適用するかどうか
+    rate_limited = True
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """
+        プロンプトに対する応答テキストを返す
+
+        Args:
+            prompt (str): プロンプト
+            timeout (float): リクエストのタイムアウト秒数
+
+        Returns:
+            str: 応答テキスト
+        """
+        raise NotImplementedError
+
+    def generate_stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """
+        プロンプトに対する応答テキストを受信した断片ごとに返す
+        （ストリーミングに対応しないバックエンドは応答全体を1つの断片として返す）
+
+        Args:
+            prompt (str): プロンプト
+            timeout (float): リクエストのタイムアウト秒数
+
+        Yields:
+            str: 応答テキストの断片
+        """
+        yield self.generate(prompt, timeout=timeout)
+
+class GeminiBackend(LLMBackend):
+    """
+    共有のクライアントプールを使ってGemini APIを呼び出すバックエンド
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str, generation_config: Dict[str, Any],
+                 safety_settings: List[Dict[str, str]]):
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self.safety_settings = safety_settings
+        self._client_pool = get_gemini_client_pool(api_key)
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        response_text, _ = self._client_pool.generate(
+            self.model_name,
+            prompt,
+            timeout=timeout,
+            generation_config=self.generation_config,
+            safety_settings=self.safety_settings
+        )
+        return response_text
+
+    def generate_stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        yield from self._client_pool.generate_stream(
+            self.model_name,
+            prompt,
+            timeout=timeout,
+            generation_config=self.generation_config,
+            safety_settings=self.safety_settings
+        )
+
+class HTTPStubBackend(LLMBackend):
+    """
+    ローカルのスタブサーバ（modules.llm_stub_server）を呼び出すバックエンド
+
+    スタブサーバの429・5xxエラーはGemini APIと同じ形式のメッセージで例外にするため、
+    本番と同じ再試行の処理を通る。
+    """
+
+    name = "stub"
+
+    def __init__(self, url: str, model_name: str = "stub"):
+        """
+        Args:
+            url (str): スタブサーバのURL（例: http://127.0.0.1:8765）
+            model_name (str): リクエストに含めるモデル名
+        """
+        self.url = url.rstrip("/")
+        self.model_name = model_name
+        # スレッドごとにセッションを持ち、接続を使い回す
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def _post(self, prompt: str, timeout: Optional[float], stream: bool) -> requests.Response:
+        try:
+            response = self._session().post(
+                f"{self.url}/generate",
+                json={"model": self.model_name, "prompt": prompt, "stream": stream},
+                timeout=timeout,
+                stream=stream
+            )
+        except requests.Timeout as e:
+            raise TimeoutError(f"スタブサーバの応答がタイムアウトしました: {e}")
+        if response.status_code != 200:
+            try:
+                message = response.json().get("error", "")
+            except ValueError:
+                message = response.text
+            raise RuntimeError(f"{response.status_code} {message}")
+        return response
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        return self._post(prompt, timeout, stream=False).json()["text"].strip()
+
+    def generate_stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        response = self._post(prompt, timeout, stream=True)
+        response.encoding = "utf-8"
+        try:
+            for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                if chunk:
+                    yield chunk
+        except requests.RequestException as e:
+            raise TimeoutError(f"スタブサーバからの受信が中断しました: {e}")
+        finally:
+            response.close()
+
+class RecordReplayBackend(LLMBackend):
+    """
+    応答をフィクスチャファイル（プロンプトごとのJSON）に記録・再生するバックエンド
+
+    recordモードでは内側のバックエンドを呼び出して応答と所要時間を保存し、
+    replayモードでは保存済みの応答のみを返す（未記録のプロンプトはエラー）。
+    """
+
+    def __init__(self, fixtures_dir: str, mode: str = "replay", inner: Optional[LLMBackend] = None,
+                 model_name: str = "", simulate_latency: bool = False):
+        """
+        Args:
+            fixtures_dir (str): フィクスチャの保存先ディレクトリ
+            mode (str): "record" または "replay"
+            inner (LLMBackend): recordモードで呼び出すバックエンド
+            model_name (str): フィクスチャのキーに含めるモデル名
+            simulate_latency (bool): replayモードで記録時の所要時間だけ待機するかどうか
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"RecordReplayBackendのモードが不正です: {mode}")
+        if mode == "record" and inner is None:
+            raise ValueError("recordモードでは記録に使うバックエンドを指定してください")
+        self.fixtures_dir = fixtures_dir
+        self.mode = mode
+        self.inner = inner
+        self.model_name = model_name
+        self.simulate_latency = simulate_latency
+        self.name = mode
+        # 再生時はAPIを呼び出さないためレート制限は不要
+        self.rate_limited = mode == "record"
+        os.makedirs(fixtures_dir, exist_ok=True)
+
+    def fixture_path(self, prompt: str) -> str:
+        """
+        プロンプトに対応するフィクスチャファイルのパスを返す
+        """
+        return os.path.join(self.fixtures_dir, f"{make_cache_key(self.model_name, prompt)}.json")
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        path = self.fixture_path(prompt)
+        if self.mode == "replay":
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    fixture = json.load(f)
+            except FileNotFoundError:
+                raise RuntimeError(f"記録済みの応答がありません（先にrecordモードで記録してください）: {path}")
+            if self.simulate_latency:
+                time.sleep(fixture.get("latency", 0))
+            return fixture["response"]
+
+        start = time.perf_counter()
+        response_text = self.inner.generate(prompt, timeout=timeout)
+        fixture = {
+            "model": self.model_name,
+            "backend": self.inner.name,
+            "latency": time.perf_counter() - start,
+            "prompt": prompt,
+            "response": response_text
+        }
+        # 書き込み途中のファイルを読まれないよう、一時ファイルに書いてから置き換える
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(fixture, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        logger.info(f"LLMの応答を記録しました: {os.path.basename(path)}")
+        return response_text
@@ -0,0 +1,261 @@
+"""
+Gemini APIの代わりに使うローカルのスタブサーバ：
+- プロンプト中のOCRテキストから正規表現で項目を取り出し、Geminiと同じ形式のJSONを返す
+- 応答遅延・エラー率・429エラーの発生率を設定できる
+- APIクォータを消費せずに処理全体の負荷試験を行うために使用する
+
+起動例:
+    python -m modules.llm_stub_server --port 8765 --latency 0.8 --jitter 0.4 --rate-limit-rate 0.05
+"""
+
+import re
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+from .constants import REQUIRED_KEYS
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+# ストリーミング応答の1断片あたりの文字数
+STREAM_CHUNK_CHARS = 16
+
+_CARD_PATTERN = re.compile(r'=== CARD (\d+) ===\n(.*?)\n=== END CARD \1 ===', re.DOTALL)
+_EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+_PHONE_PATTERN = re.compile(r'0\d{1,4}-\d{1,4}-\d{3,4}')
+_POSTAL_PATTERN = re.compile(r'〒?\s*(\d{3}-\d{4})')
+_URL_PATTERN = re.compile(r'https?://[^\s"]+')
+
+def _extract_fields(ocr_text: str) -> Dict[str, str]:
+    """
+    OCRテキストから正規表現で取り出せる項目を抽出する（スタブの応答用の簡易版）
+    """
+    result = {key: "" for key in REQUIRED_KEYS}
+    lines = [line.strip() for line in ocr_text.splitlines() if line.strip()]
+    if lines:
+        result["名前"] = lines[0]
+    for line in lines:
+        if not result["会社名"] and re.search(r'株式会社|有限会社|合同会社|Inc\.|Co\.', line):
+            result["会社名"] = line
+    email = _EMAIL_PATTERN.search(ocr_text)
+    phone = _PHONE_PATTERN.search(ocr_text)
+    postal = _POSTAL_PATTERN.search(ocr_text)
+    if email:
+        result["メールアドレス"] = email.group(0)
+    if phone:
+        result["電話番号"] = phone.group(0)
+    if postal:
+        result["郵便番号"] = postal.group(1)
+    for url in _URL_PATTERN.findall(ocr_text):
+        if "sasaeai" in url:
+            result["sasaeai URL"] = result["sasaeai URL"] or url
+        else:
+            result["HP URL"] = result["HP URL"] or url
+    return result
+
+def generate_stub_response(prompt: str) -> str:
+    """
+    プロンプトに対するスタブの応答テキストを作成する
+
+    一括解析のプロンプト（=== CARD 番号 === の区切りを含む）にはJSON配列を、
+    それ以外にはJSONオブジェクトを返す。
+
+    Args:
+        prompt (str): Gemini APIへのプロンプト
+
+    Returns:
+        str: 応答テキスト
+    """
+    cards = _CARD_PATTERN.findall(prompt)
+    if cards:
+        items = [dict(card_id=int(card_id), **_extract_fields(text)) for card_id, text in cards]
+        return json.dumps(items, ensure_ascii=False)
+    ocr_text = prompt.split("###OCRテキスト###", 1)[-1]
+    return json.dumps(_extract_fields(ocr_text), ensure_ascii=False)
+
+class StubBehavior:
+    """
+    スタブサーバの応答遅延とエラー発生の設定（スレッドセーフな乱数と集計を保持）
+    """
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, retry_delay: Optional[int] = None,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            latency (float): 応答遅延の基準値（秒）
+            jitter (float): 応答遅延に加える揺らぎの最大値（秒、指数分布で裾の長い遅延を再現）
+            error_rate (float): 500エラーを返す割合（0〜1）
+            rate_limit_rate (float): 429エラーを返す割合（0〜1）
+            retry_delay (int): 429エラーに含める待機秒数の指定（Noneの場合は含めない）
+            seed (int): 乱数のシード（再現性のある試験に使用）
+        """
+        for name, rate in (("error_rate", error_rate), ("rate_limit_rate", rate_limit_rate)):
+            if not 0 <= rate <= 1:
+                raise ValueError(f"{name}は0〜1の範囲で指定してください: {rate}")
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_delay = retry_delay
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0}
+
+    def decide(self):
+        """
+        1回のリクエストの遅延秒数と応答の種類（"ok" / "errors" / "rate_limited"）を決める
+        """
+        with self._lock:
+            delay = self.latency
+            if self.jitter > 0:
+                delay += min(self.jitter * 5, self._rng.expovariate(1 / self.jitter))
+            roll = self._rng.random()
+            if roll < self.rate_limit_rate:
+                outcome = "rate_limited"
+            elif roll < self.rate_limit_rate + self.error_rate:
+                outcome = "errors"
+            else:
+                outcome = "ok"
+            self.counts["requests"] += 1
+            self.counts[outcome] += 1
+        return delay, outcome
+
+def _make_handler(behavior: StubBehavior):
+    """
+    設定を参照するリクエストハンドラのクラスを作成する
+    """
+
+    class StubHandler(BaseHTTPRequestHandler):
+        # 接続を維持して、クライアント側の接続の使い回しを試験できるようにする
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                with behavior._lock:
+                    counts = dict(behavior.counts)
+                self._send_json(200, counts)
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/generate":
+                self._send_json(404, {"error": "not found"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                request = json.loads(self.rfile.read(length).decode('utf-8'))
+                prompt = request["prompt"]
+            except (ValueError, KeyError) as e:
+                self._send_json(400, {"error": f"invalid request: {e}"})
+                return
+
+            delay, outcome = behavior.decide()
+            if outcome == "ok" and request.get("stream"):
+                # ストリーミングでは最初の断片までに遅延の3割を待ち、残りは断片の間で待つ
+                time.sleep(delay * 0.3)
+                delay *= 0.7
+            else:
+                time.sleep(delay)
+            if outcome == "rate_limited":
+                message = "429 Resource has been exhausted (e.g. check quota)."
+                if behavior.retry_delay is not None:
+                    message += f" retry_delay {{ seconds: {behavior.retry_delay} }}"
+                self._send_json(429, {"error": message})
+            elif outcome == "errors":
+                self._send_json(500, {"error": "500 An internal error has occurred."})
+            elif request.get("stream"):
+                self._send_stream(generate_stub_response(prompt), delay)
+            else:
+                self._send_json(200, {"text": generate_stub_response(prompt)})
+
+        def _send_stream(self, text: str, delay: float) -> None:
+            """
+            応答テキストを断片に分け、チャンク転送で少しずつ送信する
+            （遅延の一部を最初の断片の前、残りを断片の間に割り振る）
+            """
+            pieces = [text[index:index + STREAM_CHUNK_CHARS] for index in range(0, len(text), STREAM_CHUNK_CHARS)]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            interval = delay / max(len(pieces), 1)
+            for piece in pieces:
+                data = piece.encode('utf-8')
+                self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+                self.wfile.flush()
+                time.sleep(interval)
+            self.wfile.write(b"0\r\n\r\n")
+
+        def log_message(self, format, *args):
+            logger.debug(f"スタブサーバ: {format % args}")
+
+    return StubHandler
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0,
+                      behavior: Optional[StubBehavior] = None) -> ThreadingHTTPServer:
+    """
+    スタブサーバをバックグラウンドのスレッドで起動する
+
+    Args:
+        host (str): 待ち受けるホスト
+        port (int): 待ち受けるポート（0の場合は空いているポートを使用）
+        behavior (StubBehavior): 応答遅延・エラー発生の設定
+
+    Returns:
+        ThreadingHTTPServer: 起動したサーバ（server_addressで実際のポート、shutdown()で停止）
+    """
+    server = ThreadingHTTPServer((host, port), _make_handler(behavior or StubBehavior()))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logger.info(f"スタブサーバを起動しました: http://{server.server_address[0]}:{server.server_address[1]}")
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description='Gemini APIの代わりに使うローカルのスタブサーバ')
+    parser.add_argument('--host', default='127.0.0.1', help='待ち受けるホスト')
+    parser.add_argument('--port', type=int, default=8765, help='待ち受けるポート')
+    parser.add_argument('--latency', type=float, default=0.5, help='応答遅延の基準値（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='応答遅延の揺らぎ（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='500エラーを返す割合（0〜1）')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='429エラーを返す割合（0〜1）')
+    parser.add_argument('--retry-delay', type=int, default=None, help='429エラーに含める待機秒数')
+    parser.add_argument('--seed', type=int, default=None, help='乱数のシード')
+    args = parser.parse_args()
+
+    behavior = StubBehavior(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_delay=args.retry_delay,
+        seed=args.seed
+    )
+    server = ThreadingHTTPServer((args.host, args.port), _make_handler(behavior))
+    print(f"スタブサーバを起動しました: http://{args.host}:{args.port} （Ctrl+Cで停止）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"集計: {behavior.counts}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,320 @@
+"""
+処理時間・件数の計測（メトリクス）を提供するモジュール：
+- span（コンテキストマネージャ）と timed（デコレータ）で処理時間をヒストグラムに記録する
+- カウンタ（キャッシュのヒット、429エラー、JSONの修復など）とサイズ（プロンプト・レスポンスの文字数）を記録する
+- Prometheusのテキスト形式とJSONで出力し、HTTPサーバ（/metrics, /metrics.json）で公開できる
+
+METRICS_ENABLEDがfalseの場合（デフォルト）は、記録の関数はフラグを確認してすぐに戻る。
+
+起動例（一括処理の計測結果をJSONに保存）:
+    python batch_process.py samples/ -o meishi.csv --metrics-json metrics.json
+"""
+
+import json
+import time
+import bisect
+import logging
+import functools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from .constants import METRICS_ENABLED
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+# メトリクス名の接頭辞
+PREFIX = "meishi_"
+
+# 処理時間（秒）のヒストグラムの区切り
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# サイズ（文字数・バイト数）のヒストグラムの区切り
+SIZE_BUCKETS = (100, 300, 1000, 3000, 10000, 30000, 100000, 300000)
+
+_enabled = METRICS_ENABLED
+
+def is_enabled() -> bool:
+    """
+    計測が有効かどうかを返す
+    """
+    return _enabled
+
+def set_enabled(enabled: bool) -> None:
+    """
+    計測の有効・無効を切り替える（一括処理の --metrics-json やテストで使用）
+    """
+    global _enabled
+    _enabled = enabled
+
+def _label_key(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+class _Histogram:
+    """
+    区切りごとの件数・合計・件数を保持するヒストグラム
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        区切りごとの累積件数（Prometheusの le ラベルの値と件数）を返す
+        """
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+class MetricsRegistry:
+    """
+    カウンタとヒストグラムをスレッドセーフに保持する
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name: str, amount: float = 1, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, buckets: Optional[Sequence[float]] = None, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = _Histogram(buckets or (TIME_BUCKETS if name.endswith("_seconds") else SIZE_BUCKETS))
+            series[key].observe(value)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        記録したメトリクスを辞書で返す
+
+        Returns:
+            dict: counters（名前 -> ラベルと値のリスト）, histograms（名前 -> ラベル・件数・合計・平均・区切りごとの件数のリスト）
+        """
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(key), "value": value} for key, value in sorted(series.items())]
+                for name, series in sorted(self._counters.items())
+            }
+            histograms = {
+                name: [
+                    {
+                        "labels": dict(key),
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+                        "buckets": {_format_bound(bound): total for bound, total in histogram.cumulative()}
+                    }
+                    for key, histogram in sorted(series.items())
+                ]
+                for name, series in sorted(self._histograms.items())
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def to_prometheus(self) -> str:
+        """
+        記録したメトリクスをPrometheusのテキスト形式で返す
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{PREFIX}{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for key, histogram in sorted(series.items()):
+                    for bound, total in histogram.cumulative():
+                        labels = _format_labels(key + (("le", _format_bound(bound)),))
+                        lines.append(f"{PREFIX}{name}_bucket{labels} {total}")
+                    lines.append(f"{PREFIX}{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{PREFIX}{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else f"{bound:g}"
+
+def _format_labels(key: Tuple[Tuple[str, str], ...]) -> str:
+    if not key:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in key)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + "}"
+
+# プロセス内で共有するレジストリ
+registry = MetricsRegistry()
+
+def inc(name: str, amount: float = 1, **labels: Any) -> None:
+    """
+    カウンタを増やす（無効の場合は何もしない）
+
+    Args:
+        name (str): メトリクス名（例: "cache_lookups_total"）
+        amount (float): 増やす量
+        **labels: ラベル
+    """
+    if _enabled:
+        registry.inc(name, amount, **labels)
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    """
+    ヒストグラムに値を記録する（名前が _seconds で終わる場合は処理時間、それ以外はサイズの区切りを使う）
+
+    Args:
+        name (str): メトリクス名（例: "llm_prompt_chars"）
+        value (float): 値
+        **labels: ラベル
+    """
+    if _enabled:
+        registry.observe(name, value, **labels)
+
+class _Span:
+    """
+    with文の開始から終了までの時間を {name}_seconds のヒストグラムに記録する
+    """
+
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name: str, labels: Dict[str, Any]):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        labels = dict(self.labels, status="error") if exc_type is not None else self.labels
+        registry.observe(f"{self.name}_seconds", time.perf_counter() - self.start, **labels)
+        return False
+
+class _NoopSpan:
+    """
+    計測が無効の場合に返す、何もしないコンテキストマネージャ
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+def span(name: str, **labels: Any):
+    """
+    with文で囲んだ処理の時間を記録する
+
+    例:
+        with metrics.span("ocr_pass", image="gray"):
+            ...
+
+    Args:
+        name (str): 処理名（{name}_seconds のヒストグラムに記録する）
+        **labels: ラベル（例外で終わった場合は status="error" を追加する）
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return _Span(name, labels)
+
+def timed(name: str, **labels: Any) -> Callable:
+    """
+    関数の処理時間を記録するデコレータ（無効の場合はフラグを確認してそのまま呼び出す）
+
+    Args:
+        name (str): 処理名（{name}_seconds のヒストグラムに記録する）
+        **labels: ラベル
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name, labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def to_prometheus() -> str:
+    """
+    共有のレジストリのメトリクスをPrometheusのテキスト形式で返す
+    """
+    return registry.to_prometheus()
+
+def to_dict() -> Dict[str, Any]:
+    """
+    共有のレジストリのメトリクスを辞書で返す
+    """
+    return registry.to_dict()
+
+def dump_json(path: str) -> None:
+    """
+    共有のレジストリのメトリクスをJSONファイルに保存する
+
+    Args:
+        path (str): 保存先のパス
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(to_dict(), f, ensure_ascii=False, indent=2)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """
+    /metrics（Prometheusのテキスト形式）と /metrics.json を返すハンドラ
+    """
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = to_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path == "/metrics.json":
+            body = json.dumps(to_dict(), ensure_ascii=False).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+def start_http_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    メトリクスを公開するHTTPサーバをバックグラウンドのスレッドで起動する
+
+    Args:
+        port (int): 待ち受けるポート（0の場合は空いているポート）
+        host (str): 待ち受けるアドレス
+
+    Returns:
+        ThreadingHTTPServer: 起動したサーバ（server_addressで実際のポートを確認できる）
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    logger.info(f"メトリクスを公開しています: http://{host}:{server.server_address[1]}/metrics")
+    return server
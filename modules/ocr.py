@@ -5,12 +5,25 @@ OCR処理を行うモジュール：
 """
 
 import os
+import re
+import time
+import zlib
+import random
 import logging
+import functools
+import threading
+import unicodedata
 import cv2
 import numpy as np
 import pytesseract
+from concurrent.futures import CancelledError, ThreadPoolExecutor
 from datetime import datetime
-from .constants import PROCESSED_IMAGES_DIR, SAVE_IMAGES, TESSERACT_CMD_PATH
+from . import layout, metrics, script_detector
+from .image_source import CardImage, load_card_image
+from .constants import (
+    PROCESSED_IMAGES_DIR, SAVE_IMAGES, TESSERACT_CMD_PATH, OCR_MODE, OCR_MAX_WORKERS,
+    OCR_CASCADE_MIN_CONFIDENCE, OCR_CASCADE_MIN_COVERAGE, OCR_SCRIPT_DETECT_ENABLED
+)
 
 # Tesseractコマンドのパスを環境変数から取得
 pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD_PATH
@@ -18,28 +31,27 @@ pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD_PATH
 # ロガーを設定
 logger = logging.getLogger(__name__)
 
+@metrics.timed("ocr_preprocess")
 def preprocess_image(image):
     """
     OCR認識精度向上のための画像前処理を実行
     
+    CardImageを渡した場合は、QRコード読み取りと共有する派生画像（グレースケール・ノイズ除去・二値化）を
+    使い回し、この関数では適応的二値化とモルフォロジー演算だけを行う。
+    
     Args:
-        image (numpy.ndarray): 入力画像
+        image (numpy.ndarray or CardImage): 入力画像（BGR）または名刺画像
         
     Returns:
         dict: 処理済み画像の辞書
     """
     try:
-        # 元の画像のコピーを作成
-        original = image.copy()
-        
-        # グレースケールに変換
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # ノイズ除去（バイラテラルフィルタ）
-        denoise = cv2.bilateralFilter(gray, 9, 75, 75)
+        card = image if isinstance(image, CardImage) else CardImage(b"", bgr=image.copy())
         
-        # 二値化（通常の閾値処理）
-        _, binary = cv2.threshold(denoise, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # グレースケール変換・ノイズ除去（バイラテラルフィルタ）・二値化（大津の方法）は共有の派生画像を使用
+        gray = card.gray
+        denoise = card.denoise
+        binary = card.binary
         
         # 適応的二値化（局所的な閾値を使用）
         adaptive_binary = cv2.adaptiveThreshold(
@@ -51,7 +63,7 @@ def preprocess_image(image):
         morph = cv2.morphologyEx(adaptive_binary, cv2.MORPH_CLOSE, kernel)
         
         return {
-            "original": original,
+            "original": card.bgr,
             "gray": gray,
             "denoise": denoise,
             "binary": binary,
@@ -60,77 +72,795 @@ def preprocess_image(image):
         }
     except Exception as e:
         logger.error(f"画像の前処理中にエラーが発生しました: {str(e)}")
-        return {"original": image}
+        return {"original": image.bgr if isinstance(image, CardImage) else image}
+
+# OCR設定（この順序がそのまま結果の結合順序になる）
+OCR_CONFIGS = [
+    # 日本語+英語（縦書き・横書き両方）
+    "--psm 3 --oem 3 -l jpn+eng",
+    # 日本語のみ
+    "--psm 3 --oem 3 -l jpn",
+    # 英語のみ
+    "--psm 3 --oem 3 -l eng",
+    # 複数ブロックとして処理（レイアウト分析あり）
+    "--psm 1 --oem 3 -l jpn+eng",
+    # 単一ブロックとして処理
+    "--psm 6 --oem 3 -l jpn+eng"
+]
+
+# 行ごとのOCRに使う設定（1行のテキストとして処理、英語のみの名刺は英語だけ）
+LINE_OCR_CONFIG = "--psm 7 --oem 3 -l jpn+eng"
+LATIN_LINE_OCR_CONFIG = "--psm 7 --oem 3 -l eng"
+
+# 文字の種類・書字方向が判定できた場合に試すOCR設定（{vert}は縦書き用の言語に置き換える）
+SCRIPT_OCR_CONFIGS = {
+    script_detector.SCRIPT_LATIN: [
+        "--psm 6 --oem 3 -l eng",
+        "--psm 3 --oem 3 -l eng"
+    ],
+    script_detector.SCRIPT_JAPANESE: [
+        "--psm 3 --oem 3 -l jpn+eng",
+        "--psm 6 --oem 3 -l jpn+eng"
+    ],
+    script_detector.DIRECTION_VERTICAL: [
+        # 縦書きの本文と、横書きの連絡先（メール・URLなど）の両方を読む
+        "--psm 5 --oem 3 -l {vert}",
+        "--psm 3 --oem 3 -l jpn+eng"
+    ]
+}
+
+# 文字の種類・書字方向が判定できた場合に使う前処理画像
+SCRIPT_OCR_VARIANTS = ("gray", "binary")
+
+# 利用可能なOCR実行モード
+OCR_MODES = ("sequential", "parallel", "cascade", "layout")
+
+# カスケード実行時の相対コスト（前処理画像ごと）
+OCR_VARIANT_COSTS = {
+    "gray": 1.0,
+    "binary": 1.0,
+    "denoise": 1.1,
+    "adaptive": 1.2,
+    "morph": 1.2
+}
+
+# カスケード実行時の相対コスト（言語ごと）
+OCR_LANG_COSTS = {
+    "eng": 1.0,
+    "jpn": 2.0,
+    "jpn+eng": 2.5
+}
+
+# カスケード実行時の相対コスト（ページ分割モードごと）
+OCR_PSM_COSTS = {
+    "6": 1.0,
+    "3": 1.2,
+    "1": 1.5
+}
+
+# カスケード終了判定に使う項目のパターン（名刺に現れやすい項目）
+CASCADE_FIELD_PATTERNS = {
+    "email": re.compile(r'[a-zA-Z0-9_.+-]+[@＠][a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+'),
+    "phone": re.compile(r'\(?\d{2,4}\)?[-.\s]?\d{2,4}[-.\s]?\d{3,4}'),
+    "postal_code": re.compile(r'〒?\s*\d{3}[-ー－]\d{4}'),
+    "url": re.compile(r'https?://\S+|www\.\S+')
+}
 
-def extract_text_from_image(image_path, save_processed_images=False):
+def build_ocr_passes(processed_images, configs=None, variants=None):
     """
-    画像から文字を抽出する
+    前処理画像とOCR設定の組み合わせ（パス）を実行順に列挙する
+    
+    Args:
+        processed_images (dict): 処理済み画像の辞書
+        configs (list): OCR設定のリスト（デフォルトはOCR_CONFIGS）
+        variants (tuple): 使用する前処理画像の名前（デフォルトはオリジナル以外のすべて）
+        
+    Returns:
+        list: (画像名, 画像, OCR設定) のタプルのリスト
+    """
+    configs = configs or OCR_CONFIGS
+    passes = []
+    for img_name, proc_img in processed_images.items():
+        if img_name == "original":
+            continue  # オリジナル画像はスキップ（カラー画像のため）
+        if variants and img_name not in variants:
+            continue
+        for config in configs:
+            passes.append((img_name, proc_img, config))
+    return passes
+
+@functools.lru_cache(maxsize=1)
+def _available_languages():
+    """
+    Tesseractで使える言語を返す（取得できない場合は空の集合）
+    """
+    try:
+        return frozenset(pytesseract.get_languages(config=""))
+    except Exception:
+        return frozenset()
+
+def select_ocr_configs(analysis):
+    """
+    名刺の判定結果（書字方向・文字の種類）から、試すOCR設定と前処理画像を選ぶ
+    
+    - 縦書き: 縦書き用の言語（jpn_vert、ない場合はjpn）の設定と、横書きの連絡先を読む設定
+    - 英語のみ: 英語の設定だけ
+    - 日本語の横書き: 日本語+英語の設定だけ
+    - 判定できない場合: すべての設定と前処理画像（従来どおり）
+    
+    Args:
+        analysis (dict): script_detector.analyze_cardの結果
+        
+    Returns:
+        tuple: (OCR設定のリスト, 前処理画像の名前のタプルまたはNone（すべて使用）)
+    """
+    if analysis["direction"] == script_detector.DIRECTION_VERTICAL and analysis["script"] != script_detector.SCRIPT_LATIN:
+        vert = "jpn_vert" if "jpn_vert" in _available_languages() else "jpn"
+        configs = [config.format(vert=vert) for config in SCRIPT_OCR_CONFIGS[script_detector.DIRECTION_VERTICAL]]
+        return configs, SCRIPT_OCR_VARIANTS
+    if analysis["script"] in SCRIPT_OCR_CONFIGS:
+        return list(SCRIPT_OCR_CONFIGS[analysis["script"]]), SCRIPT_OCR_VARIANTS
+    return list(OCR_CONFIGS), None
+
+_PSM_PATTERN = re.compile(r'--psm\s+(\d+)')
+
+def _record_pass_metrics(result):
+    """
+    1回分のOCRの所要時間を計測結果に記録する（前処理画像とページ分割モードごと、行ごとのOCRは「line」にまとめる）
+    """
+    if metrics.is_enabled():
+        psm = _PSM_PATTERN.search(result["config"])
+        metrics.observe(
+            "ocr_pass_seconds", result["elapsed"], image=re.sub(r'\d+$', '', result["image"]),
+            psm=psm.group(1) if psm else "default", status="error" if result["error"] else "ok"
+        )
+    return result
+
+def _run_ocr_pass(img_name, proc_img, config):
+    """
+    1回分のOCRを実行し、テキストと所要時間を返す
     
     Args:
-        image_path (str): 画像ファイルのパス
+        img_name (str): 前処理画像の名前
+        proc_img (numpy.ndarray): 前処理画像
+        config (str): Tesseractの設定
+        
+    Returns:
+        dict: OCR結果（image, config, text, elapsed, error）
+    """
+    start = time.perf_counter()
+    text = ""
+    error = None
+    try:
+        text = pytesseract.image_to_string(proc_img, config=config)
+    except Exception as e:
+        error = str(e)
+        logger.warning(f"OCR実行中にエラー（設定: {config}, 画像: {img_name}）: {error}")
+    return _record_pass_metrics({
+        "image": img_name,
+        "config": config,
+        "text": text,
+        "elapsed": time.perf_counter() - start,
+        "error": error
+    })
+
+_shared_executor = None
+_shared_executor_lock = threading.Lock()
+
+def get_ocr_executor():
+    """
+    プロセス内で共有するOCR用のスレッドプールを取得する
+    
+    複数の名刺を並行処理する場合も、同時に実行するTesseractの数がOCR_MAX_WORKERS
+    （デフォルトはCPUコア数（最大8））を超えないよう、名刺ごとにスレッドプールを作らずにこのプールを使う。
+    
+    Returns:
+        ThreadPoolExecutor: OCR用のスレッドプール
+    """
+    global _shared_executor
+    with _shared_executor_lock:
+        if _shared_executor is None:
+            _shared_executor = ThreadPoolExecutor(max_workers=OCR_MAX_WORKERS, thread_name_prefix="ocr")
+        return _shared_executor
+
+def _check_cancelled(cancel_event):
+    """
+    処理の中止が要求されていればCancelledErrorを送出する
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        raise CancelledError("OCRを中止しました")
+
+def run_ocr_passes(passes, max_workers=1, runner=None, cancel_event=None):
+    """
+    OCRパスを実行する（max_workersが2以上の場合は共有のスレッドプールで並列実行）
+    
+    Tesseractは外部プロセスとして起動されるため、スレッドプールでも
+    複数コアを使った並列処理になる。結果は入力と同じ順序で返す。
+    1回の呼び出しで同時に実行するパスはmax_workersまでで、プロセス全体ではOCR_MAX_WORKERSまでになる。
+    
+    cancel_eventが設定された場合は次のパスを投入せず、まだ始まっていないパスを取り消して
+    CancelledErrorを送出する（実行中のパスは止めないが、終わるのを待たずに戻る）。
+    
+    Args:
+        passes (list): build_ocr_passesで作成したパスのリスト
+        max_workers (int): この呼び出しで同時に実行するOCRの最大数
+        runner (Callable): 1回分のOCRを実行する関数（デフォルトは_run_ocr_pass）
+        cancel_event (threading.Event): 処理の中止を要求するイベント
+        
+    Returns:
+        list: パスごとのOCR結果（入力と同じ順序）
+    """
+    runner = runner or _run_ocr_pass
+    if max_workers <= 1 or len(passes) <= 1:
+        results = []
+        for ocr_pass in passes:
+            _check_cancelled(cancel_event)
+            results.append(runner(*ocr_pass))
+        return results
+    
+    # Tesseract内部のOpenMPスレッド数はconstantsで起動時に制限している（OMP_THREAD_LIMIT）
+    # 実行中のパスがmax_workersに達したら、どれかが終わるまで次のパスを投入しない
+    executor = get_ocr_executor()
+    slots = threading.Semaphore(min(max_workers, len(passes)))
+    futures = []
+    
+    def run_pass(ocr_pass):
+        # 共有のスレッドプールで順番を待っている間に中止された場合は実行しない
+        _check_cancelled(cancel_event)
+        return runner(*ocr_pass)
+    
+    try:
+        for ocr_pass in passes:
+            slots.acquire()
+            _check_cancelled(cancel_event)
+            future = executor.submit(run_pass, ocr_pass)
+            future.add_done_callback(lambda _: slots.release())
+            futures.append(future)
+        return [future.result() for future in futures]
+    except CancelledError:
+        for future in futures:
+            future.cancel()
+        raise
+
+def estimate_pass_cost(img_name, config):
+    """
+    OCRパスの相対コストを見積もる
+    
+    Args:
+        img_name (str): 前処理画像の名前
+        config (str): Tesseractの設定
+        
+    Returns:
+        float: 相対コスト（大きいほど処理が重い）
+    """
+    lang_match = re.search(r'-l\s+(\S+)', config)
+    psm_match = re.search(r'--psm\s+(\d+)', config)
+    lang_cost = OCR_LANG_COSTS.get(lang_match.group(1) if lang_match else "eng", 1.0)
+    psm_cost = OCR_PSM_COSTS.get(psm_match.group(1) if psm_match else "3", 1.2)
+    return OCR_VARIANT_COSTS.get(img_name, 1.0) * lang_cost * psm_cost
+
+def _join_words(words):
+    """
+    単語を1行に連結する（英数字同士の間だけ空白を入れ、日本語の間には入れない）
+    
+    Args:
+        words (list): 単語のリスト
+        
+    Returns:
+        str: 連結した行
+    """
+    line = ""
+    for word in words:
+        if line and line[-1].isascii() and word[0].isascii():
+            line += " "
+        line += word
+    return line
+
+def _data_to_text(data):
+    """
+    pytesseract.image_to_dataの結果からテキストと単語の信頼度を取り出す
+    
+    Args:
+        data (dict): image_to_data（Output.DICT）の結果
+        
+    Returns:
+        tuple: (テキスト, 単語ごとの信頼度のリスト)
+    """
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data.get("text", [])):
+        word = (word or "").strip()
+        conf = float(data["conf"][i])
+        if not word or conf < 0:
+            continue
+        confidences.append(conf)
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(word)
+    text = "\n".join(_join_words(words) for _, words in sorted(lines.items()))
+    return text, confidences
+
+def _run_ocr_pass_with_confidence(img_name, proc_img, config):
+    """
+    1回分のOCRを実行し、テキスト・平均信頼度・所要時間を返す
+    
+    Args:
+        img_name (str): 前処理画像の名前
+        proc_img (numpy.ndarray): 前処理画像
+        config (str): Tesseractの設定
+        
+    Returns:
+        dict: OCR結果（image, config, text, confidence, elapsed, error）
+    """
+    start = time.perf_counter()
+    text = ""
+    confidence = 0.0
+    error = None
+    try:
+        data = pytesseract.image_to_data(proc_img, config=config, output_type=pytesseract.Output.DICT)
+        text, confidences = _data_to_text(data)
+        if confidences:
+            confidence = sum(confidences) / len(confidences)
+    except Exception as e:
+        error = str(e)
+        logger.warning(f"OCR実行中にエラー（設定: {config}, 画像: {img_name}）: {error}")
+    return _record_pass_metrics({
+        "image": img_name,
+        "config": config,
+        "text": text,
+        "confidence": confidence,
+        "elapsed": time.perf_counter() - start,
+        "error": error
+    })
+
+def field_coverage(text):
+    """
+    テキストに名刺の主要項目（メール・電話・郵便番号・URL）がどれだけ含まれるかを計算する
+    
+    Args:
+        text (str): OCRテキスト
+        
+    Returns:
+        float: 検出できた項目の割合（0.0〜1.0）
+    """
+    found = sum(1 for pattern in CASCADE_FIELD_PATTERNS.values() if pattern.search(text))
+    return found / len(CASCADE_FIELD_PATTERNS)
+
+def _is_japanese_config(config):
+    """
+    OCR設定の言語に日本語（jpn, jpn_vert, jpn+engなど）が含まれるかどうかを判定する
+    """
+    lang_match = re.search(r'-l\s+(\S+)', config)
+    return bool(lang_match) and "jpn" in lang_match.group(1)
+
+def run_ocr_cascade(passes, min_confidence=None, min_coverage=None, require_japanese=True, runner=None,
+                    cancel_event=None):
+    """
+    OCRパスをコストの低い順に実行し、十分な品質に達した時点で打ち切る
+    
+    各パスの単語信頼度の平均がmin_confidence以上、かつそれまでに得たテキストの
+    項目カバー率がmin_coverage以上になったら残りのパスは実行しない。
+    カバー率の項目（メール・電話など）は英語の設定でも読み取れるため、require_japaneseの場合は
+    日本語の設定のパスを1回以上実行するまで打ち切らない（コストの低い英語のパスだけで日本語の名刺を終えないため）。
+    
+    Args:
+        passes (list): build_ocr_passesで作成したパスのリスト
+        min_confidence (float): 打ち切りに必要な平均信頼度（0〜100、デフォルトはOCR_CASCADE_MIN_CONFIDENCE）
+        min_coverage (float): 打ち切りに必要な項目カバー率（0〜1、デフォルトはOCR_CASCADE_MIN_COVERAGE）
+        require_japanese (bool): 日本語の設定のパスを実行するまで打ち切らないかどうか
+                                 （英語のみと判定した名刺ではFalseを指定する）
+        runner (Callable): 1回分のOCRを実行する関数（デフォルトは_run_ocr_pass_with_confidence）
+        cancel_event (threading.Event): 処理の中止を要求するイベント（設定されたら次のパスを実行せずCancelledErrorを送出する）
+        
+    Returns:
+        tuple: (実行したパスのOCR結果のリスト, カスケードの統計情報の辞書)
+    """
+    min_confidence = OCR_CASCADE_MIN_CONFIDENCE if min_confidence is None else min_confidence
+    min_coverage = OCR_CASCADE_MIN_COVERAGE if min_coverage is None else min_coverage
+    runner = runner or _run_ocr_pass_with_confidence
+    
+    # コストの低い順に並べる（同コストの場合は元の順序を維持）
+    ordered = sorted(passes, key=lambda ocr_pass: estimate_pass_cost(ocr_pass[0], ocr_pass[2]))
+    # 日本語の設定のパスがない場合（英語のみの設定）は日本語のパスを待たない
+    japanese_pending = require_japanese and any(_is_japanese_config(config) for _, _, config in ordered)
+    
+    results = []
+    texts = []
+    coverage = 0.0
+    stopped_early = False
+    for img_name, proc_img, config in ordered:
+        _check_cancelled(cancel_event)
+        result = runner(img_name, proc_img, config)
+        results.append(result)
+        if result["text"].strip():
+            texts.append(result["text"])
+        if japanese_pending and _is_japanese_config(config):
+            japanese_pending = False
+        coverage = field_coverage("\n".join(texts))
+        if result["confidence"] >= min_confidence and coverage >= min_coverage and not japanese_pending:
+            stopped_early = len(results) < len(ordered)
+            break
+    
+    cascade_stats = {
+        "passes_used": len(results),
+        "passes_total": len(ordered),
+        "stopped_early": stopped_early,
+        "confidence": results[-1]["confidence"] if results else 0.0,
+        "coverage": coverage
+    }
+    logger.info(
+        f"OCRカスケード: {cascade_stats['passes_used']}/{cascade_stats['passes_total']}パスを使用 "
+        f"（平均信頼度 {cascade_stats['confidence']:.1f}, 項目カバー率 {coverage:.2f}）"
+    )
+    return results, cascade_stats
+
+def run_layout_ocr(processed_images, max_workers=1, config=LINE_OCR_CONFIG, cancel_event=None):
+    """
+    テキスト行を検出し、行ごとに1行モード（--psm 7）のOCRを並列実行する
+    
+    画像全体を何度もOCRする代わりに、小さな行の画像を多数のワーカーで同時に処理する。
+    行の検出にはグレースケール画像、OCRには二値化画像を使う。
+    
+    Args:
+        processed_images (dict): 処理済み画像の辞書（gray, binaryを使用）
+        max_workers (int): 同時に実行するOCRの最大数
+        config (str): 行ごとのOCRに使うTesseractの設定
+        cancel_event (threading.Event): 処理の中止を要求するイベント
+        
+    Returns:
+        tuple: (行ごとのOCR結果のリスト, テキストを読み取れた行のリスト（box, text, confidence、読み順）)
+    """
+    with metrics.span("ocr_layout_detect"):
+        lines = layout.detect_text_lines(processed_images["gray"])
+    source = processed_images["binary"]
+    passes = [
+        (f"line{index}", layout.crop_line(source, line["box"]), config)
+        for index, line in enumerate(lines)
+    ]
+    results = run_ocr_passes(passes, max_workers=max_workers, runner=_run_ocr_pass_with_confidence,
+                             cancel_event=cancel_event)
+    read_lines = []
+    for line, result in zip(lines, results):
+        text = " ".join(result["text"].split())
+        if text:
+            read_lines.append({"box": line["box"], "text": text, "confidence": result["confidence"]})
+    return results, read_lines
+
+# 重複ブロック除去の設定
+DEDUP_SHINGLE_SIZE = 2          # 行の類似度計算に使う文字n-gramの長さ
+DEDUP_NUM_PERM = 32             # MinHashのハッシュ関数の数
+DEDUP_BANDS = 16                # LSHのバンド数（DEDUP_NUM_PERMを割り切れること）
+DEDUP_NEAR_THRESHOLD = 0.7      # 「似ているが異なる行」と判定するJaccard係数
+DEDUP_MERGE_RATIO = 0.5         # 既出行の割合がこれを超えたブロックは既存ブロックへ統合する
+DEDUP_MIN_SUBSTRING_LEN = 4     # 改行位置の違いを吸収する部分一致判定の最小文字数
+
+# 連絡先ラベルの表記ゆれ（TEL/電話、Email/メールなど）を統一するためのパターン
+_CONTACT_LABEL_PATTERNS = [
+    (re.compile(r'^(?:tel|phone|電話番号|電話)(?::|(?=[0-9+(]))'), "tel:"),
+    (re.compile(r'^(?:fax|ファックス)(?::|(?=[0-9+(]))'), "fax:"),
+    (re.compile(r'^(?:e-?mail|mail|メールアドレス|メール)(?::|(?=[a-z0-9]))'), "mail:"),
+    (re.compile(r'^(?:url|web|hp|ウェブ)(?::(?!//)|(?=www\.))'), "url:")
+]
+
+_MINHASH_PRIME = (1 << 61) - 1
+_minhash_rng = random.Random(20250426)
+_MINHASH_PARAMS = [
+    (_minhash_rng.randrange(1, _MINHASH_PRIME), _minhash_rng.randrange(0, _MINHASH_PRIME))
+    for _ in range(DEDUP_NUM_PERM)
+]
+
+def _normalize_line(line):
+    """
+    重複判定用に行を正規化する（全角半角・大文字小文字・空白・連絡先ラベルの違いを無視）
+    
+    Args:
+        line (str): OCRテキストの1行
+        
+    Returns:
+        str: 正規化したキー
+    """
+    key = re.sub(r'\s+', '', unicodedata.normalize('NFKC', line).lower())
+    for pattern, label in _CONTACT_LABEL_PATTERNS:
+        key, count = pattern.subn(label, key, count=1)
+        if count:
+            break
+    return key
+
+def _shingles(key):
+    """
+    正規化済みの行を文字n-gramの集合に変換する
+    """
+    if len(key) <= DEDUP_SHINGLE_SIZE:
+        return {key}
+    return {key[i:i + DEDUP_SHINGLE_SIZE] for i in range(len(key) - DEDUP_SHINGLE_SIZE + 1)}
+
+def _minhash_signature(shingles):
+    """
+    文字n-gramの集合からMinHashシグネチャを計算する
+    """
+    hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles]
+    return [min((a * h + b) % _MINHASH_PRIME for h in hashes) for a, b in _MINHASH_PARAMS]
+
+class _NearDuplicateIndex:
+    """
+    MinHash + LSHによる類似行の索引
+    
+    全行同士を比較せず、LSHのバケットが一致した候補だけJaccard係数を計算する。
+    """
+    
+    def __init__(self):
+        self._rows = DEDUP_NUM_PERM // DEDUP_BANDS
+        self._buckets = {}
+        self._entries = []
+    
+    def _band_keys(self, signature):
+        for band in range(DEDUP_BANDS):
+            start = band * self._rows
+            yield (band, tuple(signature[start:start + self._rows]))
+    
+    def add(self, key):
+        shingles = _shingles(key)
+        entry_id = len(self._entries)
+        self._entries.append((key, shingles))
+        for band_key in self._band_keys(_minhash_signature(shingles)):
+            self._buckets.setdefault(band_key, []).append(entry_id)
+    
+    def has_near_duplicate(self, key):
+        """
+        keyと似ているが一致はしない行が索引に存在するかどうかを返す
+        """
+        shingles = _shingles(key)
+        checked = set()
+        for band_key in self._band_keys(_minhash_signature(shingles)):
+            for entry_id in self._buckets.get(band_key, ()):
+                if entry_id in checked:
+                    continue
+                checked.add(entry_id)
+                other_key, other_shingles = self._entries[entry_id]
+                if other_key == key:
+                    continue
+                similarity = len(shingles & other_shingles) / len(shingles | other_shingles)
+                if similarity >= DEDUP_NEAR_THRESHOLD:
+                    return True
+        return False
+
+def remove_duplicate_blocks(texts):
+    """
+    複数のOCR結果（テキストブロック）から重複・準重複を取り除く
+    
+    - 空白・改行・全角半角・連絡先ラベル（TEL/電話など）の違いは無視して一致判定する
+    - 既出行が過半数のブロックは、新しい行だけを最も重なる既存ブロックに統合する
+    - 既出行と似ているが異なる行（例: サンプルA と サンプルB）は別の読み取り候補として残す
+    - 一致判定はハッシュ表（部分一致は文字n-gramの索引）、類似判定はMinHash/LSHで行うため、ブロック数に対してほぼ線形に動作する
+    
+    Args:
+        texts (list): OCR結果のテキストのリスト
+        
+    Returns:
+        list: 重複を取り除いたテキストブロックのリスト（入力順を維持）
+    """
+    blocks = []           # 出力ブロック（行のリスト）
+    block_keys = []       # 出力ブロックの正規化済み全文（部分一致判定用）
+    gram_blocks = {}      # ブロック全文の文字n-gram -> そのn-gramを含むブロックの番号の集合
+    line_owner = {}       # 正規化済みの行 -> その行を持つブロックの番号
+    seen_blocks = set()   # 正規化済みのブロック全文
+    near_index = _NearDuplicateIndex()
+    
+    def grams(key):
+        return {key[i:i + DEDUP_MIN_SUBSTRING_LEN] for i in range(len(key) - DEDUP_MIN_SUBSTRING_LEN + 1)}
+    
+    def find_owner(key):
+        if key in line_owner:
+            return line_owner[key]
+        if len(key) >= DEDUP_MIN_SUBSTRING_LEN:
+            # 全ブロックを走査せず、keyのn-gramのうち含むブロックが最も少ないものの候補だけを確認する
+            candidates = min((gram_blocks.get(gram, ()) for gram in grams(key)), key=len)
+            for index in sorted(candidates):
+                if key in block_keys[index]:
+                    return index
+        return None
+    
+    def add_lines(index, lines):
+        for line, key in lines:
+            blocks[index].append(line)
+            line_owner[key] = index
+            near_index.add(key)
+        block_keys[index] = "".join(_normalize_line(line) for line in blocks[index])
+        for gram in grams(block_keys[index]):
+            gram_blocks.setdefault(gram, set()).add(index)
+    
+    for text in texts:
+        lines = []
+        keys = set()
+        for line in text.splitlines():
+            key = _normalize_line(line)
+            if key and key not in keys:
+                keys.add(key)
+                lines.append((line.strip(), key))
+        if not lines:
+            continue
+        
+        # ブロック全体が既出なら除外（改行位置の違いも吸収）
+        whole_key = "".join(key for _, key in lines)
+        if whole_key in seen_blocks or find_owner(whole_key) is not None:
+            continue
+        seen_blocks.add(whole_key)
+        
+        # 既出の行と新しい行に分ける
+        owners = {}
+        uncovered = []
+        for line, key in lines:
+            owner = find_owner(key)
+            if owner is None:
+                uncovered.append((line, key))
+            else:
+                owners[owner] = owners.get(owner, 0) + 1
+        if not uncovered:
+            continue
+        
+        covered_ratio = (len(lines) - len(uncovered)) / len(lines)
+        if owners and covered_ratio > DEDUP_MERGE_RATIO:
+            # 既存ブロックとほぼ同じ内容: 新しい行だけを統合し、読み違いの候補は別ブロックにする
+            host = max(owners, key=owners.get)
+            near = [(line, key) for line, key in uncovered if near_index.has_near_duplicate(key)]
+            novel = [item for item in uncovered if item not in near]
+            if novel:
+                add_lines(host, novel)
+            new_lines = near
+        else:
+            new_lines = uncovered
+        
+        if new_lines:
+            blocks.append([])
+            block_keys.append("")
+            add_lines(len(blocks) - 1, new_lines)
+    
+    return ["\n".join(block) for block in blocks]
+
+def extract_text_with_stats(image_path, save_processed_images=False, mode=None, max_workers=None,
+                            cancel_event=None):
+    """
+    画像から文字を抽出し、OCRパスごとの処理時間などの統計情報も返す
+    
+    Args:
+        image_path (str or CardImage): 画像ファイルのパス、または名刺画像（バイト列・バッファも可）
         save_processed_images (bool): 処理済み画像を保存するかどうか
+        mode (str): OCRの実行モード（sequential / parallel / cascade / layout、デフォルトはOCR_MODE）
+        max_workers (int): 並列実行時のワーカー数（デフォルトはOCR_MAX_WORKERS）
+        cancel_event (threading.Event): 処理の中止を要求するイベント（設定されたら残りのOCRパスを実行しない）
         
     Returns:
-        tuple: (抽出されたテキスト, 処理済み画像の辞書)
+        tuple: (抽出されたテキスト, 処理済み画像の辞書, 統計情報の辞書)
+               layoutモードでは統計情報のlinesに行ごとの位置（box）・テキスト・信頼度が入る
     """
+    mode = (mode or OCR_MODE).lower()
+    if mode not in OCR_MODES:
+        raise ValueError(f"不明なOCR実行モードです: {mode}（指定可能: {', '.join(OCR_MODES)}）")
+    workers = 1 if mode in ("sequential", "cascade") else (max_workers or OCR_MAX_WORKERS)
+    stats = {"mode": mode, "workers": workers, "passes": [], "pass_count": 0, "wall_time": 0.0, "ocr_time": 0.0}
+    
     try:
-        # 画像を読み込み
-        image = cv2.imread(image_path)
-        if image is None:
+        # 画像を読み込み（デコードは名刺画像ごとに1回だけ）
+        try:
+            card = load_card_image(image_path)
+            card.bgr
+        except (OSError, ValueError):
             logger.error(f"画像の読み込みに失敗しました: {image_path}")
-            return "画像の読み込みに失敗しました", {}
+            return "画像の読み込みに失敗しました", {}, stats
         
         # 画像を前処理
-        processed_images = preprocess_image(image)
-        
-        # OCR設定
-        configs = [
-            # 日本語+英語（縦書き・横書き両方）
-            "--psm 3 --oem 3 -l jpn+eng",
-            # 日本語のみ
-            "--psm 3 --oem 3 -l jpn",
-            # 英語のみ
-            "--psm 3 --oem 3 -l eng",
-            # 複数ブロックとして処理（レイアウト分析あり）
-            "--psm 1 --oem 3 -l jpn+eng",
-            # 単一ブロックとして処理
-            "--psm 6 --oem 3 -l jpn+eng"
-        ]
-        
-        # 処理済み画像ごとにOCRを実行し、結果を結合
-        all_text = []
+        processed_images = preprocess_image(card)
         
         # 処理済み画像を保存（デバッグ用）
         if SAVE_IMAGES and save_processed_images:
             timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            save_processed_images_to_disk(processed_images, os.path.basename(image_path), timestamp)
+            save_processed_images_to_disk(processed_images, os.path.basename(card.name) or "image", timestamp)
+        
+        # 向き・書字方向・文字の種類を判定し、回転を補正して試すOCR設定を絞り込む
+        start = time.perf_counter()
+        configs, variants = list(OCR_CONFIGS), None
+        script = script_detector.SCRIPT_UNKNOWN
+        vertical = False
+        if OCR_SCRIPT_DETECT_ENABLED and "gray" in processed_images:
+            with metrics.span("ocr_script_detect"):
+                analysis = script_detector.analyze_card(processed_images["gray"], processed_images["binary"])
+            stats["script"] = {key: analysis[key] for key in ("rotate", "direction", "script")}
+            if analysis["rotate"]:
+                processed_images = {
+                    name: script_detector.rotate_image(img, analysis["rotate"])
+                    for name, img in processed_images.items()
+                }
+            configs, variants = select_ocr_configs(analysis)
+            script = analysis["script"]
+            vertical = analysis["direction"] == script_detector.DIRECTION_VERTICAL
+        stats["configs"] = configs
+        passes = build_ocr_passes(processed_images, configs, variants)
         
         # 各前処理画像に対してOCR実行
-        for img_name, proc_img in processed_images.items():
-            if img_name == "original":
-                continue  # オリジナル画像はスキップ（カラー画像のため）
-                
-            for config in configs:
-                try:
-                    text = pytesseract.image_to_string(proc_img, config=config)
-                    if text.strip():
-                        all_text.append(text)
-                except Exception as e:
-                    logger.warning(f"OCR実行中にエラー（設定: {config}, 画像: {img_name}）: {str(e)}")
+        lines = None
+        if mode == "layout" and not vertical:
+            line_config = LATIN_LINE_OCR_CONFIG if script == script_detector.SCRIPT_LATIN else LINE_OCR_CONFIG
+            results, lines = run_layout_ocr(processed_images, max_workers=workers, config=line_config,
+                                            cancel_event=cancel_event)
+            stats["lines"] = lines
+            if not lines:
+                # 行を検出できない画像は画像全体のOCRに切り替える
+                logger.info("行ごとのOCRでテキストを読み取れないため、画像全体のOCRに切り替えます")
+                stats["layout_fallback"] = True
+                lines = None
+                results += run_ocr_passes(passes, max_workers=workers, cancel_event=cancel_event)
+        elif mode == "cascade":
+            results, cascade_stats = run_ocr_cascade(
+                passes, require_japanese=script != script_detector.SCRIPT_LATIN, cancel_event=cancel_event
+            )
+            stats.update(cascade_stats)
+        else:
+            # 縦書きの名刺は行の検出ができないため、layoutモードでも画像全体のOCRを行う
+            results = run_ocr_passes(passes, max_workers=workers, cancel_event=cancel_event)
+        stats["wall_time"] = time.perf_counter() - start
+        stats["ocr_time"] = sum(result["elapsed"] for result in results)
+        stats["pass_count"] = len(results)
+        stats["passes"] = [
+            {
+                "image": result["image"],
+                "config": result["config"],
+                "elapsed": result["elapsed"],
+                "chars": len(result["text"]),
+                "confidence": result.get("confidence"),
+                "error": result["error"]
+            }
+            for result in results
+        ]
+        if stats["wall_time"] > 0:
+            logger.info(
+                f"OCR完了（{mode}, ワーカー数: {workers}）: {len(results)}パス, "
+                f"経過時間 {stats['wall_time']:.2f}秒, OCR合計時間 {stats['ocr_time']:.2f}秒, "
+                f"速度向上 {stats['ocr_time'] / stats['wall_time']:.1f}倍"
+            )
         
-        # 結果をまとめる
-        combined_text = "\n".join(all_text)
+        # 結果をまとめる（行ごとのOCRは読み順に結合し、それ以外はパスの順序どおりに結合して重複するブロックを除去）
+        all_text = [result["text"] for result in results if result["text"].strip()]
+        if lines:
+            combined_text = "\n".join(line["text"] for line in lines)
+        else:
+            combined_text = "\n".join(remove_duplicate_blocks(all_text))
+        stats["raw_chars"] = sum(len(text) for text in all_text)
+        stats["dedup_chars"] = len(combined_text)
+        logger.info(f"重複ブロック除去: {stats['raw_chars']}文字 -> {stats['dedup_chars']}文字")
         
         # 結果がない場合
         if not combined_text.strip():
             logger.warning("OCRから有効なテキストが抽出できませんでした。")
-            return "テキスト抽出に失敗しました。別の画像を試してください。", processed_images
+            return "テキスト抽出に失敗しました。別の画像を試してください。", processed_images, stats
             
-        return combined_text, processed_images
+        return combined_text, processed_images, stats
         
+    except CancelledError as e:
+        logger.info("OCRを中止しました")
+        return f"エラー: {str(e)}", {}, stats
     except Exception as e:
         logger.error(f"OCR処理中にエラーが発生しました: {str(e)}")
-        return f"エラー: {str(e)}", {}
+        return f"エラー: {str(e)}", {}, stats
+
+def extract_text_from_image(image_path, save_processed_images=False, mode=None, max_workers=None,
+                            cancel_event=None):
+    """
+    画像から文字を抽出する
+    
+    Args:
+        image_path (str or CardImage): 画像ファイルのパス、または名刺画像（バイト列・バッファも可）
+        save_processed_images (bool): 処理済み画像を保存するかどうか
+        mode (str): OCRの実行モード（sequential / parallel / cascade / layout、デフォルトはOCR_MODE）
+        max_workers (int): 並列実行時のワーカー数（デフォルトはOCR_MAX_WORKERS）
+        cancel_event (threading.Event): 処理の中止を要求するイベント
+        
+    Returns:
+        tuple: (抽出されたテキスト, 処理済み画像の辞書)
+    """
+    text, processed_images, _ = extract_text_with_stats(
+        image_path, save_processed_images=save_processed_images, mode=mode, max_workers=max_workers,
+        cancel_event=cancel_event
+    )
+    return text, processed_images
 
 def save_processed_images_to_disk(processed_images, original_filename, timestamp):
     """
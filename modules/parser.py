@@ -2,12 +2,25 @@ import json
 import os
 import re
 import logging
+import threading
 from dotenv import load_dotenv
 import google.generativeai as genai
-from .prompts import get_gemini_prompt
-from .constants import COLUMNS, REQUIRED_KEYS, DEMO_DATA, KEY_MAPPING, GEMINI_MODEL
+from .prompts import get_gemini_prompt, get_gemini_batch_prompt, get_gemini_partial_prompt
+from .constants import (
+    COLUMNS, REQUIRED_KEYS, DEMO_DATA, KEY_MAPPING, GEMINI_MODEL,
+    LLM_CACHE_ENABLED, LLM_CACHE_VERSION, GEMINI_BATCH_SIZE, API_TIMEOUT, GEMINI_DEADLINE,
+    LLM_BACKEND, LLM_STUB_URL, LLM_FIXTURES_DIR, LLM_REPLAY_LATENCY,
+    RULE_FAST_PATH_ENABLED, RULE_CONFIDENCE_THRESHOLD
+)
+from .rate_limiter import (
+    PRIORITY_INTERACTIVE, PRIORITY_BATCH, call_with_retry, estimate_tokens, get_gemini_rate_limiter
+)
+from .cache import get_llm_cache, make_cache_key
+from .llm_backend import LLMBackend, GeminiBackend, HTTPStubBackend, RecordReplayBackend
 from .demo_data import get_demo_data
-from typing import Optional, Dict, Any
+from . import metrics, rule_extractor
+from .stream_parser import IncrementalJSONObjectParser
+from typing import Optional, Dict, Any, Callable, List, Sequence, Tuple
 
 # ロギング設定
 logging.basicConfig(
@@ -49,8 +62,8 @@ if not GEMINI_API_KEY and os.path.exists('.env'):
     except Exception as e:
         logger.error(f".envファイルの直接読み込みエラー: {e}")
 
-# API キーが設定されているかチェック
-if not GEMINI_API_KEY:
+# API キーが設定されているかチェック（Gemini APIを呼び出すバックエンドの場合のみ必須）
+if not GEMINI_API_KEY and LLM_BACKEND in ("gemini", "record"):
     error_msg = "GEMINI_API_KEYが設定されていません。.envファイルで設定してください。"
     logger.error(error_msg)
     raise ValueError(error_msg)
@@ -58,6 +71,7 @@ if not GEMINI_API_KEY:
 logger.info(f"GEMINI_API_KEY の設定状況: {'設定済み' if GEMINI_API_KEY else '未設定'}")
 MODEL_NAME = GEMINI_MODEL  # constants.pyで定義された環境変数から読み取ったモデル名を使用
 logger.info(f"使用するモデル: {MODEL_NAME}")
+logger.info(f"使用するLLMバックエンド: {LLM_BACKEND}")
 
 def configure_genai():
     """
@@ -126,19 +140,352 @@ def normalize_text(text: str) -> str:
     
     return normalized
 
-def parse_text(ocr_text: str, qr_text: Optional[str] = None) -> Dict[str, str]:
+# モデルの設定
+GENERATION_CONFIG = {
+    "temperature": 0.1,  # 低温度で厳密な応答を得る
+    "top_p": 0.8,
+    "top_k": 40
+}
+
+SAFETY_SETTINGS = [
+    {
+        "category": "HARM_CATEGORY_HARASSMENT",
+        "threshold": "BLOCK_NONE"
+    },
+    {
+        "category": "HARM_CATEGORY_HATE_SPEECH",
+        "threshold": "BLOCK_NONE"
+    },
+    {
+        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "threshold": "BLOCK_NONE"
+    },
+    {
+        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+        "threshold": "BLOCK_NONE"
+    },
+]
+
+_llm_backend = None
+_llm_backend_lock = threading.Lock()
+
+def _create_llm_backend(name: str) -> LLMBackend:
     """
-    OCRで抽出したテキストをパースしてデータを返す
+    名前に対応するLLMバックエンドを作成する
+    """
+    if name == "stub":
+        return HTTPStubBackend(LLM_STUB_URL, model_name=MODEL_NAME)
+    if name == "replay":
+        return RecordReplayBackend(LLM_FIXTURES_DIR, mode="replay", model_name=MODEL_NAME,
+                                   simulate_latency=LLM_REPLAY_LATENCY)
+    gemini = GeminiBackend(GEMINI_API_KEY, MODEL_NAME, GENERATION_CONFIG, SAFETY_SETTINGS)
+    if name == "record":
+        return RecordReplayBackend(LLM_FIXTURES_DIR, mode="record", inner=gemini, model_name=MODEL_NAME)
+    return gemini
+
+def get_llm_backend() -> LLMBackend:
+    """
+    使用中のLLMバックエンドを取得する（初回はLLM_BACKENDの設定から作成）
+    
+    Returns:
+        LLMBackend: LLMバックエンド
+    """
+    global _llm_backend
+    with _llm_backend_lock:
+        if _llm_backend is None:
+            _llm_backend = _create_llm_backend(LLM_BACKEND)
+        return _llm_backend
+
+def set_llm_backend(backend: Optional[LLMBackend]) -> None:
+    """
+    使用するLLMバックエンドを差し替える（ベンチマークやテスト用。Noneで設定値に戻す）
+    
+    Args:
+        backend (LLMBackend): LLMバックエンド
+    """
+    global _llm_backend
+    with _llm_backend_lock:
+        _llm_backend = backend
+
+def get_llm_cache_key(prompt: str) -> str:
+    """
+    Gemini APIのレスポンスキャッシュのキーを作成する
+    
+    Args:
+        prompt (str): Gemini APIへのプロンプト
+        
+    Returns:
+        str: バックエンド・モデル名・生成設定・プロンプトのハッシュから作ったキー
+    """
+    return make_cache_key(
+        LLM_CACHE_VERSION,
+        get_llm_backend().name,
+        MODEL_NAME,
+        json.dumps(GENERATION_CONFIG, sort_keys=True),
+        prompt
+    )
+
+def clear_llm_cache() -> None:
+    """
+    Gemini APIのレスポンスキャッシュをすべて削除する
+    """
+    get_llm_cache().clear()
+    logger.info("Gemini APIのレスポンスキャッシュを削除しました")
+
+class _StreamingFieldEmitter:
+    """
+    ストリーミングで受信したレスポンスから値が確定した項目を順にコールバックへ通知する
+    
+    同じ値の項目は2回通知しない。再試行で受信し直した場合は逐次パースをやり直し、
+    最後に確定した結果と通知済みの値が異なる項目（修復処理で変わった項目など）を通知し直す。
+    """
+    
+    def __init__(self, on_field: Callable[[str, str], None], fields: Optional[Sequence[str]] = None):
+        """
+        Args:
+            on_field (Callable): 項目名と値を受け取るコールバック
+            fields (Sequence): ストリーミング中に通知する項目（Noneの場合は「その他」以外のすべて）
+        """
+        self._on_field = on_field
+        self._fields = set(fields if fields is not None else REQUIRED_KEYS) - {"その他"}
+        self._key_mapping = {eng_key: jp_key for jp_key, eng_key in KEY_MAPPING.items()}
+        self._parser = IncrementalJSONObjectParser()
+        self.emitted: Dict[str, str] = {}
+    
+    def emit(self, key: str, value: Any) -> None:
+        value = "" if value is None else str(value)
+        if self.emitted.get(key) == value:
+            return
+        self.emitted[key] = value
+        try:
+            self._on_field(key, value)
+        except Exception as e:
+            logger.warning(f"項目の通知先でエラーが発生しました: {e}")
+    
+    def reset(self) -> None:
+        """
+        再試行のたびに呼び、逐次パースを最初からやり直す
+        """
+        self._parser = IncrementalJSONObjectParser()
+    
+    def feed(self, chunk: str) -> None:
+        for key, value in self._parser.feed(chunk):
+            key = self._key_mapping.get(key, key)
+            if key in self._fields and not isinstance(value, (dict, list)):
+                self.emit(key, value)
+    
+    def finish(self, result: Dict[str, str]) -> None:
+        """
+        確定した結果のうち、未通知または通知済みの値と異なる項目を通知する
+        """
+        for key in REQUIRED_KEYS:
+            self.emit(key, result.get(key, ""))
+
+def _call_gemini(prompt: str, priority: int = PRIORITY_INTERACTIVE,
+                 stream: Optional[_StreamingFieldEmitter] = None) -> str:
+    """
+    Gemini APIを呼び出してレスポンステキストを返す
+    
+    共有のレートリミッタで待ち行列に入り、429/5xxエラーの場合は
+    指数バックオフで再試行する。1回の呼び出しにはAPI_TIMEOUTを適用する。
+    実際の呼び出し先はLLMバックエンド（LLM_BACKEND）によって切り替わる。
+    
+    Args:
+        prompt (str): Gemini APIへのプロンプト
+        priority (int): 優先度（PRIORITY_INTERACTIVE / PRIORITY_BATCH）
+        stream (_StreamingFieldEmitter): 指定した場合はストリーミングで受信し、受信した断片を渡す
+        
+    Returns:
+        str: レスポンステキスト
+    """
+    try:
+        backend = get_llm_backend()
+        
+        def request(timeout):
+            if stream is None:
+                return backend.generate(prompt, timeout=timeout)
+            stream.reset()
+            chunks = []
+            for chunk in backend.generate_stream(prompt, timeout=timeout):
+                chunks.append(chunk)
+                stream.feed(chunk)
+            return "".join(chunks).strip()
+        
+        metrics.observe("llm_prompt_chars", len(prompt))
+        with metrics.span("llm_call", backend=backend.name, stream=stream is not None):
+            response_text = call_with_retry(
+                request,
+                limiter=get_gemini_rate_limiter() if backend.rate_limited else None,
+                tokens=estimate_tokens(prompt),
+                priority=priority,
+                timeout=API_TIMEOUT,
+                deadline_seconds=GEMINI_DEADLINE
+            )
+        metrics.observe("llm_response_chars", len(response_text))
+        
+        logger.info(f"Gemini APIのレスポンス受信: {len(response_text)}文字")
+        logger.debug(f"レスポンス: {response_text}")
+        return response_text
+    except Exception as e:
+        error_msg = f"API呼び出しエラー: {e}"
+        logger.error(error_msg)
+        raise RuntimeError(error_msg)
+
+def _extract_json_text(response_text: str) -> str:
+    """
+    レスポンステキストからJSON部分を取り出す（バッククォートやマークダウン記法の削除）
+    
+    Args:
+        response_text (str): Gemini APIのレスポンステキスト
+        
+    Returns:
+        str: JSON部分のテキスト
+    """
+    if "```" in response_text:
+        # コードブロックから抽出
+        cleaned_text = re.search(r'```(?:json)?\s*(.*?)\s*```', response_text, re.DOTALL)
+        if cleaned_text:
+            response_text = cleaned_text.group(1).strip()
+            logger.info("コードブロックからJSONを抽出しました")
+    
+    # JSONブロックの抽出（{...}で囲まれた部分）
+    json_match = re.search(r'({.*})', response_text, re.DOTALL)
+    if json_match:
+        response_text = json_match.group(1).strip()
+        logger.info("JSONブロックを抽出しました")
+    
+    return response_text.strip()
+
+def _parse_json_response(response_text: str) -> Dict[str, Any]:
+    """
+    JSONテキストをパースする（失敗した場合はクリーニングや正規表現による抽出を試みる）
+    
+    Args:
+        response_text (str): JSON部分のテキスト
+        
+    Returns:
+        dict: パースしたデータ
+    """
+    try:
+        # 直接JSONをパース
+        parsed_data = json.loads(response_text)
+        logger.info("JSONとして直接パースに成功")
+        metrics.inc("llm_json_parse_total", method="direct")
+        return parsed_data
+    except json.JSONDecodeError as e:
+        logger.warning(f"JSONパースエラー: {e}")
+        logger.warning("JSONパースに失敗、クリーニングと再パースを試みます")
+    
+    # JSON形式に変換するためのクリーニング
+    cleaned_text = response_text
+    
+    # シングルクォートをダブルクォートに変換
+    cleaned_text = re.sub(r"'([^']*)'(?=\s*:)", r'"\1"', cleaned_text)
+    
+    # 前後の余分なテキストを削除
+    cleaned_text = re.sub(r'^[^{]*', '', cleaned_text)  # 先頭の不要なテキスト
+    cleaned_text = re.sub(r'[^}]*$', '', cleaned_text)  # 末尾の不要なテキスト
+    
+    # JSONのキーと値を適切にフォーマット
+    # キーをダブルクォートで囲む
+    cleaned_text = re.sub(r'([{,])\s*([a-zA-Z0-9_\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FFF]+)\s*:', r'\1"\2":', cleaned_text)
+    
+    # エスケープされていないダブルクォートの処理
+    cleaned_text = re.sub(r':\s*"([^"]*)"(?=[,}])', r':"\1"', cleaned_text)
+    
+    logger.debug(f"クリーニング後のテキスト: {cleaned_text}")
+    
+    try:
+        parsed_data = json.loads(cleaned_text)
+        logger.info("クリーニング後のJSONパースに成功")
+        metrics.inc("llm_json_parse_total", method="cleaned")
+        return parsed_data
+    except json.JSONDecodeError as e2:
+        error_msg = f"クリーニング後もJSONパースに失敗: {e2}"
+        logger.error(error_msg)
+    
+    # 最終手段: 正規表現でキーと値のペアを抽出
+    try:
+        # キーと値のペアを抽出
+        pairs = re.findall(r'"([^"]+)"\s*:\s*"([^"]*)"', cleaned_text)
+        if pairs:
+            logger.info("正規表現によるキーと値のペア抽出に成功")
+            metrics.inc("llm_json_parse_total", method="regex")
+            return {k: v for k, v in pairs}
+        error_msg = "キーと値のペア抽出に失敗"
+        logger.error(error_msg)
+        raise RuntimeError(error_msg)
+    except Exception as e3:
+        error_msg = f"正規表現によるパースに失敗: {e3}"
+        logger.error(error_msg)
+        metrics.inc("llm_json_parse_total", method="failed")
+        raise RuntimeError(error_msg)
+
+def _build_result(parsed_data: Dict[str, Any]) -> Dict[str, str]:
+    """
+    パースしたデータのキーを確認・補完して出力用のデータを作成する
+    
+    Args:
+        parsed_data (dict): パースしたデータ
+        
+    Returns:
+        dict: 必須キーをすべて含むデータ
+    """
+    result = {}
+    
+    # 英語キーで返ってきた場合は日本語キーにマッピング（未確定項目だけを抽出した場合は「name」がないこともある）
+    english_keys = any(eng_key in parsed_data for eng_key in KEY_MAPPING.values())
+    japanese_keys = any(jp_key in parsed_data for jp_key in KEY_MAPPING)
+    if "name" in parsed_data or (english_keys and not japanese_keys):
+        # 英語キーでのレスポンス
+        reversed_mapping = {v: k for k, v in KEY_MAPPING.items()}
+        for eng_key, jp_key in reversed_mapping.items():
+            if eng_key in parsed_data:
+                result[jp_key] = parsed_data[eng_key]
+    else:
+        # 日本語キーでのレスポンス
+        result = parsed_data
+    
+    # 旧フィールド（フィールド1～フィールド5、メモ、フリガナ、会社名）をその他にまとめる
+    old_fields = ["メモ", "フリガナ","電話番号(予備)","メールアドレス(予備)","FAX"]
+    other_content = []
+    
+    for field in old_fields:
+        if field in parsed_data and parsed_data[field]:
+            if field == "メモ":
+                other_content.append(f"{parsed_data[field]}")
+            else:
+                other_content.append(f"{field}: {parsed_data[field]}")
+    
+    # すでに「その他」フィールドが存在する場合は、そのコンテンツも追加（英語キーの「other」を含む）
+    if result.get("その他"):
+        other_content.append(result["その他"])
+    
+    # 「その他」フィールドを設定
+    if other_content:
+        result["その他"] = " / ".join(other_content)
+    else:
+        result["その他"] = ""
+    
+    # 必須キーの存在確認と欠損値の補完
+    for key in REQUIRED_KEYS:
+        if key not in result:
+            result[key] = ""
+    
+    return result
+
+@metrics.timed("prompt_build", step="normalize")
+def build_prompt_text(ocr_text: str, qr_text: Optional[str] = None) -> str:
+    """
+    OCRテキストとQRコードテキストを合成・正規化してプロンプトに埋め込むテキストを作成する
     
     Args:
         ocr_text (str): OCRで抽出したテキスト
         qr_text (Optional[str]): QRコードから抽出したテキスト（デフォルトはNone）
         
     Returns:
-        dict: 抽出したデータ
+        str: 正規化済みのテキスト
     """
-    logger.info("テキストの解析を開始")
-    
     # テキスト合成（QRコード情報があれば）
     if qr_text:
         combined_text = combine_texts(ocr_text, qr_text)
@@ -146,166 +493,203 @@ def parse_text(ocr_text: str, qr_text: Optional[str] = None) -> Dict[str, str]:
         combined_text = ocr_text
     
     # テキスト正規化
-    normalized_text = normalize_text(combined_text)
-    
-    # APIの設定
-    configure_genai()
+    return normalize_text(combined_text)
+
+def _generate_and_parse(prompt: str, parse_response: Callable[[str], Any], use_cache: bool = True,
+                        priority: int = PRIORITY_INTERACTIVE,
+                        stream: Optional[_StreamingFieldEmitter] = None) -> Any:
+    """
+    プロンプトのレスポンスを取得してパースする（キャッシュがあればAPIを呼び出さない）
     
-    try:
-        # プロンプトの作成
-        prompt = get_gemini_prompt(normalized_text)
-        logger.debug(f"生成したプロンプト: {prompt[:100]}...")
-        
-        # モデルの設定 - JSON modeを有効化
-        generation_config = {
-            "temperature": 0.1,  # 低温度で厳密な応答を得る
-            "top_p": 0.8,
-            "top_k": 40
-        }
-        
-        safety_settings = [
-            {
-                "category": "HARM_CATEGORY_HARASSMENT",
-                "threshold": "BLOCK_NONE"
-            },
-            {
-                "category": "HARM_CATEGORY_HATE_SPEECH",
-                "threshold": "BLOCK_NONE"
-            },
-            {
-                "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                "threshold": "BLOCK_NONE"
-            },
-            {
-                "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                "threshold": "BLOCK_NONE"
-            },
-        ]
+    Args:
+        prompt (str): Gemini APIへのプロンプト
+        parse_response (Callable): レスポンステキストをパースする関数（失敗時は例外を送出）
+        use_cache (bool): レスポンスキャッシュを使用するかどうか
+        priority (int): API呼び出しの優先度
+        stream (_StreamingFieldEmitter): 指定した場合はストリーミングで受信する
         
-        # APIリクエスト
+    Returns:
+        Any: parse_responseの戻り値
+    """
+    # キャッシュの確認
+    llm_cache = None
+    cache_key = None
+    response_text = None
+    if use_cache and LLM_CACHE_ENABLED:
         try:
-            model = genai.GenerativeModel(
-                MODEL_NAME,
-                generation_config=generation_config,
-                safety_settings=safety_settings
-            )
-            response = model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            logger.info(f"Gemini APIのレスポンス受信: {len(response_text)}文字")
-            logger.debug(f"レスポンス: {response_text}")
-            
-            # JSONレスポンスのクリーニング
-            # バッククォートやマークダウン記法の削除
-            if "```" in response_text:
-                # コードブロックから抽出
-                cleaned_text = re.search(r'```(?:json)?\s*(.*?)\s*```', response_text, re.DOTALL)
-                if cleaned_text:
-                    response_text = cleaned_text.group(1).strip()
-                    logger.info("コードブロックからJSONを抽出しました")
-            
-            # JSONブロックの抽出（{...}で囲まれた部分）
-            json_match = re.search(r'({.*})', response_text, re.DOTALL)
-            if json_match:
-                response_text = json_match.group(1).strip()
-                logger.info("JSONブロックを抽出しました")
-            
-            response_text = response_text.strip()
+            llm_cache = get_llm_cache()
+            cache_key = get_llm_cache_key(prompt)
+            response_text = llm_cache.get(cache_key)
         except Exception as e:
-            error_msg = f"API呼び出しエラー: {e}"
-            logger.error(error_msg)
-            raise RuntimeError(error_msg)
-        
-        # レスポンスのパース
+            logger.warning(f"レスポンスキャッシュを利用できません: {e}")
+            llm_cache = None
+    from_cache = response_text is not None
+    if from_cache:
+        logger.info("Gemini APIのレスポンスをキャッシュから取得しました")
+    else:
+        # APIリクエスト
+        response_text = _call_gemini(prompt, priority=priority, stream=stream)
+    
+    # レスポンスのパース
+    parsed = parse_response(response_text)
+    
+    # パースできたレスポンスのみキャッシュする
+    if llm_cache and not from_cache:
         try:
-            # 直接JSONをパース
-            parsed_data = json.loads(response_text)
-            logger.info("JSONとして直接パースに成功")
-        except json.JSONDecodeError as e:
-            logger.warning(f"JSONパースエラー: {e}")
-            logger.warning("JSONパースに失敗、クリーニングと再パースを試みます")
-            
-            # JSON形式に変換するためのクリーニング
-            cleaned_text = response_text
-            
-            # シングルクォートをダブルクォートに変換
-            cleaned_text = re.sub(r"'([^']*)'(?=\s*:)", r'"\1"', cleaned_text)
-            
-            # 前後の余分なテキストを削除
-            cleaned_text = re.sub(r'^[^{]*', '', cleaned_text)  # 先頭の不要なテキスト
-            cleaned_text = re.sub(r'[^}]*$', '', cleaned_text)  # 末尾の不要なテキスト
-            
-            # JSONのキーと値を適切にフォーマット
-            # キーをダブルクォートで囲む
-            cleaned_text = re.sub(r'([{,])\s*([a-zA-Z0-9_\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FFF]+)\s*:', r'\1"\2":', cleaned_text)
-            
-            # エスケープされていないダブルクォートの処理
-            cleaned_text = re.sub(r':\s*"([^"]*)"(?=[,}])', r':"\1"', cleaned_text)
-            
-            logger.debug(f"クリーニング後のテキスト: {cleaned_text}")
-            
-            try:
-                parsed_data = json.loads(cleaned_text)
-                logger.info("クリーニング後のJSONパースに成功")
-            except json.JSONDecodeError as e2:
-                error_msg = f"クリーニング後もJSONパースに失敗: {e2}"
-                logger.error(error_msg)
-                
-                # 最終手段: 正規表現でキーと値のペアを抽出
-                try:
-                    # キーと値のペアを抽出
-                    pairs = re.findall(r'"([^"]+)"\s*:\s*"([^"]*)"', cleaned_text)
-                    if pairs:
-                        parsed_data = {k: v for k, v in pairs}
-                        logger.info("正規表現によるキーと値のペア抽出に成功")
-                    else:
-                        error_msg = "キーと値のペア抽出に失敗"
-                        logger.error(error_msg)
-                        raise RuntimeError(error_msg)
-                except Exception as e3:
-                    error_msg = f"正規表現によるパースに失敗: {e3}"
-                    logger.error(error_msg)
-                    raise RuntimeError(error_msg)
-        
-        # レスポンスデータのキーチェックと補完
-        result = {}
-        
-        # 英語キーで返ってきた場合は日本語キーにマッピング
-        if "name" in parsed_data:
-            # 英語キーでのレスポンス
-            reversed_mapping = {v: k for k, v in KEY_MAPPING.items()}
-            for eng_key, jp_key in reversed_mapping.items():
-                if eng_key in parsed_data:
-                    result[jp_key] = parsed_data[eng_key]
-        else:
-            # 日本語キーでのレスポンス
-            result = parsed_data
+            llm_cache.set(cache_key, response_text)
+        except Exception as e:
+            logger.warning(f"レスポンスのキャッシュ保存に失敗しました: {e}")
+    
+    return parsed
+
+def _merge_partial_result(rule_data: Dict[str, str], llm_data: Dict[str, Any],
+                          fields: List[str]) -> Dict[str, Any]:
+    """
+    ルールベースで確定した項目とGemini APIで抽出した未確定項目を合わせる
+    
+    Gemini APIのレスポンスは先に_build_resultで日本語キーに揃える（英語キーのレスポンスや、
+    「その他」にまとめる旧フィールド（FAX、メモなど）も扱うため）。
+    
+    Args:
+        rule_data (dict): ルールベースで抽出したデータ
+        llm_data (dict): Gemini APIで抽出したデータ（未確定項目と「その他」）
+        fields (list): Gemini APIで抽出した項目名
         
-        # 旧フィールド（フィールド1～フィールド5、メモ、フリガナ、会社名）をその他にまとめる
-        old_fields = ["メモ", "フリガナ","電話番号(予備)","メールアドレス(予備)","FAX"]
-        other_content = []
+    Returns:
+        dict: 合わせたデータ
+    """
+    llm_result = _build_result(llm_data)
+    merged = dict(rule_data)
+    for key in fields:
+        merged[key] = llm_result.get(key, "") or ""
+    other = [text for text in (rule_data.get("その他"), llm_result.get("その他")) if text]
+    merged["その他"] = " / ".join(dict.fromkeys(other))
+    return merged
+
+def _complete_full_result(llm_data: Dict[str, Any], rule_data: Dict[str, str],
+                          known_fields: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """
+    全項目をGemini APIで抽出した結果はそのまま使い、QRコードで確定した項目と、
+    ルールベース・QRコードの「その他」（FAX番号など）だけを合わせる
+    
+    Args:
+        llm_data (dict): Gemini APIで抽出したデータ
+        rule_data (dict): ルールベースで抽出したデータ（_apply_known_fields適用済み）
+        known_fields (dict): 確定済みの項目（QRコードから取得した値など）
         
-        for field in old_fields:
-            if field in parsed_data and parsed_data[field]:
-                if field == "メモ":
-                    other_content.append(f"{parsed_data[field]}")
-                else:
-                    other_content.append(f"{field}: {parsed_data[field]}")
+    Returns:
+        dict: 合わせたデータ
+    """
+    result = _build_result(llm_data)
+    for key, value in (known_fields or {}).items():
+        if value and key in rule_extractor.RULE_FIELDS:
+            result[key] = value
+    other = [text for text in (rule_data.get("その他"), result["その他"]) if text]
+    result["その他"] = " / ".join(dict.fromkeys(other))
+    return result
+
+def _apply_known_fields(rule_data: Dict[str, str], confidence: Dict[str, float],
+                        known_fields: Dict[str, str]) -> None:
+    """
+    QRコード（vCardなど）で確定した項目をルールベースの抽出結果に上書きし、確信度を1にする
+    （「その他」は追記する）
+    """
+    for key, value in known_fields.items():
+        if not value:
+            continue
+        if key == "その他":
+            rule_data["その他"] = " / ".join(text for text in (rule_data.get("その他"), value) if text)
+        elif key in rule_extractor.RULE_FIELDS:
+            rule_data[key] = value
+            confidence[key] = 1.0
+
+def parse_text(ocr_text: str, qr_text: Optional[str] = None, use_cache: bool = True,
+               priority: int = PRIORITY_INTERACTIVE, use_rules: Optional[bool] = None,
+               on_field: Optional[Callable[[str, str], None]] = None,
+               known_fields: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    OCRで抽出したテキストをパースしてデータを返す
+    
+    まずルールベースで項目を抽出し、すべての項目の確信度が閾値に達した場合は
+    Gemini APIを呼び出さずに返す。達しなかった項目がある場合は、その項目だけを
+    Gemini APIで抽出する。正規化後のプロンプトが同じ場合はキャッシュ済みのレスポンスを使用する。
+    
+    on_fieldを指定した場合はレスポンスをストリーミングで受信し、値が確定した項目から順に
+    on_field(項目名, 値) を呼び出す（レスポンス全体の修復処理はこれまでどおり最後に行う）。
+    
+    known_fieldsの項目（QRコードのvCardなどで確定した値）はルールベースの結果より優先し、
+    Gemini APIでは解析しない。
+    
+    Args:
+        ocr_text (str): OCRで抽出したテキスト
+        qr_text (Optional[str]): QRコードから抽出したテキスト（デフォルトはNone）
+        use_cache (bool): レスポンスキャッシュを使用するかどうか
+        priority (int): API呼び出しの優先度（一括処理ではPRIORITY_BATCHを指定）
+        use_rules (bool): ルールベース抽出を使用するかどうか（デフォルトはRULE_FAST_PATH_ENABLED）
+        on_field (Callable): 項目の値が確定するたびに呼び出すコールバック
+        known_fields (dict): 確定済みの項目（QRコードから取得した値など）
         
-        # すでに「その他」フィールドが存在する場合は、そのコンテンツも追加
-        if "その他" in parsed_data and parsed_data["その他"]:
-            other_content.append(parsed_data["その他"])
+    Returns:
+        dict: 抽出したデータ
+    """
+    logger.info("テキストの解析を開始")
+    use_rules = RULE_FAST_PATH_ENABLED if use_rules is None else use_rules
+    
+    normalized_text = build_prompt_text(ocr_text, qr_text)
+    
+    try:
+        unresolved = None
+        rule_data = None
+        if use_rules or known_fields:
+            if use_rules:
+                rule_data, confidence = rule_extractor.extract_fields(ocr_text, qr_text)
+            else:
+                rule_data, confidence = {key: "" for key in REQUIRED_KEYS}, {}
+            _apply_known_fields(rule_data, confidence, known_fields or {})
+            unresolved = rule_extractor.unresolved_fields(confidence, RULE_CONFIDENCE_THRESHOLD)
+            if not unresolved:
+                logger.info("ルールベース・QRコードで全項目を抽出したため、Gemini APIを呼び出さずに解析を完了")
+                result = _build_result(rule_data)
+                if on_field:
+                    _StreamingFieldEmitter(on_field).finish(result)
+                return result
+            logger.info(f"ルールベースで確定できなかった項目をGemini APIで解析します: {', '.join(unresolved)}")
         
-        # 「その他」フィールドを設定
-        if other_content:
-            result["その他"] = " / ".join(other_content)
+        # プロンプトの作成（未確定の項目がある場合はその項目だけを抽出する）
+        stream = None
+        if unresolved and len(unresolved) < len(rule_extractor.RULE_FIELDS):
+            known_data = {key: rule_data[key] for key in rule_extractor.RULE_FIELDS if key not in unresolved}
+            with metrics.span("prompt_build", step="partial"):
+                prompt = get_gemini_partial_prompt(normalized_text, unresolved, known_data)
+            if on_field:
+                # ルールベースで確定した項目は先に通知する
+                stream = _StreamingFieldEmitter(on_field, unresolved)
+                for key, value in known_data.items():
+                    stream.emit(key, value)
         else:
-            result["その他"] = ""
+            unresolved = None
+            with metrics.span("prompt_build", step="full"):
+                prompt = get_gemini_prompt(normalized_text)
+            if on_field:
+                stream = _StreamingFieldEmitter(on_field)
+        logger.debug(f"生成したプロンプト: {prompt[:100]}...")
         
-        # 必須キーの存在確認と欠損値の補完
-        for key in REQUIRED_KEYS:
-            if key not in result:
-                result[key] = ""
+        parsed_data = _generate_and_parse(
+            prompt,
+            lambda response_text: _parse_json_response(_extract_json_text(response_text)),
+            use_cache=use_cache,
+            priority=priority,
+            stream=stream
+        )
+        if unresolved:
+            parsed_data = _merge_partial_result(rule_data, parsed_data, unresolved)
+        elif rule_data is not None:
+            parsed_data = _complete_full_result(parsed_data, rule_data, known_fields)
+        
+        # レスポンスデータのキーチェックと補完
+        result = _build_result(parsed_data)
+        if stream:
+            stream.finish(result)
         
         logger.info("テキストの解析が完了")
         return result
@@ -315,6 +699,147 @@ def parse_text(ocr_text: str, qr_text: Optional[str] = None) -> Dict[str, str]:
         logger.exception(error_msg)
         raise RuntimeError(error_msg)
 
+def _parse_batch_response(response_text: str, card_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    複数名刺をまとめたリクエストのレスポンス（JSON配列）をパースし、検証を通った要素だけを返す
+    
+    Args:
+        response_text (str): Gemini APIのレスポンステキスト
+        card_ids (list): リクエストに含めた名刺ID
+        
+    Returns:
+        dict: 名刺ID -> パースしたデータ（card_idが不正・重複している要素は含めない）
+    """
+    text = response_text
+    if "```" in text:
+        code_block = re.search(r'```(?:json)?\s*(.*?)\s*```', text, re.DOTALL)
+        if code_block:
+            text = code_block.group(1).strip()
+    
+    # JSON配列としてパースし、失敗した場合は個々のオブジェクトを取り出してパースする
+    items = []
+    array_match = re.search(r'(\[.*\])', text, re.DOTALL)
+    try:
+        items = json.loads(array_match.group(1) if array_match else text)
+        if not isinstance(items, list):
+            items = [items]
+    except json.JSONDecodeError as e:
+        logger.warning(f"一括解析レスポンスのJSON配列パースに失敗、要素ごとのパースを試みます: {e}")
+        items = []
+        for object_text in re.findall(r'{[^{}]*}', text):
+            try:
+                items.append(_parse_json_response(object_text))
+            except RuntimeError:
+                continue
+    
+    if len(items) != len(card_ids):
+        logger.warning(f"一括解析レスポンスの件数が一致しません: {len(items)}件（期待値: {len(card_ids)}件）")
+    
+    expected = set(card_ids)
+    parsed = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            card_id = int(item.pop("card_id"))
+        except (KeyError, TypeError, ValueError):
+            logger.warning("card_idが不正な要素を無視しました")
+            continue
+        if card_id not in expected or card_id in parsed:
+            logger.warning(f"想定外または重複したcard_idの要素を無視しました: {card_id}")
+            continue
+        parsed[card_id] = item
+    
+    if not parsed:
+        raise RuntimeError("一括解析レスポンスから有効な要素を取得できませんでした")
+    return parsed
+
+def parse_texts_batch(cards: Sequence[Tuple[str, Optional[str]]], batch_size: Optional[int] = None,
+                      use_cache: bool = True, return_exceptions: bool = False,
+                      known_fields: Optional[Sequence[Optional[Dict[str, str]]]] = None) -> List[Any]:
+    """
+    複数の名刺テキストをまとめてGemini APIで解析する
+    
+    ルールベース・QRコードで全項目を確定できた名刺を除き、batch_size件ずつ1つのプロンプトに
+    まとめて送信し、JSON配列で結果を受け取る。
+    件数やcard_idの検証に失敗した名刺は、parse_textで1件ずつ解析し直す。
+    
+    Args:
+        cards (Sequence): (OCRテキスト, QRコードテキスト) のタプルのリスト
+        batch_size (int): 1リクエストにまとめる名刺の数（デフォルトはGEMINI_BATCH_SIZE）
+        use_cache (bool): レスポンスキャッシュを使用するかどうか
+        return_exceptions (bool): Trueの場合、解析に失敗した名刺は例外オブジェクトを結果に入れる
+                                  （Falseの場合は最初の失敗で例外を送出する）
+        known_fields (Sequence): 名刺ごとの確定済みの項目（cardsと同じ順序、QRコードから取得した値など）
+        
+    Returns:
+        list: 入力と同じ順序の解析結果のリスト
+    """
+    batch_size = batch_size or GEMINI_BATCH_SIZE
+    known_fields = list(known_fields) if known_fields is not None else [None] * len(cards)
+    if len(known_fields) != len(cards):
+        raise ValueError(f"known_fieldsの件数が名刺の件数と一致しません: {len(known_fields)} != {len(cards)}")
+    results: List[Any] = [None] * len(cards)
+    rule_results: Dict[int, Dict[str, str]] = {}
+    logger.info(f"{len(cards)}件の名刺の一括解析を開始（1リクエストあたり最大{batch_size}件）")
+    
+    # ルールベース・QRコードで全項目を確定できた名刺はGemini APIに送らない
+    pending = []
+    for index, (ocr_text, qr_text) in enumerate(cards):
+        if RULE_FAST_PATH_ENABLED or known_fields[index]:
+            if RULE_FAST_PATH_ENABLED:
+                rule_data, confidence = rule_extractor.extract_fields(ocr_text, qr_text)
+            else:
+                rule_data, confidence = {key: "" for key in REQUIRED_KEYS}, {}
+            _apply_known_fields(rule_data, confidence, known_fields[index] or {})
+            if not rule_extractor.unresolved_fields(confidence, RULE_CONFIDENCE_THRESHOLD):
+                results[index] = _build_result(rule_data)
+                continue
+            rule_results[index] = rule_data
+        pending.append(index)
+    if len(pending) < len(cards):
+        logger.info(f"ルールベース・QRコードで{len(cards) - len(pending)}件の名刺の解析を完了")
+    
+    for start in range(0, len(pending), batch_size):
+        chunk = pending[start:start + batch_size]
+        card_ids = list(range(len(chunk)))
+        
+        # 1件だけの場合は通常の解析と同じ
+        parsed: Dict[int, Dict[str, Any]] = {}
+        if len(chunk) > 1:
+            texts = [build_prompt_text(*cards[index]) for index in chunk]
+            with metrics.span("prompt_build", step="batch"):
+                prompt = get_gemini_batch_prompt(list(zip(card_ids, texts)))
+            try:
+                parsed = _generate_and_parse(
+                    prompt,
+                    lambda response_text: _parse_batch_response(response_text, card_ids),
+                    use_cache=use_cache,
+                    priority=PRIORITY_BATCH
+                )
+            except Exception as e:
+                logger.warning(f"一括解析に失敗したため、1件ずつ解析します: {e}")
+        
+        for card_id, index in zip(card_ids, chunk):
+            if card_id in parsed:
+                if index in rule_results:
+                    results[index] = _complete_full_result(parsed[card_id], rule_results[index], known_fields[index])
+                else:
+                    results[index] = _build_result(parsed[card_id])
+                continue
+            
+            # 一括解析で結果が得られなかった名刺は個別に解析する
+            try:
+                results[index] = parse_text(*cards[index], use_cache=use_cache, priority=PRIORITY_BATCH,
+                                            known_fields=known_fields[index])
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results[index] = e
+    
+    logger.info(f"{len(cards)}件の名刺の一括解析が完了")
+    return results
+
 def extract_contact_info(text):
     """
     テキストから連絡先情報を抽出する補助関数
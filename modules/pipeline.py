@@ -0,0 +1,631 @@
+"""
+名刺画像の処理パイプラインを提供するモジュール：
+- OCR → QRコード読み取り → Gemini APIによる構造化の一連の処理
+- 処理結果キャッシュの参照・保存
+- 複数の名刺を並行処理する非同期API（OCRとQRの同時実行、Gemini呼び出しの同時実行数制限）
+"""
+
+import time
+import asyncio
+import itertools
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from . import ocr, parser, qr_reader, qr_payload, cache, prompts, metrics, profiler
+from .image_source import CardImage, load_card_image
+from .rate_limiter import PRIORITY_INTERACTIVE, PRIORITY_BATCH
+from .constants import (
+    SAVE_IMAGES, PIPELINE_VERSION, OCR_MODE, GEMINI_MODEL, RESULT_CACHE_ENABLED,
+    PIPELINE_MAX_WORKERS, GEMINI_MAX_CONCURRENCY, RULE_FAST_PATH_ENABLED, RULE_CONFIDENCE_THRESHOLD,
+    IMAGE_NORMALIZE_ENABLED, IMAGE_TARGET_DPI, IMAGE_CARD_FILL, IMAGE_MAX_PIXELS, CARD_DETECT_ENABLED,
+    OCR_SCRIPT_DETECT_ENABLED
+)
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+# Gemini APIのクォータ超過時のメッセージ
+QUOTA_ERROR_MESSAGE = "Gemini APIのクォータ制限に達しました。しばらく待ってから再試行してください。"
+
+# 複数の名刺を並行処理する際に、読み込みを始めてよい名刺の数（ワーカー1つあたり）
+# （画像はファイル全体をメモリに読み込むため、処理中の名刺だけを読み込み、残りは処理が終わるたびに読み込む）
+IN_FLIGHT_PER_WORKER = 2
+
+# 複数の名刺をまとめてGemini APIで解析する場合に、最初の名刺が届いてから他の名刺を待つ最大の時間（秒）
+LLM_BATCH_WAIT = 0.5
+
+def get_pipeline_fingerprint() -> str:
+    """
+    処理結果に影響する設定（パイプラインのバージョン、画像の正規化・名刺の切り出し・OCRの設定、モデル名、プロンプト、
+    ルールベース抽出の設定）の識別子を返す
+
+    Returns:
+        str: 設定のハッシュ値
+    """
+    return cache.make_cache_key(
+        PIPELINE_VERSION,
+        IMAGE_NORMALIZE_ENABLED,
+        IMAGE_TARGET_DPI,
+        IMAGE_CARD_FILL,
+        IMAGE_MAX_PIXELS,
+        CARD_DETECT_ENABLED,
+        OCR_SCRIPT_DETECT_ENABLED,
+        OCR_MODE,
+        "|".join(ocr.OCR_CONFIGS),
+        GEMINI_MODEL,
+        prompts.get_gemini_prompt(""),
+        RULE_FAST_PATH_ENABLED,
+        RULE_CONFIDENCE_THRESHOLD
+    )
+
+def _new_result(image_path: str) -> Dict[str, Any]:
+    """
+    処理結果の辞書を初期化する
+    """
+    return {
+        "image_path": image_path,
+        "success": False,
+        "error": None,
+        "ocr_text": None,
+        "qr_text": None,
+        "qr_codes": [],
+        "data": None,
+        "cached": False,
+        "normalization": None,
+        "timings": {}
+    }
+
+def _load_image(image: Any) -> Tuple[Optional[CardImage], Optional[Dict[str, Any]]]:
+    """
+    名刺画像を読み込む（デコードはOCR・QRコード読み取りで最初に必要になった時点で1回だけ行う）
+
+    Returns:
+        tuple: (名刺画像またはNone, 読み込みに失敗した場合の処理結果またはNone)
+    """
+    try:
+        return load_card_image(image), None
+    except (OSError, TypeError) as e:
+        logger.error(f"画像の読み込みに失敗しました: {str(e)}")
+        result = _new_result(str(image))
+        result["error"] = "画像の読み込みに失敗しました"
+        return None, result
+
+def _lookup_cache(card: CardImage, use_cache: bool) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    処理結果キャッシュを参照する（キーは画像のバイト列から作成するため、ファイルは読み直さない）
+
+    Returns:
+        tuple: (キャッシュされていた処理結果またはNone, キャッシュキーまたはNone)
+    """
+    if not (use_cache and RESULT_CACHE_ENABLED and card.data):
+        return None, None
+    try:
+        result_cache = cache.get_result_cache()
+        cache_key = cache.make_cache_key(card.data, get_pipeline_fingerprint())
+        cached = result_cache.get(cache_key)
+        if cached is None:
+            return None, cache_key
+        logger.info(f"処理結果をキャッシュから取得しました: {result_cache.stats()}")
+        result = _new_result(card.name)
+        result.update({
+            "success": True,
+            "ocr_text": cached["ocr_text"],
+            "qr_text": cached["qr_text"],
+            "qr_codes": cached.get("qr_codes") or [],
+            "data": cached["structured_data"],
+            "cached": True
+        })
+        return result, cache_key
+    except Exception as e:
+        logger.warning(f"処理結果キャッシュを利用できません: {str(e)}")
+        return None, None
+
+def _store_cache(cache_key: Optional[str], result: Dict[str, Any]) -> None:
+    """
+    成功した処理結果をキャッシュに保存する（エラーは再試行できるようにキャッシュしない）
+    """
+    if cache_key is None or not result["success"]:
+        return
+    try:
+        cache.get_result_cache().set(cache_key, {
+            "ocr_text": result["ocr_text"],
+            "qr_text": result["qr_text"],
+            "qr_codes": result["qr_codes"],
+            "structured_data": result["data"]
+        })
+    except Exception as e:
+        logger.warning(f"処理結果のキャッシュ保存に失敗しました: {str(e)}")
+
+def _run_ocr_stage(card: CardImage, cancel_event: Optional[threading.Event] = None) -> Tuple[str, float]:
+    """
+    OCR処理を実行する（cancel_eventが設定されたら残りのOCRパスを実行しない）
+
+    Returns:
+        tuple: (OCRテキスト, 所要時間)
+    """
+    start = time.perf_counter()
+    ocr_text, _ = ocr.extract_text_from_image(card, save_processed_images=SAVE_IMAGES, cancel_event=cancel_event)
+    return ocr_text, time.perf_counter() - start
+
+def _run_qr_stage(card: CardImage, cancel_event: Optional[threading.Event] = None) -> Tuple[List[Dict[str, str]], float]:
+    """
+    QRコード読み取りを実行する（OCRと共有する派生画像を使用し、名刺の中の複数のQRコードをすべて読み取る。
+    cancel_eventが設定されたら残りの読み取りを行わない）
+
+    Returns:
+        tuple: (QRコードの内容と種類のリスト, 所要時間)
+    """
+    start = time.perf_counter()
+    qr_codes = qr_reader.read_qr_codes(card, cancel_event=cancel_event)
+    for qr_code in qr_codes:
+        logger.info(f"QRコード検出（{qr_code['type']}）: {qr_code['value'][:50]}...")
+
+        # sasaeai URLの特別処理
+        if qr_code["type"] == qr_payload.QR_TYPE_SASAEAI:
+            logger.info("sasaeai URLを検出しました")
+    return qr_codes, time.perf_counter() - start
+
+def _qr_text(qr_codes: List[Dict[str, str]]) -> Optional[str]:
+    """
+    QRコードの内容をGemini APIに渡すテキストにまとめる（QRコードがない場合はNone）
+    """
+    return qr_payload.combine_payload_text(qr_codes) or None
+
+def _run_llm_stage(ocr_text: str, qr_codes: List[Dict[str, str]], priority: int = PRIORITY_INTERACTIVE,
+                   on_field: Optional[Callable[[str, str], None]] = None) -> Tuple[Dict[str, str], float]:
+    """
+    Gemini APIでテキストを構造化する（QRコード情報も含め、vCardなどで確定した項目はGemini APIで解析しない）
+
+    Returns:
+        tuple: (構造化データ, 所要時間)
+    """
+    start = time.perf_counter()
+    structured_data = parser.parse_text(
+        ocr_text, _qr_text(qr_codes), priority=priority, on_field=on_field,
+        known_fields=qr_payload.fields_from_payloads(qr_codes)
+    )
+    return move_spare_contacts_to_other(structured_data), time.perf_counter() - start
+
+class _LLMBatcher:
+    """
+    Gemini APIでの解析を待つ名刺をまとめ、parser.parse_texts_batchで1リクエストにして送る
+
+    batch_size件集まった時点、または最初の名刺が届いてからLLM_BATCH_WAIT秒が過ぎた時点で送信する。
+    送信中のリクエストの数はsemaphoreで制限する。
+    """
+
+    def __init__(self, batch_size: int, executor: ThreadPoolExecutor, semaphore: asyncio.Semaphore):
+        self.batch_size = batch_size
+        self._executor = executor
+        self._semaphore = semaphore
+        self._waiting = []   # (OCRテキスト, QRコードテキスト), 確定済みの項目, 結果を受け取るFuture
+        self._timer = None
+        self._tasks = set()
+
+    async def parse(self, ocr_text: str, qr_text: Optional[str],
+                    known_fields: Optional[Dict[str, str]]) -> Dict[str, str]:
+        """
+        名刺1枚をまとめて送る名刺に加え、解析結果が得られるまで待つ
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiting.append(((ocr_text, qr_text), known_fields, future))
+        if len(self._waiting) >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(LLM_BATCH_WAIT, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # 待っている間にキャンセルされた名刺は送らない
+        waiting = [item for item in self._waiting if not item[2].cancelled()]
+        self._waiting = []
+        if waiting:
+            task = asyncio.ensure_future(self._send(waiting))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, waiting: List[Tuple[Tuple[str, Optional[str]], Optional[Dict[str, str]], asyncio.Future]]) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            async with self._semaphore:
+                results = await loop.run_in_executor(self._executor, functools.partial(
+                    parser.parse_texts_batch, [card for card, _, _ in waiting], batch_size=len(waiting),
+                    return_exceptions=True, known_fields=[fields for _, fields, _ in waiting]
+                ))
+        except Exception as e:
+            results = [e] * len(waiting)
+        for (_, _, future), result in zip(waiting, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def close(self) -> None:
+        """
+        送信前の名刺と送信中のリクエストを取り消す
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for _, _, future in self._waiting:
+            future.cancel()
+        self._waiting = []
+        for task in self._tasks:
+            task.cancel()
+
+async def _run_llm_stage_batched(batcher: _LLMBatcher, ocr_text: str, qr_codes: List[Dict[str, str]],
+                                 on_field: Optional[Callable[[str, str], None]] = None) -> Tuple[Dict[str, str], float]:
+    """
+    Gemini APIでテキストを構造化する（他の名刺とまとめて1リクエストで送るため、ストリーミングは行わず、
+    結果が揃ってから項目を通知する）
+
+    Returns:
+        tuple: (構造化データ, 所要時間（他の名刺を待つ時間を含む）)
+    """
+    start = time.perf_counter()
+    structured_data = await batcher.parse(ocr_text, _qr_text(qr_codes), qr_payload.fields_from_payloads(qr_codes))
+    structured_data = move_spare_contacts_to_other(structured_data)
+    if on_field:
+        for key, value in structured_data.items():
+            on_field(key, value)
+    return structured_data, time.perf_counter() - start
+
+def move_spare_contacts_to_other(structured_data: Dict[str, str]) -> Dict[str, str]:
+    """
+    予備メールアドレスと予備電話番号を「その他」に移動する
+
+    Args:
+        structured_data (dict): 構造化データ
+
+    Returns:
+        dict: 変換後の構造化データ
+    """
+    if structured_data:
+        other_info = []
+        if structured_data.get('メールアドレス（予備）'):
+            other_info.append(f"予備メールアドレス: {structured_data['メールアドレス（予備）']}")
+            del structured_data['メールアドレス（予備）']
+        if structured_data.get('電話番号（予備）'):
+            other_info.append(f"予備電話番号: {structured_data['電話番号（予備）']}")
+            del structured_data['電話番号（予備）']
+
+        if other_info:
+            if structured_data.get('その他'):
+                structured_data['その他'] += "\n" + "\n".join(other_info)
+            else:
+                structured_data['その他'] = "\n".join(other_info)
+    return structured_data
+
+def _record_metrics(result: Dict[str, Any]) -> None:
+    """
+    名刺1枚の処理結果（段階ごとの所要時間と成否）を計測結果に記録する
+    """
+    if not metrics.is_enabled():
+        return
+    status = "cached" if result["cached"] else "success" if result["success"] else "failed"
+    metrics.inc("cards_total", status=status)
+    for stage, elapsed in result["timings"].items():
+        metrics.observe("pipeline_stage_seconds", elapsed, stage=stage)
+    metrics.inc("qr_codes_total", len(result.get("qr_codes") or []))
+
+def _notify_cached_fields(result: Dict[str, Any], on_field: Optional[Callable[[str, str], None]]) -> None:
+    """
+    キャッシュから取得した処理結果の項目をまとめて通知する
+    """
+    if on_field and result.get("data"):
+        for key, value in result["data"].items():
+            on_field(key, value)
+
+def _is_ocr_error(ocr_text: str) -> bool:
+    """
+    OCR結果がエラーメッセージかどうかを判定する
+    """
+    return "エラー" in ocr_text or "失敗" in ocr_text
+
+def _api_error_message(error: Exception) -> str:
+    """
+    Gemini APIのエラーを利用者向けのメッセージに変換する
+    """
+    error_msg = str(error)
+    # APIクォータエラーの特別処理
+    if "429" in error_msg:
+        return QUOTA_ERROR_MESSAGE
+    return f"Gemini APIエラー: {error_msg}"
+
+def _image_name(image_path: Any) -> str:
+    """
+    プロファイルのIDに使う画像の名前を返す
+    """
+    if isinstance(image_path, str):
+        return image_path
+    return getattr(image_path, "name", "") or ""
+
+def process_card(image_path: Any, use_cache: bool = True, priority: int = PRIORITY_INTERACTIVE,
+                 on_field: Optional[Callable[[str, str], None]] = None,
+                 on_stage: Optional[Callable[[str], None]] = None,
+                 profile: bool = False) -> Dict[str, Any]:
+    """
+    名刺画像を処理してデータを抽出し、段階ごとの所要時間とともに返す
+
+    PROFILE_ENABLEDがtrueの場合、またはprofileを指定した場合は処理をプロファイルしてPROFILE_DIRに保存する。
+    profileを指定した場合は、実際の処理を計測するため処理結果キャッシュを使用しない。
+
+    Args:
+        image_path (str or CardImage): 処理する画像のパス、または名刺画像（バイト列・バッファも可）
+        use_cache (bool): 処理結果キャッシュを使用するかどうか
+        priority (int): Gemini API呼び出しの優先度
+        on_field (Callable): 項目の値が確定するたびに (項目名, 値) で呼び出すコールバック
+                             （指定した場合はGemini APIのレスポンスをストリーミングで受信する）
+        on_stage (Callable): 各段階（"ocr" / "qr" / "llm"）を始める前に段階名で呼び出すコールバック
+        profile (bool): この名刺の処理をプロファイルするかどうか
+
+    Returns:
+        dict: 処理結果（image_path, success, error, ocr_text, qr_text, qr_codes, data, cached, normalization, timings）
+    """
+    with profiler.profile_request(_image_name(image_path), requested=profile):
+        return _process_card(image_path, use_cache and not profile, priority, on_field, on_stage)
+
+def _process_card(image_path: Any, use_cache: bool, priority: int,
+                  on_field: Optional[Callable[[str, str], None]],
+                  on_stage: Optional[Callable[[str], None]]) -> Dict[str, Any]:
+    """
+    process_cardの本体（プロファイルの対象）
+    """
+    start = time.perf_counter()
+    card, failed = _load_image(image_path)
+    if failed is not None:
+        return failed
+    cached, cache_key = _lookup_cache(card, use_cache)
+    if cached is not None:
+        cached["timings"]["total"] = time.perf_counter() - start
+        _notify_cached_fields(cached, on_field)
+        _record_metrics(cached)
+        return cached
+
+    result = _new_result(card.name)
+    timings = result["timings"]
+    notify_stage = on_stage or (lambda stage: None)
+    try:
+        # OCR処理
+        notify_stage("ocr")
+        ocr_text, timings["ocr"] = _run_ocr_stage(card)
+        result["normalization"] = card.normalization
+
+        # OCRエラーチェック
+        if _is_ocr_error(ocr_text):
+            result["error"] = ocr_text
+            return result
+        result["ocr_text"] = ocr_text
+
+        # QRコード読み取り
+        notify_stage("qr")
+        result["qr_codes"], timings["qr"] = _run_qr_stage(card)
+        result["qr_text"] = _qr_text(result["qr_codes"])
+
+        # Gemini APIでテキスト構造化
+        try:
+            notify_stage("llm")
+            result["data"], timings["llm"] = _run_llm_stage(
+                result["ocr_text"], result["qr_codes"], priority, on_field
+            )
+            result["success"] = True
+        except Exception as api_err:
+            result["error"] = _api_error_message(api_err)
+    except Exception as e:
+        result.update({"error": f"処理中にエラーが発生しました: {str(e)}", "ocr_text": None, "qr_text": None, "qr_codes": []})
+    finally:
+        timings["total"] = time.perf_counter() - start
+        _record_metrics(result)
+
+    _store_cache(cache_key, result)
+    return result
+
+def process_image(image_path: Any, use_cache: bool = True,
+                  on_field: Optional[Callable[[str, str], None]] = None,
+                  profile: bool = False) -> Tuple[bool, Optional[str], Optional[str], Optional[str], Optional[Dict[str, str]]]:
+    """
+    画像を処理してデータを抽出する共通関数
+
+    同じ画像（バイト列が一致）と同じ設定の処理結果はキャッシュから返し、
+    OCR・QRコード読み取り・Gemini APIの呼び出しを省略する。
+
+    Args:
+        image_path: 処理する画像のパス、または名刺画像（バイト列・バッファも可）
+        use_cache (bool): 処理結果キャッシュを使用するかどうか
+        on_field (Callable): 項目の値が確定するたびに (項目名, 値) で呼び出すコールバック
+        profile (bool): この名刺の処理をプロファイルするかどうか（PROFILE_ENABLEDがtrueの場合は常にプロファイルする）
+
+    Returns:
+        tuple: (成功したかどうか, エラーメッセージ, 抽出テキスト, QRコードテキスト, 構造化データ)
+    """
+    result = process_card(image_path, use_cache=use_cache, on_field=on_field, profile=profile)
+    return result["success"], result["error"], result["ocr_text"], result["qr_text"], result["data"]
+
+async def process_card_async(image_path: Any, executor: Optional[ThreadPoolExecutor] = None,
+                             llm_executor: Optional[ThreadPoolExecutor] = None,
+                             llm_semaphore: Optional[asyncio.Semaphore] = None,
+                             use_cache: bool = True, priority: int = PRIORITY_BATCH,
+                             on_field: Optional[Callable[[str, str], None]] = None,
+                             profile: bool = False, llm_batcher: Optional[_LLMBatcher] = None,
+                             cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """
+    名刺画像を非同期に処理する
+
+    OCRとQRコード読み取りを同時に実行し、その後Gemini APIの呼び出しを
+    llm_semaphoreで同時実行数を制限しながら待機する（llm_batcherを指定した場合は他の名刺とまとめて解析する）。
+
+    処理がキャンセルされた場合、またはcancel_eventが設定された場合は、共有のスレッドプールに投入済みで
+    始まっていないOCRパス・QRコードの候補領域の読み取りを実行しない。
+
+    PROFILE_ENABLEDがtrueの場合、またはprofileを指定した場合はprocess_cardと同様にプロファイルする
+    （処理はワーカースレッドで行うため、cProfileは使わずにスタックの採取とメモリ使用量の記録だけを行う）。
+
+    Args:
+        image_path (str or CardImage): 処理する画像のパス、または名刺画像
+        executor (ThreadPoolExecutor): OCR・QRコード読み取りを実行するエグゼキュータ
+        llm_executor (ThreadPoolExecutor): Gemini API呼び出しを実行するエグゼキュータ
+        llm_semaphore (asyncio.Semaphore): Gemini API呼び出しの同時実行数を制限するセマフォ
+        use_cache (bool): 処理結果キャッシュを使用するかどうか
+        priority (int): Gemini API呼び出しの優先度
+        on_field (Callable): 項目の値が確定するたびに (項目名, 値) で呼び出すコールバック
+                             （Gemini API呼び出しのスレッドから呼ばれる）
+        profile (bool): この名刺の処理をプロファイルするかどうか
+        llm_batcher (_LLMBatcher): 複数の名刺をまとめてGemini APIで解析する場合のバッチャ（process_cards_asyncで使用）
+        cancel_event (threading.Event): OCR・QRコード読み取りの中止を要求するイベント（複数の名刺で共有できる）
+
+    Returns:
+        dict: 処理結果（process_cardと同じ形式）
+    """
+    with profiler.profile_request(_image_name(image_path), requested=profile, cprofile=False):
+        return await _process_card_async(image_path, executor, llm_executor, llm_semaphore,
+                                         use_cache and not profile, priority, on_field, llm_batcher, cancel_event)
+
+async def _process_card_async(image_path: Any, executor: Optional[ThreadPoolExecutor],
+                              llm_executor: Optional[ThreadPoolExecutor],
+                              llm_semaphore: Optional[asyncio.Semaphore], use_cache: bool, priority: int,
+                              on_field: Optional[Callable[[str, str], None]],
+                              llm_batcher: Optional[_LLMBatcher] = None,
+                              cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """
+    process_card_asyncの本体（プロファイルの対象）
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    card, failed = await loop.run_in_executor(executor, _load_image, image_path)
+    if failed is not None:
+        return failed
+    cached, cache_key = await loop.run_in_executor(executor, _lookup_cache, card, use_cache)
+    if cached is not None:
+        cached["timings"]["total"] = time.perf_counter() - start
+        _notify_cached_fields(cached, on_field)
+        _record_metrics(cached)
+        return cached
+
+    result = _new_result(card.name)
+    timings = result["timings"]
+    # この名刺の処理がキャンセルされたら、共有のスレッドプールに投入済みのOCR・QRコード読み取りも打ち切る
+    if cancel_event is None:
+        cancel_event = threading.Event()
+    try:
+        # OCRとQRコード読み取りを同時に実行（デコード済みの画像と派生画像は両者で共有）
+        try:
+            (ocr_text, timings["ocr"]), (qr_codes, timings["qr"]) = await asyncio.gather(
+                loop.run_in_executor(executor, _run_ocr_stage, card, cancel_event),
+                loop.run_in_executor(executor, _run_qr_stage, card, cancel_event)
+            )
+        except asyncio.CancelledError:
+            cancel_event.set()
+            raise
+        result["normalization"] = card.normalization
+        if _is_ocr_error(ocr_text):
+            result["error"] = ocr_text
+            return result
+        result["ocr_text"] = ocr_text
+        result["qr_codes"] = qr_codes
+        result["qr_text"] = _qr_text(qr_codes)
+
+        # Gemini APIでテキスト構造化（同時実行数を制限）
+        try:
+            if llm_batcher is not None:
+                result["data"], timings["llm"] = await _run_llm_stage_batched(llm_batcher, ocr_text, qr_codes, on_field)
+            elif llm_semaphore is None:
+                result["data"], timings["llm"] = await loop.run_in_executor(
+                    llm_executor, _run_llm_stage, ocr_text, qr_codes, priority, on_field
+                )
+            else:
+                async with llm_semaphore:
+                    result["data"], timings["llm"] = await loop.run_in_executor(
+                        llm_executor, _run_llm_stage, ocr_text, qr_codes, priority, on_field
+                    )
+            result["success"] = True
+        except Exception as api_err:
+            result["error"] = _api_error_message(api_err)
+    except Exception as e:
+        result.update({"error": f"処理中にエラーが発生しました: {str(e)}", "ocr_text": None, "qr_text": None, "qr_codes": []})
+    finally:
+        timings["total"] = time.perf_counter() - start
+        _record_metrics(result)
+
+    await loop.run_in_executor(executor, _store_cache, cache_key, result)
+    return result
+
+async def process_cards_async(image_paths: Iterable[str], max_workers: Optional[int] = None,
+                              max_llm_concurrency: Optional[int] = None, use_cache: bool = True,
+                              priority: int = PRIORITY_BATCH,
+                              on_field: Optional[Callable[[str, str, str], None]] = None,
+                              llm_batch_size: int = 1) -> AsyncIterator[Dict[str, Any]]:
+    """
+    複数の名刺画像を並行処理し、処理が終わった順に結果を返す
+
+    同時に処理する名刺はmax_workers×IN_FLIGHT_PER_WORKER件までとし、image_pathsからは
+    処理が終わった分だけ次の画像を取り出す（すべての画像を先に読み込まない）。
+
+    途中で反復をやめた場合（キャンセル・例外・breakなど）は、処理中の名刺のタスクを取り消し、
+    OCR・QRコード読み取りの共有スレッドプールに投入済みで始まっていないパスも実行しない
+    （実行中のTesseractのパスとGemini APIの呼び出しは止めずに、結果を捨てる）。
+
+    llm_batch_sizeが2以上の場合は、Gemini APIでの解析を待つ名刺を最大llm_batch_size件まとめて
+    1リクエストで送る（parser.parse_texts_batch）。まとめて送る名刺を集められるよう、
+    同時に処理する名刺の上限にllm_batch_size件を加える。
+
+    Args:
+        image_paths (Iterable[str]): 処理する画像のパス
+        max_workers (int): OCR・QRコード読み取りを同時に実行する最大数（デフォルトはPIPELINE_MAX_WORKERS）
+        max_llm_concurrency (int): Gemini APIの同時呼び出し数の上限（デフォルトはGEMINI_MAX_CONCURRENCY）
+        use_cache (bool): 処理結果キャッシュを使用するかどうか
+        priority (int): Gemini API呼び出しの優先度（デフォルトは一括処理）
+        on_field (Callable): 項目の値が確定するたびに (画像のパス, 項目名, 値) で呼び出すコールバック
+        llm_batch_size (int): 1リクエストにまとめる名刺の最大数（1の場合は名刺ごとに解析する）
+
+    Yields:
+        dict: 処理結果（process_cardと同じ形式、終わった順）
+    """
+    max_workers = max_workers or PIPELINE_MAX_WORKERS
+    max_llm_concurrency = max_llm_concurrency or GEMINI_MAX_CONCURRENCY
+    llm_semaphore = asyncio.Semaphore(max_llm_concurrency)
+    if llm_batch_size < 1:
+        raise ValueError(f"llm_batch_sizeは1以上を指定してください: {llm_batch_size}")
+    max_in_flight = max_workers * IN_FLIGHT_PER_WORKER + (llm_batch_size if llm_batch_size > 1 else 0)
+    pending_paths = iter(image_paths)
+    # タスクの取り消しはイベントループが次に動くまで届かず、その前にエグゼキュータの終了待ちで止まるため、
+    # 反復をやめた時点でOCR・QRコード読み取りに直接中止を伝える
+    cancel_event = threading.Event()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="card") as executor, \
+            ThreadPoolExecutor(max_workers=max_llm_concurrency, thread_name_prefix="gemini") as llm_executor:
+        llm_batcher = _LLMBatcher(llm_batch_size, llm_executor, llm_semaphore) if llm_batch_size > 1 else None
+
+        def start_cards(count: int) -> List[asyncio.Future]:
+            return [
+                asyncio.ensure_future(process_card_async(
+                    image_path, executor=executor, llm_executor=llm_executor,
+                    llm_semaphore=llm_semaphore, use_cache=use_cache, priority=priority,
+                    on_field=functools.partial(on_field, image_path) if on_field else None,
+                    llm_batcher=llm_batcher, cancel_event=cancel_event
+                ))
+                for image_path in itertools.islice(pending_paths, count)
+            ]
+
+        # 処理中の名刺をmax_in_flight件までに抑え、終わった分だけ次の名刺を読み込む
+        in_flight = set(start_cards(max_in_flight))
+        try:
+            while in_flight:
+                finished, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                in_flight |= set(start_cards(len(finished)))
+                for task in finished:
+                    yield task.result()
+        finally:
+            cancel_event.set()
+            for task in in_flight:
+                task.cancel()
+            if llm_batcher is not None:
+                llm_batcher.close()
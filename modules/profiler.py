@@ -0,0 +1,320 @@
+"""
+名刺1枚ごとの処理をプロファイルするモジュール（処理が極端に遅い名刺の調査用）：
+- cProfileで処理を呼び出したスレッドの関数ごとの所要時間を記録する（.pstats、非同期処理では記録しない）
+- 一定間隔で全スレッドのスタックを採取し、フレームグラフ用のcollapsed形式で保存する（.collapsed）
+- tracemallocで処理中のメモリ使用量のピークを記録する（.json に概要と一緒に保存）
+  （ピークはプロセス全体の値のため、他の名刺のプロファイルと期間が重なった場合は記録せずnullにする）
+- 保存先には処理時間の長い順にPROFILE_KEEP件だけを残す
+
+PROFILE_ENABLEDがtrueの場合はすべての名刺を、falseの場合（デフォルト）は
+要求されたもの（画面のURLに ?profile=1 を付けた場合など）だけをプロファイルする。
+
+collapsed形式はFlameGraph（flamegraph.pl）やspeedscopeでそのまま表示できる:
+    flamegraph.pl profiles/<ID>.collapsed > flame.svg
+"""
+
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+import contextlib
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .diagnostics import new_request_id
+from .constants import PROFILE_ENABLED, PROFILE_DIR, PROFILE_KEEP
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+# スタックを採取する間隔（秒）
+SAMPLE_INTERVAL = 0.005
+# 概要に記録する関数の数（関数内の所要時間の長い順）
+TOP_FUNCTIONS = 20
+
+# このパッケージのディレクトリ（処理中のワーカースレッドの判定に使用）
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# tracemallocはプロセス全体で1つのため、同時にプロファイルしている処理の数で開始・停止を管理する
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_started = False
+# これまでに開始したプロファイルの数（期間が他のプロファイルと重なったかどうかの判定に使う）
+_tracemalloc_sessions = 0
+
+def _start_tracemalloc() -> Tuple[int, bool]:
+    """
+    メモリ使用量の記録を開始する
+
+    Returns:
+        tuple: (開始時点のプロファイルの通し番号, 他のプロファイルが実行中だったかどうか)
+    """
+    global _tracemalloc_users, _tracemalloc_started, _tracemalloc_sessions
+    with _tracemalloc_lock:
+        overlapped = _tracemalloc_users > 0
+        if not overlapped:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracemalloc_started = True
+            tracemalloc.reset_peak()
+        _tracemalloc_users += 1
+        _tracemalloc_sessions += 1
+        return _tracemalloc_sessions, overlapped
+
+def _stop_tracemalloc(session: Tuple[int, bool]) -> Optional[int]:
+    """
+    メモリ使用量のピーク（バイト）を返し、最後の利用者であればtracemallocを停止する
+
+    ピークはプロセス全体の値のため、期間中に他のプロファイルが実行されていた場合は
+    その処理の確保分と区別できないためNoneを返す。
+
+    Args:
+        session (tuple): _start_tracemallocの戻り値
+    """
+    global _tracemalloc_users, _tracemalloc_started
+    started_at, overlapped = session
+    with _tracemalloc_lock:
+        peak = tracemalloc.get_traced_memory()[1]
+        overlapped = overlapped or _tracemalloc_sessions != started_at
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_started:
+            tracemalloc.stop()
+            _tracemalloc_started = False
+    return None if overlapped else peak
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+class StackSampler:
+    """
+    バックグラウンドのスレッドで一定間隔ごとにスタックを採取し、collapsed形式で集計する
+
+    処理を呼び出したスレッドと、このパッケージのコードを実行中のスレッド（OCRやQRコード読み取りの
+    ワーカースレッド）を採取する。同時に他の名刺を処理している場合は、そのワーカースレッドも含まれる。
+    """
+
+    def __init__(self, target_thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.target_thread_id = target_thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                in_package = thread_id == self.target_thread_id
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    in_package = in_package or frame.f_code.co_filename.startswith(_PACKAGE_DIR)
+                    frame = frame.f_back
+                if in_package:
+                    stack.append(names.get(thread_id, str(thread_id)))
+                    self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """
+        採取したスタックをcollapsed形式（「スレッド名;関数;関数 回数」の行）で返す
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.samples.items()))
+
+def _top_functions(profile: cProfile.Profile, limit: int = TOP_FUNCTIONS) -> List[Dict[str, Any]]:
+    """
+    関数内の所要時間（呼び出し先を除く）の長い順に関数を返す
+    """
+    stats = pstats.Stats(profile).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [
+        {
+            "function": f"{os.path.basename(filename)}:{line}({name})",
+            "calls": calls,
+            "self_seconds": round(self_time, 6),
+            "cumulative_seconds": round(cumulative, 6),
+        }
+        for (filename, line, name), (_, calls, self_time, cumulative, _) in rows
+    ]
+
+class RequestProfiler:
+    """
+    名刺1枚ごとのプロファイルを保存し、処理時間の長いものだけを残す
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP,
+                 interval: float = SAMPLE_INTERVAL):
+        """
+        Args:
+            directory (str): 保存先ディレクトリ
+            keep (int): 残すプロファイルの数（処理時間の長い順）
+            interval (float): スタックを採取する間隔（秒）
+        """
+        self.directory = directory
+        self.keep = keep
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._kept: Optional[List[Tuple[float, str]]] = None
+
+    @contextlib.contextmanager
+    def profile(self, name: str = "", cprofile: bool = True) -> Iterator[str]:
+        """
+        with文で囲んだ処理をプロファイルし、終了時に保存する（処理が例外で終わった場合も保存する）
+
+        cProfileを使えない場合（Python 3.12以降で他の処理をcProfileでプロファイル中の場合など）は、
+        スタックの採取とメモリ使用量の記録だけを行う。
+
+        Args:
+            name (str): 画像のファイル名など（IDと概要に使用）
+            cprofile (bool): cProfileで関数ごとの所要時間を記録するかどうか
+                             （処理がイベントループ上の非同期処理の場合はFalseを指定する）
+
+        Yields:
+            str: プロファイルのID（保存するファイル名に使用）
+        """
+        request_id = new_request_id(name)
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        profile = cProfile.Profile() if cprofile else None
+        memory_session = _start_tracemalloc()
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            if profile is not None:
+                try:
+                    profile.enable()
+                except ValueError as e:
+                    logger.warning(f"cProfileを使えないため、スタックの採取だけを行います: {str(e)}")
+                    profile = None
+            yield request_id
+        finally:
+            if profile is not None:
+                profile.disable()
+            elapsed = time.perf_counter() - start
+            sampler.stop()
+            peak_memory = _stop_tracemalloc(memory_session)
+            summary = {
+                "request_id": request_id,
+                "name": name,
+                "elapsed_seconds": round(elapsed, 6),
+                # 他の名刺のプロファイルと期間が重なった場合はNone（プロセス全体のピークのため）
+                "peak_memory_bytes": peak_memory,
+                "samples": sum(sampler.samples.values()),
+                "cprofile": profile is not None,
+                "top_functions": _top_functions(profile) if profile is not None else [],
+            }
+            try:
+                self._save(summary, profile, sampler)
+            except Exception as e:
+                logger.warning(f"プロファイルの保存に失敗しました: {str(e)}")
+
+    def kept(self) -> List[Tuple[float, str]]:
+        """
+        保存しているプロファイルの (処理時間, ID) のリストを処理時間の長い順に返す
+        """
+        with self._lock:
+            return sorted(self._load_kept(), reverse=True)
+
+    def _load_kept(self) -> List[Tuple[float, str]]:
+        """
+        保存先に残っているプロファイルの概要を読み込む（再起動後も処理時間の長いものを残すため）
+        """
+        if self._kept is None:
+            self._kept = []
+            if os.path.isdir(self.directory):
+                for filename in os.listdir(self.directory):
+                    if not filename.endswith(".json"):
+                        continue
+                    try:
+                        with open(os.path.join(self.directory, filename), encoding="utf-8") as f:
+                            summary = json.load(f)
+                        self._kept.append((float(summary["elapsed_seconds"]), summary["request_id"]))
+                    except (OSError, ValueError, KeyError) as e:
+                        logger.warning(f"プロファイルの概要を読み込めませんでした: {filename}: {str(e)}")
+        return self._kept
+
+    def _paths(self, request_id: str) -> Dict[str, str]:
+        return {
+            suffix: os.path.join(self.directory, f"{request_id}.{suffix}")
+            for suffix in ("json", "pstats", "collapsed")
+        }
+
+    def _save(self, summary: Dict[str, Any], profile: Optional[cProfile.Profile], sampler: StackSampler) -> None:
+        """
+        プロファイルを保存し、処理時間の短いものから削除してkeep件に収める（cProfileを使わなかった場合は.pstatsを保存しない）
+        """
+        elapsed, request_id = summary["elapsed_seconds"], summary["request_id"]
+        with self._lock:
+            kept = self._load_kept()
+            if len(kept) >= self.keep and elapsed <= min(kept)[0]:
+                logger.info(f"プロファイルを保存しません（保存済みの{self.keep}件より短い処理時間）: {elapsed:.2f}秒")
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            paths = self._paths(request_id)
+            if profile is not None:
+                profile.dump_stats(paths["pstats"])
+            with open(paths["collapsed"], "w", encoding="utf-8") as f:
+                f.write(sampler.collapsed())
+            # 概要は最後に書き込む（概要のあるプロファイルだけを保存済みとして扱う）
+            with open(paths["json"], "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            kept.append((elapsed, request_id))
+            kept.sort(reverse=True)
+            while len(kept) > self.keep:
+                _, evicted = kept.pop()
+                for path in self._paths(evicted).values():
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(path)
+        peak_memory = summary["peak_memory_bytes"]
+        memory = f"{peak_memory / 1024 / 1024:.1f}MB" if peak_memory is not None else "他の処理と重なったため記録なし"
+        logger.info(f"プロファイルを保存しました: {paths['json']}（{elapsed:.2f}秒, メモリのピーク {memory}）")
+
+_shared_profiler = None
+_shared_profiler_lock = threading.Lock()
+
+def get_request_profiler() -> RequestProfiler:
+    """
+    プロセス内で共有するプロファイラを取得する
+
+    Returns:
+        RequestProfiler: プロファイラ
+    """
+    global _shared_profiler
+    with _shared_profiler_lock:
+        if _shared_profiler is None:
+            _shared_profiler = RequestProfiler()
+        return _shared_profiler
+
+def profile_request(name: str = "", requested: bool = False, cprofile: bool = True):
+    """
+    PROFILE_ENABLEDがtrueの場合、または要求された場合に処理をプロファイルする
+
+    例:
+        with profiler.profile_request("card.jpg", requested=True):
+            ...
+
+    Args:
+        name (str): 画像のファイル名など
+        requested (bool): この処理のプロファイルが要求されたかどうか
+        cprofile (bool): cProfileで関数ごとの所要時間を記録するかどうか
+
+    Returns:
+        with文で使うコンテキストマネージャ（プロファイルしない場合は何もしない）
+    """
+    if not (PROFILE_ENABLED or requested):
+        return contextlib.nullcontext()
+    return get_request_profiler().profile(name, cprofile=cprofile)
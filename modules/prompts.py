@@ -60,4 +60,96 @@ OCRで抽出された以下のテキストから、人物情報を抽出して
 ###OCRテキスト###
 {ocr_text}
 """
-    return prompt 
\ No newline at end of file
+    return prompt 
+
+def get_gemini_batch_prompt(cards):
+    """
+    複数の名刺のOCR抽出テキストをまとめて解析するGemini APIへのプロンプトを生成する
+    
+    Args:
+        cards (list): (名刺ID, OCRテキスト) のタプルのリスト
+        
+    Returns:
+        str: Gemini APIへのプロンプト
+    """
+    card_sections = ""
+    for card_id, ocr_text in cards:
+        card_sections += f"=== CARD {card_id} ===\n{ocr_text}\n=== END CARD {card_id} ===\n\n"
+    
+    prompt = f"""
+あなたは名刺（ビジネスカード）の情報を抽出する専門アシスタントです。
+OCRで抽出された以下の{len(cards)}枚の名刺のテキストから、名刺ごとに人物情報を抽出してください。
+各名刺のテキストは「=== CARD 番号 ===」から「=== END CARD 番号 ===」までです。
+
+###抽出するべき情報###
+名刺ごとに以下の情報を抽出してください：
+card_id, {', '.join(REQUIRED_KEYS)}
+
+###JSON出力形式###
+名刺ごとに1つのJSONオブジェクトを作成し、入力と同じ順序のJSON配列として出力してください：
+```
+[{{"card_id": 0, "名前": "山田太郎", "会社名": "株式会社サンプル", "職業": "営業部長", "メールアドレス": "yamada@example.com", "電話番号": "03-1234-5678", "郵便番号": "100-0001", "住所": "東京都千代田区丸の内1-1-1", "HP URL": "https://www.example.com", "sasaeai URL": "", "その他": "備考情報等"}}]
+```
+
+###重要###
+- 必ず完全に有効なJSON配列で出力してください。
+- 配列の要素数は名刺の枚数（{len(cards)}件）と必ず一致させてください。
+- "card_id"には区切り行「=== CARD 番号 ===」の番号を数値で入れてください。
+- 異なる名刺の情報を混ぜないでください。
+- 配列の前後に余分なテキスト、説明、マークダウンなどを含めないでください。
+- キーの名前は上記の通り正確に使用してください。
+- 抽出できない情報は空文字列""としてください。
+- 日本語でも英語でも出力できますが、キー名は日本語で上記の通りにしてください。
+- sasaeai URLは "https://sasaeai.link-platform.jp/" を含むURLです。
+- その他の備考情報やメモ等はすべて「その他」フィールドにまとめてください。
+- 予備のメールアドレスや電話番号、FAX、QRコード情報(sasaeai URLを除く)等が見つかった場合は「その他」フィールドに含めてください。
+
+###OCRテキスト###
+{card_sections}"""
+    return prompt
+
+def get_gemini_partial_prompt(ocr_text, fields, known_data):
+    """
+    ルールベースで確定できなかった項目だけを抽出するGemini APIへのプロンプトを生成する
+    
+    Args:
+        ocr_text (str): OCRで抽出したテキスト
+        fields (list): 抽出する項目名のリスト
+        known_data (dict): ルールベースで確定した項目（項目名 -> 値）
+        
+    Returns:
+        str: Gemini APIへのプロンプト
+    """
+    output_keys = list(fields) + ["その他"]
+    example = ", ".join(f'"{key}": ""' for key in output_keys)
+    known_lines = "\n".join(f"- {key}: {value}" for key, value in known_data.items() if value)
+    
+    prompt = f"""
+あなたは名刺（ビジネスカード）の情報を抽出する専門アシスタントです。
+OCRで抽出された以下のテキストから、指定した項目だけを抽出してください。
+
+###抽出するべき情報###
+{', '.join(output_keys)}
+
+###確定済みの情報（抽出不要）###
+{known_lines or "なし"}
+
+###JSON出力形式###
+以下のキーと完全に一致する1行のJSON形式で出力してください：
+```
+{{{example}}}
+```
+
+###重要###
+- 必ず完全に有効なJSON形式で出力してください。
+- オブジェクトの前後に余分なテキスト、説明、マークダウンなどを含めないでください。
+- 上記のキー以外は出力しないでください。
+- 抽出できない情報は空文字列""としてください。
+- 確定済みの情報と同じ内容を他の項目に入れないでください。
+- sasaeai URLは "https://sasaeai.link-platform.jp/" を含むURLです。
+- その他の備考情報やメモ等はすべて「その他」フィールドにまとめてください。
+
+###OCRテキスト###
+{ocr_text}
+"""
+    return prompt
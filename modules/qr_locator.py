@@ -0,0 +1,169 @@
+"""
+名刺画像の中からQRコードがありそうな領域を探すモジュール：
+- 縮小したグレースケール画像でQRコードの検出（ファインダーパターンの位置検出）を行う
+- 検出できない場合は、白黒が細かく入れ替わる正方形に近い領域をQRコードの候補とする
+- 候補の矩形を元の画像の座標に戻し、周囲の余白（クワイエットゾーン）を含めて返す
+
+ノイズ除去や拡大などの重い処理は、呼び出し側で候補の領域だけに行う。
+"""
+
+import logging
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+# 位置検出に使う縮小画像の長辺（ピクセル）
+LOCATE_LONG_SIDE = 640
+# 候補の領域の周囲に加える余白（領域の一辺に対する割合）
+REGION_MARGIN = 0.15
+# 模様から探す候補の最小の一辺（縮小画像のピクセル）
+MIN_CANDIDATE_SIDE = 20
+# 模様から探す候補とみなす縦横比の上限（長辺 / 短辺）
+MAX_CANDIDATE_ASPECT = 1.5
+# 模様から探す候補とみなす、外接矩形に対する塊の充填率の下限
+MIN_CANDIDATE_FILL = 0.6
+# 模様から探す候補の最大数（面積の大きい順）
+MAX_CANDIDATES = 3
+
+def downscale(gray: np.ndarray, long_side: int = LOCATE_LONG_SIDE) -> Tuple[np.ndarray, float]:
+    """
+    画像の長辺がlong_side以下になるよう縮小する（小さい画像はそのまま）
+
+    Args:
+        gray (numpy.ndarray): グレースケール画像
+        long_side (int): 縮小後の長辺（ピクセル）
+
+    Returns:
+        tuple: (縮小画像, 縮小率)
+    """
+    scale = min(1.0, long_side / max(gray.shape[:2]))
+    if scale >= 1.0:
+        return gray, 1.0
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA), scale
+
+def _detected_boxes(detector: cv2.QRCodeDetector, small: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """
+    QRコード検出器でファインダーパターンから求めたQRコードの外接矩形を返す
+    """
+    try:
+        found, points = detector.detectMulti(small)
+    except cv2.error:
+        found, points = False, None
+    if not found or points is None:
+        return []
+    return [cv2.boundingRect(np.asarray(quad, dtype=np.float32).reshape(-1, 1, 2)) for quad in points]
+
+def _texture_boxes(small: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """
+    白黒が細かく入れ替わる正方形に近い領域（QRコードらしい模様）の外接矩形を面積の大きい順に返す
+
+    文字の行は横長の塊になるため、縦横比で除外される。
+    """
+    gradient = cv2.morphologyEx(small, cv2.MORPH_GRADIENT, np.ones((3, 3), np.uint8))
+    _, edges = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    kernel_size = max(3, min(small.shape[:2]) // 60)
+    blobs = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, np.ones((kernel_size, kernel_size), np.uint8))
+    contours, _ = cv2.findContours(blobs, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    boxes = []
+    for contour in sorted(contours, key=cv2.contourArea, reverse=True):
+        x, y, w, h = cv2.boundingRect(contour)
+        if min(w, h) < MIN_CANDIDATE_SIDE:
+            continue
+        if max(w, h) / min(w, h) > MAX_CANDIDATE_ASPECT:
+            continue
+        if cv2.contourArea(contour) / (w * h) < MIN_CANDIDATE_FILL:
+            continue
+        boxes.append((x, y, w, h))
+        if len(boxes) >= MAX_CANDIDATES:
+            break
+    return boxes
+
+def _to_full_resolution(box: Tuple[int, int, int, int], scale: float,
+                        shape: Tuple[int, ...]) -> Tuple[int, int, int, int]:
+    """
+    縮小画像の矩形を元の画像の座標に戻し、余白を加えて画像の範囲に収める
+    """
+    x, y, w, h = (value / scale for value in box)
+    margin = max(w, h) * REGION_MARGIN
+    left, top = max(0, int(x - margin)), max(0, int(y - margin))
+    right = min(shape[1], int(np.ceil(x + w + margin)))
+    bottom = min(shape[0], int(np.ceil(y + h + margin)))
+    return left, top, right - left, bottom - top
+
+def quad_region(quad: np.ndarray, scale: float, shape: Tuple[int, ...]) -> Tuple[int, int, int, int]:
+    """
+    縮小画像で検出したQRコードの4つの角を、元の画像の座標の矩形（余白付き）に変換する
+
+    Args:
+        quad (numpy.ndarray): QRコードの4つの角（縮小画像の座標）
+        scale (float): 縮小率
+        shape (tuple): 元の画像の形状
+
+    Returns:
+        tuple: (x, y, 幅, 高さ)
+    """
+    box = cv2.boundingRect(np.asarray(quad, dtype=np.float32).reshape(-1, 1, 2))
+    return _to_full_resolution(box, scale, shape)
+
+def texture_regions(gray: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """
+    縮小画像でQRコードらしい模様の領域を探す（QRコード検出器が見落としたQRコードの候補）
+
+    Args:
+        gray (numpy.ndarray): グレースケール画像
+
+    Returns:
+        list: 元の画像の座標での候補の矩形 (x, y, 幅, 高さ) のリスト（面積の大きい順）
+    """
+    small, scale = downscale(gray)
+    return [_to_full_resolution(box, scale, gray.shape) for box in _texture_boxes(small)]
+
+def contains_center(outer: Tuple[int, int, int, int], inner: Tuple[int, int, int, int]) -> bool:
+    """
+    innerの矩形の中心がouterの矩形に含まれるかどうか（同じQRコードの候補かどうかの判定に使う）
+    """
+    x, y, w, h = outer
+    center_x, center_y = inner[0] + inner[2] / 2, inner[1] + inner[3] / 2
+    return x <= center_x <= x + w and y <= center_y <= y + h
+
+def locate_qr_regions(gray: np.ndarray,
+                      detector: Optional[cv2.QRCodeDetector] = None) -> List[Tuple[int, int, int, int]]:
+    """
+    縮小画像でQRコードがありそうな領域を探す
+
+    Args:
+        gray (numpy.ndarray): グレースケール画像
+        detector (cv2.QRCodeDetector): 使用するQRコード検出器（省略時は新しく作成）
+
+    Returns:
+        list: 元の画像の座標での候補の矩形 (x, y, 幅, 高さ) のリスト（有望な順）
+    """
+    detector = detector or cv2.QRCodeDetector()
+    small, scale = downscale(gray)
+    boxes = _detected_boxes(detector, small)
+    source = "ファインダーパターン"
+    if not boxes:
+        boxes = _texture_boxes(small)
+        source = "模様"
+    regions = [_to_full_resolution(box, scale, gray.shape) for box in boxes]
+    logger.info(f"QRコードの候補領域を{len(regions)}個検出しました（{source}）: {regions}")
+    return regions
+
+def crop_region(gray: np.ndarray, region: Tuple[int, int, int, int]) -> np.ndarray:
+    """
+    候補の領域を切り出す
+
+    Args:
+        gray (numpy.ndarray): グレースケール画像
+        region (tuple): (x, y, 幅, 高さ)
+
+    Returns:
+        numpy.ndarray: 切り出した画像
+    """
+    x, y, w, h = region
+    return gray[y:y + h, x:x + w]
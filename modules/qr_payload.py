@@ -0,0 +1,237 @@
+"""
+QRコードの内容（ペイロード）を分類し、名刺の項目に変換するモジュール：
+- 種類の判定（sasaeai URL / URL / vCard / MECARD / テキスト）
+- vCard・MECARDの連絡先を名刺の項目（名前・会社名・電話番号など）に変換する
+- 複数のQRコードの内容を重複なくまとめ、Gemini APIに渡すテキストと確定済みの項目を作成する
+
+QRコードで確定した項目はGemini APIで解析しない。
+"""
+
+import re
+import logging
+from typing import Any, Dict, Iterable, List
+
+from .constants import REQUIRED_KEYS
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+# QRコードの内容の種類
+QR_TYPE_SASAEAI = "sasaeai"
+QR_TYPE_URL = "url"
+QR_TYPE_VCARD = "vcard"
+QR_TYPE_MECARD = "mecard"
+QR_TYPE_TEXT = "text"
+
+# ささえあいのURL（sasaeai.com・sasaeai.link-platform.jp など、ホスト名に sasaeai を含むもの）
+_SASAEAI_PATTERN = re.compile(r'https?://[^/?#\s]*sasaeai[^/?#\s]*(?:[/?#].*)?$', re.IGNORECASE)
+_URL_PATTERN = re.compile(r'(?:https?://|www\.)\S+$', re.IGNORECASE)
+_POSTAL_PATTERN = re.compile(r'^〒?\s*(\d{3})\s*[-ー−]?\s*(\d{4})$')
+
+def classify_payload(text: str) -> str:
+    """
+    QRコードの内容の種類を判定する
+
+    Args:
+        text (str): QRコードの内容
+
+    Returns:
+        str: "sasaeai" / "url" / "vcard" / "mecard" / "text"
+    """
+    stripped = text.strip()
+    upper = stripped.upper()
+    if upper.startswith("BEGIN:VCARD"):
+        return QR_TYPE_VCARD
+    if upper.startswith("MECARD:"):
+        return QR_TYPE_MECARD
+    if _SASAEAI_PATTERN.match(stripped):
+        return QR_TYPE_SASAEAI
+    if _URL_PATTERN.match(stripped):
+        return QR_TYPE_URL
+    return QR_TYPE_TEXT
+
+def classify_payloads(values: Iterable[str]) -> List[Dict[str, str]]:
+    """
+    QRコードの内容の重複を除き、種類を付ける
+
+    Args:
+        values (Iterable[str]): 読み取ったQRコードの内容（読み取った順）
+
+    Returns:
+        list: {"type": 種類, "value": 内容} のリスト（最初に読み取った順）
+    """
+    unique = dict.fromkeys(value.strip() for value in values if value and value.strip())
+    return [{"type": classify_payload(value), "value": value} for value in unique]
+
+def _unescape(text: str) -> str:
+    """
+    バックスラッシュのエスケープ（\\, \\; \\: \\n など）を戻す
+    """
+    return re.sub(r'\\(.)', lambda m: "\n" if m.group(1) in "nN" else m.group(1), text)
+
+def _split_unescaped(text: str, separator: str) -> List[str]:
+    """
+    バックスラッシュでエスケープされていない区切り文字で分割し、エスケープを戻す
+    """
+    return [_unescape(part) for part in re.split(r'(?<!\\)' + re.escape(separator), text)]
+
+def _format_postal(postal: str) -> str:
+    """
+    郵便番号を「123-4567」の形式にそろえる
+    """
+    match = _POSTAL_PATTERN.match(postal.strip())
+    return f"{match.group(1)}-{match.group(2)}" if match else postal.strip()
+
+def _address_fields(components: List[str]) -> Dict[str, str]:
+    """
+    住所の構成要素（私書箱;拡張住所;番地;市区町村;都道府県;郵便番号;国）を郵便番号と住所に変換する
+    """
+    components = components + [""] * (7 - len(components))
+    _, extended, street, locality, region, postal, _ = components[:7]
+    # 日本の住所の順（都道府県・市区町村・番地）に並べる
+    address = "".join(part.strip() for part in (region, locality, street, extended) if part.strip())
+    return {"郵便番号": _format_postal(postal), "住所": address}
+
+def _join_name(components: List[str]) -> str:
+    """
+    姓・名の構成要素を名前にする（漢字・かなの名前は空白を入れない）
+    """
+    parts = [part.strip() for part in components[:2] if part.strip()]
+    separator = "" if all(re.fullmatch(r'[^\x00-\x7F]+', part) for part in parts) else " "
+    return separator.join(parts)
+
+def _contact_fields(entries: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    (項目, 種別, 値) の一覧を名刺の項目に変換する（2件目以降のメール・電話番号とFAXは「その他」にまとめる）
+    """
+    data = {}
+    other = []
+    name_from_n = ""
+    for entry in entries:
+        key, types, value = entry["key"], entry["types"], entry["value"]
+        if not value or (isinstance(value, str) and not value.strip()):
+            continue
+        if key == "FN":
+            data.setdefault("名前", value.strip())
+        elif key == "N":
+            name_from_n = name_from_n or _join_name(value)
+        elif key == "ORG":
+            data.setdefault("会社名", value[0].strip())
+            other += [f"部署: {unit.strip()}" for unit in value[1:] if unit.strip()]
+        elif key == "TITLE":
+            data.setdefault("職業", value.strip())
+        elif key == "EMAIL":
+            if "メールアドレス" in data:
+                other.append(f"予備メールアドレス: {value.strip()}")
+            else:
+                data["メールアドレス"] = value.strip()
+        elif key == "TEL":
+            if "FAX" in types:
+                other.append(f"FAX: {value.strip()}")
+            elif "電話番号" in data:
+                other.append(f"予備電話番号: {value.strip()}")
+            else:
+                data["電話番号"] = value.strip()
+        elif key == "ADR" and "住所" not in data:
+            data.update({k: v for k, v in _address_fields(value).items() if v})
+        elif key == "URL":
+            field = "sasaeai URL" if _SASAEAI_PATTERN.match(value.strip()) else "HP URL"
+            data.setdefault(field, value.strip())
+    # 表示名（FN）がない場合は姓・名（N）から名前を作る
+    if "名前" not in data and name_from_n:
+        data["名前"] = name_from_n
+    if other:
+        data["その他"] = " / ".join(other)
+    return data
+
+def parse_vcard(text: str) -> Dict[str, str]:
+    """
+    vCardの内容を名刺の項目に変換する
+
+    Args:
+        text (str): vCard（BEGIN:VCARD〜END:VCARD）
+
+    Returns:
+        dict: 値のある項目だけを含む辞書（キーはREQUIRED_KEYS）
+    """
+    # 折り返された行（空白で始まる行）を前の行につなげる
+    unfolded = re.sub(r'\r?\n[ \t]', '', text)
+    entries = []
+    for line in unfolded.splitlines():
+        if ":" not in line:
+            continue
+        name, value = line.split(":", 1)
+        # 「item1.TEL」のようなグループ名を除き、パラメータ（TYPE=FAXなど）を種別として扱う
+        key, *params = name.split(";")
+        key = key.split(".")[-1].upper()
+        types = {type_.upper() for param in params for type_ in param.split("=")[-1].split(",")}
+        parsed = _split_unescaped(value, ";") if key in ("N", "ORG", "ADR") else _unescape(value)
+        entries.append({"key": key, "types": types, "value": parsed})
+    return _contact_fields(entries)
+
+def parse_mecard(text: str) -> Dict[str, str]:
+    """
+    MECARDの内容を名刺の項目に変換する
+
+    Args:
+        text (str): MECARD（MECARD:N:姓,名;TEL:...;;）
+
+    Returns:
+        dict: 値のある項目だけを含む辞書（キーはREQUIRED_KEYS）
+    """
+    body = text.strip()[len("MECARD:"):]
+    entries = []
+    for field in re.split(r'(?<!\\);', body):
+        if ":" not in field:
+            continue
+        key, value = field.split(":", 1)
+        key = key.strip().upper()
+        if key in ("N", "ADR"):
+            parsed = _split_unescaped(value, ",")
+        elif key == "ORG":
+            parsed = [_unescape(value)]
+        else:
+            parsed = _unescape(value)
+        entries.append({"key": key, "types": set(), "value": parsed})
+    return _contact_fields(entries)
+
+def fields_from_payloads(payloads: List[Dict[str, str]]) -> Dict[str, str]:
+    """
+    QRコードの内容から名刺の項目を作成する（vCard・MECARDの連絡先、sasaeai URL、HP URL）
+
+    Args:
+        payloads (list): classify_payloadsの戻り値
+
+    Returns:
+        dict: QRコードで確定した項目（値のある項目のみ）
+    """
+    fields = {}
+    for payload in payloads:
+        if payload["type"] == QR_TYPE_VCARD:
+            contact = parse_vcard(payload["value"])
+        elif payload["type"] == QR_TYPE_MECARD:
+            contact = parse_mecard(payload["value"])
+        elif payload["type"] == QR_TYPE_SASAEAI:
+            contact = {"sasaeai URL": payload["value"]}
+        elif payload["type"] == QR_TYPE_URL:
+            contact = {"HP URL": payload["value"]}
+        else:
+            continue
+        for key, value in contact.items():
+            if key in REQUIRED_KEYS and value:
+                fields.setdefault(key, value)
+    if fields:
+        logger.info(f"QRコードから項目を取得しました: {', '.join(fields)}")
+    return fields
+
+def combine_payload_text(payloads: List[Dict[str, str]]) -> str:
+    """
+    QRコードの内容を1つのテキストにまとめる（Gemini APIに渡すQRコード情報）
+
+    Args:
+        payloads (list): classify_payloadsの戻り値
+
+    Returns:
+        str: 改行でつなげた内容（QRコードがない場合は空文字）
+    """
+    return "\n".join(payload["value"] for payload in payloads)
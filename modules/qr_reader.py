@@ -1,11 +1,17 @@
 # modules/qr_reader.py
 
+import os
 import logging
-import re
+import threading
 import cv2
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Tuple, Union
+
+from . import diagnostics, metrics, qr_locator, qr_payload
+from .image_source import CardImage, load_card_image
+from .constants import DIAGNOSTICS_ENABLED
 
 # ロギング設定
 logging.basicConfig(
@@ -14,118 +20,234 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# OpenCVの警告を抑制
-cv2.setLogLevel(0)  # 0: 警告を抑制
+# OpenCVの警告を抑制（新しいバージョンのOpenCVではcv2.setLogLevelがないためcv2.utils.loggingを使う）
+if hasattr(cv2, "utils") and hasattr(cv2.utils, "logging"):
+    cv2.utils.logging.setLogLevel(cv2.utils.logging.LOG_LEVEL_SILENT)
+else:
+    cv2.setLogLevel(0)  # 0: 警告を抑制
+
+# 候補領域を拡大して読み取るときの短辺の最小値（ピクセル）
+QR_ROI_MIN_SIDE = 400
+# 複数のQRコードを探す画像ピラミッドの各段の長辺（ピクセル、小さい順。元の画像より大きい段は元の画像を使う）
+QR_PYRAMID_LONG_SIDES = (640, 1280)
+# 候補領域を並列に読み取るスレッド数の上限（プロセス全体で共有）
+QR_MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+def _detect_and_decode(qr_detector: cv2.QRCodeDetector, image: np.ndarray, strategy: str) -> str:
+    """
+    1つの読み取り方法（strategy）でQRコードを読み取り、所要時間と成功数を計測結果に記録する
+    """
+    with metrics.span("qr_strategy", strategy=strategy):
+        value, points, straight_qrcode = qr_detector.detectAndDecode(image)
+    if value:
+        metrics.inc("qr_decoded_total", strategy=strategy)
+    return value
 
-def read_qr_from_image(image: Image.Image) -> Optional[str]:
+def read_qr_from_image(image: Union[CardImage, Image.Image]) -> Optional[str]:
     """
-    PIL画像からQRコードを読み取る（前処理も自動で試行）
+    名刺画像またはPIL画像からQRコードを読み取る
+
+    縮小画像でQRコードがありそうな領域を探し、その領域だけを切り出して読み取る
+    （ノイズ除去・拡大などの重い前処理も切り出した領域だけに行い、読み取れた時点で終了する）。
+    候補が見つからない場合は、二値化画像の全体で1回だけ読み取りを試みる。
+    CardImageを渡した場合は、OCRと共有する派生画像（グレースケール・二値化）を使い回す。
     """
-    logger.info("QRコードの読み取りを開始（元画像→前処理画像の順で試行）")
+    logger.info("QRコードの読み取りを開始（候補領域の検出→領域ごとの読み取りの順で試行）")
     try:
-        # 1. 元画像で検出
-        cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        
-        # 画像の前処理を強化
-        gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        _, binary = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        card = load_card_image(image)
+        request_id = diagnostics.new_request_id(card.name) if DIAGNOSTICS_ENABLED else ""
         
         # QRコード検出器の設定
         qr_detector = cv2.QRCodeDetector()
         
-        # 二値化画像で検出を試みる
-        value, points, straight_qrcode = qr_detector.detectAndDecode(binary)
+        # 1. 縮小画像で候補領域を探し、領域ごとに読み取る
+        with metrics.span("qr_strategy", strategy="locate"):
+            regions = qr_locator.locate_qr_regions(card.gray, qr_detector)
+        for region in regions:
+            value = _decode_region(qr_detector, qr_locator.crop_region(card.gray, region), request_id)
+            if value:
+                logger.info(f"QRコードを候補領域 {region} で検出: {value[:30]}...")
+                return value
+            
+        # 2. 候補領域で読み取れない場合は、二値化画像の全体で試みる
+        value = _detect_and_decode(qr_detector, card.binary, "full_binary")
         if value:
             logger.info(f"QRコードを二値化画像で検出: {value[:30]}...")
             return value
             
-        # 2. 前処理画像で再試行
-        pre_image = preprocess_image_for_qr(image)
-        pre_cv_image = np.array(pre_image)
-        if len(pre_cv_image.shape) == 2:
-            pre_cv_image = cv2.cvtColor(pre_cv_image, cv2.COLOR_GRAY2BGR)
-            
-        # 前処理画像で検出を試みる
-        value2, points2, straight_qrcode2 = qr_detector.detectAndDecode(pre_cv_image)
-        if value2:
-            logger.info(f"QRコードを前処理画像で検出: {value2[:30]}...")
-            # テスト用に前処理画像を保存
-            pre_image.save("output_qr_preprocessed.png")
-            with open("output_report.txt", "a", encoding="utf-8") as f:
-                f.write("前処理画像でQR検出成功\n")
-            return value2
-            
-        # 3. 最後の試み：元画像を拡大して検出
-        height, width = cv_image.shape[:2]
-        resized = cv2.resize(cv_image, (width*2, height*2), interpolation=cv2.INTER_CUBIC)
-        value3, points3, straight_qrcode3 = qr_detector.detectAndDecode(resized)
-        if value3:
-            logger.info(f"QRコードを拡大画像で検出: {value3[:30]}...")
-            return value3
-            
-        # 4. 失敗時のレポート
-        pre_image.save("output_qr_preprocessed.png")
-        with open("output_report.txt", "a", encoding="utf-8") as f:
-            f.write("QRコード検出失敗\n")
-        logger.info("QRコードは元画像・前処理画像・拡大画像ともに検出されませんでした")
+        # 3. 失敗時の診断情報（有効な場合だけ記録する）
+        diagnostics.record("qr_failed", "QRコード検出失敗", request_id)
+        logger.info("QRコードは候補領域・二値化画像ともに検出されませんでした")
         return None
     except Exception as e:
         logger.error(f"QRコードの読み取り中にエラーが発生しました: {str(e)}")
         return None
 
-def detect_multiple_qr_codes(image: Image.Image) -> List[Dict[str, Any]]:
+def _decode_region(qr_detector: cv2.QRCodeDetector, roi: np.ndarray, request_id: str = "") -> Optional[str]:
+    """
+    切り出した候補領域を、そのまま→前処理→拡大の順に読み取る（読み取れた時点で終了する）
+
+    Args:
+        qr_detector (cv2.QRCodeDetector): QRコード検出器
+        roi (numpy.ndarray): 切り出した候補領域（グレースケール）
+        request_id (str): 診断情報のファイル名に使う処理ごとのID
+
+    Returns:
+        str: 読み取った値（読み取れなかった場合はNone）
+    """
+    if roi.size == 0:
+        return None
+
+    # 1. そのまま読み取る
+    value = _detect_and_decode(qr_detector, roi, "roi")
+    if value:
+        return value
+        
+    # 2. 前処理（ノイズ除去・二値化）した領域で再試行
+    with metrics.span("qr_strategy", strategy="roi_preprocess"):
+        pre_image = _preprocess_gray_for_qr(roi)
+    value = _detect_and_decode(qr_detector, pre_image, "roi_preprocessed")
+    if value:
+        logger.info("QRコードを前処理した候補領域で検出")
+        diagnostics.record("qr_preprocessed", "前処理画像でQR検出成功", request_id, pre_image)
+        return value
+        
+    # 3. 小さな領域は拡大して再試行
+    height, width = roi.shape[:2]
+    scale = max(2.0, QR_ROI_MIN_SIDE / min(height, width))
+    resized = cv2.resize(roi, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    value = _detect_and_decode(qr_detector, resized, "roi_upscaled")
+    if value:
+        logger.info("QRコードを拡大した候補領域で検出")
+        return value
+    diagnostics.record("qr_region_failed", f"候補領域 {roi.shape[1]}x{roi.shape[0]} で検出失敗", request_id, pre_image)
+    return None
+
+_shared_executor = None
+_shared_executor_lock = threading.Lock()
+
+def _get_qr_executor() -> ThreadPoolExecutor:
+    """
+    候補領域の読み取りに使うスレッドプール（名刺ごとに作らず、プロセス内で共有する）
+    """
+    global _shared_executor
+    with _shared_executor_lock:
+        if _shared_executor is None:
+            _shared_executor = ThreadPoolExecutor(max_workers=QR_MAX_WORKERS, thread_name_prefix="qr")
+        return _shared_executor
+
+def _decode_candidate(gray: np.ndarray, region: Tuple[int, int, int, int], request_id: str = "") -> Optional[str]:
+    """
+    候補領域を読み取る（スレッドごとに検出器を作成する）
+    """
+    return _decode_region(cv2.QRCodeDetector(), qr_locator.crop_region(gray, region), request_id)
+
+def read_qr_codes(image: Union[CardImage, Image.Image],
+                  cancel_event: Optional[threading.Event] = None) -> List[Dict[str, str]]:
     """
-    画像から複数のQRコードを検出する
+    名刺画像から複数のQRコード（vCardとsasaeai URLなど）を読み取り、重複を除いて種類を付ける
+
+    1. 画像ピラミッドの各段（小さい順）でdetectAndDecodeMultiを1回ずつ実行する。
+       読み取れなかったQRコードと、模様から探したQRコードらしい領域がすべて読み取り済みの
+       QRコードに含まれていれば、大きい段は試さない
+    2. 残った候補領域を並列に読み取る（同じQRコードを指す候補は1つにまとめ、前処理・拡大は切り出した領域だけに行う）
+
+    cancel_eventが設定された場合は、次の段・まだ始まっていない候補領域を読み取らずに空のリストを返す。
+
+    Args:
+        image (CardImage or PIL.Image): 名刺画像
+        cancel_event (threading.Event): 処理の中止を要求するイベント
+
+    Returns:
+        list: {"type": 種類, "value": 内容} のリスト（種類はqr_payload.classify_payloadを参照）
     """
     try:
-        cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        card = load_card_image(image)
+        gray = card.gray
+        request_id = diagnostics.new_request_id(card.name) if DIAGNOSTICS_ENABLED else ""
         qr_detector = cv2.QRCodeDetector()
-        value, points, straight_qrcode = qr_detector.detectAndDecodeMulti(cv_image)
-        
-        if not value:
-            return []
-            
-        results = []
-        for i, (v, p) in enumerate(zip(value, points)):
-            if v:
-                results.append({
-                    'value': v,
-                    'points': p.tolist(),
-                    'index': i
-                })
-        return results
+        values = []
+        decoded_regions = []
+        with metrics.span("qr_strategy", strategy="texture_locate"):
+            pending = qr_locator.texture_regions(gray)
+        for long_side in QR_PYRAMID_LONG_SIDES:
+            if cancel_event is not None and cancel_event.is_set():
+                logger.info("QRコードの読み取りを中止しました")
+                return []
+            level, scale = qr_locator.downscale(gray, long_side)
+            try:
+                with metrics.span("qr_strategy", strategy=f"pyramid_{long_side}"):
+                    _, decoded, points, _ = qr_detector.detectAndDecodeMulti(level)
+            except cv2.error:
+                decoded, points = (), None
+            metrics.inc("qr_decoded_total", sum(1 for value in decoded or () if value), strategy=f"pyramid_{long_side}")
+            for value, quad in zip(decoded or (), points if points is not None else ()):
+                region = qr_locator.quad_region(quad, scale, gray.shape)
+                if value:
+                    values.append(value)
+                    decoded_regions.append(region)
+                else:
+                    pending.append(region)
+            pending = [
+                region for region in pending
+                if not any(qr_locator.contains_center(done, region) for done in decoded_regions)
+            ]
+            if (values and not pending) or scale == 1.0:
+                break
+
+        # 同じQRコードを指す候補（どちらかの中心がもう一方に含まれる）は大きい方だけを読み取る
+        candidates = []
+        for region in sorted(pending, key=lambda region: region[2] * region[3], reverse=True):
+            if not any(qr_locator.contains_center(kept, region) or qr_locator.contains_center(region, kept)
+                       for kept in candidates):
+                candidates.append(region)
+        pending = candidates
+
+        if pending:
+            def decode(region):
+                # 共有のスレッドプールで順番を待っている間に中止された場合は読み取らない
+                if cancel_event is not None and cancel_event.is_set():
+                    return None
+                return _decode_candidate(gray, region, request_id)
+
+            values += [value for value in _get_qr_executor().map(decode, pending) if value]
+            if cancel_event is not None and cancel_event.is_set():
+                logger.info("QRコードの読み取りを中止しました")
+                return []
+
+        payloads = qr_payload.classify_payloads(values)
+        if not payloads:
+            diagnostics.record("qr_failed", "QRコード検出失敗", request_id)
+        logger.info(f"QRコードを{len(payloads)}個読み取りました: {[payload['type'] for payload in payloads]}")
+        return payloads
     except Exception as e:
-        logger.error(f"複数QRコードの検出中にエラーが発生しました: {str(e)}")
+        logger.error(f"複数QRコードの読み取り中にエラーが発生しました: {str(e)}")
         return []
 
-def preprocess_image_for_qr(image: Image.Image) -> Image.Image:
+def _preprocess_gray_for_qr(gray: np.ndarray) -> np.ndarray:
+    """
+    グレースケール画像をQRコード検出用に前処理する（ノイズ除去・コントラスト強調・二値化・モルフォロジー処理）
+    """
+    # ノイズ除去
+    denoised = cv2.fastNlMeansDenoising(gray)
+    
+    # コントラスト強調
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+    enhanced = clahe.apply(denoised)
+    
+    # 二値化
+    _, binary = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    
+    # モルフォロジー処理
+    kernel = np.ones((3,3), np.uint8)
+    return cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+
+def preprocess_image_for_qr(image: Union[CardImage, Image.Image]) -> Image.Image:
     """
     QRコード検出用に画像を前処理する
     """
     try:
-        # PIL画像をOpenCV形式に変換
-        cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        
-        # グレースケール変換
-        gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
-        
-        # ノイズ除去
-        denoised = cv2.fastNlMeansDenoising(gray)
-        
-        # コントラスト強調
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        enhanced = clahe.apply(denoised)
-        
-        # 二値化
-        _, binary = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        # モルフォロジー処理
-        kernel = np.ones((3,3), np.uint8)
-        morphed = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
-        
-        # OpenCV画像をPIL形式に戻す
-        return Image.fromarray(morphed)
+        return Image.fromarray(_preprocess_gray_for_qr(load_card_image(image).gray))
     except Exception as e:
         logger.error(f"画像の前処理中にエラーが発生しました: {str(e)}")
         return image
@@ -134,8 +256,7 @@ def is_sasaeai_url(text: str) -> bool:
     """
     テキストがささえあいのURLかどうかを判定する
     """
-    pattern = r'https://sasaeai\.com/.*'
-    return bool(re.match(pattern, text))
+    return qr_payload.classify_payload(text) == qr_payload.QR_TYPE_SASAEAI
 
 def extract_qr_info(qr_text: str) -> Dict[str, str]:
     """
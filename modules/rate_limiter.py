@@ -0,0 +1,292 @@
+"""
+Gemini API呼び出しのレート制御を行うモジュール：
+- リクエスト数/分・トークン数/分のトークンバケット
+- 優先度付きの待ち行列（画面からのアップロードを一括処理より優先）
+- 429/5xxエラー時の指数バックオフ（ジッター付き）による再試行と呼び出し期限
+"""
+
+import re
+import time
+import heapq
+import random
+import logging
+import itertools
+import threading
+from typing import Any, Callable, Optional
+
+from . import metrics
+from .constants import (
+    GEMINI_RPM, GEMINI_TPM, GEMINI_MAX_RETRIES, GEMINI_RETRY_BASE_DELAY, GEMINI_RETRY_MAX_DELAY
+)
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+# 優先度（値が小さいほど優先）
+PRIORITY_INTERACTIVE = 0  # 画面からのアップロード
+PRIORITY_BATCH = 10       # 一括処理
+
+# 再試行の対象とするエラーの判定パターン（429・5xx・タイムアウト）
+_RETRYABLE_ERROR_PATTERN = re.compile(
+    r'\b(429|500|502|503|504)\b|ResourceExhausted|ServiceUnavailable|InternalServerError|'
+    r'DeadlineExceeded|TooManyRequests|quota|timed? ?out',
+    re.IGNORECASE
+)
+
+# エラーの種類（計測結果のラベル）の判定パターン
+_ERROR_REASON_PATTERNS = [
+    ("429", re.compile(r'\b429\b|ResourceExhausted|TooManyRequests|quota', re.IGNORECASE)),
+    ("5xx", re.compile(r'\b(500|502|503|504)\b|ServiceUnavailable|InternalServerError', re.IGNORECASE)),
+    ("timeout", re.compile(r'DeadlineExceeded|timed? ?out|Timeout', re.IGNORECASE)),
+]
+
+# エラーメッセージに含まれる待機時間の指定（例: retry_delay { seconds: 37 }）
+_RETRY_DELAY_PATTERN = re.compile(r'retry_delay\s*{\s*seconds:\s*(\d+)')
+
+def estimate_tokens(text: str) -> int:
+    """
+    テキストのトークン数を概算する（日本語は1文字あたり約1トークン、英数字は約4文字で1トークン）
+
+    Args:
+        text (str): テキスト
+
+    Returns:
+        int: 概算トークン数
+    """
+    ascii_chars = sum(1 for char in text if char.isascii())
+    return max(1, (len(text) - ascii_chars) + ascii_chars // 4)
+
+class TokenBucket:
+    """
+    1分あたりの補充量で定義するトークンバケット（スレッドセーフではないため RateLimiter 内で使用する）
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            rate_per_minute (float): 1分あたりに補充される量
+            capacity (float): バケットの容量（デフォルトは1分ぶん）
+            clock (Callable): 現在時刻を返す関数
+        """
+        if rate_per_minute <= 0:
+            raise ValueError(f"レート制限の値は正の数を指定してください: {rate_per_minute}")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        amountぶんを消費できるようになるまでの秒数を返す（0なら即時に消費可能）
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self._tokens >= amount:
+            return 0.0
+        return (amount - self._tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        """
+        amountぶんを消費する（wait_timeが0であることを確認してから呼ぶ）
+        """
+        self._refill()
+        self._tokens -= min(amount, self.capacity)
+
+class RateLimiter:
+    """
+    リクエスト数/分とトークン数/分の両方を制限する優先度付きレートリミッタ
+
+    待機中の呼び出しは (優先度, 到着順) の順に処理されるため、
+    一括処理が待ち行列にたまっていても画面からの処理が先に実行される。
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            requests_per_minute (float): 1分あたりの最大リクエスト数
+            tokens_per_minute (float): 1分あたりの最大トークン数
+            clock (Callable): 現在時刻を返す関数
+        """
+        self._clock = clock
+        self._requests = TokenBucket(requests_per_minute, clock=clock)
+        self._tokens = TokenBucket(tokens_per_minute, clock=clock)
+        self._condition = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    def acquire(self, tokens: int = 1, priority: int = PRIORITY_INTERACTIVE,
+                deadline: Optional[float] = None) -> float:
+        """
+        リクエスト1回ぶんとトークンを確保する（確保できるまで待機する）
+
+        Args:
+            tokens (int): 消費するトークン数
+            priority (int): 優先度（値が小さいほど優先）
+            deadline (float): 待機の期限（clockと同じ基準の時刻）。Noneの場合は無期限
+
+        Returns:
+            float: 待機した秒数
+        """
+        start = self._clock()
+        entry = (priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    wait = None
+                    if self._waiters[0] == entry:
+                        wait = max(self._requests.wait_time(1), self._tokens.wait_time(tokens))
+                        if wait <= 0:
+                            self._requests.consume(1)
+                            self._tokens.consume(tokens)
+                            return self._clock() - start
+                    if deadline is not None:
+                        remaining = deadline - self._clock()
+                        if remaining <= 0:
+                            raise TimeoutError("Gemini APIのレート制限の待機中に期限を超過しました")
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._condition.wait(wait)
+            finally:
+                # 確保・期限切れのどちらの場合も待ち行列から外し、次の待機者を起こす
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    def queue_length(self) -> int:
+        """
+        待機中の呼び出し数を返す
+        """
+        with self._condition:
+            return len(self._waiters)
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    再試行で回復する可能性があるエラー（429・5xx・タイムアウト）かどうかを判定する
+
+    Args:
+        error (Exception): 発生した例外
+
+    Returns:
+        bool: 再試行の対象であればTrue
+    """
+    if isinstance(error, TimeoutError):
+        return True
+    return bool(_RETRYABLE_ERROR_PATTERN.search(f"{type(error).__name__} {error}"))
+
+def error_reason(error: Exception) -> str:
+    """
+    エラーの種類（"429" / "5xx" / "timeout" / "other"）を返す（計測結果のラベルに使用）
+    """
+    text = f"{type(error).__name__} {error}"
+    for reason, pattern in _ERROR_REASON_PATTERNS:
+        if pattern.search(text):
+            return reason
+    return "other"
+
+def backoff_delay(attempt: int, error: Optional[Exception] = None, base_delay: float = None,
+                  max_delay: float = None, rng: random.Random = random) -> float:
+    """
+    再試行までの待機秒数を計算する（指数バックオフ + ジッター、サーバ指定の待機時間を優先）
+
+    Args:
+        attempt (int): 何回目の再試行か（0始まり）
+        error (Exception): 直前のエラー（retry_delayの指定があれば使用）
+        base_delay (float): 初回の待機秒数（デフォルトはGEMINI_RETRY_BASE_DELAY）
+        max_delay (float): 待機秒数の上限（デフォルトはGEMINI_RETRY_MAX_DELAY）
+        rng (random.Random): 乱数生成器
+
+    Returns:
+        float: 待機秒数
+    """
+    base_delay = GEMINI_RETRY_BASE_DELAY if base_delay is None else base_delay
+    max_delay = GEMINI_RETRY_MAX_DELAY if max_delay is None else max_delay
+    delay = min(max_delay, base_delay * (2 ** attempt))
+    # 複数の呼び出しが同時に再試行しないよう、待機時間の半分をランダムにずらす
+    delay = delay / 2 + rng.uniform(0, delay / 2)
+    if error is not None:
+        match = _RETRY_DELAY_PATTERN.search(str(error))
+        if match:
+            delay = max(delay, float(match.group(1)))
+    return delay
+
+def call_with_retry(func: Callable[[Optional[float]], Any], limiter: Optional[RateLimiter] = None,
+                    tokens: int = 1, priority: int = PRIORITY_INTERACTIVE,
+                    timeout: Optional[float] = None, deadline_seconds: Optional[float] = None,
+                    max_retries: Optional[int] = None,
+                    sleep: Callable[[float], None] = time.sleep,
+                    clock: Callable[[], float] = time.monotonic,
+                    rng: random.Random = random) -> Any:
+    """
+    レート制限のもとで関数を呼び出し、429/5xxエラーの場合は待機して再試行する
+
+    Args:
+        func (Callable): 呼び出す関数（引数に今回の呼び出しのタイムアウト秒数を受け取る）
+        limiter (RateLimiter): レートリミッタ（Noneの場合は制限しない）
+        tokens (int): 1回の呼び出しで消費するトークン数
+        priority (int): 優先度（値が小さいほど優先）
+        timeout (float): 1回の呼び出しのタイムアウト秒数
+        deadline_seconds (float): 待機・再試行を含めた全体の期限（秒）
+        max_retries (int): 最大再試行回数（デフォルトはGEMINI_MAX_RETRIES）
+        sleep (Callable): 待機に使う関数
+        clock (Callable): 現在時刻を返す関数
+        rng (random.Random): ジッターに使う乱数生成器
+
+    Returns:
+        Any: funcの戻り値
+    """
+    max_retries = GEMINI_MAX_RETRIES if max_retries is None else max_retries
+    deadline = clock() + deadline_seconds if deadline_seconds else None
+
+    attempt = 0
+    while True:
+        if limiter is not None:
+            waited = limiter.acquire(tokens, priority=priority, deadline=deadline)
+            metrics.observe("llm_rate_limit_wait_seconds", waited)
+            if waited > 0.1:
+                logger.info(f"Gemini APIのレート制限により{waited:.1f}秒待機しました")
+
+        call_timeout = timeout
+        if deadline is not None:
+            remaining = deadline - clock()
+            if remaining <= 0:
+                raise TimeoutError("Gemini APIの呼び出し期限を超過しました")
+            call_timeout = remaining if call_timeout is None else min(call_timeout, remaining)
+
+        try:
+            return func(call_timeout)
+        except Exception as e:
+            metrics.inc("llm_errors_total", reason=error_reason(e))
+            if not is_retryable_error(e) or attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt, e, rng=rng)
+            if deadline is not None and clock() + delay >= deadline:
+                logger.error(f"再試行の待機が呼び出し期限を超えるため中止します: {e}")
+                raise
+            attempt += 1
+            metrics.inc("llm_retries_total")
+            logger.warning(f"Gemini APIエラーのため{delay:.1f}秒後に再試行します（{attempt}/{max_retries}回目）: {e}")
+            sleep(delay)
+
+_gemini_rate_limiter = None
+_gemini_rate_limiter_lock = threading.Lock()
+
+def get_gemini_rate_limiter() -> RateLimiter:
+    """
+    Gemini API用のレートリミッタを取得する（プロセス内で共有）
+
+    Returns:
+        RateLimiter: GEMINI_RPM・GEMINI_TPMで設定したレートリミッタ
+    """
+    global _gemini_rate_limiter
+    with _gemini_rate_limiter_lock:
+        if _gemini_rate_limiter is None:
+            _gemini_rate_limiter = RateLimiter(GEMINI_RPM, GEMINI_TPM)
+        return _gemini_rate_limiter
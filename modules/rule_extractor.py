@@ -0,0 +1,287 @@
+"""
+名刺テキストから正規表現とキーワードで項目を抽出するモジュール：
+- メールアドレス・電話番号・郵便番号（〒）・住所・URL・sasaeai URL・会社名・役職・名前
+- 項目ごとに確信度（0〜1）を付け、閾値に達しなかった項目だけをGemini APIで解析する
+- 予備のメールアドレス・電話番号、FAXは「その他」にまとめる
+"""
+
+import re
+import logging
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+from .constants import REQUIRED_KEYS
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+# ルールで判定する項目（「その他」は予備の連絡先をまとめるだけで判定対象外）
+RULE_FIELDS = [key for key in REQUIRED_KEYS if key != "その他"]
+
+_EMAIL_PATTERN = re.compile(r'[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+(?:\.[a-zA-Z0-9-]+)+')
+_PHONE_PATTERN = re.compile(r'(?<![\d-])(?:\+81[-\s]?)?\(?0?\d{1,4}\)?[-\s]?\d{1,4}[-\s]?\d{3,4}(?![\d-])')
+_POSTAL_PATTERN = re.compile(r'(〒)?\s*(?<![\d-])(\d{3})\s*[-ー−]\s*(\d{4})(?![\d-])')
+_URL_PATTERN = re.compile(r'(?:https?://|www\.)[^\s<>"、。]+', re.IGNORECASE)
+_DOMAIN_PATTERN = re.compile(r'(?<![@\w.-])[a-zA-Z0-9-]+(?:\.[a-zA-Z0-9-]+)*\.(?:co\.jp|or\.jp|ne\.jp|ac\.jp|go\.jp|jp|com|net|org|biz|info)\b[^\s<>"、。]*')
+_PREFECTURE_PATTERN = re.compile(
+    r'(北海道|東京都|(?:京都|大阪)府|'
+    r'(?:青森|岩手|宮城|秋田|山形|福島|茨城|栃木|群馬|埼玉|千葉|神奈川|新潟|富山|石川|福井|山梨|長野|'
+    r'岐阜|静岡|愛知|三重|滋賀|兵庫|奈良|和歌山|鳥取|島根|岡山|広島|山口|徳島|香川|愛媛|高知|福岡|'
+    r'佐賀|長崎|熊本|大分|宮崎|鹿児島|沖縄)県)'
+)
+_CITY_PATTERN = re.compile(r'[一-龥々ヶ]+[市区町村郡].*\d')
+_COMPANY_PATTERN = re.compile(
+    r'株式会社|有限会社|合同会社|合資会社|合名会社|(?:一般|公益)(?:社団|財団)法人|特定非営利活動法人|'
+    r'NPO法人|医療法人|社会福祉法人|学校法人|\b(?:Inc|Corp|Co|Ltd|LLC|K\.K)\b\.?|Corporation|Company',
+    re.IGNORECASE
+)
+_TITLE_PATTERN = re.compile(
+    r'代表取締役|取締役|執行役員|社長|副社長|会長|専務|常務|理事長|理事|監査役|部長|次長|課長|係長|主任|'
+    r'室長|所長|支店長|店長|マネージャー|マネジャー|ディレクター|リーダー|チーフ|エンジニア|'
+    r'コンサルタント|デザイナー|プロデューサー|代表|院長|顧問|税理士|弁護士|司法書士|行政書士|社会保険労務士|'
+    r'\b(?:CEO|CTO|COO|CFO|President|Director|Manager|Engineer|Consultant|Designer)\b',
+    re.IGNORECASE
+)
+_NAME_PATTERN = re.compile(r'^[一-龥々ヶ]{1,4}\s?[一-龥々ヶ]{1,4}$|^[A-Z][a-z]+\s[A-Z][a-z]+$')
+# 部署名の行（例: 営業部, 開発本部, 大阪支店）は名前の候補から除く
+_DEPARTMENT_PATTERN = re.compile(r'(?:部|課|室|支店|支社|営業所)$')
+_FAX_LABEL_PATTERN = re.compile(r'FAX|ファックス|ファクス|\bF\s*[.:：]', re.IGNORECASE)
+_TEL_LABEL_PATTERN = re.compile(r'TEL|電話|携帯|Mobile|Phone|\b[TM]\s*[.:：]', re.IGNORECASE)
+_LABEL_PREFIX_PATTERN = re.compile(r'^(?:〒|住所|所在地|Address)\s*[:：]?\s*', re.IGNORECASE)
+
+def _normalize(text: str) -> str:
+    """
+    全角英数字・記号を半角に揃える（NFKC正規化）
+    """
+    return unicodedata.normalize('NFKC', text)
+
+def _phone_digits(phone: str) -> str:
+    digits = re.sub(r'\D', '', phone)
+    return '0' + digits[2:] if digits.startswith('81') and len(digits) >= 11 else digits
+
+def _edit_distance(a: str, b: str) -> int:
+    """
+    2つの文字列の編集距離（レーベンシュタイン距離）を求める
+    """
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+def _has_misread_variant(primary: str, others: List[str], max_distance: int = 2) -> bool:
+    """
+    予備の候補に、先頭の候補と1〜2文字だけ異なるもの（OCRの読み違いの可能性が高いもの）があるかどうかを返す
+
+    例: 03-1234-5678 と 03-1234-5676 は別の番号ではなく、同じ番号の読み違いの可能性が高い
+    """
+    return any(0 < _edit_distance(primary, other) <= max_distance for other in others)
+
+def _extract_emails(text: str) -> Tuple[List[str], float]:
+    emails = list(dict.fromkeys(_EMAIL_PATTERN.findall(text)))
+    if emails:
+        return emails, 0.95
+    # 「@」がOCRで崩れている可能性があるため、未検出は確定しない
+    return [], 0.5
+
+def _extract_phones(lines: List[str]) -> Tuple[List[str], List[str], float]:
+    """
+    電話番号とFAX番号を抽出する
+
+    Returns:
+        tuple: (電話番号のリスト, FAX番号のリスト, 先頭の電話番号の確信度)
+    """
+    phones: List[Tuple[str, bool]] = []
+    faxes: List[str] = []
+    for line in lines:
+        # 郵便番号やメールアドレスの数字を電話番号と誤認しないよう除外してから探す
+        target = _EMAIL_PATTERN.sub(' ', _POSTAL_PATTERN.sub(' ', line))
+        for match in _PHONE_PATTERN.finditer(target):
+            number = match.group(0).strip()
+            if len(_phone_digits(number)) not in (10, 11):
+                continue
+            label = target[:match.start()]
+            # 「TEL/FAX」のように両方のラベルがある行は、番号の直前に近いラベルを採用する
+            fax_at = max((m.end() for m in _FAX_LABEL_PATTERN.finditer(label)), default=-1)
+            tel_at = max((m.end() for m in _TEL_LABEL_PATTERN.finditer(label)), default=-1)
+            if fax_at > tel_at:
+                faxes.append(number)
+            else:
+                phones.append((number, tel_at >= 0))
+    if not phones:
+        return [], faxes, 0.5
+    numbers = list(dict.fromkeys(number for number, _ in phones))
+    confidence = 0.95 if phones[0][1] else 0.85
+    return numbers, faxes, confidence
+
+def _extract_postal_and_address(lines: List[str]) -> Tuple[str, float, str, float]:
+    """
+    郵便番号と住所を抽出する
+
+    Returns:
+        tuple: (郵便番号, 確信度, 住所, 確信度)
+    """
+    postal, postal_confidence = "", 0.5
+    address, address_confidence = "", 0.5
+    for index, line in enumerate(lines):
+        match = _POSTAL_PATTERN.search(line)
+        if match and not postal:
+            postal = f"{match.group(2)}-{match.group(3)}"
+            postal_confidence = 0.95 if match.group(1) else 0.75
+            rest = line[match.end():].strip()
+            # 郵便番号の後ろ、または次の行に住所が続くことが多い
+            if not rest and index + 1 < len(lines):
+                rest = lines[index + 1]
+            if rest and (_PREFECTURE_PATTERN.search(rest) or _CITY_PATTERN.search(rest)):
+                address = rest
+                address_confidence = 0.9 if _PREFECTURE_PATTERN.match(rest) else 0.75
+                if postal_confidence < 0.95:
+                    postal_confidence = 0.9
+        if not address and _PREFECTURE_PATTERN.search(line) and re.search(r'\d', line):
+            address = _POSTAL_PATTERN.sub('', line).strip()
+            address_confidence = 0.85
+    address = _LABEL_PREFIX_PATTERN.sub('', address).strip()
+    return postal, postal_confidence, address, address_confidence
+
+def _extract_urls(text: str) -> Tuple[str, float, str, float]:
+    """
+    ホームページのURLとsasaeai URLを抽出する
+
+    Returns:
+        tuple: (HP URL, 確信度, sasaeai URL, 確信度)
+    """
+    urls = [url.rstrip('.,)') for url in _URL_PATTERN.findall(text)]
+    without_urls = _URL_PATTERN.sub(' ', _EMAIL_PATTERN.sub(' ', text))
+    domains = [domain.rstrip('.,)') for domain in _DOMAIN_PATTERN.findall(without_urls)]
+
+    sasaeai = [url for url in urls + domains if 'sasaeai' in url.lower()]
+    others = [url for url in urls if 'sasaeai' not in url.lower()]
+    other_domains = [domain for domain in domains if 'sasaeai' not in domain.lower()]
+
+    if sasaeai:
+        sasaeai_url, sasaeai_confidence = sasaeai[0], 0.98
+    elif 'sasaeai' in text.lower():
+        sasaeai_url, sasaeai_confidence = "", 0.3
+    else:
+        # sasaeai URLは限られた名刺にしか載っていないため、記載がなければ空と判断する
+        sasaeai_url, sasaeai_confidence = "", 0.95
+
+    if others:
+        website, website_confidence = others[0], 0.95
+    elif other_domains:
+        website, website_confidence = other_domains[0], 0.8
+    elif re.search(r'https?|www|\.(?:com|jp|net)', text, re.IGNORECASE):
+        website, website_confidence = "", 0.3
+    else:
+        website, website_confidence = "", 0.9
+    return website, website_confidence, sasaeai_url, sasaeai_confidence
+
+def _is_contact_line(line: str) -> bool:
+    """
+    連絡先・住所の行かどうか（会社名・役職・名前の候補から除外する）
+    """
+    return bool(
+        _EMAIL_PATTERN.search(line) or _URL_PATTERN.search(line) or _POSTAL_PATTERN.search(line)
+        or _PREFECTURE_PATTERN.search(line) or re.search(r'\d{2,}', line)
+    )
+
+def _extract_company(lines: List[str]) -> Tuple[str, float]:
+    candidates = [line for line in lines if _COMPANY_PATTERN.search(line) and not _is_contact_line(line)]
+    if len(candidates) == 1:
+        return candidates[0], 0.9
+    if candidates:
+        return candidates[0], 0.6
+    return "", 0.3
+
+def _extract_title(lines: List[str], company: str) -> Tuple[str, float]:
+    candidates = [
+        line for line in lines
+        if _TITLE_PATTERN.search(line) and line != company and not _is_contact_line(line)
+    ]
+    if len(candidates) == 1 and len(candidates[0]) <= 30:
+        return candidates[0], 0.85
+    if candidates:
+        return " ".join(candidates), 0.6
+    return "", 0.3
+
+def _extract_name(lines: List[str], company: str, title: str) -> Tuple[str, float]:
+    candidates = []
+    for line in lines:
+        if line in (company, title) or _is_contact_line(line):
+            continue
+        # 役職と名前が同じ行にある場合（例: 営業部長 山田太郎）は役職を除いて判定する
+        stripped = _TITLE_PATTERN.sub('', line).strip() if _TITLE_PATTERN.search(line) else line
+        if _COMPANY_PATTERN.search(stripped) or _DEPARTMENT_PATTERN.search(stripped):
+            continue
+        if _NAME_PATTERN.match(stripped):
+            candidates.append(stripped)
+    if len(candidates) == 1:
+        return candidates[0], 0.85
+    if candidates:
+        return candidates[0], 0.5
+    return "", 0.2
+
+def extract_fields(ocr_text: str, qr_text: Optional[str] = None) -> Tuple[Dict[str, str], Dict[str, float]]:
+    """
+    名刺テキストから項目を抽出し、項目ごとの確信度とともに返す
+
+    Args:
+        ocr_text (str): OCRで抽出したテキスト
+        qr_text (Optional[str]): QRコードから抽出したテキスト（デフォルトはNone）
+
+    Returns:
+        tuple: (項目名 -> 値（REQUIRED_KEYSをすべて含む）, 項目名 -> 確信度（RULE_FIELDSのみ）)
+    """
+    text = _normalize(ocr_text or "")
+    if qr_text:
+        text += "\n" + _normalize(qr_text)
+    lines = [re.sub(r'\s+', ' ', line).strip() for line in text.splitlines()]
+    lines = [line for line in lines if line]
+
+    data = {key: "" for key in REQUIRED_KEYS}
+    confidence = {}
+    other = []
+
+    emails, confidence["メールアドレス"] = _extract_emails(text)
+    if emails:
+        data["メールアドレス"] = emails[0]
+        other += [f"予備メールアドレス: {email}" for email in emails[1:]]
+        # 読み違いの候補がある場合は、どちらが正しいかをGemini APIで確認する
+        if _has_misread_variant(emails[0].lower(), [email.lower() for email in emails[1:]]):
+            confidence["メールアドレス"] = min(confidence["メールアドレス"], 0.5)
+
+    phones, faxes, confidence["電話番号"] = _extract_phones(lines)
+    if phones:
+        data["電話番号"] = phones[0]
+        other += [f"予備電話番号: {phone}" for phone in phones[1:]]
+        if _has_misread_variant(_phone_digits(phones[0]), [_phone_digits(phone) for phone in phones[1:]]):
+            confidence["電話番号"] = min(confidence["電話番号"], 0.5)
+    other += [f"FAX: {fax}" for fax in faxes]
+
+    (data["郵便番号"], confidence["郵便番号"],
+     data["住所"], confidence["住所"]) = _extract_postal_and_address(lines)
+    (data["HP URL"], confidence["HP URL"],
+     data["sasaeai URL"], confidence["sasaeai URL"]) = _extract_urls(text)
+
+    data["会社名"], confidence["会社名"] = _extract_company(lines)
+    data["職業"], confidence["職業"] = _extract_title(lines, data["会社名"])
+    data["名前"], confidence["名前"] = _extract_name(lines, data["会社名"], data["職業"])
+    data["その他"] = " / ".join(other)
+
+    logger.debug(f"ルールベース抽出の確信度: {confidence}")
+    return data, confidence
+
+def unresolved_fields(confidence: Dict[str, float], threshold: float) -> List[str]:
+    """
+    確信度が閾値に達しなかった項目を返す
+
+    Args:
+        confidence (dict): 項目名 -> 確信度
+        threshold (float): 閾値（0〜1）
+
+    Returns:
+        list: 未確定の項目名（RULE_FIELDSの順）
+    """
+    return [key for key in RULE_FIELDS if confidence.get(key, 0.0) < threshold]
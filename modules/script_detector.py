@@ -0,0 +1,147 @@
+"""
+OCRの前に名刺の向き・書字方向・文字の種類を判定するモジュール：
+- Tesseractの向き・文字種の検出（OSD、--psm 0）で回転角度と主な文字の種類（Latin / Japanese など）を調べる
+- 文字を縦方向・横方向につなげた塊の面積を比べ、縦書きか横書きかを判定する（OSDより軽い判定）
+
+判定結果はOCRで試す言語・ページ分割モードの組み合わせを絞り込むために使う。
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+import cv2
+import numpy as np
+import pytesseract
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+# 文字の種類
+SCRIPT_LATIN = "latin"
+SCRIPT_JAPANESE = "japanese"
+SCRIPT_UNKNOWN = "unknown"
+
+# 書字方向
+DIRECTION_HORIZONTAL = "horizontal"
+DIRECTION_VERTICAL = "vertical"
+DIRECTION_UNKNOWN = "unknown"
+
+# OSDが返す文字の種類のうち、日本語として扱うもの
+_JAPANESE_SCRIPTS = {"Japanese", "Han", "Hiragana", "Katakana"}
+
+# OSDの結果を採用する信頼度の下限
+OSD_MIN_SCRIPT_CONFIDENCE = 1.0
+OSD_MIN_ORIENTATION_CONFIDENCE = 2.0
+
+# 縦書き・横書きと判定するのに必要な、一方向の塊の面積の比
+DIRECTION_RATIO = 1.5
+# 行・列の塊とみなす縦横比
+DIRECTION_ELONGATION = 3.0
+
+# OSDの回転角度（時計回りに回すと正しい向きになる角度）に対応するcv2.rotateのコード
+ROTATE_CODES = {
+    90: cv2.ROTATE_90_CLOCKWISE,
+    180: cv2.ROTATE_180,
+    270: cv2.ROTATE_90_COUNTERCLOCKWISE,
+}
+
+def detect_writing_direction(gray: np.ndarray) -> str:
+    """
+    文字を横方向・縦方向につなげた細長い塊の面積を比べ、横書きか縦書きかを判定する
+
+    Args:
+        gray (numpy.ndarray): グレースケール画像
+
+    Returns:
+        str: "horizontal" / "vertical" / "unknown"（文字が少なく判定できない場合）
+    """
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    _, _, components, _ = cv2.connectedComponentsWithStats(ink)
+    heights = components[1:, cv2.CC_STAT_HEIGHT]
+    widths = components[1:, cv2.CC_STAT_WIDTH]
+    # 文字らしい大きさの成分から文字の大きさを見積もる（罫線や点を除く）
+    glyphs = np.maximum(heights, widths)[(heights >= 5) & (widths >= 2) & (heights < gray.shape[0] / 4)]
+    if len(glyphs) < 5:
+        return DIRECTION_UNKNOWN
+    glyph_size = int(np.median(glyphs))
+
+    def elongated_area(kernel_size, vertical):
+        joined = cv2.morphologyEx(ink, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, kernel_size))
+        _, _, stats, _ = cv2.connectedComponentsWithStats(joined)
+        w, h = stats[1:, cv2.CC_STAT_WIDTH], stats[1:, cv2.CC_STAT_HEIGHT]
+        mask = h >= w * DIRECTION_ELONGATION if vertical else w >= h * DIRECTION_ELONGATION
+        return int((w * h)[mask].sum())
+
+    gap = max(3, glyph_size)
+    horizontal = elongated_area((gap, 1), vertical=False)
+    vertical = elongated_area((1, gap), vertical=True)
+    if vertical > horizontal * DIRECTION_RATIO:
+        return DIRECTION_VERTICAL
+    if horizontal > vertical * DIRECTION_RATIO:
+        return DIRECTION_HORIZONTAL
+    return DIRECTION_UNKNOWN
+
+def run_osd(image: np.ndarray) -> Optional[Dict[str, Any]]:
+    """
+    Tesseractの向き・文字種の検出（OSD）を実行する
+
+    Args:
+        image (numpy.ndarray): 画像（二値化画像を推奨）
+
+    Returns:
+        dict: rotate（時計回りの回転角度）, orientation_conf, script, script_conf（失敗した場合はNone）
+    """
+    try:
+        osd = pytesseract.image_to_osd(image, config="--psm 0", output_type=pytesseract.Output.DICT)
+    except Exception as e:
+        # 文字が少ない画像や、osd.traineddataがない環境では失敗する
+        logger.info(f"向き・文字種の検出（OSD）ができませんでした: {str(e).strip()[:100]}")
+        return None
+    return {
+        "rotate": int(osd.get("rotate", 0)),
+        "orientation_conf": float(osd.get("orientation_conf", 0.0)),
+        "script": osd.get("script", ""),
+        "script_conf": float(osd.get("script_conf", 0.0)),
+    }
+
+def analyze_card(gray: np.ndarray, binary: np.ndarray) -> Dict[str, Any]:
+    """
+    名刺の回転角度・書字方向・主な文字の種類を判定する
+
+    縦書きの日本語はOSDで90度回転した横書きと判定されることがあるため、
+    縦書きと判定した日本語（または文字の種類が不明）の名刺では、OSDの90度・270度の回転を使わない。
+
+    Args:
+        gray (numpy.ndarray): グレースケール画像（書字方向の判定に使用）
+        binary (numpy.ndarray): 二値化画像（OSDに使用）
+
+    Returns:
+        dict: rotate（時計回りの回転角度）, direction, script, osd（OSDの結果またはNone）
+    """
+    direction = detect_writing_direction(gray)
+    osd = run_osd(binary)
+    script = SCRIPT_UNKNOWN
+    rotate = 0
+    if osd is not None:
+        if osd["script_conf"] >= OSD_MIN_SCRIPT_CONFIDENCE:
+            if osd["script"] == "Latin":
+                script = SCRIPT_LATIN
+            elif osd["script"] in _JAPANESE_SCRIPTS:
+                script = SCRIPT_JAPANESE
+        if osd["rotate"] in ROTATE_CODES and osd["orientation_conf"] >= OSD_MIN_ORIENTATION_CONFIDENCE:
+            if osd["rotate"] == 180 or script == SCRIPT_LATIN or direction != DIRECTION_VERTICAL:
+                rotate = osd["rotate"]
+    if rotate in (90, 270):
+        # 90度回転すると縦横が入れ替わる
+        direction = {DIRECTION_VERTICAL: DIRECTION_HORIZONTAL,
+                     DIRECTION_HORIZONTAL: DIRECTION_VERTICAL}.get(direction, direction)
+    analysis = {"rotate": rotate, "direction": direction, "script": script, "osd": osd}
+    logger.info(f"名刺の判定: 回転 {rotate}度, 書字方向 {direction}, 文字の種類 {script}")
+    return analysis
+
+def rotate_image(image: np.ndarray, rotate: int) -> np.ndarray:
+    """
+    画像を時計回りにrotate度（90の倍数）回転する
+    """
+    code = ROTATE_CODES.get(rotate % 360)
+    return image if code is None else cv2.rotate(image, code)
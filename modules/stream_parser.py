@@ -0,0 +1,181 @@
+"""
+ストリーミングで受信するJSONオブジェクトを逐次パースするモジュール：
+- 1行のJSONオブジェクト（{"名前": "...", ...}）をチャンクごとに受け取り、値が確定したキーから順に返す
+- 前後の説明文やコードブロック記法（```json）は読み飛ばす
+- 想定外の形式を検出した場合は以降の逐次パースを中止する（最終的な解析は従来のパース処理で行う）
+"""
+
+import json
+import logging
+from typing import Any, List, Optional, Tuple
+
+# ロガーを設定
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = " \t\r\n"
+_LITERAL_END = ",}" + _WHITESPACE
+
+class IncrementalJSONObjectParser:
+    """
+    JSONオブジェクトを逐次パースし、値が確定したキーと値を返すパーサ
+
+    使用例:
+        parser = IncrementalJSONObjectParser()
+        for chunk in chunks:
+            for key, value in parser.feed(chunk):
+                ...
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._state = "start"
+        self._key = None
+        self.fields = {}
+
+    @property
+    def done(self) -> bool:
+        """
+        オブジェクトの終わり（}）まで読み終えたかどうか
+        """
+        return self._state == "done"
+
+    @property
+    def failed(self) -> bool:
+        """
+        想定外の形式のため逐次パースを中止したかどうか
+        """
+        return self._state == "failed"
+
+    def _skip_whitespace(self, pos: int) -> int:
+        while pos < len(self._buffer) and self._buffer[pos] in _WHITESPACE:
+            pos += 1
+        return pos
+
+    def _string_end(self, pos: int) -> Optional[int]:
+        """
+        posの「"」から始まる文字列の終わりの次の位置を返す（未完了の場合はNone）
+        """
+        index = pos + 1
+        while index < len(self._buffer):
+            char = self._buffer[index]
+            if char == "\\":
+                index += 2
+                continue
+            if char == '"':
+                return index + 1
+            index += 1
+        return None
+
+    def _container_end(self, pos: int) -> Optional[int]:
+        """
+        posの「{」または「[」から始まる値の終わりの次の位置を返す（未完了の場合はNone）
+        """
+        depth = 0
+        index = pos
+        while index < len(self._buffer):
+            char = self._buffer[index]
+            if char == '"':
+                end = self._string_end(index)
+                if end is None:
+                    return None
+                index = end
+                continue
+            if char in "{[":
+                depth += 1
+            elif char in "}]":
+                depth -= 1
+                if depth == 0:
+                    return index + 1
+            index += 1
+        return None
+
+    def _literal_end(self, pos: int) -> Optional[int]:
+        """
+        posから始まる数値・true・false・nullの終わりの位置を返す（区切り文字が届くまではNone）
+        """
+        index = pos
+        while index < len(self._buffer):
+            if self._buffer[index] in _LITERAL_END:
+                return index
+            index += 1
+        return None
+
+    def _fail(self, reason: str) -> None:
+        logger.debug(f"ストリーミングJSONの逐次パースを中止します: {reason}")
+        self._state = "failed"
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        チャンクを追加し、新たに値が確定したキーと値を返す
+
+        Args:
+            chunk (str): 受信したテキストの断片
+
+        Returns:
+            list: (キー, 値) のタプルのリスト（受信順）
+        """
+        self._buffer += chunk
+        completed = []
+        while self._state not in ("done", "failed"):
+            if self._state == "start":
+                start = self._buffer.find("{", self._pos)
+                if start < 0:
+                    self._pos = len(self._buffer)
+                    break
+                self._pos = start + 1
+                self._state = "key"
+                continue
+
+            pos = self._skip_whitespace(self._pos)
+            if pos >= len(self._buffer):
+                self._pos = pos
+                break
+            char = self._buffer[pos]
+
+            if self._state == "key":
+                if char == ",":
+                    self._pos = pos + 1
+                elif char == "}":
+                    self._pos = pos + 1
+                    self._state = "done"
+                elif char == '"':
+                    end = self._string_end(pos)
+                    if end is None:
+                        self._pos = pos
+                        break
+                    try:
+                        self._key = json.loads(self._buffer[pos:end])
+                    except json.JSONDecodeError as e:
+                        self._fail(f"キーを解釈できません: {e}")
+                        break
+                    self._pos = end
+                    self._state = "colon"
+                else:
+                    self._fail(f"キーの位置に想定外の文字があります: {char!r}")
+            elif self._state == "colon":
+                if char != ":":
+                    self._fail(f"「:」の位置に想定外の文字があります: {char!r}")
+                    break
+                self._pos = pos + 1
+                self._state = "value"
+            elif self._state == "value":
+                if char == '"':
+                    end = self._string_end(pos)
+                elif char in "{[":
+                    end = self._container_end(pos)
+                else:
+                    end = self._literal_end(pos)
+                if end is None:
+                    self._pos = pos
+                    break
+                try:
+                    value = json.loads(self._buffer[pos:end])
+                except json.JSONDecodeError as e:
+                    self._fail(f"値を解釈できません: {e}")
+                    break
+                self.fields[self._key] = value
+                completed.append((self._key, value))
+                self._pos = end
+                self._state = "key"
+        return completed
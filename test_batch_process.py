@@ -0,0 +1,133 @@
+"""
+一括処理ツール（batch_process）のマニフェストと集計の動作確認テスト
+"""
+
+import os
+import json
+import asyncio
+import logging
+import tempfile
+
+import batch_process
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def _record(image_path, success=True, error=None, timings=None, **extra):
+    return {
+        "image_path": image_path,
+        "success": success,
+        "error": error,
+        "data": {"会社名": image_path} if success else None,
+        "cached": False,
+        "timings": timings or {},
+        **extra,
+    }
+
+def _write_manifest(path, lines):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(lines))
+
+def test_load_manifest_skips_broken_lines():
+    """
+    壊れた行・空行を読み飛ばし、同じ画像の記録は後のものを使うことを確認する
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        manifest_path = os.path.join(directory, "out.csv.manifest.jsonl")
+        assert batch_process.load_manifest(manifest_path) == {}
+        _write_manifest(manifest_path, [
+            json.dumps(_record("a.png", success=False, error="OCR失敗")) + "\n",
+            "\n",
+            json.dumps({"success": True}) + "\n",
+            json.dumps(_record("b.png")) + "\n",
+            json.dumps(_record("a.png")) + "\n",
+            '{"image_path": "c.png", "succ',
+        ])
+        records = batch_process.load_manifest(manifest_path)
+    assert sorted(records) == ["a.png", "b.png"]
+    assert records["a.png"]["success"] is True
+
+def test_run_batch_repairs_partial_last_line():
+    """
+    中断で最終行が書きかけのマニフェストに追記しても、新しい記録が読み込めることを確認する
+    """
+    async def fake_process_cards_async(image_paths, **kwargs):
+        for image_path in image_paths:
+            yield _record(image_path, timings={"total": 0.1})
+
+    original = batch_process.process_cards_async
+    batch_process.process_cards_async = fake_process_cards_async
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            manifest_path = os.path.join(directory, "out.csv.manifest.jsonl")
+            _write_manifest(manifest_path, [
+                json.dumps(_record("a.png")) + "\n",
+                '{"image_path": "b.png", "succ',
+            ])
+            new_records = asyncio.run(batch_process.run_batch(
+                ["b.png", "c.png"], manifest_path, workers=1, llm_concurrency=1, use_cache=False
+            ))
+            records = batch_process.load_manifest(manifest_path)
+    finally:
+        batch_process.process_cards_async = original
+    assert [record["image_path"] for record in new_records] == ["b.png", "c.png"]
+    assert sorted(records) == ["a.png", "b.png", "c.png"]
+    assert all(record["success"] for record in records.values())
+
+def test_select_pending_with_retry_failed():
+    """
+    処理済みの名刺を除き、--retry-failedの場合は前回失敗した名刺だけを入力順で処理し直すことを確認する
+    """
+    image_paths = ["a.png", "b.png", "c.png", "d.png"]
+    done = {
+        "a.png": _record("a.png"),
+        "b.png": _record("b.png", success=False, error="OCR失敗"),
+        "d.png": _record("d.png", success=False, error="API失敗"),
+    }
+    assert batch_process.select_pending(image_paths, done) == ["c.png"]
+    assert batch_process.select_pending(image_paths, done, retry_failed=True) == ["b.png", "c.png", "d.png"]
+
+def test_percentile():
+    """
+    最近傍順位法の百分位数を確認する
+    """
+    assert batch_process.percentile([], 50) is None
+    assert batch_process.percentile([3.0], 95) == 3.0
+    values = [5.0, 1.0, 4.0, 2.0, 3.0]
+    assert batch_process.percentile(values, 50) == 3.0
+    assert batch_process.percentile(values, 95) == 5.0
+    assert batch_process.percentile(values, 0) == 1.0
+    assert batch_process.percentile(list(range(1, 101)), 95) == 95
+
+def test_summarize():
+    """
+    件数・失敗の内訳・画素数・段階ごとの所要時間が集計されることを確認する
+    """
+    records = [
+        _record("a.png", timings={"ocr": 1.0, "llm": 2.0, "total": 3.0}, pixels_saved=100),
+        _record("b.png", timings={"ocr": 3.0, "total": 4.0}, pixels_saved=50, pixels_upscaled=20),
+        _record("c.png", success=False, error="OCR失敗", timings={"ocr": 2.0, "total": 2.0}),
+        _record("d.png", success=False, error="OCR失敗"),
+    ]
+    records[1]["cached"] = True
+    summary = batch_process.summarize(records, elapsed=2.0)
+    assert (summary["processed"], summary["succeeded"], summary["failed"], summary["cached"]) == (4, 2, 2, 1)
+    assert summary["failures"] == {"OCR失敗": 2}
+    assert (summary["pixels_saved"], summary["pixels_upscaled"]) == (150, 20)
+    assert summary["throughput"] == 2.0
+    assert summary["stages"]["ocr"] == {"count": 3, "p50": 2.0, "p95": 3.0}
+    assert summary["stages"]["llm"] == {"count": 1, "p50": 2.0, "p95": 2.0}
+    assert summary["stages"]["qr"] == {"count": 0, "p50": None, "p95": None}
+    assert batch_process.summarize([], elapsed=0.0)["throughput"] == 0.0
+
+if __name__ == "__main__":
+    test_load_manifest_skips_broken_lines()
+    test_run_batch_repairs_partial_last_line()
+    test_select_pending_with_retry_failed()
+    test_percentile()
+    test_summarize()
+    print("すべてのテストが成功しました")
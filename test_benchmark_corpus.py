@@ -0,0 +1,129 @@
+"""
+ベンチマーク用の合成名刺コーパス（benchmark_corpus）の動作確認テスト
+"""
+
+import os
+import logging
+import tempfile
+
+import cv2
+import numpy as np
+from PIL import ImageDraw
+
+from benchmark_corpus import (
+    generate_corpus, load_corpus, make_card_spec, render_spec, normalize_value, score_fields, score_text
+)
+from generate_sample_card import CARD_WIDTH, CARD_HEIGHT
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def test_corpus_is_reproducible():
+    """
+    同じシードからは同じ画像と正解データが作成され、フォントが違っても内容は変わらないことを確認する
+    """
+    with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+        manifest = generate_corpus(first, count=6, seed=3)
+        assert generate_corpus(second, count=6, seed=3) == manifest
+        assert load_corpus(first) == manifest
+        for card in manifest["cards"]:
+            with open(os.path.join(first, card["file"]), "rb") as a, open(os.path.join(second, card["file"]), "rb") as b:
+                assert a.read() == b.read()
+        print("正解データの例:", manifest["cards"][0]["fields"])
+
+    with_fonts = make_card_spec(7, 3, ["jp.ttc"], ["en.ttf"])
+    without_fonts = make_card_spec(7, 3, [], [])
+    assert with_fonts["fields"] == without_fonts["fields"]
+    assert with_fonts["degrade"] == without_fonts["degrade"]
+
+def test_qr_ground_truth_is_readable():
+    """
+    劣化させる前の名刺では、正解のQRコードの内容をそのまま読み取れることを確認する
+    """
+    detector = cv2.QRCodeDetector()
+    checked = 0
+    for index in range(40):
+        spec = make_card_spec(index, 0, [], ["DejaVuSans.ttf"])
+        if not spec["qr_codes"]:
+            continue
+        gray = cv2.cvtColor(np.array(render_spec(spec)), cv2.COLOR_RGB2GRAY)
+        # QRコードは右下（縦書きの場合は左下）に配置される
+        height, width = gray.shape
+        bottom = gray[height * 3 // 5:]
+        corner = bottom[:, :width // 4] if spec["render"]["vertical"] else bottom[:, width * 3 // 4:]
+        value, _, _ = detector.detectAndDecode(corner)
+        assert value == spec["qr_codes"][0], spec["file"]
+        if spec["qr_codes"][0].startswith("https://sasaeai.com/"):
+            assert spec["fields"]["sasaeai URL"] == spec["qr_codes"][0]
+        checked += 1
+    print(f"QRコードを{checked}件確認しました")
+    assert checked >= 5
+
+def _drawn_text(spec):
+    """
+    名刺を描画し、描画した文字列と位置を (x, y, テキスト) のリストで返す
+    """
+    calls = []
+    original = ImageDraw.ImageDraw.text
+
+    def recording_text(self, xy, text, *args, **kwargs):
+        calls.append((xy[0], xy[1], text))
+        return original(self, xy, text, *args, **kwargs)
+
+    ImageDraw.ImageDraw.text = recording_text
+    try:
+        render_spec(spec)
+    finally:
+        ImageDraw.ImageDraw.text = original
+    return calls
+
+def test_vertical_text_matches_ground_truth():
+    """
+    縦書きの名刺でも、正解データの文字がすべて名刺の中（QRコードと重ならない位置）に描画されることを確認する
+    """
+    checked = 0
+    wrapped = 0
+    for index in range(200):
+        spec = make_card_spec(index, 0, [], ["DejaVuSans.ttf"])
+        if not spec["render"]["vertical"]:
+            continue
+        fields = spec["fields"]
+        expected = "".join([
+            fields["会社名"], fields["名前"], fields["職業"], f"〒{fields['郵便番号']} {fields['住所']}",
+            f"TEL: {fields['電話番号']}", f"Email: {fields['メールアドレス']}", fields["HP URL"],
+        ])
+        calls = _drawn_text(spec)
+        assert "".join(text for _, _, text in calls) == expected, spec["file"]
+        for x, y, _ in calls:
+            assert 0 <= x < CARD_WIDTH and 0 <= y < CARD_HEIGHT - 20, spec["file"]
+            if spec["qr_codes"]:
+                # QRコードは左下（左端から40ピクセル、下端から40ピクセル、一辺180ピクセル前後）
+                assert not (x < 40 + 200 and y > CARD_HEIGHT - 40 - 200), spec["file"]
+        # 項目の数（7列）より多い列を使った名刺は、列の下端で折り返している
+        wrapped += len({x for x, _, _ in calls}) > 7
+        checked += 1
+    print(f"縦書きの名刺を{checked}件確認しました（折り返しあり {wrapped}件）")
+    assert checked >= 5 and wrapped >= 1
+
+def test_scoring():
+    """
+    全角・半角、空白、ハイフンの種類の違いを無視して正解と比較することを確認する
+    """
+    assert normalize_value("０３－１２３４－５６７８") == "03-1234-5678"
+    expected = {"名前": "山田 太郎", "電話番号": "03-1234-5678", "郵便番号": "100-0005", "sasaeai URL": ""}
+    scores = score_fields(expected, {"名前": "山田太郎", "電話番号": "03−1234−5678", "郵便番号": "100-0006"})
+    assert scores == {"名前": True, "電話番号": True, "郵便番号": False}
+    assert score_fields(expected, None) == {"名前": False, "電話番号": False, "郵便番号": False}
+    text = "株式会社サンプル\n山田　太郎\nTEL: 03-1234-5678"
+    assert score_text(expected, text) == {"名前": True, "電話番号": True, "郵便番号": False}
+
+if __name__ == "__main__":
+    test_corpus_is_reproducible()
+    test_qr_ground_truth_is_readable()
+    test_vertical_text_matches_ground_truth()
+    test_scoring()
+    print("すべてのテストが成功しました")
@@ -0,0 +1,89 @@
+"""
+ディスクキャッシュ（modules.cache）の動作確認テスト
+"""
+
+import os
+import time
+import logging
+import tempfile
+from modules.cache import DiskCache, make_cache_key
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def test_get_set_and_counters():
+    """
+    保存した値が取得でき、ヒット・ミス数が集計されることを確認する
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = DiskCache(os.path.join(tmp_dir, "cache.sqlite3"), table="results")
+        key = make_cache_key(b"image-bytes", "v1")
+
+        assert cache.get(key) is None
+        cache.set(key, {"ocr_text": "山田太郎", "qr_text": None, "structured_data": {"名前": "山田太郎"}})
+        assert cache.get(key)["structured_data"]["名前"] == "山田太郎"
+
+        stats = cache.stats()
+        print("統計情報:", stats)
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+
+def test_key_depends_on_every_part():
+    """
+    キーの構成要素（画像・設定のバージョン）が変わるとキーも変わることを確認する
+    """
+    assert make_cache_key(b"a", "v1") == make_cache_key(b"a", "v1")
+    assert make_cache_key(b"a", "v1") != make_cache_key(b"a", "v2")
+    assert make_cache_key(b"a", "v1") != make_cache_key(b"b", "v1")
+    assert make_cache_key("ab", "c") != make_cache_key("a", "bc")
+
+def test_lru_eviction_by_entries():
+    """
+    件数上限を超えた場合、最も長く使われていないエントリが削除されることを確認する
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = DiskCache(os.path.join(tmp_dir, "cache.sqlite3"), max_entries=2)
+        cache.set("a", 1)
+        time.sleep(0.01)
+        cache.set("b", 2)
+        time.sleep(0.01)
+        cache.get("a")  # aを最近使用したことにする
+        time.sleep(0.01)
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+def test_eviction_by_size_and_ttl():
+    """
+    サイズ上限と有効期限によってエントリが削除されることを確認する
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = DiskCache(os.path.join(tmp_dir, "cache.sqlite3"), max_bytes=250)
+        cache.set("a", "x" * 100)
+        time.sleep(0.01)
+        cache.set("b", "y" * 100)
+        time.sleep(0.01)
+        cache.set("c", "z" * 100)
+        assert cache.get("a") is None
+        assert cache.stats()["bytes"] <= 250
+
+        expiring = DiskCache(os.path.join(tmp_dir, "cache.sqlite3"), table="expiring", ttl=0.05)
+        expiring.set("a", 1)
+        assert expiring.get("a") == 1
+        time.sleep(0.1)
+        assert expiring.get("a") is None
+
+if __name__ == "__main__":
+    print("===== ディスクキャッシュのテスト =====\n")
+    test_get_set_and_counters()
+    test_key_depends_on_every_part()
+    test_lru_eviction_by_entries()
+    test_eviction_by_size_and_ttl()
+    print("すべてのテストが完了しました")
@@ -0,0 +1,78 @@
+"""
+名刺の領域の検出・切り出し（modules.card_detector）の動作確認テスト
+"""
+
+import logging
+
+import cv2
+import numpy as np
+
+from modules.card_detector import crop_card, find_card_quad, order_corners
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# 名刺の縦横比（91mm x 55mm）
+CARD_ASPECT = 91 / 55
+
+def _card_photo():
+    """
+    暗い机の上に、傾けた名刺（白地に黒い文字の帯）を置いた写真を作成する
+    """
+    card = np.full((550, 910, 3), 255, np.uint8)
+    for y in range(80, 500, 70):
+        cv2.rectangle(card, (60, y), (600, y + 25), (0, 0, 0), -1)
+    photo = np.full((1500, 2000, 3), 60, np.uint8)
+    corners = np.array([[400, 350], [1450, 500], [1380, 1120], [330, 980]], np.float32)
+    matrix = cv2.getPerspectiveTransform(
+        np.array([[0, 0], [909, 0], [909, 549], [0, 549]], np.float32), corners
+    )
+    cv2.warpPerspective(card, matrix, (2000, 1500), dst=photo, borderMode=cv2.BORDER_TRANSPARENT)
+    return photo, corners
+
+def test_detect_and_warp_card():
+    """
+    傾いた名刺の4つの角を検出し、名刺の縦横比の画像に補正できることを確認する
+    """
+    photo, expected = _card_photo()
+    gray = cv2.cvtColor(photo, cv2.COLOR_BGR2GRAY)
+    cropped, corners = crop_card(photo, gray, 1075, CARD_ASPECT)
+
+    print("検出した角:", None if corners is None else corners.astype(int).tolist())
+    assert corners is not None
+    assert np.abs(corners - expected).max() < 20
+    assert cropped.shape[:2] == (650, 1075)
+    # 切り出した画像の大部分は名刺の白地で、机の色は含まれない
+    assert cv2.cvtColor(cropped, cv2.COLOR_BGR2GRAY).mean() > 150
+
+def test_fallback_without_card():
+    """
+    名刺の輪郭がない画像（スキャン画像や名刺の中の濃いロゴ）では画像全体を使うことを確認する
+    """
+    scan = np.full((650, 1075), 255, np.uint8)
+    cv2.rectangle(scan, (100, 100), (500, 340), 0, -1)  # 濃い色のロゴ（名刺の縦横比に近い）
+    assert find_card_quad(scan, CARD_ASPECT) is None
+
+    image = cv2.cvtColor(scan, cv2.COLOR_GRAY2BGR)
+    cropped, corners = crop_card(image, scan, 1075, CARD_ASPECT)
+    assert corners is None
+    assert cropped is image
+
+def test_order_corners():
+    """
+    角の順序が左上・右上・右下・左下になることを確認する（45度近く傾いた場合も含む）
+    """
+    shuffled = np.array([[10, 90], [90, 10], [10, 10], [90, 90]], np.float32)
+    assert order_corners(shuffled).tolist() == [[10, 10], [90, 10], [90, 90], [10, 90]]
+    diamond = np.array([[50, 0], [100, 50], [50, 100], [0, 50]], np.float32)
+    assert len({tuple(point) for point in order_corners(diamond).tolist()}) == 4
+
+if __name__ == "__main__":
+    test_detect_and_warp_card()
+    test_fallback_without_card()
+    test_order_corners()
+    print("すべてのテストが成功しました")
@@ -0,0 +1,80 @@
+"""
+診断情報の記録（modules.diagnostics）の動作確認テスト
+"""
+
+import os
+import logging
+import tempfile
+import threading
+
+import numpy as np
+
+from modules import diagnostics
+from modules.diagnostics import DiagnosticsSink
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def test_disabled_sink_does_nothing():
+    """
+    無効の場合はメモリにもディスクにも記録されないことを確認する
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        sink = DiagnosticsSink(enabled=False, directory=directory)
+        sink.record("qr_failed", "QRコード検出失敗", "request", np.zeros((10, 10), np.uint8))
+        assert sink.entries() == []
+        assert os.listdir(directory) == []
+    # デフォルトの設定では記録しない
+    assert not diagnostics.DIAGNOSTICS_ENABLED
+
+def test_ring_buffer_and_background_writes():
+    """
+    リングバッファは最大件数を超えると古いものから消え、ファイルは処理ごとのIDで書き込まれることを確認する
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        sink = DiagnosticsSink(enabled=True, directory=directory, max_entries=5)
+        request_ids = [diagnostics.new_request_id(f"card {index}.jpg") for index in range(4)]
+        assert len(set(request_ids)) == 4
+
+        # 複数のセッションから同時に記録する
+        def session(request_id):
+            sink.record("qr_region_failed", "候補領域で検出失敗", request_id, np.full((20, 20), 255, np.uint8))
+            sink.record("qr_failed", "QRコード検出失敗", request_id)
+        threads = [threading.Thread(target=session, args=(request_id,)) for request_id in request_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sink.flush(timeout=5)
+
+        assert len(sink.entries()) == 5
+        assert len(sink.entries(limit=2)) == 2
+        files = sorted(os.listdir(directory))
+        print("書き込まれたファイル:", files)
+        for request_id in request_ids:
+            assert f"{request_id}.log" in files
+            assert f"{request_id}_qr_region_failed.png" in files
+            with open(os.path.join(directory, f"{request_id}.log"), encoding="utf-8") as f:
+                assert len(f.read().splitlines()) == 2
+
+def test_full_queue_drops_writes():
+    """
+    書き込み待ちが上限に達した場合は記録を破棄し、処理を待たせないことを確認する
+    """
+    sink = DiagnosticsSink(enabled=True, directory=tempfile.gettempdir(), max_pending=1)
+    # 書き込み用のスレッドを起動させずに上限を超えさせる
+    sink._writer = threading.current_thread()
+    sink.record("a", "1")
+    sink.record("b", "2")
+    assert sink.dropped == 1
+    assert len(sink.entries()) == 2
+
+if __name__ == "__main__":
+    test_disabled_sink_does_nothing()
+    test_ring_buffer_and_background_writes()
+    test_full_queue_drops_writes()
+    print("すべてのテストが成功しました")
@@ -0,0 +1,78 @@
+"""
+Geminiクライアントプール（modules.gemini_client）の動作確認テスト
+
+実際のAPIは呼び出さず、偽のモデルで確認する。
+"""
+
+import logging
+import threading
+from modules.gemini_client import GeminiClientPool
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+class FakeModel:
+    """
+    プロンプトをそのまま返す偽のGenerativeModel
+    """
+
+    def __init__(self, model_name, generation_config=None, safety_settings=None):
+        self.model_name = model_name
+        self.generation_config = generation_config
+
+    def generate_content(self, prompt, request_options=None):
+        class Response:
+            text = f" {prompt} "
+        return Response()
+
+def test_model_is_created_once_per_config():
+    """
+    APIの設定は1回だけ行われ、モデルはモデル名・生成設定ごとに使い回されることを確認する
+    """
+    configure_calls = []
+    created = []
+
+    def factory(*args, **kwargs):
+        model = FakeModel(*args, **kwargs)
+        created.append(model)
+        return model
+
+    pool = GeminiClientPool("dummy-key", configure=lambda **kwargs: configure_calls.append(kwargs),
+                            model_factory=factory)
+
+    def worker():
+        for _ in range(10):
+            pool.generate("model-a", "こんにちは", timeout=30, generation_config={"temperature": 0.1})
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pool.generate("model-a", "こんにちは", generation_config={"temperature": 0.5})
+
+    stats = pool.stats()
+    print("統計情報:", stats)
+    assert len(configure_calls) == 1
+    assert len(created) == 2
+    assert stats["calls"] == 41
+
+def test_generate_reports_timing():
+    """
+    レスポンスとあわせてセットアップ時間・リクエスト時間が返されることを確認する
+    """
+    pool = GeminiClientPool("dummy-key", configure=lambda **kwargs: None, model_factory=FakeModel)
+    text, timing = pool.generate("model-a", "山田太郎")
+    assert text == "山田太郎"
+    assert set(timing) == {"setup", "request"}
+    assert timing["setup"] >= 0 and timing["request"] >= 0
+
+if __name__ == "__main__":
+    print("===== Geminiクライアントプールのテスト =====\n")
+    test_model_is_created_once_per_config()
+    test_generate_reports_timing()
+    print("すべてのテストが完了しました")
@@ -0,0 +1,155 @@
+"""
+メモリ上の名刺画像（modules.image_source）の動作確認テスト
+"""
+
+import io
+import logging
+import threading
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from modules import image_source, ocr
+from modules.image_source import CardImage, load_card_image, plan_normalization, card_long_side
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def _png_bytes():
+    """
+    テスト用の画像（白地に黒い矩形）をPNGのバイト列で作成する
+    """
+    image = np.full((60, 100, 3), 255, np.uint8)
+    cv2.rectangle(image, (20, 15), (80, 45), (0, 0, 0), -1)
+    ok, encoded = cv2.imencode(".png", image)
+    assert ok
+    return encoded.tobytes()
+
+def test_decode_once_and_lazy_derivatives():
+    """
+    デコードは1回だけ行われ、派生画像は必要になるまで作成されないことを確認する
+    """
+    calls = []
+    original_imdecode = image_source.cv2.imdecode
+
+    def counting_imdecode(*args, **kwargs):
+        calls.append(1)
+        return original_imdecode(*args, **kwargs)
+
+    image_source.cv2.imdecode = counting_imdecode
+    try:
+        card = CardImage.from_bytes(_png_bytes(), "card.png")
+        assert card.derived_names() == []
+
+        # OCRとQRコード読み取りを模して、2つのスレッドから同時に参照する
+        threads = [threading.Thread(target=lambda: card.binary) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        processed = ocr.preprocess_image(card)
+    finally:
+        image_source.cv2.imdecode = original_imdecode
+
+    print("作成済みの派生画像:", card.derived_names())
+    assert len(calls) == 1
+    assert card.derived_names() == ["bgr", "binary", "denoise", "gray"]
+    assert processed["gray"] is card.gray
+    assert processed["binary"] is card.binary
+    assert set(np.unique(card.binary)) <= {0, 255}
+
+def test_load_card_image_sources():
+    """
+    バイト列・バッファ・PIL画像のどれからでも同じ画像として読み込めることを確認する
+    """
+    data = _png_bytes()
+    buffer = io.BytesIO(data)
+    buffer.name = "upload.png"
+    cards = [
+        load_card_image(data),
+        load_card_image(buffer),
+        load_card_image(Image.open(io.BytesIO(data))),
+    ]
+    assert cards[1].name == "upload.png"
+    assert cards[0].data == cards[1].data == data
+    for card in cards[1:]:
+        assert np.array_equal(card.bgr, cards[0].bgr)
+    assert load_card_image(cards[0]) is cards[0]
+
+    broken = CardImage.from_bytes(b"not an image", "broken.png")
+    try:
+        broken.bgr
+    except ValueError as e:
+        print("想定どおりのエラー:", e)
+    else:
+        raise AssertionError("壊れた画像でエラーになりませんでした")
+
+def test_plan_normalization():
+    """
+    写真は縮小デコードと縮小、小さな画像は拡大、名刺サイズのスキャン画像はそのままになることを確認する
+    """
+    target = card_long_side(300)
+    assert target == 1075
+    # 12MPの写真: 1/2で縮小デコードし、名刺が7割の大きさで写っていても300dpiになる長辺まで縮小
+    assert plan_normalization(4000, 3000, jpeg=True, card_fill=0.7) == (2, round(target / 0.7))
+    # PNGは縮小デコードできないため、デコード後に縮小する
+    assert plan_normalization(4000, 3000, jpeg=False, card_fill=0.7) == (1, round(target / 0.7))
+    # 300dpiの名刺画像はそのまま、小さな画像は拡大
+    assert plan_normalization(1075, 650, jpeg=True) == (1, 0)
+    assert plan_normalization(500, 300, jpeg=False) == (1, target)
+    # 画素数の上限を超える場合は縮小率を上げ、縮小デコードできなければエラー
+    assert plan_normalization(4000, 3000, jpeg=True, card_fill=0.2, max_pixels=2_000_000)[0] == 4
+    try:
+        plan_normalization(4000, 3000, jpeg=False, max_pixels=2_000_000)
+    except ValueError as e:
+        print("想定どおりのエラー:", e)
+    else:
+        raise AssertionError("画素数の上限を超えてもエラーになりませんでした")
+
+def test_exif_orientation_and_reduced_decode():
+    """
+    EXIFの向きが補正され、大きなJPEGは縮小してデコードされることを確認する
+    """
+    # 横長の名刺を縦向きに保存した写真（Orientation=6: 表示時に時計回りに90度回転）
+    photo = Image.new("RGB", (3000, 4000), "white")
+    photo.paste((0, 0, 0), (0, 0, 3000, 400))  # 保存時の上端 = 補正後の右端
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    buffer = io.BytesIO()
+    photo.save(buffer, format="JPEG", exif=exif)
+
+    card = CardImage.from_bytes(buffer.getvalue(), "photo.jpg")
+    height, width = card.gray.shape
+    print("正規化の内容:", card.normalization)
+    assert width > height
+    assert card.gray[height // 2, width - 5] < 128
+    assert card.gray[height // 2, 5] > 128
+    assert card.normalization["reduction"] == 2
+    assert card.normalization["pixels_saved"] > 10_000_000
+    assert card.normalization["pixels_upscaled"] == 0
+
+def test_upscaled_pixels_are_reported_separately():
+    """
+    小さな画像を拡大した場合、削減画素数は負にならず、増えた画素数が別に記録されることを確認する
+    """
+    buffer = io.BytesIO()
+    Image.new("RGB", (500, 300), "white").save(buffer, format="PNG")
+    card = CardImage.from_bytes(buffer.getvalue(), "small.png")
+    card.bgr
+    print("正規化の内容:", card.normalization)
+    assert card.normalization["pixels_saved"] == 0
+    width, height = card.normalization["output_size"]
+    assert card.normalization["pixels_upscaled"] == width * height - 500 * 300 > 0
+
+if __name__ == "__main__":
+    test_decode_once_and_lazy_derivatives()
+    test_load_card_image_sources()
+    test_plan_normalization()
+    test_exif_orientation_and_reduced_decode()
+    test_upscaled_pixels_are_reported_separately()
+    print("すべてのテストが成功しました")
@@ -0,0 +1,159 @@
+"""
+バックグラウンド処理のジョブキュー（modules.job_queue）の動作確認テスト
+"""
+
+import time
+import logging
+import threading
+
+from modules import job_queue
+from modules.job_queue import CardJobQueue, STATUS_QUEUED, STATUS_OCR, STATUS_QR, STATUS_LLM, STATUS_DONE, STATUS_FAILED
+from modules.rate_limiter import PRIORITY_INTERACTIVE, PRIORITY_BATCH
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# 待機の上限（秒）
+TIMEOUT = 5
+
+class SteppedProcessCard:
+    """
+    段階ごとにテストからの合図を待つprocess_cardの代わり（ジョブの状態の遷移を確認するため）
+    """
+
+    def __init__(self, success=True, error=None):
+        self.success = success
+        self.error = error
+        self.reached = threading.Semaphore(0)
+        self.proceed = threading.Semaphore(0)
+        self.calls = []
+
+    def __call__(self, image, priority, on_field, on_stage, profile):
+        self.calls.append({"name": image.name, "priority": priority, "profile": profile})
+        for stage in (STATUS_OCR, STATUS_QR, STATUS_LLM):
+            on_stage(stage)
+            self.reached.release()
+            assert self.proceed.acquire(timeout=TIMEOUT)
+        if self.error:
+            raise RuntimeError(self.error)
+        on_field("会社名", "株式会社サンプル")
+        return {"success": self.success, "error": None if self.success else "OCRに失敗しました",
+                "data": {"会社名": "株式会社サンプル"} if self.success else None}
+
+    def step(self, queue, job_id):
+        """
+        次の段階に入るまで待ち、その時点のジョブの状態を返す
+        """
+        assert self.reached.acquire(timeout=TIMEOUT)
+        return queue.snapshot([job_id])[0]["status"]
+
+    def finish(self, stages=(STATUS_OCR, STATUS_QR, STATUS_LLM)):
+        """
+        残りの段階をすべて進める
+        """
+        for _ in stages:
+            assert self.reached.acquire(timeout=TIMEOUT)
+            self.proceed.release()
+
+def _wait_finished(queue, job_ids):
+    deadline = time.time() + TIMEOUT
+    while time.time() < deadline:
+        jobs = queue.snapshot(job_ids)
+        if all(job["status"] in (STATUS_DONE, STATUS_FAILED) for job in jobs):
+            return jobs
+        time.sleep(0.01)
+    raise AssertionError("ジョブが時間内に終わりませんでした")
+
+def _with_process_card(stub, test):
+    original = job_queue.process_card
+    job_queue.process_card = stub
+    queue = CardJobQueue(max_workers=1)
+    try:
+        test(queue)
+    finally:
+        for _ in range(3):
+            stub.proceed.release()
+        queue._executor.shutdown(wait=True)
+        job_queue.process_card = original
+
+def test_stage_transitions():
+    """
+    ジョブの状態が 待機中 → OCR → QR → LLM → 完了 と遷移し、抽出した項目と結果が取得できることを確認する
+    """
+    stub = SteppedProcessCard()
+
+    def test(queue):
+        first, second = queue.submit([("a.png", b"a"), ("b.png", b"b")], profile=True)
+        assert stub.step(queue, first) == STATUS_OCR
+        # ワーカーが1つのため、2件目は待機中のまま
+        assert queue.snapshot([second])[0]["status"] == STATUS_QUEUED
+        stub.proceed.release()
+        assert stub.step(queue, first) == STATUS_QR
+        stub.proceed.release()
+        assert stub.step(queue, first) == STATUS_LLM
+        stub.proceed.release()
+        job = _wait_finished(queue, [first])[0]
+        assert job["status"] == STATUS_DONE
+        assert job["fields"] == {"会社名": "株式会社サンプル"}
+        assert job["result"]["data"] == {"会社名": "株式会社サンプル"}
+        # 処理が終わった画像は保持しない
+        assert queue._jobs[first].image is None
+        assert stub.calls[0] == {"name": "a.png", "priority": PRIORITY_BATCH, "profile": True}
+
+    _with_process_card(stub, test)
+
+def test_failed_jobs():
+    """
+    処理結果が失敗の場合と、処理中に例外が発生した場合にジョブが失敗になることを確認する
+    """
+    for stub, expected_error in [
+        (SteppedProcessCard(success=False), "OCRに失敗しました"),
+        (SteppedProcessCard(error="想定外のエラー"), "処理中にエラーが発生しました: 想定外のエラー"),
+    ]:
+        def test(queue):
+            job_id, = queue.submit([("card.png", b"card")])
+            stub.finish()
+            job = _wait_finished(queue, [job_id])[0]
+            assert job["status"] == STATUS_FAILED
+            assert job["error"] == expected_error
+            assert stub.calls[0]["priority"] == PRIORITY_INTERACTIVE
+
+        _with_process_card(stub, test)
+
+def test_forget_and_prune():
+    """
+    forgetは完了したジョブだけを削除し、pruneは完了から一定時間を過ぎたジョブだけを削除することを確認する
+    """
+    stub = SteppedProcessCard()
+
+    def test(queue):
+        done_id, = queue.submit([("done.png", b"done")])
+        stub.finish()
+        _wait_finished(queue, [done_id])
+        running_id, = queue.submit([("running.png", b"running")])
+        assert stub.step(queue, running_id) == STATUS_OCR
+
+        queue.forget([done_id, running_id])
+        assert [job["id"] for job in queue.snapshot([done_id, running_id])] == [running_id]
+
+        stub.proceed.release()
+        stub.finish((STATUS_QR, STATUS_LLM))
+        _wait_finished(queue, [running_id])
+        recent_id, = queue.submit([("recent.png", b"recent")])
+        stub.finish()
+        _wait_finished(queue, [recent_id])
+        queue._jobs[running_id].finished = time.time() - 120
+        queue.prune(max_age=60)
+        assert [job["id"] for job in queue.snapshot([running_id, recent_id])] == [recent_id]
+
+    _with_process_card(stub, test)
+
+if __name__ == "__main__":
+    test_stage_transitions()
+    test_failed_jobs()
+    test_forget_and_prune()
+    print("すべてのテストが成功しました")
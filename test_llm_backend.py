@@ -0,0 +1,78 @@
+"""
+LLMバックエンド（modules.llm_backend）とスタブサーバ（modules.llm_stub_server）の動作確認テスト
+
+Gemini APIは呼び出さず、ローカルのスタブサーバと記録・再生で確認する。
+"""
+
+import os
+import logging
+import tempfile
+from modules import parser, rate_limiter
+from modules.llm_backend import HTTPStubBackend, RecordReplayBackend
+from modules.llm_stub_server import StubBehavior, start_stub_server
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SAMPLE_TEXT = """山田太郎
+株式会社サンプル
+〒100-0001 東京都千代田区丸の内1-1-1
+TEL: 03-1234-5678
+yamada@example.com
+https://www.example.com"""
+
+def test_parse_text_with_stub_server():
+    """
+    スタブサーバが429エラーを返しても、再試行してparse_textの結果が得られることを確認する
+    """
+    behavior = StubBehavior(latency=0.01, rate_limit_rate=0.5, seed=1)
+    server = start_stub_server(behavior=behavior)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    original_delay = rate_limiter.GEMINI_RETRY_BASE_DELAY
+    parser.set_llm_backend(HTTPStubBackend(url))
+    rate_limiter.GEMINI_RETRY_BASE_DELAY = 0.01
+    try:
+        results = [parser.parse_text(SAMPLE_TEXT, use_cache=False) for _ in range(5)]
+        batch = parser.parse_texts_batch([(SAMPLE_TEXT, None)] * 3, use_cache=False)
+    finally:
+        parser.set_llm_backend(None)
+        rate_limiter.GEMINI_RETRY_BASE_DELAY = original_delay
+        server.shutdown()
+
+    print("スタブサーバの集計:", behavior.counts)
+    assert all(result["メールアドレス"] == "yamada@example.com" for result in results)
+    assert all(result["郵便番号"] == "100-0001" for result in batch)
+    assert behavior.counts["rate_limited"] > 0
+
+def test_record_and_replay():
+    """
+    記録した応答がAPIを呼び出さずに再生でき、未記録のプロンプトはエラーになることを確認する
+    """
+    server = start_stub_server(behavior=StubBehavior(latency=0.0))
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            recorder = RecordReplayBackend(tmp_dir, mode="record", inner=HTTPStubBackend(url))
+            recorded = recorder.generate("###OCRテキスト###\n" + SAMPLE_TEXT)
+            assert len(os.listdir(tmp_dir)) == 1
+            server.shutdown()
+
+            player = RecordReplayBackend(tmp_dir, mode="replay")
+            assert player.generate("###OCRテキスト###\n" + SAMPLE_TEXT) == recorded
+            try:
+                player.generate("未記録のプロンプト")
+                assert False, "例外が送出されていません"
+            except RuntimeError:
+                pass
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    print("===== LLMバックエンドのテスト =====\n")
+    test_parse_text_with_stub_server()
+    test_record_and_replay()
+    print("すべてのテストが完了しました")
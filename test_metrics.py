@@ -0,0 +1,139 @@
+"""
+処理時間・件数の計測（modules.metrics）の動作確認テスト
+"""
+
+import os
+import json
+import random
+import logging
+import tempfile
+import urllib.request
+
+from modules import metrics, parser
+from modules.cache import DiskCache
+from modules.rate_limiter import call_with_retry
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def _enable():
+    metrics.registry.reset()
+    metrics.set_enabled(True)
+
+def _disable():
+    metrics.set_enabled(False)
+    metrics.registry.reset()
+
+def test_disabled_records_nothing():
+    """
+    無効の場合は何も記録されず、spanは共有の何もしないオブジェクトを返すことを確認する
+    """
+    _disable()
+    assert not metrics.is_enabled()
+    span = metrics.span("ocr_pass", image="gray")
+    assert span is metrics.span("qr_strategy")
+    with span:
+        metrics.inc("cache_lookups_total", result="hit")
+        metrics.observe("llm_prompt_chars", 1200)
+    assert metrics.to_dict() == {"counters": {}, "histograms": {}}
+
+def test_spans_counters_and_exports():
+    """
+    処理時間・件数・サイズが記録され、PrometheusのテキストとJSONで出力されることを確認する
+    """
+    _enable()
+    try:
+        @metrics.timed("export", format="csv")
+        def export():
+            return "ok"
+
+        assert export() == "ok"
+        with metrics.span("qr_strategy", strategy="roi"):
+            pass
+        try:
+            with metrics.span("qr_strategy", strategy="roi"):
+                raise ValueError("失敗")
+        except ValueError:
+            pass
+        metrics.inc("llm_json_parse_total", method="direct")
+        metrics.inc("llm_json_parse_total", method="direct")
+        metrics.observe("llm_prompt_chars", 1200)
+
+        data = metrics.to_dict()
+        print("JSON:", json.dumps(data, ensure_ascii=False)[:300])
+        assert data["counters"]["llm_json_parse_total"] == [{"labels": {"method": "direct"}, "value": 2}]
+        assert data["histograms"]["export_seconds"][0]["count"] == 1
+        statuses = [series["labels"].get("status") for series in data["histograms"]["qr_strategy_seconds"]]
+        assert sorted(statuses, key=str) == sorted([None, "error"], key=str)
+        prompt_chars = data["histograms"]["llm_prompt_chars"][0]
+        assert prompt_chars["buckets"]["1000"] == 0 and prompt_chars["buckets"]["3000"] == 1
+
+        text = metrics.to_prometheus()
+        print(text)
+        assert "# TYPE meishi_llm_json_parse_total counter" in text
+        assert 'meishi_llm_json_parse_total{method="direct"} 2' in text
+        assert 'meishi_llm_prompt_chars_bucket{le="+Inf"} 1' in text
+        assert 'meishi_export_seconds_count{format="csv"} 1' in text
+    finally:
+        _disable()
+
+def test_instrumented_modules():
+    """
+    キャッシュのヒット・429エラー・JSONの修復が計測されることを確認する
+    """
+    _enable()
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = DiskCache(os.path.join(tmp_dir, "cache.sqlite3"), table="results")
+            cache.get("missing")
+            cache.set("key", {"value": 1})
+            cache.get("key")
+
+        errors = [Exception("429 Resource has been exhausted (e.g. check quota).")]
+
+        def request(timeout):
+            if errors:
+                raise errors.pop()
+            return "{}"
+        call_with_retry(request, max_retries=2, sleep=lambda seconds: None, rng=random.Random(0))
+
+        parser._parse_json_response('```json\n{"名前": "山田太郎"}\n```')
+
+        counters = metrics.to_dict()["counters"]
+        print("カウンタ:", counters)
+        assert {"labels": {"result": "hit", "table": "results"}, "value": 1} in counters["cache_lookups_total"]
+        assert {"labels": {"result": "miss", "table": "results"}, "value": 1} in counters["cache_lookups_total"]
+        assert counters["llm_errors_total"] == [{"labels": {"reason": "429"}, "value": 1}]
+        assert counters["llm_retries_total"][0]["value"] == 1
+        assert counters["llm_json_parse_total"] == [{"labels": {"method": "cleaned"}, "value": 1}]
+    finally:
+        _disable()
+
+def test_http_endpoint():
+    """
+    HTTPサーバで /metrics と /metrics.json を取得できることを確認する
+    """
+    _enable()
+    server = metrics.start_http_server(0)
+    try:
+        metrics.inc("cards_total", status="success")
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(f"{base}/metrics", timeout=5) as response:
+            assert 'meishi_cards_total{status="success"} 1' in response.read().decode("utf-8")
+        with urllib.request.urlopen(f"{base}/metrics.json", timeout=5) as response:
+            assert json.loads(response.read())["counters"]["cards_total"][0]["value"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+        _disable()
+
+if __name__ == "__main__":
+    test_disabled_records_nothing()
+    test_spans_counters_and_exports()
+    test_instrumented_modules()
+    test_http_endpoint()
+    print("すべてのテストが成功しました")
@@ -4,7 +4,10 @@ OCRモジュールの重複テキスト除去機能のテスト
 
 import os
 import sys
+import time
 import logging
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
 from modules import ocr
 from pprint import pprint
 
@@ -72,6 +75,7 @@ def test_duplicate_removal():
     ]
     
     # 各テストケースを実行
+    failed_cases = []
     for i, case in enumerate(test_cases):
         logger.info(f"テストケース {i+1}: {case['name']}")
         print(f"\n===== テストケース {i+1}: {case['name']} =====")
@@ -96,6 +100,125 @@ def test_duplicate_removal():
         
         if not success:
             logger.warning(f"テストケース {i+1} 失敗: 結果数 {len(result)} != 期待値 {case['expected_count']}")
+            failed_cases.append(case['name'])
+    
+    assert not failed_cases, f"失敗したテストケース: {', '.join(failed_cases)}"
+
+def test_parallel_passes_keep_order():
+    """
+    並列実行でも逐次実行と同じパスの結果が同じ順序で返ること、
+    Tesseract内部のスレッド数が起動時に制限されていることを確認する
+    """
+    images = {"original": None, "gray": "gray", "binary": "binary", "denoised": "denoised"}
+    passes = ocr.build_ocr_passes(images, configs=["-l jpn --psm 6", "-l eng --psm 4", "-l jpn --psm 11"])
+    
+    def runner(img_name, proc_img, config):
+        # 後のパスほど早く終わるようにして、完了順と入力順を変える
+        time.sleep(0.002 * (len(passes) - passes.index((img_name, proc_img, config))))
+        return {"image": img_name, "config": config, "text": f"{proc_img} {config}", "error": None}
+    
+    sequential = ocr.run_ocr_passes(passes, max_workers=1, runner=runner)
+    parallel = ocr.run_ocr_passes(passes, max_workers=4, runner=runner)
+    assert len(sequential) == len(passes) == 9
+    assert parallel == sequential
+    assert [(result["image"], result["config"]) for result in parallel] == \
+        [(img_name, config) for img_name, _, config in passes]
+    if ocr.OCR_MAX_WORKERS > 1:
+        assert os.environ.get("OMP_THREAD_LIMIT")
+
+def test_parallel_passes_share_one_pool():
+    """
+    複数の名刺を同時にOCRしても、共有のスレッドプールで実行され、同時に実行するパスの数が
+    呼び出しごとのmax_workersとプロセス全体のOCR_MAX_WORKERSを超えないことを確認する
+    """
+    lock = threading.Lock()
+    running = {"total": 0, "max_total": 0}
+    per_call = {}
+    threads = set()
+    
+    def runner(img_name, proc_img, config):
+        with lock:
+            running["total"] += 1
+            per_call[proc_img] = per_call.get(proc_img, 0) + 1
+            running["max_total"] = max(running["max_total"], running["total"])
+            running[f"max_{proc_img}"] = max(running.get(f"max_{proc_img}", 0), per_call[proc_img])
+            threads.add(threading.current_thread().name)
+        time.sleep(0.01)
+        with lock:
+            running["total"] -= 1
+            per_call[proc_img] -= 1
+        return {"image": img_name, "config": config, "text": proc_img, "error": None}
+    
+    def run_card(card):
+        passes = ocr.build_ocr_passes({"gray": card, "binary": card}, configs=["-l jpn --psm 6", "-l eng --psm 6"])
+        return ocr.run_ocr_passes(passes, max_workers=2, runner=runner)
+    
+    with ThreadPoolExecutor(max_workers=6) as cards:
+        results = list(cards.map(run_card, [f"card{index}" for index in range(6)]))
+    assert all(len(card_results) == 4 for card_results in results)
+    assert all(max_used <= 2 for key, max_used in running.items() if key.startswith("max_card"))
+    assert running["max_total"] <= ocr.OCR_MAX_WORKERS
+    assert all(name.startswith("ocr") for name in threads)
+    assert len(threads) <= ocr.OCR_MAX_WORKERS
+    assert ocr.get_ocr_executor() is ocr.get_ocr_executor()
+
+def test_cascade_waits_for_japanese_pass():
+    """
+    カスケードがコストの低い順に実行され、日本語の名刺では英語のパスだけで打ち切らないことを確認する
+    """
+    configs = ["-l jpn+eng --psm 3", "-l jpn --psm 6", "-l eng --psm 6"]
+    passes = ocr.build_ocr_passes({"gray": "gray"}, configs=configs)
+    contact = "yamada@example.com\n03-1234-5678\nhttps://www.example.com"
+    
+    def runner(img_name, proc_img, config):
+        return {"image": img_name, "config": config, "text": contact, "confidence": 90.0,
+                "elapsed": 0.0, "error": None}
+    
+    results, stats = ocr.run_ocr_cascade(passes, min_confidence=80, min_coverage=0.5, runner=runner)
+    assert [result["config"] for result in results] == ["-l eng --psm 6", "-l jpn --psm 6"]
+    assert (stats["passes_used"], stats["passes_total"], stats["stopped_early"]) == (2, 3, True)
+    
+    # 英語のみと判定した名刺は最初の英語のパスで打ち切る
+    results, stats = ocr.run_ocr_cascade(passes, min_confidence=80, min_coverage=0.5,
+                                         require_japanese=False, runner=runner)
+    assert [result["config"] for result in results] == ["-l eng --psm 6"]
+    assert stats["passes_used"] == 1
+    
+    # 信頼度が閾値に達しない場合はすべてのパスを実行する
+    results, stats = ocr.run_ocr_cascade(passes, min_confidence=95, min_coverage=0.5, runner=runner)
+    assert [result["config"] for result in results] == ["-l eng --psm 6", "-l jpn --psm 6", "-l jpn+eng --psm 3"]
+    assert (stats["passes_used"], stats["stopped_early"]) == (3, False)
+
+def test_cancelled_passes_are_not_run():
+    """
+    中止を要求すると、逐次実行・並列実行・カスケードのいずれでも残りのパスを実行せずに
+    CancelledErrorを送出することを確認する
+    """
+    passes = ocr.build_ocr_passes({"gray": "gray", "binary": "binary"},
+                                  configs=["-l jpn --psm 6", "-l eng --psm 6", "-l jpn --psm 11"])
+    for max_workers, cascade in [(1, False), (2, False), (1, True)]:
+        cancel_event = threading.Event()
+        calls = []
+        
+        def runner(img_name, proc_img, config):
+            calls.append(img_name)
+            # 最初のパスの実行中に中止が要求されたものとする
+            cancel_event.set()
+            time.sleep(0.01)
+            return {"image": img_name, "config": config, "text": "", "confidence": 0.0,
+                    "elapsed": 0.0, "error": None}
+        
+        try:
+            if cascade:
+                ocr.run_ocr_cascade(passes, runner=runner, cancel_event=cancel_event)
+            else:
+                ocr.run_ocr_passes(passes, max_workers=max_workers, runner=runner, cancel_event=cancel_event)
+        except CancelledError as e:
+            print("想定どおりのエラー:", e)
+        else:
+            raise AssertionError("中止を要求してもCancelledErrorが送出されませんでした")
+        # 並列実行では中止の要求より前に投入したパスだけが実行される
+        assert 1 <= len(calls) <= max_workers, (max_workers, cascade, calls)
 
 def test_ocr_with_sample():
     """
@@ -129,6 +252,10 @@ def test_ocr_with_sample():
 if __name__ == "__main__":
     print("===== 重複テキスト除去機能のテスト =====\n")
     test_duplicate_removal()
+    test_parallel_passes_keep_order()
+    test_parallel_passes_share_one_pool()
+    test_cascade_waits_for_japanese_pass()
+    test_cancelled_passes_are_not_run()
     
     print("\n\n===== サンプル画像OCRテスト =====\n")
     test_ocr_with_sample() 
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""
+複数名刺の一括解析（parse_texts_batch, _parse_batch_response）の動作確認テスト
+"""
+
+import logging
+from modules import parser
+from modules.llm_backend import LLMBackend
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# ルールベースでは項目を確定できない名刺（Gemini APIに送られる）
+CARDS = [("カードA", None), ("カードB", None), ("カードC", None)]
+
+class ScriptedBackend(LLMBackend):
+    """
+    受け取ったプロンプトを記録し、用意した応答を順に返すバックエンド
+    """
+
+    name = "scripted"
+    rate_limited = False
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.prompts = []
+
+    def generate(self, prompt, timeout=None):
+        self.prompts.append(prompt)
+        return self.responses.pop(0)
+
+def _item(card_id, company):
+    return f'{{"card_id": {card_id}, "会社名": "{company}", "その他": ""}}'
+
+def _run_batch(responses, **kwargs):
+    backend = ScriptedBackend(responses)
+    parser.set_llm_backend(backend)
+    try:
+        results = parser.parse_texts_batch(CARDS, batch_size=3, use_cache=False, **kwargs)
+    finally:
+        parser.set_llm_backend(None)
+    return results, backend
+
+def test_length_mismatch_keeps_valid_items():
+    """
+    件数が一致しないレスポンスでも、検証を通った要素は使われることを確認する
+    """
+    parsed = parser._parse_batch_response(f"[{_item(0, 'A社')}, {_item(2, 'C社')}]", [0, 1, 2])
+    assert sorted(parsed) == [0, 2]
+    assert parsed[2] == {"会社名": "C社", "その他": ""}
+
+def test_invalid_and_duplicate_card_ids_are_ignored():
+    """
+    card_idが不正・想定外・重複している要素が無視されることを確認する（重複は最初の要素を使う）
+    """
+    response = ("```json\n["
+                f'{_item(0, "A社")}, {_item(0, "重複")}, {_item(5, "想定外")}, '
+                '{"card_id": "x", "会社名": "不正"}, {"会社名": "IDなし"}, "文字列"'
+                "]\n```")
+    parsed = parser._parse_batch_response(response, [0, 1])
+    assert list(parsed) == [0]
+    assert parsed[0]["会社名"] == "A社"
+
+    try:
+        parser._parse_batch_response(f"[{_item(7, 'X社')}]", [0, 1])
+    except RuntimeError as e:
+        print("想定どおりのエラー:", e)
+    else:
+        raise AssertionError("有効な要素がないレスポンスでエラーになりませんでした")
+
+def test_broken_array_is_parsed_per_object():
+    """
+    JSON配列として壊れたレスポンスでも、要素ごとにパースできたものが使われることを確認する
+    """
+    parsed = parser._parse_batch_response(f"[{_item(0, 'A社')}, {_item(1, 'B社')},", [0, 1])
+    assert parsed[0]["会社名"] == "A社"
+    assert parsed[1]["会社名"] == "B社"
+
+def test_missing_cards_fall_back_to_parse_text():
+    """
+    一括解析で結果が得られなかった名刺だけがparse_textで1件ずつ解析され、入力の順序で返ることを確認する
+    """
+    results, backend = _run_batch([
+        f"[{_item(0, 'A社')}, {_item(2, 'C社')}]",
+        '{"会社名": "B社", "その他": ""}',
+    ])
+    assert [result["会社名"] for result in results] == ["A社", "B社", "C社"]
+    assert len(backend.prompts) == 2
+    assert "カードB" in backend.prompts[1] and "カードA" not in backend.prompts[1]
+
+def test_unusable_batch_response_falls_back_for_every_card():
+    """
+    一括解析のレスポンスが使えない場合は全件を個別に解析し、失敗した名刺は例外オブジェクトになることを確認する
+    """
+    results, backend = _run_batch([
+        "解析できません",
+        '{"会社名": "A社", "その他": ""}',
+        "これもJSONではありません",
+        '{"会社名": "C社", "その他": ""}',
+    ], return_exceptions=True)
+    assert len(backend.prompts) == 4
+    assert results[0]["会社名"] == "A社"
+    assert isinstance(results[1], RuntimeError)
+    assert results[2]["会社名"] == "C社"
+
+def test_known_fields_per_card():
+    """
+    名刺ごとの確定済みの項目（QRコードの値）が、ルールベースの高速経路・一括解析・個別解析のすべてで使われることを確認する
+    """
+    known = {"名前": "山田 太郎", "会社名": "QR商事", "職業": "営業", "メールアドレス": "yamada@example.com",
+             "電話番号": "03-1234-5678", "郵便番号": "100-0001", "住所": "東京都千代田区丸の内1-1-1",
+             "HP URL": "https://www.example.com", "sasaeai URL": "https://sasaeai.link-platform.jp/1",
+             "その他": "FAX: 03-1234-5679"}
+    results, backend = _run_batch([
+        f"[{_item(0, 'A社')}]",
+        '{"会社名": "C社", "その他": ""}',
+    ], known_fields=[{"会社名": "QR商事", "その他": "FAX: 03-1234-5679"}, known, {"会社名": "QRシステム"}])
+    # 2件目はQRコードで全項目が確定したためGemini APIに送らない
+    assert len(backend.prompts) == 2
+    assert "カードB" not in backend.prompts[0] and "カードC" in backend.prompts[1]
+    assert results[1] == known
+    # Gemini APIの結果よりQRコードで確定した値を優先し、「その他」は追記する
+    assert results[0]["会社名"] == "QR商事"
+    assert results[0]["その他"] == "FAX: 03-1234-5679"
+    # 個別解析に回った名刺は確定済みの項目を除いて解析する
+    assert "QRシステム" in backend.prompts[1]
+    assert results[2]["会社名"] == "QRシステム"
+
+    try:
+        parser.parse_texts_batch(CARDS, known_fields=[None])
+    except ValueError as e:
+        print("想定どおりのエラー:", e)
+    else:
+        raise AssertionError("件数が一致しないknown_fieldsでエラーになりませんでした")
+
+if __name__ == "__main__":
+    print("===== 一括解析のテスト =====\n")
+    test_length_mismatch_keeps_valid_items()
+    test_invalid_and_duplicate_card_ids_are_ignored()
+    test_broken_array_is_parsed_per_object()
+    test_missing_cards_fall_back_to_parse_text()
+    test_unusable_batch_response_falls_back_for_every_card()
+    test_known_fields_per_card()
+    print("すべてのテストが完了しました")
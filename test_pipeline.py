@@ -0,0 +1,212 @@
+"""
+処理パイプライン（modules.pipeline）の並行処理の動作確認テスト
+"""
+
+import re
+import json
+import time
+import asyncio
+import logging
+import threading
+
+from modules import parser, pipeline
+from modules.llm_backend import LLMBackend
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+class FakeCard:
+    """
+    読み込んだ名刺画像の代わり（名前だけを持つ）
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.data = None
+        self.normalization = None
+
+class RecordingStages:
+    """
+    読み込み・OCR・QR・LLMの各段階の代わりに、呼び出された順序を記録する
+    """
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def _record(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def load_image(self, image_path):
+        self._record(("load", image_path))
+        return FakeCard(image_path), None
+
+    def run_ocr_stage(self, card, cancel_event=None):
+        time.sleep(0.01)
+        self._record(("ocr", card.name))
+        return f"{card.name} のテキスト", 0.01
+
+    def run_qr_stage(self, card, cancel_event=None):
+        return [], 0.0
+
+    def run_llm_stage(self, ocr_text, qr_codes, priority, on_field):
+        return {"会社名": ocr_text}, 0.0
+
+class BatchBackend(LLMBackend):
+    """
+    一括解析のプロンプトには名刺ごとの会社名のJSON配列を、個別解析のプロンプトにはJSONオブジェクトを返すバックエンド
+    """
+
+    name = "batch"
+    rate_limited = False
+
+    def __init__(self):
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, timeout=None):
+        with self._lock:
+            self.prompts.append(prompt)
+        cards = re.findall(r'=== CARD (\d+) ===\n(\S+) ', prompt)
+        if cards:
+            return json.dumps([{"card_id": int(card_id), "会社名": name, "その他": ""} for card_id, name in cards],
+                              ensure_ascii=False)
+        return json.dumps({"会社名": "個別", "その他": ""}, ensure_ascii=False)
+
+STAGES = {
+    "_load_image": "load_image",
+    "_run_ocr_stage": "run_ocr_stage",
+    "_run_qr_stage": "run_qr_stage",
+    "_run_llm_stage": "run_llm_stage",
+}
+
+def test_loading_interleaves_with_ocr():
+    """
+    すべての画像を先に読み込まず、処理中の名刺が上限に達したら、処理が終わるたびに次の画像を読み込むことを確認する
+    """
+    stages = RecordingStages()
+    originals = {name: getattr(pipeline, name) for name in STAGES}
+    for name, method in STAGES.items():
+        setattr(pipeline, name, getattr(stages, method))
+    taken = []
+
+    def image_paths():
+        for index in range(20):
+            taken.append(index)
+            yield f"card{index:02d}.png"
+
+    async def collect():
+        return [result async for result in pipeline.process_cards_async(image_paths(), max_workers=2,
+                                                                        use_cache=False)]
+
+    try:
+        results = asyncio.run(collect())
+    finally:
+        for name, original in originals.items():
+            setattr(pipeline, name, original)
+
+    max_in_flight = 2 * pipeline.IN_FLIGHT_PER_WORKER
+    assert len(results) == 20 and all(result["success"] for result in results)
+    assert sorted(result["image_path"] for result in results) == [f"card{index:02d}.png" for index in range(20)]
+    assert taken == list(range(20))
+
+    kinds = [kind for kind, _ in stages.events]
+    print("段階の順序:", "".join("L" if kind == "load" else "O" for kind in kinds))
+    # 最初のOCRが終わるより前に読み込むのは処理中の上限の件数まで
+    assert kinds.index("ocr") <= max_in_flight
+    # どの時点でも、読み込み済みでOCRが終わっていない名刺は上限を超えない
+    loaded = 0
+    for kind in kinds:
+        loaded += 1 if kind == "load" else -1
+        assert loaded <= max_in_flight
+    # 最後の読み込みより前にOCRが終わった名刺がある（読み込みとOCRが交互に進む）
+    last_load = len(kinds) - 1 - kinds[::-1].index("load")
+    assert kinds[:last_load].count("ocr") >= 20 - max_in_flight
+
+def test_llm_requests_are_batched():
+    """
+    llm_batch_sizeを指定すると、Gemini APIでの解析を待つ名刺がまとめて送られ、リクエスト数が減ることを確認する
+    """
+    stages = RecordingStages()
+    names = [name for name in STAGES if name != "_run_llm_stage"]
+    originals = {name: getattr(pipeline, name) for name in names}
+    for name in names:
+        setattr(pipeline, name, getattr(stages, STAGES[name]))
+    backend = BatchBackend()
+    parser.set_llm_backend(backend)
+
+    async def collect():
+        return [result async for result in pipeline.process_cards_async(
+            [f"card{index:02d}.png" for index in range(20)], max_workers=2, use_cache=False, llm_batch_size=5
+        )]
+
+    try:
+        results = asyncio.run(collect())
+    finally:
+        parser.set_llm_backend(None)
+        for name, original in originals.items():
+            setattr(pipeline, name, original)
+
+    print("リクエスト数:", len(backend.prompts))
+    assert len(results) == 20 and all(result["success"] for result in results)
+    assert all(result["data"]["会社名"] == result["image_path"] for result in results)
+    assert all("llm" in result["timings"] for result in results)
+    assert len(backend.prompts) <= 8
+
+    try:
+        asyncio.run(pipeline.process_cards_async([], llm_batch_size=0).__anext__())
+    except ValueError as e:
+        print("想定どおりのエラー:", e)
+    else:
+        raise AssertionError("llm_batch_sizeが0でエラーになりませんでした")
+
+def test_cancel_stops_submitted_ocr():
+    """
+    process_cards_asyncの反復を途中でやめると、実行中の名刺のOCR・QRコード読み取りに中止が伝わり、
+    終わるのを待たずに戻ることを確認する
+    """
+    stages = RecordingStages()
+    observed = []
+
+    def blocking_ocr_stage(card, cancel_event=None):
+        # 中止が伝わるまで終わらないOCR（伝わらなければ上限の時間まで待つ）
+        observed.append(cancel_event.wait(timeout=5))
+        return "", 0.0
+
+    replacements = {"_load_image": stages.load_image, "_run_ocr_stage": blocking_ocr_stage,
+                    "_run_qr_stage": stages.run_qr_stage}
+    originals = {name: getattr(pipeline, name) for name in replacements}
+    for name, stage in replacements.items():
+        setattr(pipeline, name, stage)
+
+    async def collect():
+        return [result async for result in pipeline.process_cards_async(
+            [f"card{index:02d}.png" for index in range(10)], max_workers=2, use_cache=False
+        )]
+
+    start = time.perf_counter()
+    try:
+        asyncio.run(asyncio.wait_for(collect(), timeout=0.2))
+    except asyncio.TimeoutError:
+        print("想定どおりのタイムアウト")
+    else:
+        raise AssertionError("OCRが終わらないのに処理が完了しました")
+    finally:
+        for name, original in originals.items():
+            setattr(pipeline, name, original)
+    elapsed = time.perf_counter() - start
+
+    print(f"中止までの時間: {elapsed:.2f}秒, OCRに中止が伝わった名刺: {observed}")
+    assert observed and all(observed)
+    assert elapsed < 2
+
+if __name__ == "__main__":
+    test_loading_interleaves_with_ocr()
+    test_llm_requests_are_batched()
+    test_cancel_stops_submitted_ocr()
+    print("すべてのテストが成功しました")
@@ -0,0 +1,169 @@
+"""
+名刺ごとのプロファイル（modules.profiler）の動作確認テスト
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import pstats
+import logging
+import tempfile
+import contextlib
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from modules import profiler, qr_payload, pipeline
+from modules.profiler import RequestProfiler
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def _busy_work(seconds):
+    """
+    このパッケージのコードを一定時間実行する（ワーカースレッドの採取の確認用）
+    """
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        qr_payload.parse_vcard("BEGIN:VCARD\nFN:山田太郎\nTEL:03-1234-5678\nEND:VCARD")
+
+def test_disabled_by_default():
+    """
+    要求がなく、PROFILE_ENABLEDがfalseの場合はプロファイルしないことを確認する
+    """
+    assert not profiler.PROFILE_ENABLED
+    assert isinstance(profiler.profile_request("card.jpg"), contextlib.nullcontext)
+
+def test_profile_artifacts():
+    """
+    pstats・collapsed形式・概要（メモリのピーク）が保存され、ワーカースレッドのスタックも採取されることを確認する
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        request_profiler = RequestProfiler(directory=directory, keep=3, interval=0.001)
+        with request_profiler.profile("vertical card.jpg") as request_id:
+            buffer = bytearray(5 * 1024 * 1024)
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="qr") as executor:
+                executor.submit(_busy_work, 0.1).result()
+            del buffer
+        assert not tracemalloc.is_tracing()
+
+        files = sorted(os.listdir(directory))
+        print("保存したファイル:", files)
+        assert files == [f"{request_id}.collapsed", f"{request_id}.json", f"{request_id}.pstats"]
+        with open(os.path.join(directory, f"{request_id}.json"), encoding="utf-8") as f:
+            summary = json.load(f)
+        assert summary["name"] == "vertical card.jpg"
+        assert summary["elapsed_seconds"] >= 0.1
+        assert summary["peak_memory_bytes"] >= 5 * 1024 * 1024
+        assert summary["top_functions"]
+
+        stats = pstats.Stats(os.path.join(directory, f"{request_id}.pstats"))
+        assert stats.total_calls > 0
+        with open(os.path.join(directory, f"{request_id}.collapsed"), encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        # 「スレッド名;関数;関数 回数」の形式で、ワーカースレッドの処理も含まれる
+        worker_lines = [line for line in lines if line.startswith("qr_") and "qr_payload.py:parse_vcard" in line]
+        assert worker_lines
+        stack, count = worker_lines[0].rsplit(" ", 1)
+        assert int(count) >= 1 and "test_profiler.py:_busy_work" in stack.split(";")
+
+def test_overlapping_profiles_have_no_peak():
+    """
+    他のプロファイルと期間が重なった場合はメモリのピーク（プロセス全体の値）を記録せず、
+    単独で実行したプロファイルだけに記録することを確認する
+    """
+    def peak(directory, request_id):
+        with open(os.path.join(directory, f"{request_id}.json"), encoding="utf-8") as f:
+            return json.load(f)["peak_memory_bytes"]
+
+    with tempfile.TemporaryDirectory() as directory:
+        request_profiler = RequestProfiler(directory=directory, keep=5, interval=0.001)
+        with request_profiler.profile("outer.jpg", cprofile=False) as outer_id:
+            with request_profiler.profile("inner.jpg", cprofile=False) as inner_id:
+                buffer = bytearray(1024 * 1024)
+                del buffer
+        with request_profiler.profile("alone.jpg", cprofile=False) as alone_id:
+            buffer = bytearray(1024 * 1024)
+            del buffer
+        assert not tracemalloc.is_tracing()
+        assert peak(directory, outer_id) is None
+        assert peak(directory, inner_id) is None
+        assert peak(directory, alone_id) >= 1024 * 1024
+
+def test_keeps_slowest_profiles():
+    """
+    処理時間の長い順にkeep件だけが残り、再起動後も保存済みのプロファイルを引き継ぐことを確認する
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        request_profiler = RequestProfiler(directory=directory, keep=2)
+        for name, seconds in [("a", 0.03), ("b", 0.01), ("c", 0.05), ("d", 0.02)]:
+            with request_profiler.profile(name):
+                time.sleep(seconds)
+        kept = request_profiler.kept()
+        print("保存したプロファイル:", kept)
+        assert [request_id.split("-")[2] for _, request_id in kept] == ["c", "a"]
+        assert len(os.listdir(directory)) == 6
+
+        # 新しいプロファイラも保存先の概要を読み込み、短い処理のプロファイルは保存しない
+        restarted = RequestProfiler(directory=directory, keep=2)
+        with restarted.profile("e"):
+            pass
+        assert restarted.kept() == kept
+        assert len(os.listdir(directory)) == 6
+
+def test_sampling_only_profiles():
+    """
+    cProfileを使わない場合と、同時に2つの処理をプロファイルする場合も、例外にならずに保存されることを確認する
+    （Python 3.12以降はcProfileを同時に1つしか使えないため、後から始めた方はスタックの採取だけになる）
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        request_profiler = RequestProfiler(directory=directory, keep=5, interval=0.001)
+        with request_profiler.profile("async.jpg", cprofile=False) as request_id:
+            _busy_work(0.02)
+        assert sorted(os.listdir(directory)) == [f"{request_id}.collapsed", f"{request_id}.json"]
+        with open(os.path.join(directory, f"{request_id}.json"), encoding="utf-8") as f:
+            summary = json.load(f)
+        assert summary["cprofile"] is False and summary["top_functions"] == []
+        assert summary["samples"] > 0
+
+        with request_profiler.profile("outer.jpg") as outer_id:
+            with request_profiler.profile("inner.jpg") as inner_id:
+                _busy_work(0.01)
+        summaries = {}
+        for request_id in (outer_id, inner_id):
+            with open(os.path.join(directory, f"{request_id}.json"), encoding="utf-8") as f:
+                summaries[request_id] = json.load(f)
+        assert summaries[outer_id]["cprofile"] is True
+        if sys.version_info >= (3, 12):
+            assert summaries[inner_id]["cprofile"] is False
+            assert not os.path.exists(os.path.join(directory, f"{inner_id}.pstats"))
+
+def test_process_card_async_is_profiled():
+    """
+    非同期処理（一括処理）でも、要求された名刺がプロファイルされることを確認する
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        original = profiler._shared_profiler
+        profiler._shared_profiler = RequestProfiler(directory=directory, keep=3, interval=0.001)
+        try:
+            result = asyncio.run(pipeline.process_card_async(b"not an image", profile=True))
+            kept = profiler._shared_profiler.kept()
+        finally:
+            profiler._shared_profiler = original
+        print("処理結果:", result["error"])
+        assert len(kept) == 1
+        assert {name.rsplit(".", 1)[1] for name in os.listdir(directory)} == {"collapsed", "json"}
+
+if __name__ == "__main__":
+    test_disabled_by_default()
+    test_profile_artifacts()
+    test_overlapping_profiles_have_no_peak()
+    test_keeps_slowest_profiles()
+    test_sampling_only_profiles()
+    test_process_card_async_is_profiled()
+    print("すべてのテストが成功しました")
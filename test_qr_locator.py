@@ -0,0 +1,84 @@
+"""
+QRコードの候補領域の検出（modules.qr_locator）の動作確認テスト
+"""
+
+import logging
+
+import cv2
+import numpy as np
+
+from modules import qr_locator
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+QR_TEXT = "https://sasaeai.link-platform.jp/card/abc123"
+
+def _card_with_qr(width, height, module_size):
+    """
+    右下にQRコードを印刷した名刺画像を作成する
+
+    Returns:
+        tuple: (名刺画像, QRコードの矩形 (x, y, 幅, 高さ))
+    """
+    qr = cv2.QRCodeEncoder.create().encode(QR_TEXT)
+    qr = cv2.resize(qr, None, fx=module_size, fy=module_size, interpolation=cv2.INTER_NEAREST)
+    card = np.full((height, width), 255, np.uint8)
+    for index, text in enumerate(["ACME Inc.", "Taro Yamada", "TEL 03-1234-5678"]):
+        cv2.putText(card, text, (40, 100 + index * 90), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 3)
+    size = qr.shape[0]
+    x, y = width - size - 40, height - size - 40
+    card[y:y + size, x:x + size] = qr
+    return card, (x, y, size, size)
+
+def _contains(region, box):
+    x, y, w, h = region
+    bx, by, bw, bh = box
+    return x <= bx and y <= by and bx + bw <= x + w and by + bh <= y + h
+
+def test_locate_and_decode_region():
+    """
+    名刺サイズの画像と大きな写真のどちらでも、QRコードを含む小さな領域が見つかり、その領域だけで読み取れることを確認する
+    """
+    detector = cv2.QRCodeDetector()
+    for width, height, module_size in [(1075, 650, 6), (3000, 2000, 12)]:
+        card, qr_box = _card_with_qr(width, height, module_size)
+        regions = qr_locator.locate_qr_regions(card, detector)
+        print(f"{width}x{height} の候補領域:", regions)
+        assert regions
+        region = regions[0]
+        assert _contains(region, qr_box)
+        # 候補領域は画像全体よりも十分に小さい
+        assert region[2] * region[3] < width * height * 0.1
+        value, _, _ = detector.detectAndDecode(qr_locator.crop_region(card, region))
+        assert value == QR_TEXT
+
+def test_no_candidates_on_text_only_card():
+    """
+    文字だけの名刺では候補領域が見つからないことを確認する
+    """
+    card = np.full((650, 1075), 255, np.uint8)
+    for index, text in enumerate(["ACME Inc.", "Taro Yamada", "TEL 03-1234-5678", "taro@example.com"]):
+        cv2.putText(card, text, (40, 100 + index * 120), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 3)
+    assert qr_locator.locate_qr_regions(card) == []
+
+def test_downscale():
+    """
+    縮小画像の長辺と縮小率を確認する
+    """
+    small, scale = qr_locator.downscale(np.zeros((2000, 3000), np.uint8))
+    assert max(small.shape) == qr_locator.LOCATE_LONG_SIDE
+    assert abs(scale - qr_locator.LOCATE_LONG_SIDE / 3000) < 1e-9
+    image = np.zeros((300, 400), np.uint8)
+    small, scale = qr_locator.downscale(image)
+    assert small is image and scale == 1.0
+
+if __name__ == "__main__":
+    test_locate_and_decode_region()
+    test_no_candidates_on_text_only_card()
+    test_downscale()
+    print("すべてのテストが成功しました")
@@ -0,0 +1,177 @@
+"""
+QRコードの内容の分類と項目への変換（modules.qr_payload）、QRコードで確定した項目の扱いの動作確認テスト
+"""
+
+import logging
+from modules import parser, qr_payload
+from modules.llm_backend import LLMBackend
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+VCARD = """BEGIN:VCARD
+VERSION:3.0
+N:山田;太郎;;;
+FN:山田 太郎
+ORG:株式会社サンプル;営業部
+TITLE:営業部長
+TEL;TYPE=WORK,VOICE:03-1234-5678
+TEL;TYPE=FAX:03-1234-5679
+TEL;TYPE=CELL:090-1111-2222
+EMAIL;TYPE=INTERNET:yamada@example.com
+ADR;TYPE=WORK:;;丸の内1-1-1;千代田区;東京都;1000001;日本
+URL:https://www.example.com
+END:VCARD"""
+
+MECARD = "MECARD:N:Yamada,Taro;TEL:+81-3-1234-5678;EMAIL:taro@example.com;URL:https\\://example.com;;"
+
+class RecordingBackend(LLMBackend):
+    """
+    受け取ったプロンプトを記録し、固定の応答を返すバックエンド
+    """
+
+    name = "recording"
+    rate_limited = False
+
+    def __init__(self, response):
+        self.response = response
+        self.prompts = []
+
+    def generate(self, prompt, timeout=None):
+        self.prompts.append(prompt)
+        return self.response
+
+def test_classify_and_deduplicate():
+    """
+    QRコードの内容が種類ごとに分類され、同じ内容は1つにまとめられることを確認する
+    """
+    payloads = qr_payload.classify_payloads([
+        "https://sasaeai.com/abc123", VCARD, MECARD, "https://www.example.com", "こんにちは",
+        "https://sasaeai.com/abc123 ", ""
+    ])
+    print("分類結果:", [payload["type"] for payload in payloads])
+    assert [payload["type"] for payload in payloads] == ["sasaeai", "vcard", "mecard", "url", "text"]
+
+def test_sasaeai_hosts():
+    """
+    sasaeai.com以外のささえあいのURL（sasaeai.link-platform.jp）もsasaeai URLとして扱い、HP URLを上書きしないことを確認する
+    """
+    for url in ["https://sasaeai.link-platform.jp/card/abc123", "http://SASAEAI.com/abc123",
+                "https://sasaeai.link-platform.jp"]:
+        assert qr_payload.classify_payload(url) == qr_payload.QR_TYPE_SASAEAI, url
+    for url in ["https://www.example.com/sasaeai", "https://example.jp/?ref=sasaeai.com"]:
+        assert qr_payload.classify_payload(url) == qr_payload.QR_TYPE_URL, url
+
+    payloads = qr_payload.classify_payloads([
+        "BEGIN:VCARD\nVERSION:3.0\nFN:山田 太郎\nURL:https://www.example.com\n"
+        "URL:https://sasaeai.link-platform.jp/card/abc123\nEND:VCARD",
+    ])
+    fields = qr_payload.fields_from_payloads(payloads)
+    assert fields["HP URL"] == "https://www.example.com"
+    assert fields["sasaeai URL"] == "https://sasaeai.link-platform.jp/card/abc123"
+
+    payloads = qr_payload.classify_payloads(["https://sasaeai.link-platform.jp/card/abc123"])
+    assert qr_payload.fields_from_payloads(payloads) == {"sasaeai URL": "https://sasaeai.link-platform.jp/card/abc123"}
+
+def test_parse_vcard_and_mecard():
+    """
+    vCard・MECARDの連絡先が名刺の項目に変換されることを確認する
+    """
+    data = qr_payload.parse_vcard(VCARD)
+    print("vCard:", data)
+    assert data["名前"] == "山田 太郎"
+    assert data["会社名"] == "株式会社サンプル"
+    assert data["職業"] == "営業部長"
+    assert data["電話番号"] == "03-1234-5678"
+    assert data["メールアドレス"] == "yamada@example.com"
+    assert data["郵便番号"] == "100-0001"
+    assert data["住所"] == "東京都千代田区丸の内1-1-1"
+    assert data["HP URL"] == "https://www.example.com"
+    assert "FAX: 03-1234-5679" in data["その他"]
+    assert "予備電話番号: 090-1111-2222" in data["その他"]
+    assert "部署: 営業部" in data["その他"]
+
+    data = qr_payload.parse_mecard(MECARD)
+    print("MECARD:", data)
+    assert data == {
+        "名前": "Yamada Taro",
+        "電話番号": "+81-3-1234-5678",
+        "メールアドレス": "taro@example.com",
+        "HP URL": "https://example.com",
+    }
+
+def test_vcard_fields_skip_llm():
+    """
+    vCardとsasaeai URLのQRコードで全項目が確定した名刺ではGemini APIが呼び出されないことを確認する
+    """
+    payloads = qr_payload.classify_payloads([VCARD, "https://sasaeai.com/abc123"])
+    known_fields = qr_payload.fields_from_payloads(payloads)
+    backend = RecordingBackend("{}")
+    parser.set_llm_backend(backend)
+    try:
+        result = parser.parse_text("読み取れない文字", qr_payload.combine_payload_text(payloads),
+                                   use_cache=False, use_rules=False, known_fields=known_fields)
+    finally:
+        parser.set_llm_backend(None)
+    assert backend.prompts == []
+    assert result["sasaeai URL"] == "https://sasaeai.com/abc123"
+    assert result["会社名"] == "株式会社サンプル"
+    assert "FAX: 03-1234-5679" in result["その他"]
+
+def test_only_fields_missing_from_qr_are_sent():
+    """
+    QRコードで確定しなかった項目だけがGemini APIに送られることを確認する
+    """
+    known_fields = qr_payload.fields_from_payloads(qr_payload.classify_payloads([MECARD]))
+    backend = RecordingBackend('{"会社名": "サンプル商事", "職業": "", "郵便番号": "", "住所": "", '
+                               '"sasaeai URL": "", "その他": ""}')
+    parser.set_llm_backend(backend)
+    try:
+        result = parser.parse_text("サンプル商事\nYamada Taro", MECARD, use_cache=False,
+                                   use_rules=False, known_fields=known_fields)
+    finally:
+        parser.set_llm_backend(None)
+    assert len(backend.prompts) == 1
+    assert "###抽出するべき情報###\n会社名, 職業, 郵便番号, 住所, sasaeai URL, その他" in backend.prompts[0]
+    assert result["名前"] == "Yamada Taro"
+    assert result["会社名"] == "サンプル商事"
+
+def test_qr_notes_kept_with_full_prompt():
+    """
+    QRコードで確定した項目が「その他」だけでプロンプト全体を送る場合も、「その他」が残ることを確認する
+    """
+    backend = RecordingBackend('{"会社名": "サンプル商事", "名前": "山田 太郎", "その他": "携帯: 090-1111-2222"}')
+    parser.set_llm_backend(backend)
+    try:
+        result = parser.parse_text("サンプル商事\n山田 太郎", None, use_cache=False, use_rules=False,
+                                   known_fields={"その他": "FAX: 03-1234-5679"})
+    finally:
+        parser.set_llm_backend(None)
+    assert len(backend.prompts) == 1
+    assert result["会社名"] == "サンプル商事"
+    assert result["その他"] == "FAX: 03-1234-5679 / 携帯: 090-1111-2222"
+
+    # 英語キーのレスポンスもそのまま使い、「その他」だけを追記する
+    backend = RecordingBackend('{"name": "山田 太郎", "company": "サンプル商事", "other": "携帯: 090-1111-2222"}')
+    parser.set_llm_backend(backend)
+    try:
+        result = parser.parse_text("サンプル商事\n山田 太郎", None, use_cache=False, use_rules=False,
+                                   known_fields={"その他": "FAX: 03-1234-5679"})
+    finally:
+        parser.set_llm_backend(None)
+    assert result["名前"] == "山田 太郎"
+    assert result["会社名"] == "サンプル商事"
+    assert result["その他"] == "FAX: 03-1234-5679 / 携帯: 090-1111-2222"
+
+if __name__ == "__main__":
+    test_classify_and_deduplicate()
+    test_sasaeai_hosts()
+    test_parse_vcard_and_mecard()
+    test_vcard_fields_skip_llm()
+    test_only_fields_missing_from_qr_are_sent()
+    test_qr_notes_kept_with_full_prompt()
+    print("すべてのテストが成功しました")
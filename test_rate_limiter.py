@@ -0,0 +1,192 @@
+"""
+Gemini API呼び出しのレート制御（modules.rate_limiter）の動作確認テスト
+
+実際のAPIは呼び出さず、429エラーを返すように台本化した偽のモデルで確認する。
+"""
+
+import time
+import random
+import logging
+import threading
+from modules import rate_limiter
+from modules.rate_limiter import (
+    RateLimiter, TokenBucket, call_with_retry, is_retryable_error,
+    PRIORITY_INTERACTIVE, PRIORITY_BATCH
+)
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+class ScriptedFakeModel:
+    """
+    台本どおりに例外またはレスポンスを返す偽のGenerativeModel
+    """
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = []
+
+    def generate_content(self, prompt, request_options=None):
+        self.calls.append(request_options)
+        step = self.script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+
+        class Response:
+            text = step
+        return Response()
+
+def test_retry_on_scripted_429():
+    """
+    429エラーが続いた後に成功した場合、再試行して結果を返すことを確認する
+    """
+    model = ScriptedFakeModel([
+        Exception("429 Resource has been exhausted (e.g. check quota)."),
+        Exception("503 The service is currently unavailable."),
+        '{"名前": "山田太郎"}'
+    ])
+    sleeps = []
+    result = call_with_retry(
+        lambda timeout: model.generate_content("prompt", request_options={"timeout": timeout}).text,
+        timeout=30,
+        max_retries=3,
+        sleep=sleeps.append,
+        rng=random.Random(0)
+    )
+    print("結果:", result, "待機秒数:", sleeps)
+    assert result == '{"名前": "山田太郎"}'
+    assert len(model.calls) == 3
+    assert all(call["timeout"] == 30 for call in model.calls)
+    assert len(sleeps) == 2 and sleeps[1] > sleeps[0] * 0.5
+
+def test_no_retry_on_client_error():
+    """
+    400などの再試行しても回復しないエラーはそのまま送出されることを確認する
+    """
+    model = ScriptedFakeModel([Exception("400 API key not valid."), "unused"])
+    try:
+        call_with_retry(lambda timeout: model.generate_content("prompt").text, sleep=lambda _: None)
+        assert False, "例外が送出されていません"
+    except Exception as e:
+        assert "400" in str(e)
+    assert len(model.calls) == 1
+    assert is_retryable_error(Exception("429 Too Many Requests"))
+    assert not is_retryable_error(ValueError("invalid argument"))
+
+def test_retry_gives_up_after_max_retries():
+    """
+    再試行回数の上限に達したら最後のエラーを送出することを確認する
+    """
+    model = ScriptedFakeModel([Exception("429 quota exceeded")] * 3)
+    try:
+        call_with_retry(lambda timeout: model.generate_content("prompt").text,
+                        max_retries=2, sleep=lambda _: None)
+        assert False, "例外が送出されていません"
+    except Exception as e:
+        assert "429" in str(e)
+    assert len(model.calls) == 3
+
+def test_server_retry_delay_is_respected():
+    """
+    エラーに含まれるretry_delayの指定より短く待機しないことを確認する
+    """
+    error = Exception("429 quota exceeded retry_delay { seconds: 37 }")
+    assert rate_limiter.backoff_delay(0, error, base_delay=1, max_delay=60) >= 37
+
+def test_parse_text_survives_scripted_429():
+    """
+    parse_textが429エラーを受けても失敗せず、再試行して結果を返すことを確認する
+    """
+    from modules import parser
+    from modules.llm_backend import LLMBackend
+    model = ScriptedFakeModel([
+        Exception("429 Resource has been exhausted (e.g. check quota)."),
+        '{"名前": "山田太郎", "会社名": "株式会社サンプル"}'
+    ])
+
+    class ScriptedBackend(LLMBackend):
+        name = "scripted"
+        rate_limited = False
+
+        def generate(self, prompt, timeout=None):
+            return model.generate_content(prompt, request_options={"timeout": timeout}).text
+
+    original_delay = rate_limiter.GEMINI_RETRY_BASE_DELAY
+    parser.set_llm_backend(ScriptedBackend())
+    rate_limiter.GEMINI_RETRY_BASE_DELAY = 0.01
+    try:
+        result = parser.parse_text("山田太郎\n株式会社サンプル", use_cache=False)
+    finally:
+        parser.set_llm_backend(None)
+        rate_limiter.GEMINI_RETRY_BASE_DELAY = original_delay
+    assert result["名前"] == "山田太郎"
+    assert len(model.calls) == 2
+
+def test_token_bucket_limits_rate():
+    """
+    容量を超える取得は補充されるまで待機することを確認する
+    """
+    limiter = RateLimiter(requests_per_minute=1200, tokens_per_minute=1000000)
+    limiter._requests = TokenBucket(1200, capacity=1)  # 0.05秒に1回
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    elapsed = time.monotonic() - start
+    print(f"3回の取得にかかった時間: {elapsed:.3f}秒")
+    assert elapsed >= 0.09
+
+def test_deadline_while_queued():
+    """
+    待機中に期限を超えた場合はTimeoutErrorになることを確認する
+    """
+    limiter = RateLimiter(requests_per_minute=1, tokens_per_minute=1000000)
+    limiter._requests = TokenBucket(1, capacity=1)
+    limiter.acquire()
+    try:
+        limiter.acquire(deadline=time.monotonic() + 0.05)
+        assert False, "TimeoutErrorが送出されていません"
+    except TimeoutError:
+        pass
+    assert limiter.queue_length() == 0
+
+def test_interactive_preempts_batch():
+    """
+    待ち行列では一括処理より画面からの処理が先に実行されることを確認する
+    """
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=1000000)
+    limiter._requests = TokenBucket(600, capacity=1)  # 0.1秒に1回
+    limiter.acquire()
+
+    order = []
+
+    def worker(name, priority):
+        limiter.acquire(priority=priority)
+        order.append(name)
+
+    threads = [threading.Thread(target=worker, args=(f"batch{i}", PRIORITY_BATCH)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.02)
+    interactive = threading.Thread(target=worker, args=("interactive", PRIORITY_INTERACTIVE))
+    interactive.start()
+    for thread in threads + [interactive]:
+        thread.join()
+
+    print("実行順:", order)
+    assert order[0] == "interactive"
+
+if __name__ == "__main__":
+    print("===== レート制御のテスト =====\n")
+    test_retry_on_scripted_429()
+    test_no_retry_on_client_error()
+    test_retry_gives_up_after_max_retries()
+    test_server_retry_delay_is_respected()
+    test_parse_text_survives_scripted_429()
+    test_token_bucket_limits_rate()
+    test_deadline_while_queued()
+    test_interactive_preempts_batch()
+    print("すべてのテストが完了しました")
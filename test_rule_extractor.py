@@ -0,0 +1,146 @@
+"""
+ルールベース抽出（modules.rule_extractor）とparse_textの高速経路の動作確認テスト
+"""
+
+import logging
+from modules import ocr, parser, rule_extractor
+from modules.llm_backend import LLMBackend
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SIMPLE_CARD = """株式会社サンプル
+営業部長
+山田 太郎
+〒100-0001
+東京都千代田区丸の内1-1-1
+TEL: 03-1234-5678 FAX: 03-1234-5679
+携帯 090-1111-2222
+yamada@example.com
+https://www.example.com"""
+
+class RecordingBackend(LLMBackend):
+    """
+    受け取ったプロンプトを記録し、固定の応答を返すバックエンド
+    """
+
+    name = "recording"
+    rate_limited = False
+
+    def __init__(self, response):
+        self.response = response
+        self.prompts = []
+
+    def generate(self, prompt, timeout=None):
+        self.prompts.append(prompt)
+        return self.response
+
+def test_extract_fields_with_confidence():
+    """
+    名刺の各項目と確信度が抽出され、FAX・予備の電話番号が「その他」にまとめられることを確認する
+    """
+    data, confidence = rule_extractor.extract_fields(SIMPLE_CARD, "https://sasaeai.link-platform.jp/123")
+    print("抽出結果:", data)
+    print("確信度:", confidence)
+    assert data["会社名"] == "株式会社サンプル"
+    assert data["電話番号"] == "03-1234-5678"
+    assert data["郵便番号"] == "100-0001"
+    assert data["住所"] == "東京都千代田区丸の内1-1-1"
+    assert data["sasaeai URL"] == "https://sasaeai.link-platform.jp/123"
+    assert "FAX: 03-1234-5679" in data["その他"]
+    assert "090-1111-2222" in data["その他"]
+    assert rule_extractor.unresolved_fields(confidence, 0.85) == []
+
+def test_department_line_is_not_a_name():
+    """
+    部署名の行（営業部, 開発本部など）が名前として確定しないことを確認する
+    """
+    for department in ("営業部", "開発本部", "大阪支店", "経営企画室"):
+        card = f"株式会社サンプル\n{department}\n東京都千代田区丸の内1-1-1\nyamada@example.com"
+        data, confidence = rule_extractor.extract_fields(card)
+        assert data["名前"] == "", department
+        assert "名前" in rule_extractor.unresolved_fields(confidence, 0.85)
+    data, _ = rule_extractor.extract_fields(SIMPLE_CARD.replace("営業部長\n", "営業部\n"))
+    assert data["名前"] == "山田 太郎"
+
+def test_misread_variants_are_unresolved():
+    """
+    OCRパスごとの読み違い（1〜2文字だけ異なる電話番号・メールアドレス）が残った場合は、
+    予備の連絡先として確定せず、Gemini APIで確認する項目になることを確認する
+    """
+    blocks = ocr.remove_duplicate_blocks([
+        SIMPLE_CARD,
+        SIMPLE_CARD.replace("03-1234-5678", "03-1234-5676").replace("yamada@", "yamda@"),
+    ])
+    data, confidence = rule_extractor.extract_fields("\n".join(blocks))
+    print("抽出結果:", data)
+    assert data["電話番号"] == "03-1234-5678"
+    assert "03-1234-5676" in data["その他"]
+    unresolved = rule_extractor.unresolved_fields(confidence, 0.85)
+    assert "電話番号" in unresolved and "メールアドレス" in unresolved
+    # 数字が大きく異なる番号（携帯電話など）は別の番号として扱う
+    _, confidence = rule_extractor.extract_fields(SIMPLE_CARD)
+    assert confidence["電話番号"] >= 0.85
+
+def test_fast_path_skips_llm():
+    """
+    全項目の確信度が閾値に達した名刺ではGemini APIが呼び出されないことを確認する
+    """
+    backend = RecordingBackend("{}")
+    parser.set_llm_backend(backend)
+    try:
+        result = parser.parse_text(SIMPLE_CARD, use_cache=False, use_rules=True)
+    finally:
+        parser.set_llm_backend(None)
+    assert backend.prompts == []
+    assert result["名前"] == "山田 太郎"
+    assert result["メールアドレス"] == "yamada@example.com"
+
+def test_only_unresolved_fields_are_sent():
+    """
+    確信度が閾値未満の項目だけがGemini APIに送られ、確定済みの項目と合わせて返されることを確認する
+    """
+    card = SIMPLE_CARD.replace("営業部長\n", "")
+    backend = RecordingBackend('{"職業": "営業", "その他": "備考"}')
+    parser.set_llm_backend(backend)
+    try:
+        result = parser.parse_text(card, use_cache=False, use_rules=True)
+    finally:
+        parser.set_llm_backend(None)
+    assert len(backend.prompts) == 1
+    assert "###抽出するべき情報###\n職業, その他" in backend.prompts[0]
+    assert result["職業"] == "営業"
+    assert result["会社名"] == "株式会社サンプル"
+    assert "備考" in result["その他"] and "FAX: 03-1234-5679" in result["その他"]
+
+def test_partial_response_with_english_keys():
+    """
+    未確定項目だけを抽出したGemini APIのレスポンスが英語キーでも、値と旧フィールド（FAXなど）が失われないことを確認する
+    """
+    card = SIMPLE_CARD.replace("営業部長\n", "")
+    backend = RecordingBackend('{"occupation": "営業", "other": "備考", "FAX": "03-9999-0000"}')
+    parser.set_llm_backend(backend)
+    try:
+        result = parser.parse_text(card, use_cache=False, use_rules=True)
+    finally:
+        parser.set_llm_backend(None)
+    assert len(backend.prompts) == 1
+    assert result["職業"] == "営業"
+    assert result["会社名"] == "株式会社サンプル"
+    assert result["名前"] == "山田 太郎"
+    assert "備考" in result["その他"] and "FAX: 03-9999-0000" in result["その他"]
+    assert "FAX: 03-1234-5679" in result["その他"]
+
+if __name__ == "__main__":
+    print("===== ルールベース抽出のテスト =====\n")
+    test_extract_fields_with_confidence()
+    test_department_line_is_not_a_name()
+    test_misread_variants_are_unresolved()
+    test_fast_path_skips_llm()
+    test_only_unresolved_fields_are_sent()
+    test_partial_response_with_english_keys()
+    print("すべてのテストが完了しました")
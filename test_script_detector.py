@@ -0,0 +1,101 @@
+"""
+向き・書字方向・文字の種類の判定（modules.script_detector）とOCR設定の絞り込みの動作確認テスト
+"""
+
+import logging
+
+import cv2
+import numpy as np
+
+from modules import ocr, script_detector
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def _horizontal_card():
+    """
+    横書きの名刺画像を作成する
+    """
+    card = np.full((650, 1075), 255, np.uint8)
+    for index, text in enumerate(["ACME Inc.", "Taro Yamada", "TEL 03-1234-5678", "taro@example.com"]):
+        cv2.putText(card, text, (60, 120 + index * 120), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 3)
+    return card
+
+def _vertical_card():
+    """
+    縦書きの名刺画像（1文字ずつ縦に並べた列）を作成する
+    """
+    card = np.full((1075, 650), 255, np.uint8)
+    for column, text in enumerate(["YAMADATARO", "ACMEINC", "TOKYOJAPAN"]):
+        for row, char in enumerate(text):
+            cv2.putText(card, char, (500 - column * 150, 100 + row * 50), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 3)
+    return card
+
+def _fake_osd(rotate, script, script_conf=5.0, orientation_conf=5.0):
+    def image_to_osd(image, config=None, output_type=None):
+        return {"rotate": rotate, "orientation_conf": orientation_conf, "script": script, "script_conf": script_conf}
+    return image_to_osd
+
+def _analyze(image, osd):
+    original = script_detector.pytesseract.image_to_osd
+    script_detector.pytesseract.image_to_osd = osd
+    try:
+        return script_detector.analyze_card(image, image)
+    finally:
+        script_detector.pytesseract.image_to_osd = original
+
+def test_writing_direction():
+    """
+    横書きと縦書きを判定できることを確認する
+    """
+    assert script_detector.detect_writing_direction(_horizontal_card()) == script_detector.DIRECTION_HORIZONTAL
+    assert script_detector.detect_writing_direction(_vertical_card()) == script_detector.DIRECTION_VERTICAL
+    assert script_detector.detect_writing_direction(np.full((100, 100), 255, np.uint8)) == script_detector.DIRECTION_UNKNOWN
+
+def test_select_configs_from_analysis():
+    """
+    判定結果に応じてOCR設定が2〜4パスに絞り込まれ、判定できない場合は従来どおりになることを確認する
+    """
+    latin = _analyze(_horizontal_card(), _fake_osd(0, "Latin"))
+    configs, variants = ocr.select_ocr_configs(latin)
+    print("英語の名刺:", configs, variants)
+    assert all("-l eng" in config for config in configs)
+    assert len(configs) * len(variants) <= 5
+
+    japanese = _analyze(_horizontal_card(), _fake_osd(0, "Japanese"))
+    configs, _ = ocr.select_ocr_configs(japanese)
+    assert all("jpn+eng" in config for config in configs)
+
+    vertical = _analyze(_vertical_card(), _fake_osd(90, "Japanese"))
+    configs, _ = ocr.select_ocr_configs(vertical)
+    print("縦書きの名刺:", vertical, configs)
+    # 縦書きの日本語はOSDの90度回転を使わない
+    assert vertical["rotate"] == 0
+    assert "--psm 5" in configs[0]
+
+    def failing_osd(image, config=None, output_type=None):
+        raise RuntimeError("Too few characters")
+    unknown = _analyze(_horizontal_card(), failing_osd)
+    configs, variants = ocr.select_ocr_configs(unknown)
+    assert configs == ocr.OCR_CONFIGS and variants is None
+
+def test_rotation_for_sideways_latin_card():
+    """
+    横向きに撮影した英語の名刺はOSDの回転角度で補正されることを確認する
+    """
+    sideways = cv2.rotate(_horizontal_card(), cv2.ROTATE_90_COUNTERCLOCKWISE)
+    analysis = _analyze(sideways, _fake_osd(90, "Latin"))
+    assert analysis["rotate"] == 90
+    assert analysis["direction"] == script_detector.DIRECTION_HORIZONTAL
+    restored = script_detector.rotate_image(sideways, analysis["rotate"])
+    assert np.array_equal(restored, _horizontal_card())
+
+if __name__ == "__main__":
+    test_writing_direction()
+    test_select_configs_from_analysis()
+    test_rotation_for_sideways_latin_card()
+    print("すべてのテストが成功しました")
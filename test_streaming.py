@@ -0,0 +1,98 @@
+"""
+ストリーミング受信と逐次JSONパース（modules.stream_parser）の動作確認テスト
+
+Gemini APIは呼び出さず、ローカルのスタブサーバと偽のバックエンドで確認する。
+"""
+
+import time
+import logging
+from modules import parser
+from modules.llm_backend import LLMBackend, HTTPStubBackend
+from modules.llm_stub_server import StubBehavior, start_stub_server
+from modules.stream_parser import IncrementalJSONObjectParser
+
+# ロギング設定
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+RESPONSE = '```json\n{"名前": "山田 \\"太郎\\"", "会社名": "株式会社サンプル", "その他": "備考, {メモ}"}\n```'
+
+class ChunkedBackend(LLMBackend):
+    """
+    固定の応答を指定した文字数ずつ返す偽のバックエンド
+    """
+
+    name = "chunked"
+    rate_limited = False
+
+    def __init__(self, response, size):
+        self.response = response
+        self.size = size
+
+    def generate(self, prompt, timeout=None):
+        return self.response
+
+    def generate_stream(self, prompt, timeout=None):
+        for index in range(0, len(self.response), self.size):
+            yield self.response[index:index + self.size]
+
+def test_incremental_parser_any_chunk_size():
+    """
+    どの位置でチャンクが分割されても、同じ項目が同じ順序で得られることを確認する
+    """
+    expected = [("名前", '山田 "太郎"'), ("会社名", "株式会社サンプル"), ("その他", "備考, {メモ}")]
+    for size in range(1, len(RESPONSE) + 1):
+        stream_parser = IncrementalJSONObjectParser()
+        fields = []
+        for index in range(0, len(RESPONSE), size):
+            fields += stream_parser.feed(RESPONSE[index:index + size])
+        assert fields == expected, f"チャンクサイズ{size}で不一致: {fields}"
+        assert stream_parser.done
+
+def test_fields_arrive_before_response_completes():
+    """
+    スタブサーバのストリーミング応答で、応答全体を受信する前に最初の項目が通知されることを確認する
+    """
+    server = start_stub_server(behavior=StubBehavior(latency=0.5))
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    arrivals = []
+    parser.set_llm_backend(HTTPStubBackend(url))
+    try:
+        start = time.perf_counter()
+        result = parser.parse_text(
+            "山田太郎\n株式会社サンプル\nyamada@example.com", use_cache=False, use_rules=False,
+            on_field=lambda key, value: arrivals.append((key, value, time.perf_counter() - start))
+        )
+        total = time.perf_counter() - start
+    finally:
+        parser.set_llm_backend(None)
+        server.shutdown()
+
+    print(f"最初の項目: {arrivals[0][2]:.2f}秒 / 全体: {total:.2f}秒")
+    assert arrivals[0][0] == "名前"
+    assert arrivals[0][2] < total * 0.7
+    assert {key: value for key, value, _ in arrivals} == result
+
+def test_malformed_stream_falls_back_to_repair():
+    """
+    逐次パースできない応答でも、従来の修復処理で最終結果が得られ、すべての項目が通知されることを確認する
+    """
+    parser.set_llm_backend(ChunkedBackend("{名前: '山田太郎', \"会社名\": \"株式会社サンプル\"}", 5))
+    notified = {}
+    try:
+        result = parser.parse_text("山田太郎", use_cache=False, use_rules=False,
+                                   on_field=lambda key, value: notified.__setitem__(key, value))
+    finally:
+        parser.set_llm_backend(None)
+    assert result["会社名"] == "株式会社サンプル"
+    assert notified == result
+
+if __name__ == "__main__":
+    print("===== ストリーミング受信のテスト =====\n")
+    test_incremental_parser_any_chunk_size()
+    test_fields_arrive_before_response_completes()
+    test_malformed_stream_falls_back_to_repair()
+    print("すべてのテストが完了しました")